@@ -2628,6 +2628,11 @@ Singleton {
             property JsonObject resources: JsonObject {
                 property int updateInterval: 3000
                 property bool monitorGpu: true
+                // Sampler rates in ms (0 = updateInterval)
+                property int temperatureInterval: 0
+                property int diskInterval: 30000
+                // Sampling slows down this many times while the bar is hidden or the screen is locked
+                property int hiddenSlowdown: 4
             }
 
             property JsonObject musicRecognition: JsonObject {
@@ -2649,6 +2654,10 @@ Singleton {
                 // Decoded text of pinned entries, newest first. Stored decoded so a
                 // pin survives cliphist rotating its store past the original id.
                 property list<string> pinned: []
+                property string backend: "cliphist" // "cliphist" | "native" (scripts/clipboard_history.py)
+                // Native backend only; cliphist takes its own -max-items
+                property int historyMaxEntries: 750
+                property int historyMaxMegabytes: 256
             }
 
             property JsonObject search: JsonObject {
@@ -3038,6 +3047,10 @@ Singleton {
                 property string targetMonitor: ""
                 property string style: "grid" // "grid" | "coverflow" | "launcher"
                 property string coverflowView: "gallery" // "gallery" | "skew"
+                // Per thumbnail size; 0 = no limit (thumbnails of deleted/changed files are pruned either way).
+                // ~/.cache/thumbnails is shared with file managers and other apps: a budget evicts
+                // their least recently used thumbnails too, which they then regenerate.
+                property int thumbnailCacheBudgetMB: 0
             }
 
             property JsonObject screenRecord: JsonObject {
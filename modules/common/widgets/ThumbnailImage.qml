@@ -52,15 +52,22 @@ StyledImage {
         }
     }
 
-    // Queue thumbnail generation through Wallpapers' serial queue instead of
+    // Queue thumbnail generation through Wallpapers' thumbgen queue instead of
     // spawning a per-item magick/ffmpeg process.  This avoids a thundering herd
-    // when opening a directory with many uncached thumbnails.
+    // when opening a directory with many uncached thumbnails, and puts the
+    // thumbnails on screen ahead of a running folder scan.
+    property bool _thumbnailRequested: false
     function _ensureThumbnail() {
         if (!root.generateThumbnail) return
         if (!root.sourcePath || root.sourcePath.length === 0) return
-        // Batch generator already running — it will emit thumbnailGeneratedFile
-        if (Wallpapers.thumbnailGenerationRunning) return
-        Wallpapers.ensureThumbnailForPath(root.sourcePath, root.thumbnailSizeName)
+        root._thumbnailRequested = true
+        Wallpapers.ensureThumbnailForPath(root.sourcePath, root.thumbnailSizeName, Wallpapers.thumbnailPriorityVisible)
+    }
+
+    // Scrolled away before its thumbnail was made: let visible ones go first
+    Component.onDestruction: {
+        if (root._thumbnailRequested && !root.thumbnailAvailable)
+            Wallpapers.prioritizeThumbnail(root.sourcePath, Wallpapers.thumbnailPriorityBackground)
     }
 
     function _clearResolvedThumbnail() {
@@ -200,14 +200,15 @@ Item {
         for (let offset = 0; offset <= radius; offset++) {
             const leftIndex = centerIndex - offset
             const rightIndex = offset === 0 ? -1 : centerIndex + offset
+            const priority = offset === 0 ? Wallpapers.thumbnailPriorityVisible : Wallpapers.thumbnailPriorityNear
             if (leftIndex >= 0)
-                _prefetchIndex(leftIndex)
+                _prefetchIndex(leftIndex, priority)
             if (rightIndex >= 0 && rightIndex < totalCount)
-                _prefetchIndex(rightIndex)
+                _prefetchIndex(rightIndex, priority)
         }
     }
 
-    function _prefetchIndex(index) {
+    function _prefetchIndex(index, priority = Wallpapers.thumbnailPriorityNear) {
         if (index < 0 || index >= totalCount)
             return
         if (_fileIsDir(index))
@@ -215,7 +216,7 @@ Item {
         const filePath = _filePath(index)
         if (!filePath || filePath.length === 0)
             return
-        Wallpapers.ensureThumbnailForPath(filePath, _lastThumbnailSizeName)
+        Wallpapers.ensureThumbnailForPath(filePath, _lastThumbnailSizeName, priority)
     }
 
 
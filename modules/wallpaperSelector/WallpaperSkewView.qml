@@ -631,7 +631,7 @@ Item {
             const fp = _imgFilePath(i)
             const fn = _imgFileName(i)
             if (fp && fp.length > 0) {
-                Wallpapers.ensureThumbnailForPath(fp, root._thumbSizeName)
+                Wallpapers.ensureThumbnailForPath(fp, root._thumbSizeName, Wallpapers.thumbnailPriorityNear)
                 if (_mediaKind(fn) === "video")
                     Wallpapers.ensureVideoFirstFrame(fp)
             }
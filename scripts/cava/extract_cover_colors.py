@@ -54,8 +54,11 @@ def quantize_colors(image_path: str, count: int = 8) -> list[str]:
     """Extract dominant colors using PIL quantization."""
     from PIL import Image
 
-    img = Image.open(image_path).convert("RGB")
-    img = img.resize((150, 150), Image.LANCZOS)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "colors"))
+    from image_loading import load_downscaled
+
+    # Covers can be multi-megapixel; decode at reduced resolution where possible
+    img, _stats = load_downscaled(image_path, (150, 150), Image.LANCZOS, mode="RGB")
     quantized = img.quantize(colors=max(count * 3, 12), method=Image.Quantize.MEDIANCUT)
     palette = quantized.getpalette()
     if not palette:
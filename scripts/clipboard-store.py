@@ -21,22 +21,72 @@ Electron app (Discord, Slack, VS Code) emit the CF_HTML fragment markers around
 the selection. Neither appears in copied source code that merely happens to
 contain "<div>". Anything that is not one of those payloads is forwarded byte
 for byte -- a trailing newline is part of what you copied.
+
+Payloads are read in chunks. Detection only looks at the first
+DETECT_PREFIX_BYTES (both wrappers sit at the very start), so anything else --
+a multi-MB log, say -- is streamed through untouched without being held in
+memory. Markup payloads larger than --strip-limit are stored as they are
+rather than stripped.
+
+`--watch` replaces the per-copy `wl-paste --watch clipboard-store.py` process:
+it runs one wl-paste watcher whose per-copy command only writes wl-paste's
+CLIPBOARD_STATE and the base64-encoded payload, each followed by a NUL, and
+filters and stores the NUL-delimited entries itself. Base64 keeps NUL bytes
+inside a payload from splitting it.
+
+With clipboard.backend set to "native" in config.json, entries go to
+clipboard_history.py's store instead of `cliphist store`. cliphist then no
+longer sees images either, so --watch also runs a `wl-paste --type image`
+watcher that stores them, unfiltered, while that backend is selected. That
+watcher is started and stopped as the backend setting changes.
 """
 
+import argparse
+import base64
 import html
+import itertools
+import json
+import os
 import re
 import subprocess
 import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import clipboard_history  # noqa: E402
 
 # Firefox-style: a content-type meta tag prepended to the payload.
 HTML_PAYLOAD_PREFIX = b'<meta http-equiv="content-type" content="text/html'
 # Chromium/Electron-style: the selection wrapped in CF_HTML fragment markers,
 # usually inside a bare <html><body>.
 HTML_FRAGMENT_MARKER = b"<!--StartFragment-->"
+# Both wrappers open the payload; the fragment marker follows at most a few
+# <html>/<head>/<meta> tags.
+DETECT_PREFIX_BYTES = 4096
+# Markup payloads above this are stored unstripped (0 = no limit)
+STRIP_LIMIT_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# wl-paste runs this per copy in --watch mode: the clipboard state and the
+# payload, each followed by a separator. Payloads travel base64-encoded, as
+# images are full of NULs and text may contain them too.
+WATCH_COMMAND = [
+    "wl-paste", "--type", "text", "--watch", "sh", "-c", 'printf "%s\\0" "$CLIPBOARD_STATE"; base64 -w0; printf "\\0"'
+]
+IMAGE_WATCH_COMMAND = [
+    "wl-paste", "--type", "image", "--watch", "sh", "-c", 'printf "%s\\0" "$CLIPBOARD_STATE"; base64 -w0; printf "\\0"'
+]
+# Seconds between config.json checks for a backend switch in --watch (a stat)
+CONFIG_CHECK_INTERVAL = 2.0
+CONFIG_JSON = os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config"),
+    "inir",
+    "config.json",
+)
 
 
 def is_browser_markup(payload: bytes) -> bool:
-    return payload.startswith(HTML_PAYLOAD_PREFIX) or HTML_FRAGMENT_MARKER in payload
+    head = payload[:DETECT_PREFIX_BYTES]
+    return head.startswith(HTML_PAYLOAD_PREFIX) or HTML_FRAGMENT_MARKER in head
 
 
 def strip_browser_markup(markup: str) -> str:
@@ -60,23 +110,252 @@ def strip_browser_markup(markup: str) -> str:
     return re.sub(r"\n{3,}", "\n\n", text).strip()
 
 
-def main() -> int:
-    payload = sys.stdin.buffer.read()
+def filter_entry(chunks, strip_limit=STRIP_LIMIT_BYTES):
+    """Filter one payload given as an iterable of byte chunks. Returns an
+    iterable of output chunks, or None when nothing should be stored."""
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= DETECT_PREFIX_BYTES:
+            break
+
+    if not is_browser_markup(head):
+        return itertools.chain((head,), chunks)
+
+    raw = []
+    size = 0
+    for chunk in itertools.chain((head,), chunks):
+        raw.append(chunk)
+        size += len(chunk)
+        if strip_limit and size > strip_limit:
+            return itertools.chain(raw, chunks)
+
+    text = strip_browser_markup(b"".join(raw).decode("utf-8", "replace"))
+    return (text.encode("utf-8"),) if text else None
+
+
+def read_chunks(fd):
+    while chunk := os.read(fd, CHUNK_SIZE):
+        yield chunk
 
-    if is_browser_markup(payload):
-        text = strip_browser_markup(payload.decode("utf-8", "replace"))
-        if not text:
+
+def nul_entries(fd):
+    """Split the stream on `fd` at NUL bytes, yielding each entry as an
+    iterator of chunks. Consume (or abandon) each entry before the next."""
+    pending = b""
+    eof = False
+
+    def entry():
+        nonlocal pending, eof
+        while True:
+            end = pending.find(b"\0")
+            if end >= 0:
+                chunk, pending = pending[:end], pending[end + 1:]
+                if chunk:
+                    yield chunk
+                return
+            if pending:
+                chunk, pending = pending, b""
+                yield chunk
+            if eof:
+                return
+            data = os.read(fd, CHUNK_SIZE)
+            if not data:
+                eof = True
+            pending += data
+
+    while True:
+        if not pending and not eof:
+            pending = os.read(fd, CHUNK_SIZE)
+            eof = not pending
+        if not pending and eof:
+            return
+        current = entry()
+        yield current
+        for _ in current:
+            pass
+
+
+_settings_cache = {"mtime": None, "settings": None}
+
+
+def history_settings():
+    """The clipboard history settings of config.json, reloaded when it changes."""
+    try:
+        mtime = os.stat(CONFIG_JSON).st_mtime_ns
+    except OSError:
+        mtime = None
+    if _settings_cache["settings"] is None or mtime != _settings_cache["mtime"]:
+        try:
+            with open(CONFIG_JSON) as f:
+                clipboard = json.load(f).get("clipboard") or {}
+        except (OSError, ValueError, AttributeError):
+            clipboard = {}
+        _settings_cache["mtime"] = mtime
+        _settings_cache["settings"] = {
+            "backend": clipboard.get("backend", "cliphist"),
+            "maxEntries": int(clipboard.get("historyMaxEntries", clipboard_history.MAX_ENTRIES)),
+            "maxBytes": int(clipboard.get("historyMaxMegabytes", clipboard_history.MAX_BYTES >> 20)) << 20,
+        }
+    return _settings_cache["settings"]
+
+
+def store_native(chunks, state, settings) -> int:
+    data = []
+    size = 0
+    for chunk in chunks:
+        data.append(chunk)
+        size += len(chunk)
+        # cliphist ignores oversized entries too; stop buffering them early
+        if size > clipboard_history.MAX_ENTRY_BYTES:
             return 0
-        payload = text.encode("utf-8")
+    history = clipboard_history.HistoryStore(max_entries=settings["maxEntries"], max_bytes=settings["maxBytes"])
+    try:
+        history.store(b"".join(data), state)
+    except (OSError, clipboard_history.HistoryError) as e:
+        print(f"[clipboard-store] cannot store in the native history: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def store(chunks, state=None) -> int:
+    """Store one entry. `state` is wl-paste's CLIPBOARD_STATE, which both
+    backends honour: "sensitive" entries are skipped, "clear" drops the newest."""
+    settings = history_settings()
+    if settings["backend"] == "native":
+        return store_native(chunks, state, settings)
+    env = None if state is None else dict(os.environ, CLIPBOARD_STATE=state)
+    proc = subprocess.Popen(["cliphist", "store"], stdin=subprocess.PIPE, env=env)
+    try:
+        for chunk in chunks:
+            proc.stdin.write(chunk)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    return proc.wait()
+
+
+def b64_decoded(chunks):
+    """Decode a base64 stream chunk by chunk."""
+    rest = b""
+    for chunk in chunks:
+        rest += chunk
+        cut = len(rest) - len(rest) % 4
+        if cut:
+            yield base64.b64decode(rest[:cut])
+            rest = rest[cut:]
+
+
+def watched_entries(watcher):
+    """(state, payload chunks) for every copy `watcher` reports."""
+    entries = nul_entries(watcher.stdout.fileno())
+    for state in entries:
+        state = b"".join(state).decode("utf-8", "replace")
+        payload = next(entries, None)
+        if payload is None:
+            return
+        yield state, b64_decoded(payload)
+
+
+def store_text(state, payload, strip_limit):
+    if state == "clear":
+        store((), state)
+        return
+    if state == "sensitive":
+        return
+    output = filter_entry(payload, strip_limit)
+    if output is None:
+        return
+    # Peek so an empty copy does not reach the store
+    output = iter(output)
+    first = next((chunk for chunk in output if chunk), None)
+    if first is not None:
+        store(itertools.chain((first,), output), state)
+
+
+def watch_images(watcher):
+    for state, payload in watched_entries(watcher):
+        settings = history_settings()
+        # With cliphist its own image watcher stores these; the text watcher
+        # already handles "clear"
+        if settings["backend"] == "native" and state not in ("clear", "sensitive"):
+            store_native(payload, state, settings)
+
+
+def follow_backend(stopped):
+    """Run the image watcher while the native backend is selected, starting and
+    stopping it as config.json changes, until `stopped` is set."""
+    image_watcher = None
+    while True:
+        native = history_settings()["backend"] == "native"
+        if native and image_watcher is None:
+            try:
+                image_watcher = subprocess.Popen(IMAGE_WATCH_COMMAND, stdout=subprocess.PIPE)
+            except OSError as e:
+                print(f"[clipboard-store] cannot start wl-paste: {e}", file=sys.stderr)
+            else:
+                threading.Thread(target=watch_images, args=(image_watcher,), daemon=True).start()
+        elif not native and image_watcher is not None:
+            image_watcher.terminate()
+            image_watcher.wait()
+            image_watcher = None
+        if stopped.wait(CONFIG_CHECK_INTERVAL):
+            break
+    if image_watcher is not None:
+        image_watcher.terminate()
+        image_watcher.wait()
+
+
+def watch(strip_limit) -> int:
+    try:
+        watcher = subprocess.Popen(WATCH_COMMAND, stdout=subprocess.PIPE)
+    except OSError as e:
+        print(f"[clipboard-store] cannot start wl-paste: {e}", file=sys.stderr)
+        return 1
+    stopped = threading.Event()
+    follower = threading.Thread(target=follow_backend, args=(stopped,), daemon=True)
+    follower.start()
+    try:
+        for state, payload in watched_entries(watcher):
+            store_text(state, payload, strip_limit)
+    except KeyboardInterrupt:
+        watcher.terminate()
+    stopped.set()
+    follower.join()
+    return watcher.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Strip browser markup from clipboard text before cliphist stores it")
+    parser.add_argument("--filter", action="store_true", help="write the result to stdout instead of storing it")
+    parser.add_argument("--watch", action="store_true", help="run one wl-paste watcher and store every copy")
+    parser.add_argument(
+        "--strip-limit", type=int, default=STRIP_LIMIT_BYTES, metavar="BYTES",
+        help=f"store larger markup payloads unstripped (default {STRIP_LIMIT_BYTES}, 0 = no limit)",
+    )
+    args, _ = parser.parse_known_args()
+
+    if args.watch:
+        return watch(args.strip_limit)
+
+    output = filter_entry(read_chunks(sys.stdin.fileno()), args.strip_limit)
+    if output is None:
+        return 0
 
     # --filter writes to stdout instead of storing. Entries captured before this
     # filter existed still hold markup, so copying one back out has to clean it
     # too, or the history stays poisoned for as long as those entries live.
-    if "--filter" in sys.argv[1:]:
-        sys.stdout.buffer.write(payload)
+    if args.filter:
+        for chunk in output:
+            sys.stdout.buffer.write(chunk)
         return 0
 
-    return subprocess.run(["cliphist", "store"], input=payload).returncode
+    return store(output, os.environ.get("CLIPBOARD_STATE"))
 
 
 if __name__ == "__main__":
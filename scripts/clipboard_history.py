@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+"""
+Native clipboard history store with a cliphist-compatible command line.
+
+services/deferred/Cliphist.qml drives cliphist through `list`, `decode`,
+`delete` and `wipe`, and the watcher feeds it through `store`. This script
+takes the same commands and prints the same "id<TAB>preview" lines, so the
+panel can use it in place of cliphist (clipboard.backend = "native"):
+
+  store                  store stdin as the newest entry
+  list [--limit N]       "id<TAB>preview" lines, newest first
+  decode [LINE]          write the entry of "id[<TAB>...]" (argument or stdin)
+  delete                 delete the entries of the lines on stdin
+  delete-query QUERY     delete every text entry containing QUERY
+  wipe                   delete everything
+  search QUERY           like list, for text entries containing QUERY
+                         (ASCII case-insensitive)
+  import-cliphist        copy the cliphist history into this store
+
+The store lives in $XDG_CACHE_HOME/inir/clipboard-history:
+
+  data.<generation>   preview + payload of every entry, append-only
+  index               48-byte header (magic, version, generation, next id,
+                      live entries and bytes, oldest live position), then
+                      one fixed 40-byte record per entry in id order:
+                      id, data offset, payload length, preview length,
+                      flags, blake2b-128 of the payload
+  trigrams            trigram -> index positions of the text entries holding
+                      it, for the first `covered` index records
+  lock                flock: writers exclusive, readers shared
+
+Listing reads previews straight out of the mmapped files, so its cost is the
+number of lines printed, not the size of the history. Deleting only flags the
+index record; storing a payload already in the history flags the old record
+and points a new one at the same data, so it moves to the top without being
+written twice. Once dead data outweighs live data the files are rewritten
+under the next generation. The trigram index is merged in growing batches
+of stores; records past the covered ones are scanned directly.
+"""
+
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import subprocess
+import sys
+from array import array
+from pathlib import Path
+
+DB_PATH = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "inir" / "clipboard-history"
+# Same default as cliphist -max-items
+MAX_ENTRIES = 750
+# Stored bytes kept, previews included
+MAX_BYTES = 256 * 1024 * 1024
+# cliphist ignores anything larger
+MAX_ENTRY_BYTES = 5_000_000
+PREVIEW_WIDTH = 100
+# Trigrams are taken from this much of each entry; longer entries are always
+# checked in full instead
+SEARCH_BYTES = 1024 * 1024
+# Stores between trigram index merges: at least TRIGRAM_BATCH, and at least
+# 1/TRIGRAM_GROWTH of the records already covered so merges stay amortised
+TRIGRAM_BATCH = 64
+TRIGRAM_GROWTH = 8
+# Compaction waits for at least this much dead data
+COMPACT_MIN_BYTES = 1024 * 1024
+
+_MAGIC = b"INIRCLIP"
+_TRIGRAM_MAGIC = b"INIRTRI1"
+_VERSION = 1
+# magic, version, generation, next id, live entries, live bytes, oldest live position
+_HEADER = struct.Struct("<8sIIQQQQ")
+_RECORD = struct.Struct("<QQIHH16s")  # id, offset, length, preview length, flags, digest
+_FLAGS = struct.Struct("<H")
+_FLAGS_OFFSET = 22
+_TRIGRAM_HEADER = struct.Struct("<8sIII")  # magic, generation, covered records, trigrams
+_TRIGRAM_KEY = struct.Struct("<3sxII")  # trigram, first posting, postings
+_POSTING = "I"
+
+_DELETED = 1
+_IMAGE = 2
+
+# Record fields
+_ID, _OFFSET, _LENGTH, _PREVIEW, _FLAGS_FIELD, _DIGEST = range(6)
+
+
+class HistoryError(Exception):
+    pass
+
+
+# ── Previews ─────────────────────────────────────────────────────────────────
+
+
+def image_info(data):
+    """(format, width, height) for the image formats cliphist recognises, else None."""
+    try:
+        if data.startswith(b"\x89PNG\r\n\x1a\n"):
+            width, height = struct.unpack_from(">II", data, 16)
+            return "png", width, height
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack_from("<HH", data, 6)
+            return "gif", width, height
+        if data.startswith(b"BM"):
+            if struct.unpack_from("<I", data, 14)[0] == 12:
+                width, height = struct.unpack_from("<HH", data, 18)
+            else:
+                width, height = struct.unpack_from("<ii", data, 18)
+            return "bmp", width, abs(height)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            chunk = data[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack_from("<HH", data, 26)
+                return "webp", width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = struct.unpack_from("<I", data, 21)[0]
+                return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                width = int.from_bytes(data[24:27], "little") + 1
+                height = int.from_bytes(data[27:30], "little") + 1
+                return "webp", width, height
+            return None
+        if data.startswith(b"\xff\xd8"):
+            return _jpeg_info(data)
+    except struct.error:
+        pass
+    return None
+
+
+def _jpeg_info(data):
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack_from(">HH", data, pos + 5)
+            return "jpeg", width, height
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        pos += 2 + struct.unpack_from(">H", data, pos + 2)[0]
+    return None
+
+
+def _size_str(size):
+    units = ("B", "KiB", "MiB")
+    value = float(size)
+    unit = 0
+    while value >= 1024 and unit < len(units) - 1:
+        value /= 1024
+        unit += 1
+    return f"{value:.0f} {units[unit]}"
+
+
+def preview(data, width=PREVIEW_WIDTH):
+    """The preview `cliphist list` shows for `data`. Returns (text, is_image)."""
+    info = image_info(data)
+    if info is not None:
+        fmt, w, h = info
+        return f"[[ binary data {_size_str(len(data))} {fmt} {w}x{h} ]]", True
+    text = " ".join(data.decode("utf-8", "replace").split())
+    if len(text) > width:
+        text = text[:width] + "…"
+    return text, False
+
+
+# ── Trigrams ─────────────────────────────────────────────────────────────────
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _search_window(data):
+    return data[:SEARCH_BYTES].lower()
+
+
+def _matches(data, needle, fold):
+    return needle in (data.lower() if fold else data)
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+
+def _map(path):
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+
+def _find_position(index, count, entry_id):
+    # Ids only ever grow along the index
+    low, high = 0, count
+    while low < high:
+        mid = (low + high) // 2
+        current = struct.unpack_from("<Q", index, _HEADER.size + mid * _RECORD.size)[0]
+        if current < entry_id:
+            low = mid + 1
+        elif current > entry_id:
+            high = mid
+        else:
+            return mid
+    return None
+
+
+class _Snapshot:
+    """Read-only view of the store, valid while the shared lock is held."""
+
+    def __init__(self, root):
+        self.root = root
+        self.generation = 0
+        self.count = 0
+        self.first_live = 0
+        self.index = _map(root / "index")
+        self.data = None
+        self.trigrams = None
+        self._trigram_keys = 0
+        if self.index is None or len(self.index) < _HEADER.size:
+            return
+        magic, version, self.generation, _, _, _, self.first_live = _HEADER.unpack_from(self.index, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise HistoryError(f"{root / 'index'} is not a clipboard history index")
+        self.count = (len(self.index) - _HEADER.size) // _RECORD.size
+        self.data = _map(root / f"data.{self.generation}")
+        self.trigrams = _map(root / "trigrams")
+
+    def close(self):
+        for mapped in (self.index, self.data, self.trigrams):
+            if mapped is not None:
+                mapped.close()
+
+    def record(self, pos):
+        return _RECORD.unpack_from(self.index, _HEADER.size + pos * _RECORD.size)
+
+    def find(self, entry_id):
+        pos = _find_position(self.index, self.count, entry_id)
+        if pos is None:
+            return None
+        record = self.record(pos)
+        return None if record[_FLAGS_FIELD] & _DELETED else record
+
+    def live(self):
+        """Live records, newest first."""
+        for pos in range(self.count - 1, self.first_live - 1, -1):
+            record = self.record(pos)
+            if not record[_FLAGS_FIELD] & _DELETED:
+                yield pos, record
+
+    def preview(self, record):
+        start = record[_OFFSET]
+        return self.data[start:start + record[_PREVIEW]]
+
+    def payload(self, record):
+        start = record[_OFFSET] + record[_PREVIEW]
+        return self.data[start:start + record[_LENGTH]]
+
+    def _postings(self, key):
+        table = _TRIGRAM_HEADER.size
+        low, high = 0, _TRIGRAM_HEADER.unpack_from(self.trigrams, 0)[3]
+        while low < high:
+            mid = (low + high) // 2
+            current, first, count = _TRIGRAM_KEY.unpack_from(self.trigrams, table + mid * _TRIGRAM_KEY.size)
+            if current < key:
+                low = mid + 1
+            elif current > key:
+                high = mid
+            else:
+                postings = array(_POSTING)
+                start = table + self._trigram_keys * _TRIGRAM_KEY.size + first * postings.itemsize
+                postings.frombytes(self.trigrams[start:start + count * postings.itemsize])
+                return postings
+        return array(_POSTING)
+
+    def candidates(self, needle):
+        """Index positions that may hold `needle` (lowercase), newest first.
+        None means every position."""
+        if len(needle) < 3 or self.trigrams is None or len(self.trigrams) < _TRIGRAM_HEADER.size:
+            return None
+        magic, generation, covered, self._trigram_keys = _TRIGRAM_HEADER.unpack_from(self.trigrams, 0)
+        if magic != _TRIGRAM_MAGIC or generation != self.generation or covered > self.count:
+            return None
+        positions = None
+        for key in sorted(_trigrams(needle)):
+            postings = set(self._postings(key))
+            positions = postings if positions is None else positions & postings
+            if not positions:
+                break
+        positions = set(positions or ())
+        # Entries too long to index whole and records not merged yet
+        for pos in range(self.count):
+            if pos >= covered or self.record(pos)[_LENGTH] > SEARCH_BYTES:
+                positions.add(pos)
+        return sorted(positions, reverse=True)
+
+    def search(self, needle, fold=True):
+        """Live text records whose payload contains `needle`, newest first."""
+        if fold:
+            needle = needle.lower()
+        positions = self.candidates(needle.lower())
+        if positions is None:
+            positions = range(self.count - 1, self.first_live - 1, -1)
+        for pos in positions:
+            record = self.record(pos)
+            if record[_FLAGS_FIELD] & (_DELETED | _IMAGE):
+                continue
+            if _matches(self.payload(record), needle, fold):
+                yield pos, record
+
+
+# ── Writing ──────────────────────────────────────────────────────────────────
+
+
+def _write_all(fd, data, offset=None):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view) if offset is None else os.pwrite(fd, view, offset)
+        view = view[written:]
+        if offset is not None:
+            offset += written
+
+
+def _read_all(fd):
+    size = os.fstat(fd).st_size
+    data = os.pread(fd, size, 0)
+    while len(data) < size:
+        part = os.pread(fd, size - len(data), len(data))
+        if not part:
+            break
+        data += part
+    return data
+
+
+class _Writer:
+    """Mutable view of the store, valid while the exclusive lock is held.
+
+    The index stays raw bytes: records are unpacked only where a store,
+    delete or trim needs them, so their cost does not grow with the history."""
+
+    def __init__(self, root):
+        self.root = root
+        self.index_fd = os.open(root / "index", os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+        raw = _read_all(self.index_fd)
+        if len(raw) < _HEADER.size:
+            self.generation, self.next_id = 0, 1
+            self.live_count = self.live_bytes = self.first_live = 0
+            raw = b""
+            self._write_header()
+        else:
+            magic, version, *fields = _HEADER.unpack_from(raw, 0)
+            if magic != _MAGIC or version != _VERSION:
+                os.close(self.index_fd)
+                raise HistoryError(f"{root / 'index'} is not a clipboard history index")
+            self.generation, self.next_id, self.live_count, self.live_bytes, self.first_live = fields
+        self.count = max(0, len(raw) - _HEADER.size) // _RECORD.size
+        end = _HEADER.size + self.count * _RECORD.size
+        if len(raw) > end:
+            # A record cut short by a crash
+            os.ftruncate(self.index_fd, end)
+        self.index = bytearray(raw[:end] or self._header())
+        self.data_fd = self._open_data(self.generation)
+        self.appended = False
+
+    def _open_data(self, generation, truncate=False):
+        flags = os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_CLOEXEC
+        if truncate:
+            flags |= os.O_TRUNC
+        return os.open(self.root / f"data.{generation}", flags, 0o600)
+
+    def close(self):
+        os.close(self.data_fd)
+        os.close(self.index_fd)
+
+    def _header(self):
+        return _HEADER.pack(
+            _MAGIC, _VERSION, self.generation, self.next_id, self.live_count, self.live_bytes, self.first_live
+        )
+
+    def _write_header(self):
+        _write_all(self.index_fd, self._header(), 0)
+
+    def record(self, pos):
+        return _RECORD.unpack_from(self.index, _HEADER.size + pos * _RECORD.size)
+
+    def is_live(self, pos):
+        return not self.index[_HEADER.size + pos * _RECORD.size + _FLAGS_OFFSET] & _DELETED
+
+    def payload(self, record, limit=None):
+        length = record[_LENGTH] if limit is None else min(limit, record[_LENGTH])
+        return os.pread(self.data_fd, length, record[_OFFSET] + record[_PREVIEW])
+
+    def live(self):
+        """Positions of the live records, newest first."""
+        return (pos for pos in range(self.count - 1, self.first_live - 1, -1) if self.is_live(pos))
+
+    def find(self, entry_id):
+        pos = _find_position(self.index, self.count, entry_id)
+        return pos if pos is not None and self.is_live(pos) else None
+
+    def _find_digest(self, digest):
+        # A substring search over the raw index beats unpacking every record
+        digest_offset = _RECORD.size - len(digest)
+        at = self.index.find(digest, _HEADER.size)
+        while at >= 0:
+            pos, rest = divmod(at - _HEADER.size, _RECORD.size)
+            if rest == digest_offset and self.is_live(pos):
+                return pos
+            at = self.index.find(digest, at + 1)
+        return None
+
+    def delete(self, pos):
+        if not self.is_live(pos):
+            return
+        record = self.record(pos)
+        flags = record[_FLAGS_FIELD] | _DELETED
+        offset = _HEADER.size + pos * _RECORD.size + _FLAGS_OFFSET
+        _FLAGS.pack_into(self.index, offset, flags)
+        _write_all(self.index_fd, _FLAGS.pack(flags), offset)
+        self.live_count -= 1
+        self.live_bytes -= record[_LENGTH] + record[_PREVIEW]
+        while self.first_live < self.count and not self.is_live(self.first_live):
+            self.first_live += 1
+        self._write_header()
+
+    def append(self, data, digest):
+        duplicate = self._find_digest(digest)
+        if duplicate is not None:
+            # Same content: move it to the top, reusing the stored bytes
+            _, offset, length, preview_length, flags, _ = self.record(duplicate)
+            self.delete(duplicate)
+        else:
+            text, is_image = preview(data)
+            text = text.encode("utf-8")
+            offset = os.fstat(self.data_fd).st_size
+            _write_all(self.data_fd, text + data)
+            length, preview_length, flags = len(data), len(text), _IMAGE if is_image else 0
+        packed = _RECORD.pack(self.next_id, offset, length, preview_length, flags, digest)
+        _write_all(self.index_fd, packed, len(self.index))
+        self.index += packed
+        if self.live_count == 0:
+            self.first_live = self.count
+        self.count += 1
+        self.next_id += 1
+        self.live_count += 1
+        self.live_bytes += length + preview_length
+        self._write_header()
+        self.appended = True
+
+    def trim(self, max_entries, max_bytes):
+        # Oldest first; the newest entry always stays
+        while self.live_count > 1 and (self.live_count > max_entries or self.live_bytes > max_bytes):
+            self.delete(self.first_live)
+
+    def maintain(self):
+        """Compact when dead data dominates, else merge pending trigrams."""
+        dead_bytes = os.fstat(self.data_fd).st_size - self.live_bytes
+        dead_records = self.count - self.live_count
+        if dead_bytes > max(self.live_bytes, COMPACT_MIN_BYTES) or dead_records > max(self.live_count, TRIGRAM_BATCH * 4):
+            self.compact()
+        elif self.appended:
+            covered = self._trigrams_covered()
+            if self.count - covered >= max(TRIGRAM_BATCH, covered // TRIGRAM_GROWTH):
+                self.write_trigrams()
+
+    def compact(self):
+        generation = self.generation + 1
+        data_fd = self._open_data(generation, truncate=True)
+        records = []
+        offset = 0
+        for pos in range(self.first_live, self.count):
+            if not self.is_live(pos):
+                continue
+            record = list(self.record(pos))
+            size = record[_PREVIEW] + record[_LENGTH]
+            _write_all(data_fd, os.pread(self.data_fd, size, record[_OFFSET]))
+            record[_OFFSET] = offset
+            offset += size
+            records.append(record)
+        os.fsync(data_fd)
+        self._replace_index(generation, records)
+        os.close(self.data_fd)
+        self.data_fd = data_fd
+        self.write_trigrams()
+
+    def wipe(self):
+        generation = self.generation + 1
+        data_fd = self._open_data(generation, truncate=True)
+        self._replace_index(generation, [])
+        os.close(self.data_fd)
+        self.data_fd = data_fd
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.root / "trigrams")
+
+    def _replace_index(self, generation, records):
+        self.generation = generation
+        self.count = self.live_count = len(records)
+        # Also repairs totals a crash between two index writes left behind
+        self.live_bytes = sum(r[_LENGTH] + r[_PREVIEW] for r in records)
+        self.first_live = 0
+        self.index = bytearray(self._header() + b"".join(_RECORD.pack(*r) for r in records))
+        tmp = self.root / "index.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o600)
+        try:
+            _write_all(fd, self.index)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, self.root / "index")
+        os.close(self.index_fd)
+        self.index_fd = os.open(self.root / "index", os.O_RDWR | os.O_CLOEXEC)
+        # Data of earlier generations, including any left by a crash
+        for name in os.listdir(self.root):
+            if name.startswith("data.") and name != f"data.{generation}":
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.root / name)
+
+    def _read_trigrams(self):
+        """(covered, {trigram: postings}) of the current index, or (0, {})."""
+        mapped = _map(self.root / "trigrams")
+        if mapped is None:
+            return 0, {}
+        try:
+            if len(mapped) < _TRIGRAM_HEADER.size:
+                return 0, {}
+            magic, generation, covered, keys = _TRIGRAM_HEADER.unpack_from(mapped, 0)
+            if magic != _TRIGRAM_MAGIC or generation != self.generation or covered > self.count:
+                return 0, {}
+            itemsize = array(_POSTING).itemsize
+            base = _TRIGRAM_HEADER.size + keys * _TRIGRAM_KEY.size
+            postings = {}
+            for key, first, count in _TRIGRAM_KEY.iter_unpack(mapped[_TRIGRAM_HEADER.size:base]):
+                values = array(_POSTING)
+                values.frombytes(mapped[base + first * itemsize:base + (first + count) * itemsize])
+                postings[key] = values
+            return covered, postings
+        finally:
+            mapped.close()
+
+    def _trigrams_covered(self):
+        try:
+            with open(self.root / "trigrams", "rb") as f:
+                header = f.read(_TRIGRAM_HEADER.size)
+        except FileNotFoundError:
+            return 0
+        if len(header) < _TRIGRAM_HEADER.size:
+            return 0
+        magic, generation, covered, _ = _TRIGRAM_HEADER.unpack(header)
+        if magic != _TRIGRAM_MAGIC or generation != self.generation:
+            return 0
+        return covered
+
+    def write_trigrams(self):
+        covered, postings = self._read_trigrams()
+        for pos in range(covered, self.count):
+            record = self.record(pos)
+            if record[_FLAGS_FIELD] & (_DELETED | _IMAGE):
+                continue
+            for key in _trigrams(_search_window(self.payload(record, SEARCH_BYTES))):
+                values = postings.get(key)
+                if values is None:
+                    postings[key] = values = array(_POSTING)
+                values.append(pos)
+
+        keys = sorted(postings)
+        table = []
+        first = 0
+        for key in keys:
+            table.append(_TRIGRAM_KEY.pack(key, first, len(postings[key])))
+            first += len(postings[key])
+        tmp = self.root / "trigrams.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_TRIGRAM_HEADER.pack(_TRIGRAM_MAGIC, self.generation, self.count, len(keys)))
+            f.write(b"".join(table))
+            for key in keys:
+                f.write(postings[key].tobytes())
+        os.replace(tmp, self.root / "trigrams")
+
+
+# ── Store ────────────────────────────────────────────────────────────────────
+
+
+class HistoryStore:
+    def __init__(self, path=DB_PATH, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        # History can hold passwords: keep it private
+        self.path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(self.path / "lock", os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    @contextlib.contextmanager
+    def reader(self):
+        with self._locked(False):
+            snapshot = _Snapshot(self.path)
+            try:
+                yield snapshot
+            finally:
+                snapshot.close()
+
+    @contextlib.contextmanager
+    def writer(self):
+        with self._locked(True):
+            writer = _Writer(self.path)
+            try:
+                yield writer
+                writer.maintain()
+            finally:
+                writer.close()
+
+    def store(self, data, state=None):
+        """Store `data` as the newest entry. `state` is wl-paste's
+        CLIPBOARD_STATE: "sensitive" data is not stored and "clear" deletes
+        the newest entry, as cliphist does. Returns True when stored."""
+        if state == "sensitive":
+            return False
+        if state == "clear":
+            self.delete_last()
+            return False
+        if len(data) > min(MAX_ENTRY_BYTES, self.max_bytes) or not data.strip():
+            return False
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self.writer() as writer:
+            writer.append(data, digest)
+            writer.trim(self.max_entries, self.max_bytes)
+        return True
+
+    def delete(self, ids):
+        with self.writer() as writer:
+            for entry_id in ids:
+                pos = writer.find(entry_id)
+                if pos is not None:
+                    writer.delete(pos)
+
+    def delete_last(self):
+        with self.writer() as writer:
+            newest = next(writer.live(), None)
+            if newest is not None:
+                writer.delete(newest)
+
+    def delete_query(self, query):
+        # Matching happens on a snapshot; the lock is upgraded for the deletes
+        with self.reader() as snapshot:
+            ids = [record[_ID] for _, record in snapshot.search(query, fold=False)]
+        if ids:
+            self.delete(ids)
+        return len(ids)
+
+    def wipe(self):
+        with self.writer() as writer:
+            writer.wipe()
+
+    def list(self, limit=None, query=None):
+        """Yield "id<TAB>preview" lines as bytes, newest first."""
+        with self.reader() as snapshot:
+            records = snapshot.live() if query is None else snapshot.search(query.encode("utf-8"))
+            for count, (_, record) in enumerate(records):
+                if limit is not None and count >= limit:
+                    return
+                yield b"%d\t%s\n" % (record[_ID], snapshot.preview(record))
+
+    def decode(self, entry_id):
+        with self.reader() as snapshot:
+            record = snapshot.find(entry_id)
+            return None if record is None else snapshot.payload(record)
+
+
+# ── Command line ─────────────────────────────────────────────────────────────
+
+
+def _parse_id(line):
+    field = line.split("\t", 1)[0].strip()
+    return int(field) if field.isdigit() else None
+
+
+def _write_lines(lines):
+    out = sys.stdout.buffer
+    for line in lines:
+        out.write(line)
+    out.flush()
+
+
+def import_cliphist(history):
+    try:
+        listing = subprocess.run(["cliphist", "list"], capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[clipboard_history] cannot list cliphist: {e}", file=sys.stderr)
+        return 1
+    lines = [line for line in listing.decode("utf-8", "replace").splitlines() if _parse_id(line) is not None]
+    imported = 0
+    # Oldest first, so the newest entry ends up on top
+    for line in reversed(lines):
+        result = subprocess.run(["cliphist", "decode"], input=line.encode("utf-8"), capture_output=True)
+        if result.returncode == 0 and history.store(result.stdout):
+            imported += 1
+    print(f"[clipboard_history] imported {imported} of {len(lines)} entries", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clipboard history store with a cliphist-compatible interface")
+    parser.add_argument("--db-path", type=Path, default=DB_PATH, help=f"store directory (default {DB_PATH})")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES, help=f"entries kept (default {MAX_ENTRIES})")
+    parser.add_argument(
+        "--max-bytes", type=int, default=MAX_BYTES, help=f"payload bytes kept (default {MAX_BYTES})"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("store", help="store stdin as the newest entry")
+    list_parser = commands.add_parser("list", help="list entries, newest first")
+    list_parser.add_argument("--limit", type=int, default=None)
+    decode_parser = commands.add_parser("decode", help="write an entry to stdout")
+    decode_parser.add_argument("line", nargs="?", help='"id" or a list line (default: first line of stdin)')
+    commands.add_parser("delete", help="delete the entries of the list lines on stdin")
+    query_parser = commands.add_parser("delete-query", help="delete the text entries containing QUERY")
+    query_parser.add_argument("query")
+    commands.add_parser("wipe", help="delete every entry")
+    search_parser = commands.add_parser("search", help="list the text entries containing QUERY")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=None)
+    commands.add_parser("import-cliphist", help="copy the cliphist history into this store")
+    args = parser.parse_args()
+
+    history = HistoryStore(args.db_path, args.max_entries, args.max_bytes)
+    try:
+        if args.command == "store":
+            history.store(sys.stdin.buffer.read(), os.environ.get("CLIPBOARD_STATE"))
+        elif args.command == "list":
+            _write_lines(history.list(args.limit))
+        elif args.command == "search":
+            _write_lines(history.list(args.limit, args.query))
+        elif args.command == "decode":
+            line = args.line if args.line is not None else sys.stdin.readline()
+            entry_id = _parse_id(line)
+            data = None if entry_id is None else history.decode(entry_id)
+            if data is None:
+                print(f"[clipboard_history] no entry for {line.strip()!r}", file=sys.stderr)
+                return 1
+            sys.stdout.buffer.write(data)
+        elif args.command == "delete":
+            history.delete(i for i in map(_parse_id, sys.stdin.read().splitlines()) if i is not None)
+        elif args.command == "delete-query":
+            history.delete_query(args.query.encode("utf-8"))
+        elif args.command == "wipe":
+            history.wipe()
+        elif args.command == "import-cliphist":
+            return import_cliphist(history)
+    except HistoryError as e:
+        print(f"[clipboard_history] {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Forward generate_colors_material.py arguments to a running `--serve` daemon.
+
+Stdlib only, so it starts in a few milliseconds. Accepts exactly the same
+arguments as generate_colors_material.py, prints the daemon's stdout/stderr
+and exits with its status. Exits 75 (EX_TEMPFAIL) without output when no
+daemon is reachable so callers can fall back to the one-shot CLI.
+"""
+
+import json
+import os
+import socket
+import sys
+
+EXIT_DAEMON_UNAVAILABLE = 75
+# Keep in sync with generate_colors_material.DAEMON_ENV_KEYS
+DAEMON_ENV_KEYS = ("HOME", "XDG_CONFIG_HOME", "XDG_STATE_HOME", "XDG_CACHE_HOME")
+
+
+def default_socket_path() -> str:
+    # Keep in sync with generate_colors_material.default_socket_path()
+    if os.environ.get("INIR_COLORGEN_SOCKET"):
+        return os.environ["INIR_COLORGEN_SOCKET"]
+    # Never the shared /tmp: another user could own the directory first
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, "inir", "colorgen.sock")
+
+
+def request(argv, socket_path, timeout=30.0):
+    env = {key: os.environ.get(key) for key in DAEMON_ENV_KEYS}
+    payload = json.dumps({"argv": argv, "cwd": os.getcwd(), "env": env}).encode() + b"\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(payload)
+        # Generation can take longer than any timeout, and giving up here would
+        # make the caller rerun the CLI while the daemon is still writing
+        sock.settimeout(None)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if chunk.endswith(b"\n"):
+                break
+    return json.loads(b"".join(chunks))
+
+
+def main():
+    socket_path = default_socket_path()
+    try:
+        response = request(sys.argv[1:], socket_path)
+    except (OSError, ValueError):
+        # No daemon, stale socket, connect timeout or truncated reply
+        raise SystemExit(EXIT_DAEMON_UNAVAILABLE)
+
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    raise SystemExit(response.get("code", 1))
+
+
+if __name__ == "__main__":
+    main()
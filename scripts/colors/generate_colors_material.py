@@ -1,10 +1,13 @@
 #!/usr/bin/env -S\_/bin/sh\_-c\_"source\_\$(eval\_echo\_\${INIR_VENV:-\$ILLOGICAL_IMPULSE_VIRTUAL_ENV})/bin/activate&&exec\_python\_-E\_"\$0"\_"\$@""
 import argparse
+import io
 import math
 import json
 import os
 import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
@@ -22,11 +25,18 @@ from materialyoucolor.utils.color_utils import (
     argb_from_rgb,
     argb_from_rgba,
 )
-from materialyoucolor.utils.math_utils import (
-    sanitize_degrees_double,
-    difference_degrees,
-    rotation_direction,
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from hct_batch import (
+    argb_to_hct,
+    boost_chroma_tone,
+    ensure_contrast,
+    ensure_min_chroma,
+    harmonize,
 )
+import wallpaper_index
+from image_loading import load_downscaled
+from video_frames import extract_frame, is_video
 
 parser = argparse.ArgumentParser(description="Color generation script")
 parser.add_argument(
@@ -143,6 +153,12 @@ parser.add_argument(
     default=None,
     help="directory containing templates/ and templates.json (renders GTK/fuzzel/etc.)",
 )
+parser.add_argument(
+    "--render-jobs",
+    type=int,
+    default=0,
+    help="threads used to render templates (default: one per template)",
+)
 parser.add_argument(
     "--color-strength",
     type=float,
@@ -155,7 +171,43 @@ parser.add_argument(
     default=False,
     help="Rotate seed color hue 180° before scheme generation (complementary palette)",
 )
-args = parser.parse_args()
+parser.add_argument(
+    "--terminal-mode",
+    type=str,
+    choices=["dark", "light"],
+    default=None,
+    help="mode for the SCSS and terminal outputs (default: --mode)",
+)
+parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    default=False,
+    help="bypass the generated palette cache",
+)
+parser.add_argument(
+    "--cache-stats",
+    action="store_true",
+    default=False,
+    help="print palette cache statistics as JSON and exit",
+)
+parser.add_argument(
+    "--serve",
+    action="store_true",
+    default=False,
+    help="run as a daemon answering generation requests on a Unix socket",
+)
+parser.add_argument(
+    "--socket",
+    type=str,
+    default=None,
+    help="socket path for --serve (default: ${XDG_RUNTIME_DIR:-/run/user/UID}/inir/colorgen.sock)",
+)
+parser.add_argument(
+    "--idle-timeout",
+    type=float,
+    default=600,
+    help="seconds without requests before --serve exits (0 = never)",
+)
 
 rgba_to_hex = lambda rgba: "#{:02X}{:02X}{:02X}".format(rgba[0], rgba[1], rgba[2])
 argb_to_hex = lambda argb: "#{:02X}{:02X}{:02X}".format(
@@ -169,13 +221,14 @@ display_color = lambda rgba: "\x1b[38;2;{};{};{}m{}\x1b[0m".format(
 )
 
 
-def _auto_detect_scheme(pil_image):
-    """Detect optimal material scheme from image statistics.
-    Uses the same decision tree as scheme_for_image.py but operates on an
-    already-loaded PIL image, avoiding a separate Python process + cv2 import."""
+def image_scheme_stats(pil_image):
+    """(colorfulness, saturation, hue_spread) of an image, or None if it has
+    no color channels: the Hasler-Süsstrunk colorfulness, mean HSV saturation
+    (0-255) and hue std-dev (OpenCV's 0-180 hue scale) of an already-loaded
+    PIL image. scheme_for_image.py and the wallpaper index use it as well."""
     arr = np.array(pil_image, dtype=np.float64)
     if arr.ndim != 3 or arr.shape[2] < 3:
-        return "scheme-tonal-spot"
+        return None
 
     R, G, B = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
 
@@ -203,9 +256,16 @@ def _auto_detect_scheme(pil_image):
         idx = (maxc == b) & mask
         h[idx] = 30.0 * ((r[idx] - g[idx]) / delta[idx] + 4)
 
-    saturation = float(np.mean(s))
-    hue_spread = float(np.std(h))
+    return colorfulness, float(np.mean(s)), float(np.std(h))
 
+
+def pick_scheme(colorfulness, saturation, hue_spread):
+    """Scheme decision tree, also used by scheme_for_image.py and the
+    wallpaper index.
+
+    tonal-spot is the safe default; near-grayscale images get monochrome,
+    muted ones neutral, focused color content or fidelity, and only
+    genuinely extreme images expressive or rainbow."""
     if saturation < 20:
         return "scheme-monochrome"
     if colorfulness < 30:
@@ -233,6 +293,16 @@ def _auto_detect_scheme(pil_image):
     return "scheme-tonal-spot"
 
 
+def _auto_detect_scheme(pil_image):
+    """Detect optimal material scheme from image statistics.
+    Operates on the already-loaded PIL image, avoiding a separate
+    scheme_for_image.py process."""
+    stats = image_scheme_stats(pil_image)
+    if stats is None:
+        return "scheme-tonal-spot"
+    return pick_scheme(*stats)
+
+
 def calculate_optimal_size(width: int, height: int, bitmap_size: int) -> (int, int):
     image_area = width * height
     bitmap_area = bitmap_size**2
@@ -246,197 +316,6 @@ def calculate_optimal_size(width: int, height: int, bitmap_size: int) -> (int, i
     return new_width, new_height
 
 
-def harmonize(
-    design_color: int, source_color: int, threshold: float = 35, harmony: float = 0.5
-) -> int:
-    from_hct = Hct.from_int(design_color)
-    to_hct = Hct.from_int(source_color)
-    difference_degrees_ = difference_degrees(from_hct.hue, to_hct.hue)
-    rotation_degrees = min(difference_degrees_ * harmony, threshold)
-    output_hue = sanitize_degrees_double(
-        from_hct.hue + rotation_degrees * rotation_direction(from_hct.hue, to_hct.hue)
-    )
-    return Hct.from_hct(output_hue, from_hct.chroma, from_hct.tone).to_int()
-
-
-def boost_chroma_tone(
-    argb: int, chroma: float = 1, tone: float = 1, tone_cap: float = 95.0
-) -> int:
-    """Scale chroma and tone of a color.
-
-    Args:
-        argb: Input color in ARGB format
-        chroma: Chroma multiplier (1 = no change)
-        tone: Tone multiplier (1 = no change)
-        tone_cap: Maximum tone value to prevent white-washing bright colors
-
-    Returns:
-        Adjusted color in ARGB format
-    """
-    hct = Hct.from_int(argb)
-    new_tone = min(tone_cap, hct.tone * tone)
-    return Hct.from_hct(hct.hue, hct.chroma * chroma, new_tone).to_int()
-
-
-def ensure_min_chroma(argb: int, min_chroma: float = 40) -> int:
-    """Ensure a color has minimum chroma for visual distinctiveness."""
-    hct = Hct.from_int(argb)
-    if hct.chroma < min_chroma:
-        return Hct.from_hct(hct.hue, min_chroma, hct.tone).to_int()
-    return argb
-
-
-def scale_chroma(argb: int, factor: float, maximum: float | None = None) -> int:
-    """Scale chroma while preserving hue/tone for stronger or calmer accent colors."""
-    if abs(factor - 1.0) < 1e-6:
-        return argb
-    hct = Hct.from_int(argb)
-    new_chroma = max(0.0, hct.chroma * factor)
-    if maximum is not None:
-        new_chroma = min(maximum, new_chroma)
-    return Hct.from_hct(hct.hue, new_chroma, hct.tone).to_int()
-
-
-def relative_luminance(argb: int) -> float:
-    """Calculate relative luminance per WCAG 2.1 spec."""
-    r = ((argb >> 16) & 0xFF) / 255.0
-    g = ((argb >> 8) & 0xFF) / 255.0
-    b = (argb & 0xFF) / 255.0
-
-    def linearize(c):
-        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
-
-    return 0.2126 * linearize(r) + 0.7152 * linearize(g) + 0.0722 * linearize(b)
-
-
-def contrast_ratio(fg_argb: int, bg_argb: int) -> float:
-    """Calculate WCAG contrast ratio between two colors."""
-    l1 = relative_luminance(fg_argb)
-    l2 = relative_luminance(bg_argb)
-    lighter = max(l1, l2)
-    darker = min(l1, l2)
-    return (lighter + 0.05) / (darker + 0.05)
-
-
-def find_tone_for_contrast(
-    hue: float,
-    chroma: float,
-    start_tone: float,
-    limit_tone: float,
-    bg_argb: int,
-    min_ratio: float,
-    is_dark: bool,
-    step: float = 0.25,
-) -> tuple[int, float, bool, float]:
-    """Search tone values for contrast.
-
-    Returns:
-        (color_argb, tone, met_min_ratio, achieved_ratio)
-    """
-    direction = 1.0 if is_dark else -1.0
-    tone = start_tone
-    max_steps = max(1, int(math.ceil(abs(limit_tone - start_tone) / step)) + 2)
-
-    initial = Hct.from_hct(hue, chroma, max(0.0, min(100.0, start_tone))).to_int()
-    best_color = initial
-    best_tone = start_tone
-    best_ratio = contrast_ratio(initial, bg_argb)
-
-    for _ in range(max_steps):
-        clamped_tone = max(0.0, min(100.0, tone))
-        candidate = Hct.from_hct(hue, chroma, clamped_tone).to_int()
-        ratio = contrast_ratio(candidate, bg_argb)
-
-        if ratio > best_ratio:
-            best_color = candidate
-            best_tone = clamped_tone
-            best_ratio = ratio
-
-        if ratio >= min_ratio:
-            return candidate, clamped_tone, True, ratio
-
-        if is_dark and clamped_tone >= limit_tone:
-            break
-        if not is_dark and clamped_tone <= limit_tone:
-            break
-
-        tone += direction * step
-        if is_dark and tone > limit_tone:
-            tone = limit_tone
-        if not is_dark and tone < limit_tone:
-            tone = limit_tone
-
-    return best_color, best_tone, False, best_ratio
-
-
-def ensure_contrast(
-    fg_argb: int, bg_argb: int, min_ratio: float = 4.5, is_dark: bool = True
-) -> int:
-    """Adjust foreground tone to ensure minimum contrast ratio against background.
-
-    For dark mode, increases tone (lighter). For light mode, decreases tone (darker).
-    Preserves hue and boosts chroma when tone approaches extremes to prevent washed-out colors.
-    """
-    current_ratio = contrast_ratio(fg_argb, bg_argb)
-    if current_ratio >= min_ratio:
-        return fg_argb
-
-    hct = Hct.from_int(fg_argb)
-    original_tone = hct.tone
-    original_chroma = hct.chroma
-
-    # Tone limits to prevent colors from washing out to pure white/black.
-    # If min ratio is unreachable inside limits, return highest-contrast option.
-    tone_limit = 88.0 if is_dark else 20.0
-
-    best, best_tone, met_min, best_ratio = find_tone_for_contrast(
-        hct.hue,
-        hct.chroma,
-        original_tone,
-        tone_limit,
-        bg_argb,
-        min_ratio,
-        is_dark,
-    )
-
-    # Compensate for tone shift by boosting chroma
-    # When tone moves far from original, colors lose perceptual saturation
-    # Boost chroma proportionally to maintain color identity
-    tone_shift = abs(best_tone - original_tone)
-    if tone_shift > 10:
-        # Boost chroma by up to 40% for large tone shifts
-        # The further we shift, the more we compensate
-        boost_factor = 1.0 + min(0.4, (tone_shift - 10) / 50)
-        boosted_chroma = min(original_chroma * boost_factor, 80.0)
-        boosted_same_tone = Hct.from_hct(hct.hue, boosted_chroma, best_tone).to_int()
-        boosted_ratio = contrast_ratio(boosted_same_tone, bg_argb)
-
-        if met_min and boosted_ratio >= min_ratio:
-            return boosted_same_tone
-
-        boosted_best, _, boosted_met, boosted_best_ratio = find_tone_for_contrast(
-            hct.hue,
-            boosted_chroma,
-            best_tone,
-            tone_limit,
-            bg_argb,
-            min_ratio,
-            is_dark,
-        )
-
-        if met_min:
-            # Keep strict contrast if we already had a valid candidate.
-            if boosted_met:
-                return boosted_best
-            return best
-
-        # If target contrast is unreachable, keep the best achievable ratio.
-        if boosted_best_ratio > best_ratio:
-            return boosted_best
-
-    return best
-
-
 def mix_hex(color_a: str, color_b: str, keep_a: float = 0.5) -> str:
     a = color_a.lstrip("#")
     b = color_b.lstrip("#")
@@ -449,10 +328,13 @@ def mix_hex(color_a: str, color_b: str, keep_a: float = 0.5) -> str:
     )
 
 
-def readable_hex(fg_hex: str, bg_hex: str, min_ratio: float = 4.5) -> str:
-    bg_argb = hex_to_argb(bg_hex)
-    is_bg_dark = Hct.from_int(bg_argb).tone < 50
-    return argb_to_hex(ensure_contrast(hex_to_argb(fg_hex), bg_argb, min_ratio, is_bg_dark))
+def readable_hexes(pairs: list[tuple[str, str, float]]) -> list[str]:
+    """Readable foregrounds for (fg_hex, bg_hex, min_ratio) pairs, solved in one batch."""
+    fg_argbs = [hex_to_argb(fg_hex) for fg_hex, _, _ in pairs]
+    bg_argbs = [hex_to_argb(bg_hex) for _, bg_hex, _ in pairs]
+    _, _, bg_tones = argb_to_hct(bg_argbs)
+    adjusted = ensure_contrast(fg_argbs, bg_argbs, [ratio for _, _, ratio in pairs], bg_tones < 50)
+    return [argb_to_hex(argb) for argb in adjusted.tolist()]
 
 
 def build_app_palette(base_palette: dict[str, str]) -> dict[str, str]:
@@ -465,16 +347,23 @@ def build_app_palette(base_palette: dict[str, str]) -> dict[str, str]:
     on_surface_variant = base_palette.get("on_surface_variant") or on_surface
     primary = base_palette.get("primary") or "#6750A4"
     primary_container = base_palette.get("primary_container") or primary
-    on_primary = base_palette.get("on_primary") or readable_hex(on_surface, primary, 4.5)
     outline = base_palette.get("outline") or on_surface_variant
     outline_variant = base_palette.get("outline_variant") or mix_hex(layer1, outline, 0.72)
 
-    on_layer0 = readable_hex(on_surface, layer0, 4.5)
-    on_layer1 = readable_hex(on_surface_variant, layer1, 4.5)
-    on_layer2 = readable_hex(on_surface, layer2, 4.5)
-    on_layer3 = readable_hex(on_surface, layer3, 4.5)
-    on_layer4 = readable_hex(on_surface, layer4, 4.5)
-    subtext = readable_hex(mix_hex(on_layer1, layer1, 0.75), layer1, 3.0)
+    # Contrast fixes are solved in two batches: the second pair depends on the first.
+    pairs = [
+        (on_surface, layer0, 4.5),
+        (on_surface_variant, layer1, 4.5),
+        (on_surface, layer2, 4.5),
+        (on_surface, layer3, 4.5),
+        (on_surface, layer4, 4.5),
+    ]
+    on_primary = base_palette.get("on_primary")
+    if not on_primary:
+        pairs.append((on_surface, primary, 4.5))
+    readable = readable_hexes(pairs)
+    on_layer0, on_layer1, on_layer2, on_layer3, on_layer4 = readable[:5]
+    on_primary = on_primary or readable[5]
 
     layer1_hover = mix_hex(layer1, on_layer1, 0.92)
     layer1_active = mix_hex(layer1, on_layer1, 0.85)
@@ -484,7 +373,12 @@ def build_app_palette(base_palette: dict[str, str]) -> dict[str, str]:
     layer3_active = mix_hex(layer3, on_layer3, 0.80)
     selection = mix_hex(layer3, primary, 0.82)
     selection_hover = mix_hex(layer3, primary, 0.74)
-    on_selection = readable_hex(on_layer3, selection, 4.5)
+    subtext, on_selection = readable_hexes(
+        [
+            (mix_hex(on_layer1, layer1, 0.75), layer1, 3.0),
+            (on_layer3, selection, 4.5),
+        ]
+    )
 
     app = dict(base_palette)
     app.update(
@@ -539,283 +433,408 @@ def build_app_palette(base_palette: dict[str, str]) -> dict[str, str]:
     return app
 
 
-darkmode = args.mode == "dark"
-transparent = args.transparency == "transparent"
+SCHEME_CLASSES = {
+    "scheme-fruit-salad": ("scheme_fruit_salad", "SchemeFruitSalad"),
+    "scheme-expressive": ("scheme_expressive", "SchemeExpressive"),
+    "scheme-monochrome": ("scheme_monochrome", "SchemeMonochrome"),
+    "scheme-rainbow": ("scheme_rainbow", "SchemeRainbow"),
+    "scheme-tonal-spot": ("scheme_tonal_spot", "SchemeTonalSpot"),
+    "scheme-neutral": ("scheme_neutral", "SchemeNeutral"),
+    "scheme-fidelity": ("scheme_fidelity", "SchemeFidelity"),
+    "scheme-content": ("scheme_content", "SchemeContent"),
+    "scheme-vibrant": ("scheme_vibrant", "SchemeVibrant"),
+}
 
-if args.path is not None:
-    image = Image.open(args.path)
+# Schemes that already produce calm palettes; --soften leaves them alone.
+SOFTEN_EXEMPT_SCHEMES = ["scheme-tonal-spot", "scheme-neutral", "scheme-monochrome"]
 
-    if image.format == "GIF":
-        image.seek(1)
 
-    if image.mode in ["L", "P"]:
-        image = image.convert("RGB")
-    wsize, hsize = image.size
-    wsize_new, hsize_new = calculate_optimal_size(wsize, hsize, args.size)
-    if wsize_new < wsize or hsize_new < hsize:
-        image = image.resize((wsize_new, hsize_new), Image.Resampling.BICUBIC)
-    # Auto-detect scheme from the already-resized image (avoids separate Python process)
-    if args.scheme == "auto":
-        args.scheme = _auto_detect_scheme(image)
-    colors = QuantizeCelebi(list(image.getdata()), 128)
-    argb = Score.score(colors)[0]
+def get_scheme_class(name: str):
+    """Import the materialyoucolor scheme class for a `scheme-*` name.
 
-    if args.cache is not None:
-        with open(args.cache, "w") as file:
-            file.write(argb_to_hex(argb))
-    hct = Hct.from_int(argb)
-    if args.smart:
-        if hct.chroma < 20:
-            args.scheme = "neutral"
-elif args.color is not None:
-    argb = hex_to_argb(args.color)
-    hct = Hct.from_int(argb)
-
-# Complementary palette: rotate seed hue 180° before scheme generation.
-# The motor recalculates optimal tones for the complementary hue, producing
-# a natural palette rather than a flat hue-shift of the generated colors.
-if args.invert_hue and hct is not None:
-    hct = Hct.from_hct((hct.hue + 180.0) % 360.0, hct.chroma, hct.tone)
-
-if args.scheme == "scheme-fruit-salad":
-    from materialyoucolor.scheme.scheme_fruit_salad import SchemeFruitSalad as Scheme
-elif args.scheme == "scheme-expressive":
-    from materialyoucolor.scheme.scheme_expressive import SchemeExpressive as Scheme
-elif args.scheme == "scheme-monochrome":
-    from materialyoucolor.scheme.scheme_monochrome import SchemeMonochrome as Scheme
-elif args.scheme == "scheme-rainbow":
-    from materialyoucolor.scheme.scheme_rainbow import SchemeRainbow as Scheme
-elif args.scheme == "scheme-tonal-spot":
-    from materialyoucolor.scheme.scheme_tonal_spot import SchemeTonalSpot as Scheme
-elif args.scheme == "scheme-neutral":
-    from materialyoucolor.scheme.scheme_neutral import SchemeNeutral as Scheme
-elif args.scheme == "scheme-fidelity":
-    from materialyoucolor.scheme.scheme_fidelity import SchemeFidelity as Scheme
-elif args.scheme == "scheme-content":
-    from materialyoucolor.scheme.scheme_content import SchemeContent as Scheme
-elif args.scheme == "scheme-vibrant":
-    from materialyoucolor.scheme.scheme_vibrant import SchemeVibrant as Scheme
-else:
-    from materialyoucolor.scheme.scheme_tonal_spot import SchemeTonalSpot as Scheme
-# Generate
-scheme = Scheme(hct, darkmode, 0.0)
-
-material_colors = {}
-term_colors = {}
-
-for color in vars(MaterialDynamicColors).keys():
-    color_name = getattr(MaterialDynamicColors, color)
-    if hasattr(color_name, "get_hct"):
-        generated_hct = color_name.get_hct(scheme)
-
-        # Apply softening if requested and scheme allows it
-        if args.soften and args.scheme not in [
-            "scheme-tonal-spot",
-            "scheme-neutral",
-            "scheme-monochrome",
-        ]:
-            generated_hct = Hct.from_hct(
-                generated_hct.hue, generated_hct.chroma * 0.60, generated_hct.tone
-            )
+    Unknown names fall back to tonal spot, like the CLI always has."""
+    import importlib
 
-        # Scale output chroma for color strength — skip near-achromatic tokens
-        # (chroma < 2 means effectively gray/black/white, leave untouched)
-        if abs(args.color_strength - 1.0) > 1e-6 and generated_hct.chroma > 2.0:
-            generated_hct = Hct.from_hct(
-                generated_hct.hue,
-                generated_hct.chroma * args.color_strength,
-                generated_hct.tone,
-            )
+    module_name, class_name = SCHEME_CLASSES.get(name, SCHEME_CLASSES["scheme-tonal-spot"])
+    module = importlib.import_module(f"materialyoucolor.scheme.{module_name}")
+    return getattr(module, class_name)
 
-        rgba = generated_hct.to_rgba()
-        material_colors[color] = rgba_to_hex(rgba)
-
-# Extended material
-if darkmode == True:
-    material_colors["success"] = "#B5CCBA"
-    material_colors["onSuccess"] = "#213528"
-    material_colors["successContainer"] = "#374B3E"
-    material_colors["onSuccessContainer"] = "#D1E9D6"
-else:
-    material_colors["success"] = "#4F6354"
-    material_colors["onSuccess"] = "#FFFFFF"
-    material_colors["successContainer"] = "#D1E8D5"
-    material_colors["onSuccessContainer"] = "#0C1F13"
-
-# Terminal Colors
-if args.termscheme is not None:
-    with open(args.termscheme, "r") as f:
-        json_termscheme = f.read()
-    term_source_colors = json.loads(json_termscheme)["dark" if darkmode else "light"]
-
-    # Handle both snake_case and camelCase key naming across library versions
-    primary_key = material_colors.get(
-        "primary_paletteKeyColor",
-        material_colors.get(
-            "primaryPaletteKeyColor", material_colors.get("primary", "#6750A4")
-        ),
+
+def load_seed_image(path, bitmap_size):
+    """Open a wallpaper and downscale it for seed extraction.
+
+    Returns (image, image_info, decode_stats) where image_info holds the
+    original and resized dimensions for --debug output and decode_stats the
+    image_loading.load_downscaled() timings. Videos are read from a
+    representative keyframe (video_frames.py)."""
+    source = path
+    if is_video(path):
+        frame = extract_frame(path, max_size=1024)
+        if frame is None:
+            raise OSError(f"could not extract a frame from {path}")
+        source = io.BytesIO(frame)
+    image, decode_stats = load_downscaled(
+        source,
+        lambda size: calculate_optimal_size(size[0], size[1], bitmap_size),
+        Image.Resampling.BICUBIC,
+        gif_frame=1,
     )
-    primary_color_argb = hex_to_argb(primary_key)
-
-    # User-configurable parameters
-    user_saturation = args.term_saturation  # 0.0-1.0
-    user_brightness = args.term_brightness  # 0.0-1.0
-    user_harmony = args.harmony  # 0.0-1.0
-    user_bg_brightness = args.term_bg_brightness  # 0.0-1.0
-
-    # Define surface colors for interpolation based on bg_brightness
-    # 0.0 = background (darkest), 0.5 = surfaceContainerLow (matches shell), 1.0 = surfaceContainerHighest (lightest)
-    surface_levels = [
-        ("background", 0.0),
-        ("surfaceContainerLowest", 0.2),
-        ("surfaceContainerLow", 0.4),
-        ("surfaceContainer", 0.6),
-        ("surfaceContainerHigh", 0.8),
-        ("surfaceContainerHighest", 1.0),
-    ]
+    wsize, hsize = decode_stats["original"]
+    wsize_new, hsize_new = image.size
+    return image, (wsize, hsize, wsize_new, hsize_new), decode_stats
 
-    def get_interpolated_surface(brightness):
-        """Get a surface color based on brightness (0-1)"""
-        # Find the two surface levels to interpolate between
-        for i, (name, level) in enumerate(surface_levels):
-            if brightness <= level or i == len(surface_levels) - 1:
-                if i == 0:
-                    return material_colors.get(name, "#1a1a1a")
-                # Interpolate between previous and current
-                prev_name, prev_level = surface_levels[i - 1]
-                t = (
-                    (brightness - prev_level) / (level - prev_level)
-                    if level != prev_level
-                    else 0
-                )
-                c1 = hex_to_argb(material_colors.get(prev_name, "#1a1a1a"))
-                c2 = hex_to_argb(material_colors.get(name, "#2a2a2a"))
-                # Simple RGB interpolation
-                r1, g1, b1 = (c1 >> 16) & 0xFF, (c1 >> 8) & 0xFF, c1 & 0xFF
-                r2, g2, b2 = (c2 >> 16) & 0xFF, (c2 >> 8) & 0xFF, c2 & 0xFF
-                r = int(r1 + (r2 - r1) * t)
-                g = int(g1 + (g2 - g1) * t)
-                b = int(b1 + (b2 - b1) * t)
-                return f"#{r:02X}{g:02X}{b:02X}"
-        return material_colors.get("surfaceContainerLow", "#1a1a1a")
-
-    for color, val in term_source_colors.items():
-        if args.scheme == "monochrome":
-            term_colors[color] = val
-            continue
 
-        # Terminal background: Interpolate based on user_bg_brightness
-        # 0.5 = surfaceContainerLow (matches shell surfaces perfectly)
-        if color == "term0":
-            term_colors[color] = get_interpolated_surface(user_bg_brightness)
-            continue
+def load_seed(args):
+    """Resolve the seed color from --path or --color.
 
-        # Terminal foreground: Use EXACT Material onSurface color
-        if color == "term15":
-            term_colors[color] = material_colors.get("onSurface", "#e0e0e0")
-            continue
+    Returns (argb, image_info) where image_info holds the original and
+    resized image dimensions for --debug output (None for --color).
+    Wallpapers already in the wallpaper_index.py index are not decoded;
+    otherwise the decode timings are left in args.decode_stats."""
+    argb = None
+    image_info = None
+    if args.path is not None:
+        indexed = wallpaper_index.lookup(args.path, args.size)
+        if indexed is not None:
+            image_info = tuple(indexed["image_info"])
+            if args.scheme == "auto":
+                args.scheme = indexed["scheme"]
+            argb = indexed["seeds"][0]
+        else:
+            image, image_info, args.decode_stats = load_seed_image(args.path, args.size)
+            # Auto-detect scheme from the already-resized image (avoids separate Python process)
+            if args.scheme == "auto":
+                args.scheme = _auto_detect_scheme(image)
+            colors = QuantizeCelebi(list(image.getdata()), 128)
+            argb = Score.score(colors)[0]
+
+        if args.smart:
+            if Hct.from_int(argb).chroma < 20:
+                args.scheme = "neutral"
+    elif args.color is not None:
+        argb = hex_to_argb(args.color)
+
+    return argb, image_info
+
+
+def seed_hct(argb, args):
+    hct = Hct.from_int(argb) if argb is not None else None
+
+    # Complementary palette: rotate seed hue 180° before scheme generation.
+    # The motor recalculates optimal tones for the complementary hue, producing
+    # a natural palette rather than a flat hue-shift of the generated colors.
+    if args.invert_hue and hct is not None:
+        hct = Hct.from_hct((hct.hue + 180.0) % 360.0, hct.chroma, hct.tone)
+
+    return hct
+
+
+def extended_material_colors(is_dark: bool) -> dict[str, str]:
+    """Extended Material tokens that MaterialDynamicColors does not provide."""
+    if is_dark:
+        return {
+            "success": "#B5CCBA",
+            "onSuccess": "#213528",
+            "successContainer": "#374B3E",
+            "onSuccessContainer": "#D1E9D6",
+        }
+    return {
+        "success": "#4F6354",
+        "onSuccess": "#FFFFFF",
+        "successContainer": "#D1E8D5",
+        "onSuccessContainer": "#0C1F13",
+    }
+
+
+class SchemeEngine:
+    """Dark and light schemes for one seed, each built once.
+
+    Every MaterialDynamicColors token is evaluated at most once per mode and
+    memoized; material_colors, palette.json, app-palette.json, the templates
+    and the terminal colors all read from that one table. Schemes are only
+    built when a consumer first asks for a mode."""
+
+    def __init__(self, Scheme, hct, args):
+        self._Scheme = Scheme
+        self._hct = hct
+        self._soften = args.soften and args.scheme not in SOFTEN_EXEMPT_SCHEMES
+        self._color_strength = args.color_strength
+        self._tokens = {}
+        self._hex_tables = {}
+
+    @staticmethod
+    def _dynamic_colors():
+        for name in vars(MaterialDynamicColors).keys():
+            dynamic_color = getattr(MaterialDynamicColors, name)
+            if hasattr(dynamic_color, "get_hct"):
+                yield name, dynamic_color
+
+    def tokens(self, is_dark: bool) -> dict:
+        """HCT of every token for one mode, with --soften already applied."""
+        table = self._tokens.get(is_dark)
+        if table is None:
+            scheme = self._Scheme(self._hct, is_dark, 0.0)
+            table = {}
+            for name, dynamic_color in self._dynamic_colors():
+                generated_hct = dynamic_color.get_hct(scheme)
+                # Apply softening if requested and scheme allows it
+                if self._soften:
+                    generated_hct = Hct.from_hct(
+                        generated_hct.hue, generated_hct.chroma * 0.60, generated_hct.tone
+                    )
+                table[name] = generated_hct
+            self._tokens[is_dark] = table
+        return table
+
+    def _hex_table(self, is_dark: bool, color_strength: float) -> dict[str, str]:
+        key = (is_dark, color_strength)
+        table = self._hex_tables.get(key)
+        if table is None:
+            table = {}
+            for name, generated_hct in self.tokens(is_dark).items():
+                # Scale output chroma for color strength — skip near-achromatic tokens
+                # (chroma < 2 means effectively gray/black/white, leave untouched)
+                if abs(color_strength - 1.0) > 1e-6 and generated_hct.chroma > 2.0:
+                    generated_hct = Hct.from_hct(
+                        generated_hct.hue,
+                        generated_hct.chroma * color_strength,
+                        generated_hct.tone,
+                    )
+                table[name] = rgba_to_hex(generated_hct.to_rgba())
+            self._hex_tables[key] = table
+        return table
+
+    def material_colors(self, is_dark: bool) -> dict[str, str]:
+        material_colors = dict(self._hex_table(is_dark, self._color_strength))
+        # Extended material
+        material_colors.update(extended_material_colors(is_dark))
+        return material_colors
+
+    def template_palette(self, is_dark: bool, source_argb: int) -> dict[str, str]:
+        # Templates have never applied --color-strength, only --soften.
+        palette = dict(self._hex_table(is_dark, 1.0))
+        # source_color is the seed itself
+        palette["source_color"] = argb_to_hex(source_argb)
+        # Extended Material tokens (not in MaterialDynamicColors)
+        palette.update(extended_material_colors(is_dark))
+        raw_contract = {
+            "primary": palette.get("primary", ""),
+            "on_primary": palette.get("onPrimary", ""),
+            "primary_container": palette.get("primaryContainer", ""),
+            "on_primary_container": palette.get("onPrimaryContainer", ""),
+            "background": palette.get("background", ""),
+            "on_background": palette.get("onBackground", ""),
+            "surface": palette.get("surface", ""),
+            "on_surface": palette.get("onSurface", ""),
+            "surface_dim": palette.get("surfaceDim", ""),
+            "surface_bright": palette.get("surfaceBright", ""),
+            "surface_container_lowest": palette.get("surfaceContainerLowest", ""),
+            "surface_container_low": palette.get("surfaceContainerLow", ""),
+            "surface_container": palette.get("surfaceContainer", ""),
+            "surface_container_high": palette.get("surfaceContainerHigh", ""),
+            "surface_container_highest": palette.get("surfaceContainerHighest", ""),
+            "on_surface_variant": palette.get("onSurfaceVariant", ""),
+            "outline": palette.get("outline", ""),
+            "outline_variant": palette.get("outlineVariant", ""),
+        }
+        palette.update(build_app_palette(raw_contract))
+        return palette
+
+
+def generate_term_colors(material_colors, args, darkmode: bool):
+    """Harmonize the terminal scheme against the material palette.
+
+    Returns (term_colors, term_source_colors)."""
+    term_colors = {}
+    term_source_colors = {}
+    if args.termscheme is not None:
+        with open(args.termscheme, "r") as f:
+            json_termscheme = f.read()
+        term_source_colors = json.loads(json_termscheme)["dark" if darkmode else "light"]
+
+        # Handle both snake_case and camelCase key naming across library versions
+        primary_key = material_colors.get(
+            "primary_paletteKeyColor",
+            material_colors.get(
+                "primaryPaletteKeyColor", material_colors.get("primary", "#6750A4")
+            ),
+        )
+        primary_color_argb = hex_to_argb(primary_key)
+
+        # User-configurable parameters
+        user_saturation = args.term_saturation  # 0.0-1.0
+        user_brightness = args.term_brightness  # 0.0-1.0
+        user_harmony = args.harmony  # 0.0-1.0
+        user_bg_brightness = args.term_bg_brightness  # 0.0-1.0
+
+        # Define surface colors for interpolation based on bg_brightness
+        # 0.0 = background (darkest), 0.5 = surfaceContainerLow (matches shell), 1.0 = surfaceContainerHighest (lightest)
+        surface_levels = [
+            ("background", 0.0),
+            ("surfaceContainerLowest", 0.2),
+            ("surfaceContainerLow", 0.4),
+            ("surfaceContainer", 0.6),
+            ("surfaceContainerHigh", 0.8),
+            ("surfaceContainerHighest", 1.0),
+        ]
+
+        def get_interpolated_surface(brightness):
+            """Get a surface color based on brightness (0-1)"""
+            # Find the two surface levels to interpolate between
+            for i, (name, level) in enumerate(surface_levels):
+                if brightness <= level or i == len(surface_levels) - 1:
+                    if i == 0:
+                        return material_colors.get(name, "#1a1a1a")
+                    # Interpolate between previous and current
+                    prev_name, prev_level = surface_levels[i - 1]
+                    t = (
+                        (brightness - prev_level) / (level - prev_level)
+                        if level != prev_level
+                        else 0
+                    )
+                    c1 = hex_to_argb(material_colors.get(prev_name, "#1a1a1a"))
+                    c2 = hex_to_argb(material_colors.get(name, "#2a2a2a"))
+                    # Simple RGB interpolation
+                    r1, g1, b1 = (c1 >> 16) & 0xFF, (c1 >> 8) & 0xFF, c1 & 0xFF
+                    r2, g2, b2 = (c2 >> 16) & 0xFF, (c2 >> 8) & 0xFF, c2 & 0xFF
+                    r = int(r1 + (r2 - r1) * t)
+                    g = int(g1 + (g2 - g1) * t)
+                    b = int(b1 + (b2 - b1) * t)
+                    return f"#{r:02X}{g:02X}{b:02X}"
+            return material_colors.get("surfaceContainerLow", "#1a1a1a")
+
+        # Brightness affects tone: higher = lighter in dark mode, darker in light mode
+        tone_mult = 1 + ((user_brightness - 0.5) * 0.8 * (1 if darkmode else -1))
+        # Foreground boost gently pushes ANSI colors away from background tone.
+        # Keep this bounded so high values don't collapse colors to white/black.
+        fg_boost_delta = args.term_fg_boost * 0.25 * (1 if darkmode else -1)
+        tone_mult = max(0.60, min(1.45, tone_mult + fg_boost_delta))
+
+        # Colors that go through HCT are collected and processed as one batch;
+        # their slots are reserved here so term_colors keeps the source order.
+        hct_colors = []
+        hct_params = []
+        for color, val in term_source_colors.items():
+            if args.scheme == "monochrome":
+                term_colors[color] = val
+                continue
+
+            # Terminal background: Interpolate based on user_bg_brightness
+            # 0.5 = surfaceContainerLow (matches shell surfaces perfectly)
+            if color == "term0":
+                term_colors[color] = get_interpolated_surface(user_bg_brightness)
+                continue
+
+            # Terminal foreground: Use EXACT Material onSurface color
+            if color == "term15":
+                term_colors[color] = material_colors.get("onSurface", "#e0e0e0")
+                continue
+
+            # term8: autosuggestion color — needs contrast against term0
+            if color == "term8":
+                if darkmode:
+                    term_colors[color] = material_colors.get(
+                        "outline",
+                        get_interpolated_surface(min(1.0, user_bg_brightness + 0.45)),
+                    )
+                else:
+                    term_colors[color] = material_colors.get(
+                        "outline_variant",
+                        material_colors.get(
+                            "outlineVariant",
+                            get_interpolated_surface(max(0.0, user_bg_brightness - 0.45)),
+                        ),
+                    )
+                continue
 
-        # term8: autosuggestion color — needs contrast against term0
-        if color == "term8":
-            if darkmode:
-                term_colors[color] = material_colors.get(
-                    "outline",
-                    get_interpolated_surface(min(1.0, user_bg_brightness + 0.45)),
+            term_colors[color] = None
+            hct_colors.append(color)
+            if color == "term7":
+                # Neutral colors (gray tones) - minimal harmonization,
+                # user saturation reduced for grays
+                hct_params.append(
+                    (
+                        hex_to_argb(val),
+                        args.harmonize_threshold * 0.3,
+                        user_harmony * 0.4,
+                        user_saturation * 1.2,
+                        1,
+                    )
                 )
             else:
-                term_colors[color] = material_colors.get(
-                    "outline_variant",
-                    material_colors.get(
-                        "outlineVariant",
-                        get_interpolated_surface(max(0.0, user_bg_brightness - 0.45)),
-                    ),
+                # Regular semantic colors — gentle harmonization preserves hue identity,
+                # then user saturation and brightness
+                hct_params.append(
+                    (
+                        hex_to_argb(val),
+                        args.harmonize_threshold * 0.12,
+                        user_harmony,
+                        user_saturation * 2.0,
+                        tone_mult,
+                    )
                 )
-            continue
 
-        if color == "term7":
-            # Neutral colors (gray tones) - minimal harmonization
-            harmonized = harmonize(
-                hex_to_argb(val),
-                primary_color_argb,
-                args.harmonize_threshold * 0.3,
-                user_harmony * 0.4,
-            )
-            # Apply user saturation (reduced for grays)
-            harmonized = boost_chroma_tone(harmonized, user_saturation * 1.2, 1)
-        else:
-            # Regular semantic colors — gentle harmonization preserves hue identity
-            harmonized = harmonize(
-                hex_to_argb(val),
-                primary_color_argb,
-                args.harmonize_threshold * 0.12,
-                user_harmony,
-            )
-            # Apply user saturation and brightness
-            # Brightness affects tone: higher = lighter in dark mode, darker in light mode
-            tone_mult = 1 + ((user_brightness - 0.5) * 0.8 * (1 if darkmode else -1))
-            # Foreground boost gently pushes ANSI colors away from background tone.
-            # Keep this bounded so high values don't collapse colors to white/black.
-            fg_boost_delta = args.term_fg_boost * 0.25 * (1 if darkmode else -1)
-            tone_mult = max(0.60, min(1.45, tone_mult + fg_boost_delta))
-            harmonized = boost_chroma_tone(harmonized, user_saturation * 2.0, tone_mult)
+        if hct_colors:
+            source_argbs, thresholds, harmonies, chroma_mults, tone_mults = zip(*hct_params)
+            harmonized = harmonize(source_argbs, primary_color_argb, thresholds, harmonies)
+            harmonized = boost_chroma_tone(harmonized, chroma_mults, tone_mults)
             # Ensure minimum chroma for visual distinctiveness
-            harmonized = ensure_min_chroma(harmonized, 40)
-
-        # Apply additional softening if requested
-        if args.soften and args.scheme not in [
-            "scheme-tonal-spot",
-            "scheme-neutral",
-            "scheme-monochrome",
-        ]:
-            harmonized = boost_chroma_tone(harmonized, 0.55, 1)
-
-        term_colors[color] = argb_to_hex(harmonized)
-
-    # Second pass: ensure all foreground colors have sufficient contrast against background
-    # WCAG AA requires 4.5:1 for normal text, 3:1 for large text
-    # Normal colors (term1-6) use 4.5:1, bright colors (term9-14) use 3.5:1 since they're
-    # already intended to be lighter and we don't want to wash them out to white
-    if "term0" in term_colors:
-        bg_argb = hex_to_argb(term_colors["term0"])
-
-        # Normal semantic colors: stricter contrast (4.5:1)
-        normal_colors = ["term1", "term2", "term3", "term4", "term5", "term6"]
-        for color in normal_colors:
-            if color in term_colors:
-                fg_argb = hex_to_argb(term_colors[color])
-                adjusted = ensure_contrast(fg_argb, bg_argb, 4.5, darkmode)
-                term_colors[color] = argb_to_hex(adjusted)
-
-        # Bright semantic colors: lighter contrast requirement (3.5:1) to preserve vibrancy
-        bright_colors = ["term9", "term10", "term11", "term12", "term13", "term14"]
-        for color in bright_colors:
-            if color in term_colors:
-                fg_argb = hex_to_argb(term_colors[color])
-                adjusted = ensure_contrast(fg_argb, bg_argb, 3.5, darkmode)
-                term_colors[color] = argb_to_hex(adjusted)
-
-# Fallback: derive term colors from material colors when no termscheme provided
-if not term_colors and material_colors:
-    term_colors = {
-        "term0": material_colors.get("surfaceVariant", "#282828"),
-        "term1": material_colors.get("error", "#CC241D"),
-        "term2": material_colors.get("secondary", "#98971A"),
-        "term3": material_colors.get("tertiary", "#D79921"),
-        "term4": material_colors.get("primary", "#458588"),
-        "term5": material_colors.get("tertiary", "#B16286"),
-        "term6": material_colors.get("secondary", "#689D6A"),
-        "term7": material_colors.get("onSurfaceVariant", "#A89984"),
-        "term8": material_colors.get("outline", "#928374"),
-        "term9": material_colors.get("error", "#FB4934"),
-        "term10": material_colors.get("secondary", "#B8BB26"),
-        "term11": material_colors.get("tertiary", "#FABD2F"),
-        "term12": material_colors.get("primary", "#83A598"),
-        "term13": material_colors.get("tertiary", "#D3869B"),
-        "term14": material_colors.get("secondary", "#8EC07C"),
-        "term15": material_colors.get("onSurface", "#EBDBB2"),
-    }
+            semantic = np.array([color != "term7" for color in hct_colors])
+            harmonized[semantic] = ensure_min_chroma(harmonized[semantic], 40)
+
+            # Apply additional softening if requested
+            if args.soften and args.scheme not in SOFTEN_EXEMPT_SCHEMES:
+                harmonized = boost_chroma_tone(harmonized, 0.55, 1)
+
+            for color, argb in zip(hct_colors, harmonized.tolist()):
+                term_colors[color] = argb_to_hex(argb)
+
+        # Second pass: ensure all foreground colors have sufficient contrast against background
+        # WCAG AA requires 4.5:1 for normal text, 3:1 for large text
+        # Normal colors (term1-6) use 4.5:1, bright colors (term9-14) use 3.5:1 since they're
+        # already intended to be lighter and we don't want to wash them out to white
+        if "term0" in term_colors:
+            bg_argb = hex_to_argb(term_colors["term0"])
+
+            normal_colors = ["term1", "term2", "term3", "term4", "term5", "term6"]
+            bright_colors = ["term9", "term10", "term11", "term12", "term13", "term14"]
+            targets = [(color, 4.5) for color in normal_colors if color in term_colors]
+            targets += [(color, 3.5) for color in bright_colors if color in term_colors]
+            if targets:
+                adjusted = ensure_contrast(
+                    [hex_to_argb(term_colors[color]) for color, _ in targets],
+                    bg_argb,
+                    [min_ratio for _, min_ratio in targets],
+                    darkmode,
+                )
+                for (color, _), argb in zip(targets, adjusted.tolist()):
+                    term_colors[color] = argb_to_hex(argb)
+
+    # Fallback: derive term colors from material colors when no termscheme provided
+    if not term_colors and material_colors:
+        term_colors = {
+            "term0": material_colors.get("surfaceVariant", "#282828"),
+            "term1": material_colors.get("error", "#CC241D"),
+            "term2": material_colors.get("secondary", "#98971A"),
+            "term3": material_colors.get("tertiary", "#D79921"),
+            "term4": material_colors.get("primary", "#458588"),
+            "term5": material_colors.get("tertiary", "#B16286"),
+            "term6": material_colors.get("secondary", "#689D6A"),
+            "term7": material_colors.get("onSurfaceVariant", "#A89984"),
+            "term8": material_colors.get("outline", "#928374"),
+            "term9": material_colors.get("error", "#FB4934"),
+            "term10": material_colors.get("secondary", "#B8BB26"),
+            "term11": material_colors.get("tertiary", "#FABD2F"),
+            "term12": material_colors.get("primary", "#83A598"),
+            "term13": material_colors.get("tertiary", "#D3869B"),
+            "term14": material_colors.get("secondary", "#8EC07C"),
+            "term15": material_colors.get("onSurface", "#EBDBB2"),
+        }
 
-def build_scss_output() -> str:
+    return term_colors, term_source_colors
+
+
+def build_scss_output(material_colors, term_colors, darkmode, transparent) -> str:
     lines = [f"$darkmode: {darkmode};", f"$transparent: {transparent};"]
     for color, code in material_colors.items():
         lines.append(f"${color}: {code};")
@@ -824,21 +843,21 @@ def build_scss_output() -> str:
     return "\n".join(lines) + "\n"
 
 
-scss_output = build_scss_output()
-
-if args.scss_output:
-    with open(args.scss_output, "w") as f:
-        f.write(scss_output)
-
-if args.debug == False:
-    print(scss_output, end="")
-else:
-    if args.path is not None:
+def print_debug_report(args, argb, hct, image_info, material_colors, term_colors, term_source_colors):
+    if image_info is not None:
+        wsize, hsize, wsize_new, hsize_new = image_info
         print("\n--------------Image properties-----------------")
         print(f"Image size: {wsize} x {hsize}")
         print(f"Resized image: {wsize_new} x {hsize_new}")
+        decode_stats = getattr(args, "decode_stats", None)
+        if decode_stats is not None:
+            dw, dh = decode_stats["decoded"]
+            print(f"Decoded at: {dw} x {dh} (box reduce x{decode_stats['reduce']})")
+            print(f"Decode time: {decode_stats['decode_ms']:.1f} ms ({decode_stats['total_ms']:.1f} ms total load)")
+        else:
+            print("Decode time: skipped (cached or indexed)")
     print("\n---------------Selected color------------------")
-    print(f"Dark mode: {darkmode}")
+    print(f"Dark mode: {args.mode == 'dark'}")
     print(f"Scheme: {args.scheme}")
     print(f"Accent color: {display_color(rgba_from_argb(argb))} {argb_to_hex(argb)}")
     print(f"HCT: {hct.hue:.2f}  {hct.chroma:.2f}  {hct.tone:.2f}")
@@ -849,7 +868,7 @@ else:
     print("\n----------Harmonize terminal colors------------")
     for color, code in term_colors.items():
         rgba = rgba_from_argb(hex_to_argb(code))
-        code_source = term_source_colors[color]
+        code_source = term_source_colors.get(color, code)
         rgba_source = rgba_from_argb(hex_to_argb(code_source))
         print(
             f"{color.ljust(6)} : {display_color(rgba_source)} {code_source} --> {display_color(rgba)} {code}"
@@ -857,7 +876,7 @@ else:
     print("-----------------------------------------------")
 
 
-def build_palette_json():
+def build_palette_json(material_colors):
     palette = {
         "primary": material_colors.get("primary", ""),
         "on_primary": material_colors.get("onPrimary", ""),
@@ -918,59 +937,58 @@ def build_palette_json():
     return palette
 
 
-palette_json = build_palette_json()
-app_palette_json = build_app_palette(palette_json)
-colors_json = dict(palette_json)
-for tkey, tval in term_colors.items():
-    colors_json[tkey] = tval
-
-theme_meta = {
-    "source": "image"
-    if args.path is not None
-    else "color"
-    if args.color is not None
-    else "unknown",
-    "source_path": args.path,
-    "seed_color": argb_to_hex(argb),
-    "mode": "dark" if darkmode else "light",
-    "scheme": args.scheme,
-    "transparent": transparent,
-    "soften": args.soften,
-    "term_harmony": args.harmony,
-    "term_saturation": args.term_saturation,
-    "term_brightness": args.term_brightness,
-    "term_bg_brightness": args.term_bg_brightness,
-    "term_fg_boost": args.term_fg_boost,
-    "harmonize_threshold": args.harmonize_threshold,
-    "color_strength": args.color_strength,
-    "blend_bg_fg": args.blend_bg_fg,
-    "generated_by": "generate_colors_material.py",
-}
-
-if args.json_output:
-    with open(args.json_output, "w") as f:
-        json.dump(colors_json, f, indent=2)
-
-if args.palette_output:
-    with open(args.palette_output, "w") as f:
-        json.dump(palette_json, f, indent=2)
+def build_theme_meta(args, argb, darkmode, transparent):
+    return {
+        "source": "image"
+        if args.path is not None
+        else "color"
+        if args.color is not None
+        else "unknown",
+        "source_path": args.path,
+        "seed_color": argb_to_hex(argb),
+        "mode": "dark" if darkmode else "light",
+        "scheme": args.scheme,
+        "transparent": transparent,
+        "soften": args.soften,
+        "term_harmony": args.harmony,
+        "term_saturation": args.term_saturation,
+        "term_brightness": args.term_brightness,
+        "term_bg_brightness": args.term_bg_brightness,
+        "term_fg_boost": args.term_fg_boost,
+        "harmonize_threshold": args.harmonize_threshold,
+        "color_strength": args.color_strength,
+        "blend_bg_fg": args.blend_bg_fg,
+        "generated_by": "generate_colors_material.py",
+    }
 
-if args.app_palette_output:
-    with open(args.app_palette_output, "w") as f:
-        json.dump(app_palette_json, f, indent=2)
 
-if args.terminal_output:
-    with open(args.terminal_output, "w") as f:
-        json.dump(term_colors, f, indent=2)
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
 
-if args.meta_output:
-    with open(args.meta_output, "w") as f:
-        json.dump(theme_meta, f, indent=2)
 
 # ---------------------------------------------------------------------------
 # Template rendering for iNiR's unified theming pipeline
 # ---------------------------------------------------------------------------
-if args.render_templates:
+
+# Parsed manifests keyed by path; entries are reused while (mtime, size) match.
+# Only matters for --serve, where the same manifest is read on every request.
+_manifest_cache = {}
+
+
+def _load_manifest(manifest_path):
+    st = os.stat(manifest_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _manifest_cache.get(manifest_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    _manifest_cache[manifest_path] = (stamp, manifest)
+    return manifest
+
+
+def collect_template_entries(args):
     template_dir = args.render_templates
     manifest_path = os.path.join(template_dir, "templates.json")
     legacy_config_path = os.path.join(template_dir, "config.toml")
@@ -993,8 +1011,7 @@ if args.render_templates:
         managed_outputs.add(resolved)
 
     if os.path.isfile(manifest_path):
-        with open(manifest_path, "r") as f:
-            manifest = json.load(f)
+        manifest = _load_manifest(manifest_path)
 
         templates_base = os.path.join(template_dir, "templates")
         for entry in manifest.get("templates", []):
@@ -1052,66 +1069,161 @@ if args.render_templates:
             file=sys.stderr,
         )
 
-    if not template_entries:
-        # Nothing to render — either no manifest found or all entries were
-        # invalid.  Color generation already succeeded, so exit cleanly.
-        sys.exit(0)
-
-    # Build both dark and light palettes so templates can use either variant.
-    # The main `material_colors` dict was generated for the *current* mode;
-    # we also need the opposite mode for templates like GTK4 that embed both.
-    def _generate_palette(is_dark):
-        s = Scheme(hct, is_dark, 0.0)
-        palette = {}
-        for c in vars(MaterialDynamicColors).keys():
-            cn = getattr(MaterialDynamicColors, c)
-            if hasattr(cn, "get_hct"):
-                g = cn.get_hct(s)
-                if args.soften and args.scheme not in [
-                    "scheme-tonal-spot",
-                    "scheme-neutral",
-                    "scheme-monochrome",
-                ]:
-                    g = Hct.from_hct(g.hue, g.chroma * 0.60, g.tone)
-                palette[c] = rgba_to_hex(g.to_rgba())
-        # source_color is the seed itself
-        palette["source_color"] = argb_to_hex(argb)
-        # Extended Material tokens (not in MaterialDynamicColors)
-        if is_dark:
-            palette["success"] = "#B5CCBA"
-            palette["onSuccess"] = "#213528"
-            palette["successContainer"] = "#374B3E"
-            palette["onSuccessContainer"] = "#D1E9D6"
-        else:
-            palette["success"] = "#4F6354"
-            palette["onSuccess"] = "#FFFFFF"
-            palette["successContainer"] = "#D1E8D5"
-            palette["onSuccessContainer"] = "#0C1F13"
-        raw_contract = {
-            "primary": palette.get("primary", ""),
-            "on_primary": palette.get("onPrimary", ""),
-            "primary_container": palette.get("primaryContainer", ""),
-            "on_primary_container": palette.get("onPrimaryContainer", ""),
-            "background": palette.get("background", ""),
-            "on_background": palette.get("onBackground", ""),
-            "surface": palette.get("surface", ""),
-            "on_surface": palette.get("onSurface", ""),
-            "surface_dim": palette.get("surfaceDim", ""),
-            "surface_bright": palette.get("surfaceBright", ""),
-            "surface_container_lowest": palette.get("surfaceContainerLowest", ""),
-            "surface_container_low": palette.get("surfaceContainerLow", ""),
-            "surface_container": palette.get("surfaceContainer", ""),
-            "surface_container_high": palette.get("surfaceContainerHigh", ""),
-            "surface_container_highest": palette.get("surfaceContainerHighest", ""),
-            "on_surface_variant": palette.get("onSurfaceVariant", ""),
-            "outline": palette.get("outline", ""),
-            "outline_variant": palette.get("outlineVariant", ""),
+    return template_entries
+
+
+# ---------------------------------------------------------------------------
+# Compiled templates
+# ---------------------------------------------------------------------------
+# Each template is split once into literal chunks and {{ ... }} references;
+# the result lives in templates/state.json under the palette cache dir, keyed
+# by the template's (mtime, size). The same file records, per output, a digest
+# of the token values it was rendered from plus the output's own stamp, so an
+# output whose template, tokens and file are all unchanged is skipped without
+# rendering, and one that renders to identical text is not rewritten (which
+# would make GTK, kitty, etc. reload for nothing).
+
+TEMPLATE_STATE_VERSION = 1
+
+# {{colors.TOKEN.MODE.PROP}} and {{image}}. split() yields
+# [literal, raw, expr, literal, raw, expr, ..., literal].
+_TEMPLATE_VAR_RE = re.compile(r"(\{\{\s*(.*?)\s*\}\})")
+
+
+def compile_template(content: str) -> list[str]:
+    return _TEMPLATE_VAR_RE.split(content)
+
+
+def render_segments(segments: list[str], values: list[str | None]) -> str:
+    """Join compiled segments; a None value leaves the reference as written."""
+    chunks = [segments[0]]
+    for i, value in enumerate(values):
+        chunks.append(segments[3 * i + 1] if value is None else value)
+        chunks.append(segments[3 * i + 3])
+    return "".join(chunks)
+
+
+class TemplateState:
+    """Compiled templates and per-output render records.
+
+    With state_dir=None nothing is read from or written to disk (--no-cache):
+    templates are compiled on every run and no output is skipped, although
+    unchanged outputs are still left alone."""
+
+    def __init__(self, state_dir):
+        self.path = os.path.join(state_dir, "state.json") if state_dir else None
+        self._state = None
+
+    def _load(self):
+        if self._state is None:
+            state = None
+            if self.path is not None:
+                try:
+                    with open(self.path, "r") as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = None
+            if not isinstance(state, dict) or state.get("version") != TEMPLATE_STATE_VERSION:
+                state = {"version": TEMPLATE_STATE_VERSION, "templates": {}, "outputs": {}}
+            self._state = state
+        return self._state
+
+    def compiled(self, template_path, stamp):
+        """Compiled segments for a template, recompiled when its stamp changes."""
+        templates = self._load()["templates"]
+        known = templates.get(template_path)
+        if known is not None and known["stamp"] == stamp:
+            return known["segments"]
+        with open(template_path, "r") as f:
+            segments = compile_template(f.read())
+        templates[template_path] = {"stamp": stamp, "segments": segments}
+        return segments
+
+    def output_current(self, output_path, digest):
+        """True if output_path was rendered from `digest` and not touched since."""
+        if self.path is None:
+            return False
+        known = self._load()["outputs"].get(output_path)
+        if known is None or known["digest"] != digest:
+            return False
+        try:
+            st = os.lstat(output_path)
+        except OSError:
+            return False
+        return [st.st_mtime_ns, st.st_size] == known["stamp"]
+
+    def record_output(self, output_path, digest):
+        try:
+            st = os.lstat(output_path)
+        except OSError:
+            return
+        self._load()["outputs"][output_path] = {
+            "digest": digest,
+            "stamp": [st.st_mtime_ns, st.st_size],
         }
-        palette.update(build_app_palette(raw_contract))
-        return palette
 
-    dark_palette = _generate_palette(True)
-    light_palette = _generate_palette(False)
+    def save(self):
+        if self.path is None or self._state is None:
+            return
+        state = self._state
+        for key in ("templates", "outputs"):
+            for path in [p for p in state[key] if not os.path.exists(p)]:
+                del state[key][path]
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            _atomic_write_json(self.path, state)
+        except OSError:
+            pass
+
+
+def _render_digest(template_path, stamp, segments, values):
+    import hashlib
+
+    material = {
+        "template": [template_path, stamp],
+        "values": dict(zip(segments[2::3], values)),
+    }
+    encoded = json.dumps(material, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _render_template_job(index, entry, segments, values, digest):
+    """Render one template into a temp file beside its output.
+
+    Returns (entry, temp_path, digest, seconds); temp_path is None when the
+    output already holds exactly this text."""
+    started = time.perf_counter()
+    out_path = entry["output_path"]
+    rendered = render_segments(segments, values)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    existing_mode = None
+    if not os.path.islink(out_path):
+        try:
+            existing_mode = os.stat(out_path).st_mode
+            with open(out_path, "r", newline="") as f:
+                current = f.read()
+        except (OSError, UnicodeDecodeError):
+            current = None
+        if current == rendered:
+            return entry, None, digest, time.perf_counter() - started
+
+    tmp_path = f"{out_path}.{os.getpid()}-{index}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(rendered)
+        if existing_mode is not None:
+            os.chmod(tmp_path, existing_mode & 0o7777)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return entry, tmp_path, digest, time.perf_counter() - started
+
+
+def render_templates(args, template_entries, dark_palette, light_palette, darkmode):
     default_palette = dark_palette if darkmode else light_palette
 
     # Build the nested `colors` namespace expected by the compatibility templates:
@@ -1147,22 +1259,21 @@ if args.render_templates:
         """Convert camelCase to snake_case for compatibility template aliases."""
         return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
 
-    for tok in all_tokens:
+    for tok in sorted(all_tokens):
         dk = dark_palette.get(tok, "#000000")
         lt = light_palette.get(tok, "#000000")
         df = default_palette.get(tok, "#000000")
         token_obj = _Token(dk, lt, df)
-        # Register under both camelCase and snake_case keys
+        # Register under both camelCase and snake_case keys. A token that is
+        # itself snake_case (e.g. the app contract's surface_bright) wins over
+        # the alias of its camelCase twin; set order used to pick one at random.
         colors_ns[tok] = token_obj
         snake = _camel_to_snake(tok)
-        if snake != tok:
+        if snake != tok and snake not in all_tokens:
             colors_ns[snake] = token_obj
 
-    # Regex to resolve {{colors.TOKEN.MODE.PROP}} and {{image}}
-    _VAR_RE = re.compile(r"\{\{\s*(.*?)\s*\}\}")
-
-    def _resolve(match):
-        expr = match.group(1)
+    def _resolve(expr):
+        """Value for a {{ ... }} expression, or None to leave it unresolved."""
         if expr == "image":
             return args.path or ""
         parts = expr.split(".")
@@ -1177,25 +1288,38 @@ if args.render_templates:
                     f"[render-templates] WARNING: unresolved token '{token}' in {{{{colors.{token}.{mode}.{prop}}}}}",
                     file=sys.stderr,
                 )
-                return match.group(0)  # leave unresolved
+                return None  # leave unresolved
             mode_obj = getattr(tok_obj, mode, None)
             if mode_obj is None:
                 print(
                     f"[render-templates] WARNING: unresolved mode '{mode}' for token '{token}' in {{{{colors.{token}.{mode}.{prop}}}}}",
                     file=sys.stderr,
                 )
-                return match.group(0)
+                return None
             val = getattr(mode_obj, prop, None)
             if val is None:
                 print(
                     f"[render-templates] WARNING: unresolved prop '{prop}' for token '{token}.{mode}' in {{{{colors.{token}.{mode}.{prop}}}}}",
                     file=sys.stderr,
                 )
-                return match.group(0)
+                return None
             return val
-        return match.group(0)  # leave unknown expressions untouched
+        return None  # leave unknown expressions untouched
 
-    rendered_count = 0
+    # Expressions repeat heavily within and across templates; resolve each once
+    resolved = {}
+
+    def _value(expr):
+        if expr not in resolved:
+            resolved[expr] = _resolve(expr)
+        return resolved[expr]
+
+    state = TemplateState(
+        None if args.no_cache else os.path.join(default_palette_cache_dir(), "templates")
+    )
+    started = time.perf_counter()
+    skipped_count = 0
+    jobs = []
 
     for entry in template_entries:
         tpl_path = entry["template_path"]
@@ -1208,26 +1332,79 @@ if args.render_templates:
             )
             continue
 
-        with open(tpl_path, "r") as f:
-            content = f.read()
+        st = os.stat(tpl_path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        segments = state.compiled(tpl_path, stamp)
+        values = [_value(expr) for expr in segments[2::3]]
+        digest = _render_digest(tpl_path, stamp, segments, values)
+        if state.output_current(out_path, digest):
+            skipped_count += 1
+            continue
+        jobs.append((entry, segments, values, digest))
+
+    # Render into temp files next to each output; nothing replaces a real
+    # output until every template has rendered, so a failure part-way leaves
+    # the previous GTK/fuzzel/etc. configs intact.
+    render_jobs = args.render_jobs if args.render_jobs > 0 else len(jobs)
+    results = []
+    try:
+        if render_jobs <= 1 or len(jobs) <= 1:
+            for index, job in enumerate(jobs):
+                results.append(_render_template_job(index, *job))
+        else:
+            with ThreadPoolExecutor(max_workers=min(render_jobs, len(jobs))) as pool:
+                futures = [
+                    pool.submit(_render_template_job, index, *job)
+                    for index, job in enumerate(jobs)
+                ]
+            # The pool has drained here; keep every finished temp file on
+            # record so a failure elsewhere cleans it up.
+            failure = None
+            for future in futures:
+                if future.exception() is None:
+                    results.append(future.result())
+                elif failure is None:
+                    failure = future.exception()
+            if failure is not None:
+                raise failure
+    except BaseException:
+        for _, tmp_path, _, _ in results:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        raise
 
-        rendered = _VAR_RE.sub(_resolve, content)
+    rendered_count = 0
+    unchanged_count = 0
+    timings = []
+    for entry, tmp_path, digest, elapsed in results:
+        out_path = entry["output_path"]
+        timings.append(f"{entry['name']} {elapsed * 1000:.1f}ms")
+        if tmp_path is None:
+            unchanged_count += 1
+        else:
+            # Break symlinks before writing so we don't corrupt external themes
+            if os.path.islink(out_path):
+                print(
+                    f"[render-templates] Replacing symlink with regular file: {out_path}",
+                    file=sys.stderr,
+                )
+            os.replace(tmp_path, out_path)
+            rendered_count += 1
+        state.record_output(out_path, digest)
 
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        # Break symlinks before writing so we don't corrupt external themes
-        if os.path.islink(out_path):
-            print(
-                f"[render-templates] Replacing symlink with regular file: {out_path}",
-                file=sys.stderr,
-            )
-            os.remove(out_path)
-        with open(out_path, "w") as f:
-            f.write(rendered)
-        rendered_count += 1
+    state.save()
 
-    if rendered_count > 0:
+    if rendered_count or unchanged_count or skipped_count:
+        total_ms = (time.perf_counter() - started) * 1000
+        detail = f" ({', '.join(timings)})" if timings else ""
         print(
-            f"[render-templates] Rendered {rendered_count} template(s)", file=sys.stderr
+            f"[render-templates] Rendered {rendered_count} template(s), "
+            f"{unchanged_count} unchanged, {skipped_count} skipped "
+            f"in {total_ms:.1f}ms with {max(1, min(render_jobs, len(jobs)))} job(s){detail}",
+            file=sys.stderr,
         )
 
     # SDDM sync post-hook: run only if script and theme exist
@@ -1241,3 +1418,504 @@ if args.render_templates:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
+    return rendered_count
+
+
+# ---------------------------------------------------------------------------
+# Palette cache
+# ---------------------------------------------------------------------------
+# Wallpaper rotation keeps coming back to the same images. Generated colors
+# are stored under $XDG_STATE_HOME/quickshell/user/generated/cache/, keyed by
+# the image content hash plus every option that changes the colors, so a hit
+# skips PIL, quantization, scoring, the scheme and the terminal contrast
+# search. Dark and light results live in the same entry and are filled in
+# as each mode is first requested. Output files are still rebuilt from the cached colors (cheap), which
+# keeps per-path data such as theme-meta's source_path correct.
+
+PALETTE_CACHE_VERSION = 2
+PALETTE_CACHE_MAX_ENTRIES = 256
+
+
+def default_palette_cache_dir() -> str:
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+    return os.path.join(state_home, "quickshell", "user", "generated", "cache")
+
+
+def _atomic_write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class PaletteCache:
+    """LRU cache of generated colors, one JSON file per entry.
+
+    index.json remembers (mtime, size) → content hash per image path so
+    unchanged wallpapers are not re-hashed, plus hit/miss counters. Entry
+    recency is the entry file's mtime, bumped on every hit."""
+
+    def __init__(self, cache_dir, max_entries=PALETTE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._index = None
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path, "r") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+            self._index.setdefault("files", {})
+            self._index.setdefault("hits", 0)
+            self._index.setdefault("misses", 0)
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _atomic_write_json(self.index_path, self._load_index())
+
+    def _content_hash(self, path):
+        import hashlib
+
+        st = os.stat(path)
+        files = self._load_index()["files"]
+        known = files.get(path)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        files[path] = [st.st_mtime_ns, st.st_size, content_hash]
+        return content_hash
+
+    def key_for(self, args):
+        """Cache key for the colors `args` would generate, or None if uncacheable."""
+        import hashlib
+
+        if args.path is not None:
+            source = "image:" + self._content_hash(os.path.abspath(args.path))
+        elif args.color is not None:
+            source = "color:" + args.color.upper()
+        else:
+            return None
+
+        termscheme = None
+        if args.termscheme is not None:
+            with open(args.termscheme, "rb") as f:
+                termscheme = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+        material = {
+            "version": PALETTE_CACHE_VERSION,
+            # Any update to this script or its helpers invalidates old entries
+            "generator": _script_stamp(),
+            "source": source,
+            "size": args.size,
+            "scheme": args.scheme,
+            "smart": args.smart,
+            "termscheme": termscheme,
+            "harmony": args.harmony,
+            "harmonize_threshold": args.harmonize_threshold,
+            "term_fg_boost": args.term_fg_boost,
+            "term_saturation": args.term_saturation,
+            "term_brightness": args.term_brightness,
+            "term_bg_brightness": args.term_bg_brightness,
+            "soften": args.soften,
+            "color_strength": args.color_strength,
+            "invert_hue": args.invert_hue,
+        }
+        encoded = json.dumps(material, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        index = self._load_index()
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r") as f:
+                entry = json.load(f)
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            index["misses"] += 1
+            return None
+        index["hits"] += 1
+        return entry
+
+    def put(self, key, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _atomic_write_json(self._entry_path(key), entry)
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if item.name == "index.json" or not item.name.endswith(".json"):
+                        continue
+                    st = item.stat()
+                    entries.append((st.st_mtime, st.st_size, item.path))
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, _, path in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def flush(self):
+        """Persist the hash index and counters; drop paths that no longer exist."""
+        files = self._load_index()["files"]
+        for path in [p for p in files if not os.path.exists(p)]:
+            del files[path]
+        try:
+            self._save_index()
+        except OSError:
+            pass
+
+    def stats(self):
+        index = self._load_index()
+        entries = self._entries()
+        lookups = index["hits"] + index["misses"]
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "max_entries": self.max_entries,
+            "bytes": sum(size for _, size, _ in entries),
+            "indexed_files": len(index["files"]),
+            "hits": index["hits"],
+            "misses": index["misses"],
+            "hit_rate": round(index["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+def print_cache_stats():
+    json.dump(PaletteCache(default_palette_cache_dir()).stats(), sys.stdout, indent=2)
+    print()
+
+
+def generate(args) -> dict:
+    """Run the full pipeline for one set of parsed CLI arguments.
+
+    Writes every requested output file, prints the SCSS (or the --debug
+    report) to stdout and returns the generated documents."""
+    darkmode = args.mode == "dark"
+    transparent = args.transparency == "transparent"
+    # SCSS and terminal.json may be forced to another mode than the shell
+    # palette (forceDarkMode for terminals); both come out of the same run.
+    terminal_mode = args.terminal_mode or args.mode
+
+    cache = None if args.no_cache else PaletteCache(default_palette_cache_dir())
+    cache_key = None
+    entry = None
+    if cache is not None:
+        try:
+            cache_key = cache.key_for(args)
+        except OSError:
+            cache_key = None
+        if cache_key is not None:
+            entry = cache.get(cache_key)
+
+    if entry is not None:
+        args.scheme = entry["scheme"]
+    else:
+        argb, image_info = load_seed(args)
+        entry = {"seed": argb, "image_info": image_info, "scheme": args.scheme, "modes": {}}
+    argb = entry["seed"]
+    image_info = entry["image_info"]
+    hct = seed_hct(argb, args)
+    engine = SchemeEngine(get_scheme_class(args.scheme), hct, args)
+
+    entry_changed = False
+    for mode in dict.fromkeys([args.mode, terminal_mode]):
+        if mode not in entry["modes"]:
+            is_dark = mode == "dark"
+            material_colors = engine.material_colors(is_dark)
+            term_colors, term_source_colors = generate_term_colors(material_colors, args, is_dark)
+            entry["modes"][mode] = {
+                "material_colors": material_colors,
+                "term_colors": term_colors,
+                "term_source_colors": term_source_colors,
+            }
+            entry_changed = True
+
+    material_colors = entry["modes"][args.mode]["material_colors"]
+    term_colors = entry["modes"][args.mode]["term_colors"]
+    term_source_colors = entry["modes"][args.mode]["term_source_colors"]
+    output_term_colors = entry["modes"][terminal_mode]["term_colors"]
+
+    if args.path is not None and args.cache is not None:
+        with open(args.cache, "w") as file:
+            file.write(argb_to_hex(argb))
+
+    scss_output = build_scss_output(
+        entry["modes"][terminal_mode]["material_colors"],
+        output_term_colors,
+        terminal_mode == "dark",
+        transparent,
+    )
+
+    if args.scss_output:
+        with open(args.scss_output, "w") as f:
+            f.write(scss_output)
+
+    if args.debug == False:
+        print(scss_output, end="")
+    else:
+        print_debug_report(
+            args, argb, hct, image_info, material_colors, term_colors, term_source_colors
+        )
+
+    palette_json = build_palette_json(material_colors)
+    app_palette_json = build_app_palette(palette_json)
+    colors_json = dict(palette_json)
+    for tkey, tval in term_colors.items():
+        colors_json[tkey] = tval
+
+    theme_meta = build_theme_meta(args, argb, darkmode, transparent)
+
+    if args.json_output:
+        write_json(args.json_output, colors_json)
+
+    if args.palette_output:
+        write_json(args.palette_output, palette_json)
+
+    if args.app_palette_output:
+        write_json(args.app_palette_output, app_palette_json)
+
+    if args.terminal_output:
+        write_json(args.terminal_output, output_term_colors)
+
+    if args.meta_output:
+        write_json(args.meta_output, theme_meta)
+
+    if args.render_templates:
+        # Nothing to render when no manifest is found or all entries are
+        # invalid; color generation already succeeded, so that is fine.
+        template_entries = collect_template_entries(args)
+        if template_entries:
+            palettes = entry.get("template_palettes")
+            if palettes is None:
+                palettes = [engine.template_palette(True, argb), engine.template_palette(False, argb)]
+                entry["template_palettes"] = palettes
+                entry_changed = True
+            render_templates(args, template_entries, palettes[0], palettes[1], darkmode)
+
+    if cache is not None:
+        if entry_changed and cache_key is not None:
+            cache.put(cache_key, entry)
+        cache.flush()
+
+    return {
+        "colors": colors_json,
+        "palette": palette_json,
+        "app_palette": app_palette_json,
+        "terminal": output_term_colors,
+        "meta": theme_meta,
+        "scss": scss_output,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Daemon mode (--serve)
+# ---------------------------------------------------------------------------
+# One-shot runs spend most of their time importing numpy/PIL/materialyoucolor.
+# --serve keeps a process with those imports warm and answers requests on a
+# Unix socket. Protocol: the client sends one JSON line
+#   {"argv": [...same arguments as the CLI...], "cwd": "/abs/dir", "env": {...}}
+# where `env` holds the client's DAEMON_ENV_KEYS values (null when unset)
+# and reads one JSON line back
+#   {"code": 0, "stdout": "...", "stderr": "...", "result": {...}}
+# where `result` holds colors/palette/app_palette/terminal/meta/scss.
+# colorgen_client.py is the stdlib-only client used by switchwall.sh.
+
+# Returned when the daemon can't serve a request (e.g. the script was updated
+# after the daemon started). Clients fall back to the one-shot CLI.
+EXIT_DAEMON_UNAVAILABLE = 75
+
+
+def default_socket_path() -> str:
+    if os.environ.get("INIR_COLORGEN_SOCKET"):
+        return os.environ["INIR_COLORGEN_SOCKET"]
+    # Never the shared /tmp: another user could own the directory first
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, "inir", "colorgen.sock")
+
+
+# Most of the generator lives in these sibling modules; a change to any of
+# them invalidates cached palettes and retires a running daemon.
+_STAMPED_MODULES = ("hct_batch", "image_loading", "video_frames", "wallpaper_index")
+# The daemon reads these from its own environment (video_frames even at import
+# time), so it only serves clients whose values match.
+DAEMON_ENV_KEYS = ("HOME", "XDG_CONFIG_HOME", "XDG_STATE_HOME", "XDG_CACHE_HOME")
+
+
+def _script_stamp():
+    """mtimes of this script and its helper modules."""
+    stamp = []
+    for path in [__file__] + [sys.modules[name].__file__ for name in _STAMPED_MODULES]:
+        try:
+            stamp.append(os.stat(os.path.abspath(path)).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return stamp
+
+
+def handle_request(request: dict) -> dict:
+    import contextlib
+    import io
+
+    argv = request.get("argv")
+    if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+        return {"code": 2, "stdout": "", "stderr": "invalid request: argv must be a list of strings\n"}
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    code = 0
+    result = None
+    previous_cwd = os.getcwd()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                os.chdir(request.get("cwd") or previous_cwd)
+                args = parser.parse_args(argv)
+                if args.serve:
+                    raise ValueError("--serve is not accepted inside a request")
+                if args.cache_stats:
+                    print_cache_stats()
+                else:
+                    result = generate(args)
+            except SystemExit as exc:
+                # argparse errors and --help
+                code = exc.code if isinstance(exc.code, int) else 1
+            except Exception as exc:
+                print(f"[colorgen] {type(exc).__name__}: {exc}", file=sys.stderr)
+                code = 1
+    finally:
+        os.chdir(previous_cwd)
+
+    response = {"code": code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+    if result is not None:
+        response["result"] = result
+    return response
+
+
+def serve(socket_path: str, idle_timeout: float) -> int:
+    import signal
+    import socket
+    import socketserver
+
+    socket_dir = os.path.dirname(socket_path)
+    try:
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        st = os.stat(socket_dir)
+    except OSError as exc:
+        print(f"[colorgen] Cannot create {socket_dir}: {exc}", file=sys.stderr)
+        return 1
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        # Someone else could swap the socket for their own
+        print(f"[colorgen] Refusing {socket_dir}: not owned by us or writable by others", file=sys.stderr)
+        return 1
+
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)  # stale socket from a dead daemon
+        else:
+            print(f"[colorgen] Daemon already listening on {socket_path}", file=sys.stderr)
+            return 0
+        finally:
+            probe.close()
+
+    started_stamp = _script_stamp()
+    state = {"stop": False}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return
+            if _script_stamp() != started_stamp:
+                # Updated on disk: let the client run the new code and exit.
+                response = {
+                    "code": EXIT_DAEMON_UNAVAILABLE,
+                    "stdout": "",
+                    "stderr": "[colorgen] Script changed on disk, daemon exiting\n",
+                }
+                state["stop"] = True
+            else:
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    response = {"code": 2, "stdout": "", "stderr": f"invalid request: {exc}\n"}
+                else:
+                    env = request.get("env")
+                    if env is not None and env != {key: os.environ.get(key) for key in DAEMON_ENV_KEYS}:
+                        # Another session's directories: the client runs the CLI itself
+                        response = {
+                            "code": EXIT_DAEMON_UNAVAILABLE,
+                            "stdout": "",
+                            "stderr": "[colorgen] Client environment differs from the daemon's\n",
+                        }
+                    else:
+                        response = handle_request(request)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    class Server(socketserver.UnixStreamServer):
+        def handle_timeout(self):
+            state["stop"] = True
+
+    try:
+        server = Server(socket_path, Handler)
+    except OSError as exc:
+        # Lost a startup race against another daemon
+        print(f"[colorgen] Cannot listen on {socket_path}: {exc}", file=sys.stderr)
+        return 0
+
+    # SIGTERM unwinds through the finally below so the socket gets removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    with server:
+        os.chmod(socket_path, 0o600)
+        server.timeout = idle_timeout if idle_timeout > 0 else None
+        print(f"[colorgen] Listening on {socket_path}", file=sys.stderr, flush=True)
+        try:
+            while not state["stop"]:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
+    return 0
+
+
+def main():
+    args = parser.parse_args()
+    if args.cache_stats:
+        print_cache_stats()
+        return
+    if args.serve:
+        raise SystemExit(serve(args.socket or default_socket_path(), args.idle_timeout))
+    generate(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,612 @@
+"""
+NumPy batch versions of the HCT conversions used by generate_colors_material.py.
+
+materialyoucolor converts one color at a time in pure Python, and the
+terminal/app-palette contrast searches call it thousands of times per
+wallpaper, mostly through HctSolver's out-of-gamut bisection. Everything here
+takes arrays of ARGB ints or HCT components and mirrors Cam16/HctSolver
+operation for operation (same constants, same evaluation order).
+
+NumPy's SIMD pow/atan2 can differ from libm in the last ulp. That is harmless
+on the HCT -> ARGB side, where every result is rounded to 8 bits, but the
+ARGB -> HCT side returns floats that later code compares against thresholds,
+so it uses libm through _libm_pow/_libm_atan2 and per-channel lookup tables.
+"""
+
+import math
+
+import numpy as np
+from materialyoucolor.hct.hct_solver import HctSolver
+from materialyoucolor.hct.viewing_conditions import ViewingConditions
+
+_VC = ViewingConditions.DEFAULT
+_RGB_D = _VC.rgb_d
+_ALPHA_SCALE = math.pow(1.64 - math.pow(0.29, _VC.n), 0.73)
+_T_INNER_COEFF = 1 / math.pow(1.64 - math.pow(0.29, _VC.n), 0.73)
+_J_EXPONENT = 1.0 / _VC.c / _VC.z
+_P1_SCALE = 50000.0 / 13.0
+_PI_8 = math.pi * 8
+_PI_2 = math.pi * 2
+_LAB_E = 216.0 / 24389.0
+_LAB_KAPPA = 24389.0 / 27.0
+
+_SCALED_DISCOUNT = HctSolver.SCALED_DISCOUNT_FROM_LINRGB
+_LINRGB_FROM_SCALED = HctSolver.LINRGB_FROM_SCALED_DISCOUNT
+_KR, _KG, _KB = HctSolver.Y_FROM_LINRGB
+_CRITICAL_PLANES = np.array(HctSolver.CRITICAL_PLANES)
+
+_libm_pow = np.frompyfunc(math.pow, 2, 1)
+_libm_atan2 = np.frompyfunc(math.atan2, 2, 1)
+
+
+def _linearized_component(component):
+    normalized = component / 255.0
+    if normalized <= 0.040449936:
+        return normalized / 12.92 * 100.0
+    return math.pow((normalized + 0.055) / 1.055, 2.4) * 100.0
+
+
+def _wcag_linearized_component(component):
+    c = component / 255.0
+    return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+
+
+_LINEARIZED = np.array([_linearized_component(c) for c in range(256)])
+_WCAG_LINEARIZED = np.array([_wcag_linearized_component(c) for c in range(256)])
+
+
+def _as_argb(argb):
+    return np.asarray(argb, dtype=np.int64)
+
+
+def _delinearized(component):
+    normalized = component / 100.0
+    value = np.where(
+        normalized <= 0.0031308,
+        normalized * 12.92,
+        1.055 * np.power(normalized, 1.0 / 2.4) - 0.055,
+    )
+    return np.clip(np.rint(value * 255.0), 0, 255).astype(np.int64)
+
+
+def _argb_from_rgb(r, g, b):
+    return (255 << 24) | ((r & 255) << 16) | ((g & 255) << 8) | (b & 255)
+
+
+def _argb_from_linrgb(r, g, b):
+    return _argb_from_rgb(_delinearized(r), _delinearized(g), _delinearized(b))
+
+
+def _pow(base, exponent):
+    return np.asarray(_libm_pow(base, exponent), dtype=np.float64)
+
+
+def _lab_f(t):
+    return np.where(t > _LAB_E, _pow(t, 1.0 / 3.0), (_LAB_KAPPA * t + 16) / 116)
+
+
+def _y_from_lstar(lstar):
+    ft = (lstar + 16.0) / 116.0
+    ft3 = ft * ft * ft
+    return 100.0 * np.where(ft3 > _LAB_E, ft3, (116 * ft - 16) / _LAB_KAPPA)
+
+
+def _sanitize_degrees(degrees):
+    return np.mod(degrees, 360.0)
+
+
+def _sanitize_radians(angle):
+    return np.mod(angle + _PI_8, _PI_2)
+
+
+def _in_cyclic_order(a, b, c):
+    return _sanitize_radians(b - a) < _sanitize_radians(c - a)
+
+
+def argb_to_hct(argb):
+    """Hue, chroma and tone arrays for an array of ARGB ints (Hct.from_int)."""
+    argb = _as_argb(argb)
+    red = _LINEARIZED[(argb & 0x00FF0000) >> 16]
+    green = _LINEARIZED[(argb & 0x0000FF00) >> 8]
+    blue = _LINEARIZED[argb & 0x000000FF]
+
+    x = 0.41233895 * red + 0.35762064 * green + 0.18051042 * blue
+    y = 0.2126 * red + 0.7152 * green + 0.0722 * blue
+    z = 0.01932141 * red + 0.11916382 * green + 0.95034478 * blue
+
+    r_c = 0.401288 * x + 0.650173 * y - 0.051461 * z
+    g_c = -0.250268 * x + 1.204414 * y + 0.045854 * z
+    b_c = -0.002079 * x + 0.048952 * y + 0.953127 * z
+
+    r_d = _RGB_D[0] * r_c
+    g_d = _RGB_D[1] * g_c
+    b_d = _RGB_D[2] * b_c
+
+    r_af = _pow((_VC.fl * np.abs(r_d)) / 100.0, 0.42)
+    g_af = _pow((_VC.fl * np.abs(g_d)) / 100.0, 0.42)
+    b_af = _pow((_VC.fl * np.abs(b_d)) / 100.0, 0.42)
+
+    r_a = (np.sign(r_d) * 400.0 * r_af) / (r_af + 27.13)
+    g_a = (np.sign(g_d) * 400.0 * g_af) / (g_af + 27.13)
+    b_a = (np.sign(b_d) * 400.0 * b_af) / (b_af + 27.13)
+
+    a = (11.0 * r_a + -12.0 * g_a + b_a) / 11.0
+    b = (r_a + g_a - 2.0 * b_a) / 9.0
+    u = (20.0 * r_a + 20.0 * g_a + 21.0 * b_a) / 20.0
+    p2 = (40.0 * r_a + 20.0 * g_a + b_a) / 20.0
+    atan2 = np.asarray(_libm_atan2(b, a), dtype=np.float64)
+    hue = _sanitize_degrees((atan2 * 180.0) / math.pi)
+
+    ac = p2 * _VC.nbb
+    j = 100.0 * _pow(ac / _VC.aw, _VC.c * _VC.z)
+    hue_prime = np.where(hue < 20.14, hue + 360, hue)
+    e_hue = 0.25 * (np.cos((hue_prime * math.pi) / 180.0 + 2.0) + 3.8)
+    p1 = _P1_SCALE * e_hue * _VC.nc * _VC.ncb
+    t = (p1 * np.sqrt(a * a + b * b)) / (u + 0.305)
+    alpha = _pow(t, 0.9) * _ALPHA_SCALE
+    chroma = alpha * np.sqrt(j / 100.0)
+
+    tone = 116.0 * _lab_f(y / 100.0) - 16.0
+    return hue, chroma, tone
+
+
+def _hue_of(r, g, b):
+    m = _SCALED_DISCOUNT
+    scaled = (
+        r * m[0][0] + g * m[0][1] + b * m[0][2],
+        r * m[1][0] + g * m[1][1] + b * m[1][2],
+        r * m[2][0] + g * m[2][1] + b * m[2][2],
+    )
+    adapted = []
+    for component in scaled:
+        af = np.power(np.abs(component), 0.42)
+        adapted.append(np.sign(component) * 400.0 * af / (af + 27.13))
+    r_a, g_a, b_a = adapted
+    a = (11.0 * r_a + -12.0 * g_a + b_a) / 11.0
+    b = (r_a + g_a - 2.0 * b_a) / 9.0
+    return np.arctan2(b, a)
+
+
+def _inverse_chromatic_adaptation(adapted):
+    adapted_abs = np.abs(adapted)
+    base = np.maximum(0, 27.13 * adapted_abs / (400.0 - adapted_abs))
+    return np.sign(adapted) * np.power(base, 1.0 / 0.42)
+
+
+def _find_result_by_j(hue_radians, chroma, y):
+    """HctSolver.find_result_by_j; 0 marks elements that need bisection."""
+    j = np.sqrt(y) * 11.0
+    e_hue = 0.25 * (np.cos(hue_radians + 2.0) + 3.8)
+    p1 = e_hue * _P1_SCALE * _VC.nc * _VC.ncb
+    h_sin = np.sin(hue_radians)
+    h_cos = np.cos(hue_radians)
+    m = _LINRGB_FROM_SCALED
+
+    result = np.zeros(y.shape, dtype=np.int64)
+    active = np.ones(y.shape, dtype=bool)
+    for iteration_round in range(5):
+        j_normalized = j / 100.0
+        alpha = np.where(
+            (chroma != 0.0) & (j != 0.0), chroma / np.sqrt(j_normalized), 0.0
+        )
+        t = np.power(alpha * _T_INNER_COEFF, 1.0 / 0.9)
+        ac = _VC.aw * np.power(j_normalized, _J_EXPONENT)
+        p2 = ac / _VC.nbb
+        gamma = (
+            23.0 * (p2 + 0.305) * t / (23.0 * p1 + 11 * t * h_cos + 108.0 * t * h_sin)
+        )
+        a = gamma * h_cos
+        b = gamma * h_sin
+        r_c = _inverse_chromatic_adaptation((460.0 * p2 + 451.0 * a + 288.0 * b) / 1403.0)
+        g_c = _inverse_chromatic_adaptation((460.0 * p2 - 891.0 * a - 261.0 * b) / 1403.0)
+        b_c = _inverse_chromatic_adaptation((460.0 * p2 - 220.0 * a - 6300.0 * b) / 1403.0)
+        lin_r = r_c * m[0][0] + g_c * m[0][1] + b_c * m[0][2]
+        lin_g = r_c * m[1][0] + g_c * m[1][1] + b_c * m[1][2]
+        lin_b = r_c * m[2][0] + g_c * m[2][1] + b_c * m[2][2]
+
+        negative = (lin_r < 0) | (lin_g < 0) | (lin_b < 0)
+        fnj = _KR * lin_r + _KG * lin_g + _KB * lin_b
+        failed = active & (negative | (fnj <= 0))
+        active &= ~failed
+
+        settled = active & ((iteration_round == 4) | (np.abs(fnj - y) < 0.002))
+        in_range = (lin_r <= 100.01) & (lin_g <= 100.01) & (lin_b <= 100.01)
+        accepted = settled & in_range
+        if accepted.any():
+            result[accepted] = _argb_from_linrgb(
+                lin_r[accepted], lin_g[accepted], lin_b[accepted]
+            )
+        active &= ~settled
+        if not active.any():
+            break
+
+        j = np.where(active, j - (fnj - y) * j / (2 * fnj), j)
+
+    return result
+
+
+def _nth_vertices(y):
+    """All 12 HctSolver.nth_vertex candidates: (N, 12, 3) array and validity mask."""
+    vertices = np.full(y.shape + (12, 3), -1.0)
+    valid = np.zeros(y.shape + (12,), dtype=bool)
+    for n in range(12):
+        coord_a = 0.0 if n % 4 <= 1 else 100.0
+        coord_b = 0.0 if n % 2 == 0 else 100.0
+        if n < 4:
+            g, b = coord_a, coord_b
+            r = (y - g * _KG - b * _KB) / _KR
+            solved, axis = r, 0
+            point = (r, g, b)
+        elif n < 8:
+            b, r = coord_a, coord_b
+            g = (y - r * _KR - b * _KB) / _KG
+            solved, axis = g, 1
+            point = (r, g, b)
+        else:
+            r, g = coord_a, coord_b
+            b = (y - r * _KR - g * _KG) / _KB
+            solved, axis = b, 2
+            point = (r, g, b)
+        ok = (solved >= 0.0) & (solved <= 100.0)
+        valid[:, n] = ok
+        for component in range(3):
+            value = point[component]
+            vertices[:, n, component] = np.where(ok, value, -1.0)
+    return vertices, valid
+
+
+def _bisect_to_segment(y, target_hue):
+    count = y.shape[0]
+    vertices, valid = _nth_vertices(y)
+    vertex_hues = _hue_of(vertices[..., 0], vertices[..., 1], vertices[..., 2])
+
+    left = np.full((count, 3), -1.0)
+    right = left.copy()
+    left_hue = np.zeros(count)
+    right_hue = np.zeros(count)
+    initialized = np.zeros(count, dtype=bool)
+    uncut = np.ones(count, dtype=bool)
+
+    for n in range(12):
+        mid = vertices[:, n, :]
+        mid_hue = vertex_hues[:, n]
+        ok = valid[:, n]
+
+        first = ok & ~initialized
+        left[first] = mid[first]
+        right[first] = mid[first]
+        left_hue[first] = mid_hue[first]
+        right_hue[first] = mid_hue[first]
+
+        cut = ok & initialized & (uncut | _in_cyclic_order(left_hue, mid_hue, right_hue))
+        uncut &= ~cut
+        to_right = cut & _in_cyclic_order(left_hue, target_hue, mid_hue)
+        to_left = cut & ~to_right
+        right[to_right] = mid[to_right]
+        right_hue[to_right] = mid_hue[to_right]
+        left[to_left] = mid[to_left]
+        left_hue[to_left] = mid_hue[to_left]
+
+        initialized |= first
+
+    return left, right
+
+
+def _true_delinearized(component):
+    normalized = component / 100.0
+    value = np.where(
+        normalized <= 0.0031308,
+        normalized * 12.92,
+        1.055 * np.power(normalized, 1.0 / 2.4) - 0.055,
+    )
+    return value * 255.0
+
+
+def _bisect_to_limit(y, target_hue):
+    """HctSolver.bisect_to_limit; returns linear RGB columns."""
+    left, right = _bisect_to_segment(y, target_hue)
+    left_hue = _hue_of(left[:, 0], left[:, 1], left[:, 2])
+
+    for axis in range(3):
+        differs = left[:, axis] != right[:, axis]
+        if not differs.any():
+            continue
+        increasing = left[:, axis] < right[:, axis]
+        left_td = _true_delinearized(left[:, axis]) - 0.5
+        right_td = _true_delinearized(right[:, axis]) - 0.5
+        l_plane = np.where(increasing, np.floor(left_td), np.ceil(left_td))
+        r_plane = np.where(increasing, np.ceil(right_td), np.floor(right_td))
+
+        active = differs.copy()
+        for _ in range(8):
+            active &= np.abs(r_plane - l_plane) > 1
+            if not active.any():
+                break
+            m_plane = np.floor((l_plane + r_plane) / 2.0)
+            plane_index = np.clip(m_plane, 0, len(_CRITICAL_PLANES) - 1).astype(np.int64)
+            coordinate = _CRITICAL_PLANES[plane_index]
+
+            source = left[:, axis]
+            t = (coordinate - source) / (right[:, axis] - source)
+            mid = left + (right - left) * t[:, None]
+            mid_hue = _hue_of(mid[:, 0], mid[:, 1], mid[:, 2])
+
+            to_right = active & _in_cyclic_order(left_hue, target_hue, mid_hue)
+            to_left = active & ~to_right
+            right[to_right] = mid[to_right]
+            r_plane = np.where(to_right, m_plane, r_plane)
+            left[to_left] = mid[to_left]
+            left_hue = np.where(to_left, mid_hue, left_hue)
+            l_plane = np.where(to_left, m_plane, l_plane)
+
+    midpoint = (left + right) / 2
+    return midpoint[:, 0], midpoint[:, 1], midpoint[:, 2]
+
+
+def hct_to_argb(hue, chroma, tone):
+    """ARGB ints for arrays of HCT components (Hct.from_hct(...).to_int())."""
+    hue, chroma, tone = np.broadcast_arrays(
+        np.asarray(hue, dtype=np.float64),
+        np.asarray(chroma, dtype=np.float64),
+        np.asarray(tone, dtype=np.float64),
+    )
+    shape = hue.shape
+    hue, chroma, tone = hue.ravel(), chroma.ravel(), tone.ravel()
+    result = np.zeros(hue.shape, dtype=np.int64)
+
+    with np.errstate(all="ignore"):
+        achromatic = (chroma < 0.0001) | (tone < 0.0001) | (tone > 99.9999)
+        if achromatic.any():
+            component = _delinearized(_y_from_lstar(tone[achromatic]))
+            result[achromatic] = _argb_from_rgb(component, component, component)
+
+        chromatic = ~achromatic
+        if chromatic.any():
+            hue_radians = _sanitize_degrees(hue[chromatic]) / 180 * math.pi
+            y = _y_from_lstar(tone[chromatic])
+            exact = _find_result_by_j(hue_radians, chroma[chromatic], y)
+            missing = exact == 0
+            if missing.any():
+                r, g, b = _bisect_to_limit(y[missing], hue_radians[missing])
+                exact[missing] = _argb_from_linrgb(r, g, b)
+            result[chromatic] = exact
+
+    return result.reshape(shape)
+
+
+def relative_luminance(argb):
+    """Relative luminance per WCAG 2.1 spec."""
+    argb = _as_argb(argb)
+    r = _WCAG_LINEARIZED[(argb >> 16) & 0xFF]
+    g = _WCAG_LINEARIZED[(argb >> 8) & 0xFF]
+    b = _WCAG_LINEARIZED[argb & 0xFF]
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+
+def contrast_ratio(fg_argb, bg_argb):
+    """WCAG contrast ratio between two arrays of colors."""
+    l1 = relative_luminance(fg_argb)
+    l2 = relative_luminance(bg_argb)
+    return (np.maximum(l1, l2) + 0.05) / (np.minimum(l1, l2) + 0.05)
+
+
+def harmonize(design_color, source_color, threshold=35, harmony=0.5):
+    """Rotate each design color's hue towards its source color."""
+    from_hue, from_chroma, from_tone = argb_to_hct(design_color)
+    to_hue, _, _ = argb_to_hct(source_color)
+    difference_degrees = 180.0 - np.abs(np.abs(from_hue - to_hue) - 180.0)
+    rotation_degrees = np.minimum(difference_degrees * np.asarray(harmony), threshold)
+    direction = np.where(_sanitize_degrees(to_hue - from_hue) <= 180.0, 1.0, -1.0)
+    output_hue = _sanitize_degrees(from_hue + rotation_degrees * direction)
+    return hct_to_argb(output_hue, from_chroma, from_tone)
+
+
+def boost_chroma_tone(argb, chroma=1, tone=1, tone_cap=95.0):
+    """Scale chroma and tone; tone_cap prevents white-washing bright colors."""
+    hue, current_chroma, current_tone = argb_to_hct(argb)
+    new_tone = np.minimum(tone_cap, current_tone * np.asarray(tone))
+    return hct_to_argb(hue, current_chroma * np.asarray(chroma), new_tone)
+
+
+def ensure_min_chroma(argb, min_chroma=40):
+    """Raise chroma to min_chroma where it is lower, for visual distinctiveness."""
+    argb = _as_argb(argb)
+    hue, chroma, tone = argb_to_hct(argb)
+    low = chroma < min_chroma
+    if not low.any():
+        return argb
+    raised = hct_to_argb(hue, np.broadcast_to(min_chroma, hue.shape), tone)
+    return np.where(low, raised, argb)
+
+
+def scale_chroma(argb, factor, maximum=None):
+    """Scale chroma while preserving hue/tone for stronger or calmer accent colors."""
+    argb = _as_argb(argb)
+    if abs(factor - 1.0) < 1e-6:
+        return argb
+    hue, chroma, tone = argb_to_hct(argb)
+    new_chroma = np.maximum(0.0, chroma * factor)
+    if maximum is not None:
+        new_chroma = np.minimum(maximum, new_chroma)
+    return hct_to_argb(hue, new_chroma, tone)
+
+
+def _tone_candidates(start_tone, limit_tone, is_dark, step):
+    """The exact tone sequence the scalar search walks, including its float
+    accumulation, so batched candidates line up with the original loop."""
+    direction = 1.0 if is_dark else -1.0
+    tone = start_tone
+    max_steps = max(1, int(math.ceil(abs(limit_tone - start_tone) / step)) + 2)
+    tones = []
+    for _ in range(max_steps):
+        clamped_tone = max(0.0, min(100.0, tone))
+        tones.append(clamped_tone)
+        if is_dark and clamped_tone >= limit_tone:
+            break
+        if not is_dark and clamped_tone <= limit_tone:
+            break
+        tone += direction * step
+        if is_dark and tone > limit_tone:
+            tone = limit_tone
+        if not is_dark and tone < limit_tone:
+            tone = limit_tone
+    return tones
+
+
+def find_tone_for_contrast(
+    hue, chroma, start_tone, limit_tone, bg_argb, min_ratio, is_dark, step=0.25, block=48
+):
+    """Search tone values for contrast, for many colors at once.
+
+    Every element walks the same tone sequence as the scalar search; candidates
+    are solved in blocks across all still-searching elements, which keeps the
+    early exit without going back to one color per solve.
+
+    Returns:
+        (color_argb, tone, met_min_ratio, achieved_ratio) lists
+    """
+    hue, chroma, start_tone, limit_tone, bg_argb, min_ratio, is_dark = (
+        np.broadcast_arrays(
+            np.asarray(hue, dtype=np.float64),
+            np.asarray(chroma, dtype=np.float64),
+            np.asarray(start_tone, dtype=np.float64),
+            np.asarray(limit_tone, dtype=np.float64),
+            _as_argb(bg_argb),
+            np.asarray(min_ratio, dtype=np.float64),
+            np.asarray(is_dark, dtype=bool),
+        )
+    )
+    count = hue.shape[0]
+    sequences = [
+        _tone_candidates(float(start_tone[i]), float(limit_tone[i]), bool(is_dark[i]), step)
+        for i in range(count)
+    ]
+
+    initial = hct_to_argb(hue, chroma, np.clip(start_tone, 0.0, 100.0))
+    best_color = initial.tolist()
+    best_tone = start_tone.tolist()
+    best_ratio = contrast_ratio(initial, bg_argb).tolist()
+    met = [False] * count
+
+    pending = list(range(count))
+    offset = 0
+    while pending:
+        owners, tones = [], []
+        for i in pending:
+            chunk = sequences[i][offset : offset + block]
+            owners.extend([i] * len(chunk))
+            tones.extend(chunk)
+        if not tones:
+            break
+        owners_arr = np.array(owners)
+        candidates = hct_to_argb(hue[owners_arr], chroma[owners_arr], np.array(tones))
+        ratios = contrast_ratio(candidates, bg_argb[owners_arr]).tolist()
+        candidates = candidates.tolist()
+
+        still_pending = []
+        position = 0
+        for i in pending:
+            length = len(sequences[i][offset : offset + block])
+            done = False
+            for k in range(position, position + length):
+                ratio = ratios[k]
+                if ratio > best_ratio[i]:
+                    best_color[i] = candidates[k]
+                    best_tone[i] = tones[k]
+                    best_ratio[i] = ratio
+                if ratio >= min_ratio[i]:
+                    best_color[i] = candidates[k]
+                    best_tone[i] = tones[k]
+                    best_ratio[i] = ratio
+                    met[i] = True
+                    done = True
+                    break
+            position += length
+            if not done and offset + block < len(sequences[i]):
+                still_pending.append(i)
+        pending = still_pending
+        offset += block
+
+    return best_color, best_tone, met, best_ratio
+
+
+def ensure_contrast(fg_argb, bg_argb, min_ratio=4.5, is_dark=True):
+    """Adjust foreground tones to reach a minimum contrast ratio against backgrounds.
+
+    For dark mode, increases tone (lighter). For light mode, decreases tone (darker).
+    Preserves hue and boosts chroma when tone approaches extremes to prevent washed-out colors.
+    """
+    fg_argb, bg_argb, min_ratio, is_dark = np.broadcast_arrays(
+        _as_argb(fg_argb),
+        _as_argb(bg_argb),
+        np.asarray(min_ratio, dtype=np.float64),
+        np.asarray(is_dark, dtype=bool),
+    )
+    fg_argb = fg_argb.ravel()
+    bg_argb = bg_argb.ravel()
+    min_ratio = min_ratio.ravel()
+    is_dark = is_dark.ravel()
+    result = fg_argb.copy()
+
+    todo = np.flatnonzero(contrast_ratio(fg_argb, bg_argb) < min_ratio)
+    if todo.size == 0:
+        return result
+
+    bg = bg_argb[todo]
+    ratio_needed = min_ratio[todo]
+    dark = is_dark[todo]
+    hue, original_chroma, original_tone = argb_to_hct(fg_argb[todo])
+
+    # Tone limits to prevent colors from washing out to pure white/black.
+    # If min ratio is unreachable inside limits, return highest-contrast option.
+    tone_limit = np.where(dark, 88.0, 20.0)
+
+    best, best_tone, met, best_ratio = find_tone_for_contrast(
+        hue, original_chroma, original_tone, tone_limit, bg, ratio_needed, dark
+    )
+    chosen = list(best)
+
+    # Compensate for tone shift by boosting chroma
+    # When tone moves far from original, colors lose perceptual saturation
+    # Boost chroma proportionally to maintain color identity
+    best_tone = np.array(best_tone)
+    tone_shift = np.abs(best_tone - original_tone)
+    shifted = np.flatnonzero(tone_shift > 10)
+    if shifted.size:
+        # Boost chroma by up to 40% for large tone shifts
+        # The further we shift, the more we compensate
+        boost_factor = 1.0 + np.minimum(0.4, (tone_shift[shifted] - 10) / 50)
+        boosted_chroma = np.minimum(original_chroma[shifted] * boost_factor, 80.0)
+        boosted_same_tone = hct_to_argb(hue[shifted], boosted_chroma, best_tone[shifted])
+        boosted_ratio = contrast_ratio(boosted_same_tone, bg[shifted])
+
+        search = []
+        for n, i in enumerate(shifted.tolist()):
+            if met[i] and boosted_ratio[n] >= ratio_needed[i]:
+                chosen[i] = int(boosted_same_tone[n])
+            else:
+                search.append(n)
+
+        if search:
+            search = np.array(search)
+            rows = shifted[search]
+            boosted_best, _, boosted_met, boosted_best_ratio = find_tone_for_contrast(
+                hue[rows],
+                boosted_chroma[search],
+                best_tone[rows],
+                tone_limit[rows],
+                bg[rows],
+                ratio_needed[rows],
+                dark[rows],
+            )
+            for n, i in enumerate(rows.tolist()):
+                if met[i]:
+                    # Keep strict contrast if we already had a valid candidate.
+                    if boosted_met[n]:
+                        chosen[i] = boosted_best[n]
+                elif boosted_best_ratio[n] > best_ratio[i]:
+                    # If target contrast is unreachable, keep the best achievable ratio.
+                    chosen[i] = boosted_best[n]
+
+    result[todo] = chosen
+    return result
@@ -0,0 +1,100 @@
+"""
+Reduced-resolution image loading for the color scripts.
+
+The color pipeline only ever looks at ~128-150px versions of wallpapers and
+cover art, but decoding a 6K/8K JPEG at full size used to dominate its
+runtime. load_downscaled() asks the decoder for fewer pixels instead:
+
+  1. JPEG: DCT scaling through Image.draft() (1/2, 1/4 or 1/8 while decoding)
+     JPEG 2000: a lower resolution level of the codestream (`reduce`)
+  2. an integer box reduce() down towards the target
+  3. the caller's resampling filter for the exact target size
+
+Steps 1 and 2 stop at OVERSAMPLE x the target size, so the final filter still
+sees real detail and the result stays visually equivalent to resampling the
+full-size image.
+"""
+
+import time
+
+from PIL import Image
+
+OVERSAMPLE = 2
+# Image.reduce() box-averages these modes; others go straight to resize()
+_REDUCIBLE_MODES = {"L", "LA", "RGB", "RGBA", "RGBX", "CMYK", "I", "F"}
+
+
+def _shrink_factor(size, target):
+    """Largest integer factor that keeps `size` >= OVERSAMPLE x `target`."""
+    return min(size[0] // (target[0] * OVERSAMPLE), size[1] // (target[1] * OVERSAMPLE))
+
+
+def load_downscaled(path, target_size, resample=Image.Resampling.BICUBIC, mode=None, gif_frame=None):
+    """Open `path` and return it scaled to `target_size`.
+
+    target_size is a (width, height) tuple or a callable taking the original
+    (width, height) and returning one. mode="RGB" converts every image;
+    mode=None only expands L/P images to RGB and keeps alpha; a callable gets
+    the opened image and returns the mode to use. gif_frame selects a frame
+    of animated GIFs.
+
+    Returns (image, stats), stats holding the original and decoded sizes, the
+    box reduce factor and decode/total times in milliseconds."""
+    started = time.perf_counter()
+    image = Image.open(path)
+    if gif_frame is not None and image.format == "GIF":
+        image.seek(gif_frame)
+
+    original = image.size
+    target = target_size(original) if callable(target_size) else tuple(target_size)
+    target = (max(1, target[0]), max(1, target[1]))
+
+    jp2_level = 0
+    if _shrink_factor(original, target) >= 2:
+        if image.format == "JPEG":
+            image.draft(None, (target[0] * OVERSAMPLE, target[1] * OVERSAMPLE))
+        elif image.format == "JPEG2000":
+            while _shrink_factor((original[0] >> (jp2_level + 1), original[1] >> (jp2_level + 1)), target) >= 1:
+                jp2_level += 1
+            # Codestreams usually carry 5 levels below full size. Setting
+            # `reduce` on a Jpeg2KImageFile shadows the reduce() method.
+            jp2_level = min(jp2_level, 5)
+            image.reduce = jp2_level
+
+    decode_started = time.perf_counter()
+    try:
+        image.load()
+    except OSError:
+        if not jp2_level:
+            raise
+        # Fewer resolution levels than assumed; decode at full size
+        image = Image.open(path)
+        image.load()
+    decode_ms = (time.perf_counter() - decode_started) * 1000
+    decoded = image.size
+
+    if callable(mode):
+        mode = mode(image)
+    if mode is not None:
+        if image.mode != mode:
+            image = image.convert(mode)
+    elif image.mode in ["L", "P"]:
+        image = image.convert("RGB")
+
+    factor = _shrink_factor(image.size, target)
+    if factor >= 2 and image.mode in _REDUCIBLE_MODES:
+        image = Image.Image.reduce(image, factor)
+    else:
+        factor = 1
+
+    if image.size != target:
+        image = image.resize(target, resample)
+
+    stats = {
+        "original": original,
+        "decoded": decoded,
+        "reduce": factor,
+        "decode_ms": decode_ms,
+        "total_ms": (time.perf_counter() - started) * 1000,
+    }
+    return image, stats
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
+import os
 import sys
-import cv2
-import numpy as np
 
 # Allowed scheme types
 SCHEMES = [
@@ -16,98 +15,30 @@ SCHEMES = [
 ]
 
 
-def image_colorfulness(image):
-    # Based on Hasler and Süsstrunk's colorfulness metric
-    (B, G, R) = cv2.split(image.astype("float"))
-    rg = np.absolute(R - G)
-    yb = np.absolute(0.5 * (R + G) - B)
-    std_rg = np.std(rg)
-    std_yb = np.std(yb)
-    mean_rg = np.mean(rg)
-    mean_yb = np.mean(yb)
-    colorfulness = np.sqrt(std_rg**2 + std_yb**2) + (
-        0.3 * np.sqrt(mean_rg**2 + mean_yb**2)
-    )
-    return colorfulness
+def _features(img_path):
+    """(colorfulness, scheme) for an image, or None if it cannot be read.
 
+    Indexed wallpapers answer from wallpaper_index.py. Others go through the
+    pipeline the index itself uses (generate_colors_material's seed bitmap at
+    the index size and its metrics), so a wallpaper gets the same scheme
+    before and after the indexer has seen it."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import wallpaper_index
 
-def dominant_saturation(image):
-    """Average saturation of the image in HSV space."""
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    return float(np.mean(hsv[:, :, 1]))
+    features = wallpaper_index.lookup(img_path)
+    if features is not None and features["colorfulness"] is not None:
+        return features["colorfulness"], features["scheme"]
 
+    import generate_colors_material as gcm
 
-def color_variety(image):
-    """Rough hue spread: std-dev of the hue channel (0-180 in OpenCV)."""
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    return float(np.std(hsv[:, :, 0]))
-
-
-def pick_scheme(colorfulness, saturation, hue_spread):
-    """
-    Multi-axis decision tree for scheme variant selection.
-
-    Axes:
-      - colorfulness  (Hasler-Süsstrunk metric, 0-~200+)
-      - saturation    (mean HSV saturation, 0-255)
-      - hue_spread    (hue std-dev, 0-~90)
-
-    Design goals:
-      - tonal-spot is the safe default — most images should land here
-      - Near-grayscale images → monochrome (preserves intent)
-      - Low-color, muted images → neutral (calm palette)
-      - Focused moderate color → content (faithful to source)
-      - High saturation + focused hue → fidelity (vibrant but faithful)
-      - Expressive/rainbow only for genuinely extreme images
-    """
-    # Near-grayscale: very low saturation regardless of other metrics
-    if saturation < 20:
-        return "scheme-monochrome"
-
-    # Very low colorfulness can still carry enough saturation to avoid a flat
-    # neutral palette. Keep neutral for truly muted frames only.
-    if colorfulness < 30:
-        if saturation < 55:
-            return "scheme-neutral"
-        if hue_spread < 22:
-            return "scheme-content"
-        return "scheme-tonal-spot"
-
-    # Low-to-moderate colorfulness — tonal-spot or content
-    if colorfulness < 55:
-        if hue_spread < 22 and saturation < 100:
-            return "scheme-content"
-        return "scheme-tonal-spot"
-
-    # Moderate colorfulness — mostly tonal-spot, fidelity for saturated
-    if colorfulness < 90:
-        if saturation > 140 and hue_spread < 35:
-            # Very saturated with focused hue → fidelity
-            return "scheme-fidelity"
-        if hue_spread < 30:
-            # Focused color, moderate saturation → content
-            return "scheme-content"
-        return "scheme-tonal-spot"
-
-    # High colorfulness (90+) — only here do expressive/rainbow appear
-    if hue_spread > 55 and saturation > 150:
-        return "scheme-rainbow"
-    if saturation > 160:
-        return "scheme-fidelity"
-    if hue_spread > 45:
-        return "scheme-expressive"
-    return "scheme-tonal-spot"
-
-
-def _downscale(img, max_dim=256):
-    """Resize to at most max_dim on the longest side. Statistical metrics
-    (colorfulness, mean saturation, hue std-dev) are resolution-invariant,
-    so a 256x256 thumbnail produces identical scheme selections."""
-    h, w = img.shape[:2]
-    if max(h, w) <= max_dim:
-        return img
-    scale = max_dim / max(h, w)
-    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    try:
+        image, _, _ = gcm.load_seed_image(img_path, wallpaper_index.DEFAULT_BITMAP_SIZE)
+    except (OSError, ValueError):
+        return None
+    stats = gcm.image_scheme_stats(image)
+    if stats is None:
+        return None
+    return stats[0], gcm.pick_scheme(*stats)
 
 
 def main():
@@ -120,19 +51,12 @@ def main():
         print("scheme-tonal-spot")
         sys.exit(1)
     img_path = args[0]
-    img = cv2.imread(img_path)
-    if img is None:
+    features = _features(img_path)
+    if features is None:
         print("scheme-tonal-spot")
         sys.exit(1)
-    img = _downscale(img)
-    colorfulness = image_colorfulness(img)
-    if colorfulness_mode:
-        print(f"{colorfulness}")
-    else:
-        sat = dominant_saturation(img)
-        spread = color_variety(img)
-        scheme = pick_scheme(colorfulness, sat, spread)
-        print(scheme)
+    colorfulness, scheme = features
+    print(f"{colorfulness}" if colorfulness_mode else scheme)
 
 
 if __name__ == "__main__":
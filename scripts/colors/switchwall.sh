@@ -269,15 +269,16 @@ get_focused_monitor_name() {
  }
 
  # Wallpaper loops routinely open on black or a fade-in, so frame 0 produces a
-# nearly black palette and a misleading accent. ffmpeg's thumbnail filter scores
-# a batch of frames and returns a representative one instead.
+# nearly black palette and a misleading accent. video_frames.py picks a
+# representative keyframe (decoding keyframes only) and caches its timestamp,
+# the same frame thumbgen and the SDDM sync use.
 extract_representative_frame() {
     local media_path="$1"
     local out_path="$2"
     mkdir -p "$(dirname "$out_path")"
 
-    if ffmpeg -y -i "$media_path" -vf "thumbnail=n=100" -frames:v 1 -update 1 -q:v 2 \
-        "$out_path" >/dev/null 2>&1 && [ -s "$out_path" ]; then
+    if "${_ii_python:-python3}" "$SCRIPT_DIR/video_frames.py" "$media_path" "$out_path" >/dev/null 2>&1 \
+        && [ -s "$out_path" ]; then
         return 0
     fi
     # Very short or unusual clips can defeat the filter; fall back to frame 0.
@@ -314,6 +315,29 @@ ensure_color_preview_for_media() {
     return 1
  }
 
+# Run generate_colors_material.py with the given arguments. Goes through the
+# warm --serve daemon when one is listening (numpy/PIL/materialyoucolor are
+# already imported there, so a request takes tens of milliseconds), otherwise
+# runs the one-shot CLI and starts a daemon in the background for the next
+# switch. The daemon exits on its own after 10 idle minutes.
+# INIR_COLORGEN_DAEMON=0 disables the daemon entirely.
+run_color_generator() {
+    if [[ "${INIR_COLORGEN_DAEMON:-1}" != "0" ]]; then
+        "$_ii_python" "$SCRIPT_DIR/colorgen_client.py" "$@"
+        local status=$?
+        [[ $status -ne 75 ]] && return $status
+    fi
+
+    "$_ii_python" "$SCRIPT_DIR/generate_colors_material.py" "$@"
+    local status=$?
+
+    if [[ "${INIR_COLORGEN_DAEMON:-1}" != "0" ]]; then
+        setsid -f "$_ii_python" "$SCRIPT_DIR/generate_colors_material.py" --serve \
+            >/dev/null 2>&1 </dev/null
+    fi
+    return $status
+}
+
 switch() {
     imgpath="$1"
     mode_flag="$2"
@@ -593,8 +617,14 @@ switch() {
     _chromium_out="$STATE_DIR/user/generated/chromium.theme"
     force_dark_terminal="$cfg_force_dark_terminal"
 
-    # 1) Generate authoritative shell/UI colors.json + render app templates.
-    if "$_ii_python" "$SCRIPT_DIR/generate_colors_material.py" "${generate_colors_material_args[@]}" \
+    # Generate authoritative shell/UI colors.json + render app templates.
+    # Terminal colors may optionally force dark mode; --terminal-mode makes the
+    # same run emit dark SCSS/terminal.json while the shell palette keeps the
+    # real mode.
+    if [[ "$force_dark_terminal" == "true" ]]; then
+        generate_colors_material_args+=(--terminal-mode dark)
+    fi
+    if run_color_generator "${generate_colors_material_args[@]}" \
         --json-output "$_json_tmp" \
         --palette-output "$_palette_tmp" \
         --app-palette-output "$_app_palette_tmp" \
@@ -606,15 +636,9 @@ switch() {
         mv "$_json_tmp" "$_json_out"
         [[ -s "$_palette_tmp" ]] && mv "$_palette_tmp" "$_palette_out" || rm -f "$_palette_tmp"
         [[ -s "$_app_palette_tmp" ]] && mv "$_app_palette_tmp" "$_app_palette_out" || rm -f "$_app_palette_tmp"
-        if [[ "$force_dark_terminal" == "true" ]]; then
-            rm -f "$_terminal_tmp"
-        else
-            [[ -s "$_terminal_tmp" ]] && mv "$_terminal_tmp" "$_terminal_out" || rm -f "$_terminal_tmp"
-        fi
+        [[ -s "$_terminal_tmp" ]] && mv "$_terminal_tmp" "$_terminal_out" || rm -f "$_terminal_tmp"
         [[ -s "$_meta_tmp" ]] && mv "$_meta_tmp" "$_meta_out" || rm -f "$_meta_tmp"
-        if [[ "$force_dark_terminal" != "true" ]]; then
-            [[ -s "$_scss_tmp" ]] && mv "$_scss_tmp" "$STATE_DIR/user/generated/material_colors.scss" || rm -f "$_scss_tmp"
-        fi
+        [[ -s "$_scss_tmp" ]] && mv "$_scss_tmp" "$STATE_DIR/user/generated/material_colors.scss" || rm -f "$_scss_tmp"
         if write_chromium_theme_contract "$_app_palette_out" "$_chromium_tmp" && [[ -s "$_chromium_tmp" ]]; then
             mv "$_chromium_tmp" "$_chromium_out"
         else
@@ -631,32 +655,6 @@ switch() {
         rm -f "$_chromium_tmp"
     fi
 
-    if [[ "$force_dark_terminal" == "true" ]]; then
-        scss_generate_args=("${generate_colors_material_args[@]}")
-        for i in "${!scss_generate_args[@]}"; do
-            if [[ "${scss_generate_args[$i]}" == "--mode" && $((i + 1)) -lt ${#scss_generate_args[@]} ]]; then
-                scss_generate_args[$((i + 1))]="dark"
-                break
-            fi
-        done
-        _terminal_force_tmp="$STATE_DIR/user/generated/terminal.json.force.tmp"
-
-        scss_cmd=("$_ii_python" "$SCRIPT_DIR/generate_colors_material.py" "${scss_generate_args[@]}")
-        scss_cmd+=(--terminal-output "$_terminal_force_tmp")
-
-        if "${scss_cmd[@]}" > "$_scss_tmp" 2>/dev/null && [[ -s "$_scss_tmp" && -s "$_terminal_force_tmp" ]]; then
-            mv "$_scss_tmp" "$STATE_DIR/user/generated/material_colors.scss"
-            # Keep terminal outputs aligned with forced-dark generation path when enabled.
-            mv "$_terminal_force_tmp" "$_terminal_out"
-        else
-            echo "[switchwall] Warning: material_colors.scss generation failed, keeping previous SCSS" >&2
-            rm -f "$_scss_tmp"
-            rm -f "$_terminal_force_tmp"
-        fi
-    else
-        rm -f "$_scss_tmp"
-    fi
-
     # Generate Vesktop theme if enabled (only when app theming is on)
     if [ "$enable_apps_shell" != "false" ]; then
         if [[ "$cfg_enable_vesktop" != "false" ]]; then
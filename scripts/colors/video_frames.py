@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Single-frame extraction for video wallpapers.
+
+Wallpaper loops routinely open on black or a fade-in, so frame 0 makes a poor
+thumbnail and a misleading color seed, while scoring 100 decoded frames with
+ffmpeg's thumbnail filter costs seconds on 4K clips. extract_frame() instead:
+
+  1. on the first request for a file, decodes only keyframes
+     (-skip_frame nokey) and lets the thumbnail filter pick the most
+     representative of the first KEYFRAMES of them, noting its timestamp
+  2. afterwards, seeks straight to that timestamp (-ss before -i) and decodes
+     that single keyframe
+
+Timestamps are cached in $XDG_CACHE_HOME/inir/video-frames.sqlite by path,
+mtime and size. Frames are scaled inside ffmpeg, so only the requested size
+is piped back. Used by thumbgen.py, sync-pixel-sddm.py,
+generate_colors_material.py and (through the command line) switchwall.sh.
+
+Usage: video_frames.py VIDEO OUTPUT [--max-size N]
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+VIDEO_SUFFIXES = {".mp4", ".webm", ".mkv", ".avi", ".mov"}
+# Keyframes the thumbnail filter chooses from on the first extraction
+KEYFRAMES = 8
+CACHE_PATH = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "inir" / "video-frames.sqlite"
+# -ss lands on the last keyframe at or before the given time; showinfo rounds
+# to microseconds, so nudge past the frame to never fall back a keyframe
+_SEEK_EPSILON = 0.01
+_PTS_RE = re.compile(r"pts_time:\s*(-?[0-9.]+)")
+
+
+def is_video(path):
+    return os.path.splitext(str(path))[1].lower() in VIDEO_SUFFIXES
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _open_cache():
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(CACHE_PATH), timeout=5.0)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS frames ("
+        "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, pts REAL NOT NULL)"
+    )
+    return conn
+
+
+def cached_timestamp(path, stamp):
+    """Timestamp chosen for `path` by an earlier extraction, if it did not change since."""
+    try:
+        conn = _open_cache()
+        try:
+            row = conn.execute("SELECT mtime_ns, size, pts FROM frames WHERE path = ?", (path,)).fetchone()
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        return None
+    if row is None or (row[0], row[1]) != tuple(stamp):
+        return None
+    return row[2]
+
+
+def _store_timestamp(path, stamp, pts):
+    try:
+        conn = _open_cache()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)", (path, stamp[0], stamp[1], pts))
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def _output_args(max_size, codec, filters):
+    if max_size:
+        filters = filters + [
+            f"scale='min({max_size},iw)':'min({max_size},ih)':force_original_aspect_ratio=decrease"
+        ]
+    args = ["-an", "-sn", "-dn"]
+    if filters:
+        args += ["-vf", ",".join(filters)]
+    args += ["-frames:v", "1", "-f", "image2pipe", "-c:v", codec]
+    if codec == "mjpeg":
+        args += ["-q:v", "2"]
+    return args + ["-"]
+
+
+def _run(command, timeout):
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result
+
+
+def extract_frame(path, max_size=None, codec="png", timeout=30):
+    """Return a representative frame of the video at `path` as encoded image
+    bytes (PNG, or JPEG with codec="mjpeg"), scaled to fit max_size x max_size
+    when given (never enlarged). Returns None when ffmpeg is missing or cannot
+    read the file."""
+    ffmpeg = shutil.which("ffmpeg")
+    path = os.path.abspath(path)
+    stamp = _stamp(path)
+    if ffmpeg is None or stamp is None:
+        return None
+    base = [ffmpeg, "-hide_banner", "-nostdin", "-v", "error"]
+
+    pts = cached_timestamp(path, stamp)
+    if pts is not None:
+        result = _run(
+            base + ["-ss", f"{pts + _SEEK_EPSILON:.6f}", "-noaccurate_seek", "-i", path]
+            + _output_args(max_size, codec, []),
+            timeout,
+        )
+        if result is not None:
+            return result.stdout
+
+    # showinfo reports the timestamp of the frame the thumbnail filter kept
+    result = _run(
+        [ffmpeg, "-hide_banner", "-nostdin", "-v", "info", "-skip_frame", "nokey", "-i", path]
+        + _output_args(max_size, codec, [f"thumbnail=n={KEYFRAMES}", "showinfo"]),
+        timeout,
+    )
+    if result is not None:
+        match = _PTS_RE.search(result.stderr.decode(errors="replace"))
+        if match:
+            _store_timestamp(path, stamp, max(0.0, float(match.group(1))))
+        return result.stdout
+
+    # Streams the keyframe pass cannot handle: plain first frame
+    result = _run(base + ["-i", path] + _output_args(max_size, codec, []), timeout)
+    return result.stdout if result is not None else None
+
+
+def save_frame(path, dest, max_size=None, timeout=30):
+    """Write a representative frame of `path` to dest (JPEG for .jpg/.jpeg,
+    PNG otherwise). Returns True on success."""
+    jpeg = os.path.splitext(dest)[1].lower() in (".jpg", ".jpeg")
+    data = extract_frame(path, max_size, "mjpeg" if jpeg else "png", timeout)
+    if data is None:
+        return False
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract a representative frame of a video")
+    parser.add_argument("video")
+    parser.add_argument("output", help="image to write (.jpg/.jpeg for JPEG, PNG otherwise)")
+    parser.add_argument("--max-size", type=int, default=None, help="fit the frame in N x N pixels")
+    args = parser.parse_args()
+    if not save_frame(args.video, args.output, args.max_size):
+        print(f"[video_frames] could not extract a frame from {args.video}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+#!/usr/bin/env -S\_/bin/sh\_-c\_"source\_\$(eval\_echo\_\${INIR_VENV:-\$ILLOGICAL_IMPULSE_VIRTUAL_ENV})/bin/activate&&exec\_python\_-E\_"\$0"\_"\$@""
+"""
+Index of per-wallpaper color features, built in the background.
+
+Picking a wallpaper used to decode the full image at switch time just to
+downscale it to 128px, quantize it and run the auto-scheme statistics. The
+indexer does that ahead of time for whole wallpaper directories and keeps,
+per image:
+
+  - an 8x8x8 RGB histogram of the downscaled image (512 x uint16)
+  - the QuantizeCelebi result and the Score-ranked seed colors
+  - colorfulness / saturation / hue spread and the auto scheme they select
+  - the least busy region for the default widget placement
+    (least_busy_region.py defaults: 1920x1080 fill, 300x200, stride 10)
+
+Rows live in one SQLite file, keyed by path and refreshed when the file's
+(mtime, size) changes, so re-running over a directory only touches new or
+edited images.
+
+    wallpaper_index.py index [--workers N] DIR...   refresh the index
+    wallpaper_index.py query PATH...                 print indexed features (JSON lines)
+
+generate_colors_material.py --path and scheme_for_image.py read it through
+lookup() and skip decoding on a hit.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+# Bump when the stored features change meaning; older rows are recomputed.
+INDEX_VERSION = 2
+DEFAULT_BITMAP_SIZE = 128
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".avif", ".bmp", ".gif"}
+
+# Matches least_busy_region.py's CLI defaults (the clock widget's request).
+LEAST_BUSY_DEFAULTS = {
+    "screen_width": 1920,
+    "screen_height": 1080,
+    "region_width": 300,
+    "region_height": 200,
+    "stride": 10,
+    "horizontal_padding": 50,
+    "vertical_padding": 50,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallpapers (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    bitmap_size INTEGER NOT NULL,
+    image_info TEXT NOT NULL,
+    histogram BLOB NOT NULL,
+    quantized TEXT NOT NULL,
+    seeds TEXT NOT NULL,
+    colorfulness REAL,
+    saturation REAL,
+    hue_spread REAL,
+    scheme TEXT NOT NULL,
+    least_busy TEXT
+)
+"""
+
+
+def default_index_path() -> str:
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+    return os.path.join(state_home, "quickshell", "user", "generated", "wallpaper-index.sqlite")
+
+
+def _connect(index_path, readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True, timeout=1.0)
+    else:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        conn = sqlite3.connect(index_path, timeout=10.0)
+        # Readers (switchwall) must not block on a running indexer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _row_to_features(row) -> dict:
+    return {
+        "path": row["path"],
+        "image_info": json.loads(row["image_info"]),
+        "histogram": list(memoryview(row["histogram"]).cast("H")),
+        "quantized": json.loads(row["quantized"]),
+        "seeds": json.loads(row["seeds"]),
+        "colorfulness": row["colorfulness"],
+        "saturation": row["saturation"],
+        "hue_spread": row["hue_spread"],
+        "scheme": row["scheme"],
+        "least_busy": json.loads(row["least_busy"]) if row["least_busy"] else None,
+    }
+
+
+def lookup(path, bitmap_size=DEFAULT_BITMAP_SIZE, index_path=None):
+    """Indexed features for `path`, or None if it is missing or stale."""
+    index_path = index_path or default_index_path()
+    if not os.path.isfile(index_path):
+        return None
+    path = os.path.abspath(path)
+    try:
+        st = os.stat(path)
+        conn = _connect(index_path, readonly=True)
+        try:
+            row = conn.execute(
+                "SELECT * FROM wallpapers WHERE path = ? AND mtime_ns = ? AND size = ?"
+                " AND version = ? AND bitmap_size = ?",
+                (path, st.st_mtime_ns, st.st_size, INDEX_VERSION, bitmap_size),
+            ).fetchone()
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        return None
+    return _row_to_features(row) if row is not None else None
+
+
+def _least_busy_region(path):
+    """Default-placement least busy region, or None when OpenCV is unavailable."""
+    images_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+    if images_dir not in sys.path:
+        sys.path.insert(0, images_dir)
+    try:
+        import least_busy_region
+    except ImportError:
+        return None
+    d = LEAST_BUSY_DEFAULTS
+    try:
+        (x, y), variance = least_busy_region.find_least_busy_region(
+            path,
+            region_width=d["region_width"],
+            region_height=d["region_height"],
+            screen_width=d["screen_width"],
+            screen_height=d["screen_height"],
+            stride=d["stride"],
+            horizontal_padding=d["horizontal_padding"],
+            vertical_padding=d["vertical_padding"],
+        )
+    except (FileNotFoundError, ValueError):
+        return None
+    return {
+        "screen": [d["screen_width"], d["screen_height"]],
+        "x": int(x),
+        "y": int(y),
+        "width": d["region_width"],
+        "height": d["region_height"],
+        "variance": float(variance) if variance is not None else None,
+    }
+
+
+def compute_features(path, bitmap_size=DEFAULT_BITMAP_SIZE) -> dict:
+    """Decode one wallpaper and compute everything the index stores.
+
+    Uses generate_colors_material's own loading/quantization so indexed seeds
+    and schemes are exactly what a live run would produce."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import numpy as np
+    import generate_colors_material as gcm
+
+    image, image_info, _ = gcm.load_seed_image(path, bitmap_size)
+    stats = gcm.image_scheme_stats(image)
+    scheme = gcm.pick_scheme(*stats) if stats is not None else "scheme-tonal-spot"
+    colors = gcm.QuantizeCelebi(list(image.getdata()), 128)
+    seeds = gcm.Score.score(colors)
+
+    rgb = np.asarray(image.convert("RGB"), dtype=np.uint8) >> 5
+    bins = (rgb[..., 0].astype(np.int32) << 6) | (rgb[..., 1] << 3) | rgb[..., 2]
+    histogram = np.bincount(bins.ravel(), minlength=512).astype(np.uint16)
+
+    return {
+        "image_info": list(image_info),
+        "histogram": histogram.tobytes(),
+        "quantized": sorted(([int(c), int(n)] for c, n in colors.items()), key=lambda p: -p[1]),
+        "seeds": [int(c) for c in seeds],
+        "colorfulness": stats[0] if stats else None,
+        "saturation": stats[1] if stats else None,
+        "hue_spread": stats[2] if stats else None,
+        "scheme": scheme,
+        "least_busy": _least_busy_region(path),
+    }
+
+
+def _compute_job(job):
+    path, bitmap_size = job
+    try:
+        return path, compute_features(path, bitmap_size), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _scan(directories):
+    for directory in directories:
+        for root, dirs, files in os.walk(os.path.expanduser(directory)):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+def build_index(directories, index_path=None, bitmap_size=DEFAULT_BITMAP_SIZE, workers=1):
+    """Refresh the index for every image under `directories`.
+
+    Returns (indexed, unchanged, removed, failed) counts."""
+    index_path = index_path or default_index_path()
+    conn = _connect(index_path)
+    known = {
+        row["path"]: (row["mtime_ns"], row["size"], row["version"], row["bitmap_size"])
+        for row in conn.execute("SELECT path, mtime_ns, size, version, bitmap_size FROM wallpapers")
+    }
+
+    pending = {}
+    unchanged = 0
+    for path in _scan(directories):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamp = (st.st_mtime_ns, st.st_size, INDEX_VERSION, bitmap_size)
+        if known.get(path) == stamp:
+            unchanged += 1
+            continue
+        pending[path] = stamp
+
+    indexed = 0
+    failed = 0
+    jobs = [(path, bitmap_size) for path in pending]
+    if workers > 1 and len(jobs) > 1:
+        from multiprocessing import Pool
+
+        with Pool(workers) as pool:
+            results = pool.imap_unordered(_compute_job, jobs)
+            indexed, failed = _store_results(conn, pending, results)
+    else:
+        indexed, failed = _store_results(conn, pending, map(_compute_job, jobs))
+
+    # Forget images that were deleted since they were indexed
+    removed = 0
+    for path in known:
+        if not os.path.exists(path):
+            conn.execute("DELETE FROM wallpapers WHERE path = ?", (path,))
+            removed += 1
+    conn.commit()
+    conn.close()
+    return indexed, unchanged, removed, failed
+
+
+def _store_results(conn, pending, results):
+    indexed = 0
+    failed = 0
+    for path, features, error in results:
+        if features is None:
+            print(f"[wallpaper-index] {path}: {error}", file=sys.stderr)
+            failed += 1
+            continue
+        mtime_ns, size, version, bitmap_size = pending[path]
+        conn.execute(
+            "INSERT OR REPLACE INTO wallpapers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                mtime_ns,
+                size,
+                version,
+                bitmap_size,
+                json.dumps(features["image_info"]),
+                features["histogram"],
+                json.dumps(features["quantized"]),
+                json.dumps(features["seeds"]),
+                features["colorfulness"],
+                features["saturation"],
+                features["hue_spread"],
+                features["scheme"],
+                json.dumps(features["least_busy"]) if features["least_busy"] else None,
+            ),
+        )
+        indexed += 1
+        # Commit in small batches so readers see progress on big directories
+        if indexed % 16 == 0:
+            conn.commit()
+    return indexed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-compute wallpaper color features")
+    parser.add_argument("--index", default=None, help="index file (default: state dir)")
+    parser.add_argument(
+        "--size", type=int, default=DEFAULT_BITMAP_SIZE, help="bitmap size used for seed extraction"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_cmd = sub.add_parser("index", help="index or refresh wallpaper directories")
+    index_cmd.add_argument("directories", nargs="+")
+    index_cmd.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    query_cmd = sub.add_parser("query", help="print indexed features for images")
+    query_cmd.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        try:
+            # Background job: stay out of the way of the compositor and shell
+            os.nice(10)
+        except OSError:
+            pass
+        indexed, unchanged, removed, failed = build_index(
+            args.directories, args.index, args.size, max(1, args.workers)
+        )
+        print(
+            f"[wallpaper-index] {indexed} indexed, {unchanged} unchanged, "
+            f"{removed} removed, {failed} failed",
+            file=sys.stderr,
+        )
+        raise SystemExit(1 if failed and not (indexed or unchanged) else 0)
+
+    missing = False
+    for path in args.paths:
+        features = lookup(path, args.size, args.index)
+        if features is None:
+            missing = True
+            print(json.dumps({"path": os.path.abspath(path), "indexed": False}))
+            continue
+        features.pop("histogram")
+        features["indexed"] = True
+        print(json.dumps(features))
+    raise SystemExit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
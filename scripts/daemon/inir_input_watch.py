@@ -0,0 +1,73 @@
+"""
+Hotplug discovery of /dev/input event nodes, shared by the input daemons
+(inir_super_overview_daemon.py, keyboard_lock_state_daemon.py).
+
+InputDirWatcher reports event* nodes through inotify, so a daemon wakes up
+only when input hardware changes. Where inotify is unavailable the daemons
+fall back to rescanning every RESCAN_SEC seconds.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+
+INPUT_DIR = "/dev/input"
+# udev creates the node first and fixes its permissions right after
+HOTPLUG_SETTLE_SEC = 0.5
+# Only used where inotify is unavailable
+RESCAN_SEC = 5
+
+_IN_ATTRIB = 0x00000004
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class InputDirWatcher:
+    """inotify on /dev/input: calls on_change(path) when an event* node is
+    created or changes permissions and on_remove(path) when it goes away
+    (on_change when on_remove is None). Raises OSError where inotify is
+    unavailable."""
+
+    def __init__(self, on_change, on_remove=None, path=INPUT_DIR):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_CREATE | _IN_DELETE | _IN_ATTRIB | _IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch {path} failed")
+        self.path = path
+        self.on_change = on_change
+        self.on_remove = on_remove or on_change
+        asyncio.get_running_loop().add_reader(self.fd, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            _, mask, _, name_len = _INOTIFY_EVENT.unpack_from(data, offset)
+            name_start = offset + _INOTIFY_EVENT.size
+            name = os.fsdecode(data[name_start:name_start + name_len].rstrip(b"\0"))
+            offset = name_start + name_len
+            if not name.startswith("event"):
+                continue
+            node = os.path.join(self.path, name)
+            if mask & _IN_DELETE:
+                self.on_remove(node)
+            else:
+                self.on_change(node)
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.fd)
+        os.close(self.fd)
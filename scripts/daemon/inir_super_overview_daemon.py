@@ -3,11 +3,17 @@
 import asyncio
 import os
 import shutil
+import socket
+import struct
 import subprocess
+import sys
 import time
 
 from evdev import InputDevice, categorize, ecodes, list_devices
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inir_input_watch import HOTPLUG_SETTLE_SEC, RESCAN_SEC, InputDirWatcher  # noqa: E402
+
 SUPER_CODES = {ecodes.KEY_LEFTMETA, ecodes.KEY_RIGHTMETA}
 
 POINTER_BUTTON_CODES = {
@@ -33,6 +39,76 @@ tap_handled = False
 INIR_ENV_CACHE = {}
 INIR_ENV_PID = None
 
+# Tap-to-toggle latency and socket (re)connects; off by default
+DEBUG = os.environ.get("INIR_SUPER_DAEMON_DEBUG") == "1"
+
+
+def debug(message):
+    if DEBUG:
+        print(f"[inir-super-daemon] {message}", flush=True)
+
+
+def overview_socket_path():
+    """Line-based overview socket the shell listens on (see shell.qml)."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, "inir", "overview.sock")
+
+
+class OverviewChannel:
+    """Connection to the shell's overview socket, kept open across taps.
+
+    The shell PID comes from the socket peer credentials; the connection is
+    dropped and re-established when that PID disappears or a write fails, so
+    a tap never scans /proc or spawns a process while the shell is up.
+    """
+
+    def __init__(self):
+        self.sock = None
+        self.pid = None
+
+    async def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC)
+        sock.setblocking(False)
+        try:
+            await asyncio.get_running_loop().sock_connect(sock, overview_socket_path())
+            creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.pid = struct.unpack("3i", creds)[0]
+        debug(f"Connected to overview socket of inir pid={self.pid}")
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.pid = None
+
+    async def send(self, command):
+        """Send one command line; returns False when the shell is unreachable."""
+        message = f"{command}\n".encode()
+        for _ in range(2):
+            if self.sock is not None and not os.path.exists(f"/proc/{self.pid}"):
+                self.close()
+            if self.sock is None:
+                try:
+                    await self._connect()
+                except OSError as e:
+                    debug(f"Overview socket unavailable: {e}")
+                    return False
+            try:
+                # A short line on a local socket never fills the send buffer
+                self.sock.send(message)
+                return True
+            except OSError:
+                # Shell restarted behind the cached connection
+                self.close()
+        return False
+
+
+overview_channel = OverviewChannel()
+
 
 def _find_inir_pid():
     """Locate the PID of the running iNiR quickshell process by inspecting /proc.
@@ -118,47 +194,99 @@ def get_inir_env():
         return {}
 
 
-def find_keyboard_devices():
-    keyboards = []
-    pointers = []
-    for path in list_devices():
+def probe_device(path):
+    """Open `path` and classify it once: returns (dev, "keyboard" | "pointer")
+    for devices worth monitoring, (None, None) for the rest. Raises OSError
+    when the node cannot be opened (yet)."""
+    dev = InputDevice(path)
+    try:
+        caps = dev.capabilities().get(ecodes.EV_KEY, [])
+    except OSError:
+        dev.close()
+        raise
+
+    name = (dev.name or "").lower()
+
+    # Ignore clearly virtual devices (ydotoold, etc.) to avoid echo.
+    if "ydotool" in name or "virtual" in name:
+        dev.close()
+        return None, None
+
+    # A keyboard monitor already counts clicks on the same device as interaction
+    if any(code in SUPER_CODES for code in caps):
+        print(f"[inir-super-daemon] Using keyboard device {path} ({dev.name})", flush=True)
+        return dev, "keyboard"
+    if any(code in POINTER_BUTTON_CODES for code in caps):
+        print(f"[inir-super-daemon] Using pointer device {path} ({dev.name})", flush=True)
+        return dev, "pointer"
+
+    dev.close()
+    return None, None
+
+
+class DeviceSupervisor:
+    """Monitors one task per keyboard/pointer node. Nodes are probed once
+    (non-matching ones are remembered) and monitors only start or stop on
+    hotplug, so the daemon sleeps while the input hardware stays the same."""
+
+    def __init__(self):
+        self.tasks = {}
+        # path -> role ("keyboard" / "pointer"), None for nodes not monitored
+        self.known = {}
+        self._pending = {}
+
+    def adopt(self, path):
+        self._pending.pop(path, None)
+        if path in self.known:
+            return
         try:
-            dev = InputDevice(path)
-            caps = dev.capabilities().get(ecodes.EV_KEY, [])
-        except Exception as e:
+            dev, role = probe_device(path)
+        except OSError as e:
+            # Usually permissions udev has not applied yet; retried on IN_ATTRIB
             print(f"[inir-super-daemon] Error inspecting {path}: {e}", flush=True)
-            continue
-
-        name = (dev.name or "").lower()
-
-        # Ignore clearly virtual devices (ydotoold, etc.) to avoid echo.
-        if "ydotool" in name or "virtual" in name:
-            continue
-
-        has_super = any(code in SUPER_CODES for code in caps)
-        has_pointer_button = any(code in POINTER_BUTTON_CODES for code in caps)
-
-        if has_super:
-            print(
-                f"[inir-super-daemon] Using keyboard device {path} ({dev.name}), has_super={has_super}",
-                flush=True,
-            )
-            keyboards.append(path)
-
-        if has_pointer_button:
-            print(
-                f"[inir-super-daemon] Using pointer device {path} ({dev.name}), has_pointer_button={has_pointer_button}",
-                flush=True,
-            )
-            pointers.append(path)
-
-    if not keyboards:
-        print("[inir-super-daemon] No suitable keyboard devices found", flush=True)
-
-    return keyboards, pointers
-
-
-async def monitor_device(path):
+            return
+        self.known[path] = role
+        if dev is None:
+            return
+        monitor = monitor_device if role == "keyboard" else monitor_pointer_device
+        task = asyncio.create_task(monitor(dev))
+        task.add_done_callback(lambda _task, path=path: self._monitor_done(path, _task))
+        self.tasks[path] = task
+
+    def _monitor_done(self, path, task):
+        # Device vanished (unplug, suspend/resume): forget it so the node is
+        # probed again if it comes back
+        if self.tasks.get(path) is task:
+            del self.tasks[path]
+            self.known.pop(path, None)
+
+    def schedule(self, path):
+        handle = self._pending.pop(path, None)
+        if handle is not None:
+            handle.cancel()
+        self._pending[path] = asyncio.get_running_loop().call_later(HOTPLUG_SETTLE_SEC, self.adopt, path)
+
+    def remove(self, path):
+        handle = self._pending.pop(path, None)
+        if handle is not None:
+            handle.cancel()
+        self.known.pop(path, None)
+        task = self.tasks.pop(path, None)
+        if task is not None:
+            task.cancel()
+
+    def scan(self):
+        present = set(list_devices())
+        for path in [path for path in self.known if path not in present]:
+            self.remove(path)
+        for path in sorted(present):
+            self.adopt(path)
+
+    def has_keyboard(self):
+        return "keyboard" in self.known.values()
+
+
+async def monitor_device(dev):
     global \
         super_down_global, \
         interaction_since_super_down, \
@@ -168,7 +296,6 @@ async def monitor_device(path):
     chord = False
 
     try:
-        dev = InputDevice(path)
         async for event in dev.async_read_loop():
             if event.type != ecodes.EV_KEY:
                 continue
@@ -201,6 +328,19 @@ async def monitor_device(path):
                                 "[inir-super-daemon] Super tap detected, toggling inir overview",
                                 flush=True,
                             )
+                            started = time.perf_counter()
+                            if await overview_channel.send("toggle"):
+                                debug(
+                                    f"Toggle sent {(time.perf_counter() - started) * 1000:.2f} ms after the tap was read, "
+                                    f"{(time.time() - event.timestamp()) * 1000:.2f} ms after key release"
+                                )
+                                super_down = False
+                                chord = False
+                                super_down_global = False
+                                interaction_since_super_down = False
+                                continue
+
+                            # Shell without the overview socket: go through the launcher
                             try:
                                 inir_env = get_inir_env()
                                 if not inir_env:
@@ -247,15 +387,16 @@ async def monitor_device(path):
         return
     except OSError:
         # Device vanished (unplug, suspend/resume). Returning lets the supervisor
-        # in main() re-adopt it on the next rescan instead of killing the daemon.
+        # re-adopt the node when it reappears instead of killing the daemon.
         return
+    finally:
+        dev.close()
 
 
-async def monitor_pointer_device(path):
+async def monitor_pointer_device(dev):
     global interaction_since_super_down
 
     try:
-        dev = InputDevice(path)
         async for event in dev.async_read_loop():
             if event.type != ecodes.EV_KEY:
                 continue
@@ -271,37 +412,31 @@ async def monitor_pointer_device(path):
         return
     except OSError:
         return
+    finally:
+        dev.close()
 
 
 async def main():
-    # Retry keyboard detection until we have at least one device with Super,
-    # so the service still works if it starts before the session is fully up.
-    keyboard_paths = []
-    while not keyboard_paths:
-        keyboard_paths, _ = find_keyboard_devices()
-        if keyboard_paths:
-            break
-        print(
-            "[inir-super-daemon] No keyboards with Super yet, retrying in 5s",
-            flush=True,
-        )
-        await asyncio.sleep(5)
-
-    # Supervise: a monitor returns when its device disappears, so rescan on a
-    # tick and (re)adopt anything unmonitored. Without this, unplugging a
-    # keyboard left the daemon alive but deaf, and one plugged in after startup
-    # was never watched at all.
-    tasks = {}
+    # Keyboards plugged in (or made readable) after startup are picked up by
+    # the hotplug watcher, so the service works even if it starts before the
+    # session is fully up.
+    supervisor = DeviceSupervisor()
+    try:
+        # Watch before the first scan so nothing plugged in between is missed
+        watcher = InputDirWatcher(supervisor.schedule, supervisor.remove)
+    except (OSError, AttributeError) as e:
+        print(f"[inir-super-daemon] inotify unavailable ({e}), rescanning every {RESCAN_SEC}s", flush=True)
+        watcher = None
+
+    supervisor.scan()
+    if not supervisor.has_keyboard():
+        print("[inir-super-daemon] No keyboards with Super yet, waiting for hotplug", flush=True)
+
+    if watcher is not None:
+        await asyncio.get_running_loop().create_future()
     while True:
-        keyboard_paths, pointer_paths = find_keyboard_devices()
-        for path, monitor in [
-            *((p, monitor_device) for p in keyboard_paths),
-            *((p, monitor_pointer_device) for p in pointer_paths),
-        ]:
-            task = tasks.get(path)
-            if task is None or task.done():
-                tasks[path] = asyncio.create_task(monitor(path))
-        await asyncio.sleep(5)
+        await asyncio.sleep(RESCAN_SEC)
+        supervisor.scan()
 
 
 if __name__ == "__main__":
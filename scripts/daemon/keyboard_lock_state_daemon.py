@@ -1,22 +1,52 @@
 #!/usr/bin/env python3
+"""
+Caps/Num Lock state of all keyboards, printed as JSON lines for
+services/KeyboardIndicators.qml.
+
+LED state is read once per keyboard with an ioctl (dev.leds()) when it is
+attached. After that, the EV_LED events each keyboard reports carry the new
+values. Events are coalesced, so a toggle echoed by N keyboards produces one
+aggregated state line. Keyboards are re-probed only when inotify reports
+changes in /dev/input, with a periodic rescan where inotify is unavailable.
+"""
 
 import argparse
 import asyncio
 import json
+import os
 import sys
+import time
 
 from evdev import InputDevice, ecodes, list_devices
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inir_input_watch import HOTPLUG_SETTLE_SEC, RESCAN_SEC, InputDirWatcher  # noqa: E402
+
 IGNORED_NAME_PARTS = ("ydotool", "virtual")
 RELEVANT_KEY_CODES = {ecodes.KEY_CAPSLOCK, ecodes.KEY_NUMLOCK}
 RELEVANT_LED_CODES = {ecodes.LED_CAPSL, ecodes.LED_NUML}
+LED_FIELDS = {ecodes.LED_CAPSL: "caps", ecodes.LED_NUML: "num"}
+# Window in which LED events from all keyboards are merged into one state line
+COALESCE_DELAY = 0.01
+# Lock key released without any EV_LED echo this long after the press: ask the
+# devices directly (keyboards that never report their LEDs)
+LED_ECHO_TIMEOUT = 0.03
 
 
 class KeyboardLockMonitor:
     def __init__(self):
         self.devices = {}
         self.tasks = {}
+        # path -> {"caps": bool, "num": bool}, kept current from EV_LED events
+        self.led_states = {}
+        # Paths probed as non-keyboards; not reopened on every hotplug event
+        self.rejected = set()
         self.last_state = None
+        self._emit_handle = None
+        self._refresh_handle = None
+        self._refresh_task = None
+        self._key_pressed_at = 0.0
+        self._led_event_at = 0.0
 
     def _is_candidate(self, dev):
         name = (dev.name or "").lower()
@@ -38,18 +68,17 @@ class KeyboardLockMonitor:
             return previous if previous is not None else False
         return true_count > false_count
 
-    def _snapshot(self):
-        caps_values = []
-        num_values = []
-
-        for dev in self.devices.values():
-            try:
-                active_leds = set(dev.leds())
-            except OSError:
-                continue
+    def _read_leds(self, path):
+        try:
+            active_leds = set(self.devices[path].leds())
+        except OSError:
+            self.led_states.pop(path, None)
+            return
+        self.led_states[path] = {field: code in active_leds for code, field in LED_FIELDS.items()}
 
-            caps_values.append(ecodes.LED_CAPSL in active_leds)
-            num_values.append(ecodes.LED_NUML in active_leds)
+    def _snapshot(self):
+        caps_values = [state["caps"] for state in self.led_states.values()]
+        num_values = [state["num"] for state in self.led_states.values()]
 
         if not caps_values and not num_values:
             return None
@@ -63,6 +92,9 @@ class KeyboardLockMonitor:
         }
 
     async def emit_state(self, force=False):
+        self._emit(force)
+
+    def _emit(self, force=False):
         state = self._snapshot()
         if state is None:
             return
@@ -72,57 +104,103 @@ class KeyboardLockMonitor:
             print(json.dumps({"type": "state", **state}), flush=True)
         self.last_state = next_state
 
-    async def refresh_devices(self):
-        discovered = {}
-        for path in list_devices():
+    def _schedule_emit(self):
+        if self._emit_handle is None:
+            self._emit_handle = asyncio.get_running_loop().call_later(COALESCE_DELAY, self._flush_emit)
+
+    def _flush_emit(self):
+        self._emit_handle = None
+        self._emit()
+
+    def _schedule_refresh(self):
+        # inotify reports several events per hotplug; probe once they settle
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+        self._refresh_handle = asyncio.get_running_loop().call_later(HOTPLUG_SETTLE_SEC, self._hotplug_refresh)
+
+    def _hotplug_refresh(self):
+        self._refresh_handle = None
+        self._refresh_task = asyncio.create_task(self.refresh_devices(emit=True))
+
+    def _verify_led_echo(self, pressed_at):
+        if self._led_event_at >= pressed_at:
+            return
+        for path in list(self.devices):
+            self._read_leds(path)
+        self._emit()
+
+    def _remove_device(self, path):
+        task = self.tasks.pop(path, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        dev = self.devices.pop(path, None)
+        if dev is not None:
             try:
-                dev = InputDevice(path)
+                dev.close()
             except OSError:
-                continue
+                pass
+        self.led_states.pop(path, None)
 
+    async def refresh_devices(self, emit=False):
+        present = set(list_devices())
+        self.rejected &= present
+        changed = False
+
+        for path in [path for path in self.devices if path not in present]:
+            self._remove_device(path)
+            changed = True
+
+        for path in present:
+            if path in self.devices or path in self.rejected:
+                continue
             try:
-                if not self._is_candidate(dev):
-                    dev.close()
-                    continue
+                dev = InputDevice(path)
             except OSError:
-                dev.close()
+                # Usually permissions udev has not applied yet; retried on IN_ATTRIB
                 continue
 
-            discovered[path] = dev
-
-        removed_paths = [path for path in self.devices.keys() if path not in discovered]
-        for path in removed_paths:
-            task = self.tasks.pop(path, None)
-            if task is not None:
-                task.cancel()
             try:
-                self.devices[path].close()
+                candidate = self._is_candidate(dev)
             except OSError:
-                pass
-            self.devices.pop(path, None)
-
-        for path, dev in discovered.items():
-            if path in self.devices:
+                dev.close()
+                continue
+            if not candidate:
+                self.rejected.add(path)
                 dev.close()
                 continue
 
             self.devices[path] = dev
+            self._read_leds(path)
             self.tasks[path] = asyncio.create_task(self.monitor_device(path))
+            changed = True
+
+        if emit and changed:
+            self._emit()
 
     async def monitor_device(self, path):
         dev = self.devices[path]
+        loop = asyncio.get_running_loop()
         try:
             async for event in dev.async_read_loop():
                 if event.type == ecodes.EV_LED and event.code in RELEVANT_LED_CODES:
-                    await self.emit_state()
+                    self._led_event_at = time.monotonic()
+                    state = self.led_states.setdefault(path, {"caps": False, "num": False})
+                    state[LED_FIELDS[event.code]] = bool(event.value)
+                    self._schedule_emit()
                     continue
 
-                if event.type == ecodes.EV_KEY and event.code in RELEVANT_KEY_CODES and event.value == 0:
-                    await asyncio.sleep(0.03)
-                    await self.emit_state()
+                if event.type == ecodes.EV_KEY and event.code in RELEVANT_KEY_CODES:
+                    if event.value == 1:
+                        self._key_pressed_at = time.monotonic()
+                    elif event.value == 0:
+                        loop.call_later(LED_ECHO_TIMEOUT, self._verify_led_echo, self._key_pressed_at)
         except asyncio.CancelledError:
             return
         except OSError:
+            # Unplugged (ENODEV); drop it now rather than on the next rescan
+            if self.devices.get(path) is dev:
+                self._remove_device(path)
+                self._schedule_emit()
             return
 
     async def run(self):
@@ -132,11 +210,20 @@ class KeyboardLockMonitor:
 
         await self.emit_state(force=True)
 
-        while True:
-            await asyncio.sleep(5)
-            await self.refresh_devices()
-            if self.devices:
-                await self.emit_state()
+        try:
+            watcher = InputDirWatcher(lambda _path: self._schedule_refresh())
+        except (OSError, AttributeError):
+            watcher = None
+        try:
+            if watcher is not None:
+                # Hotplug is handled by the watcher callbacks from here on
+                await asyncio.get_running_loop().create_future()
+            while True:
+                await asyncio.sleep(RESCAN_SEC)
+                await self.refresh_devices(emit=True)
+        finally:
+            if watcher is not None:
+                watcher.close()
 
     async def run_once(self):
         await self.refresh_devices()
@@ -147,6 +234,9 @@ class KeyboardLockMonitor:
         return 0
 
     async def close(self):
+        for handle in (self._emit_handle, self._refresh_handle):
+            if handle is not None:
+                handle.cancel()
         for task in self.tasks.values():
             task.cancel()
         for task in list(self.tasks.values()):
@@ -1,7 +1,33 @@
 #!/usr/bin/env python3
+"""
+Temperature sensor discovery for the resource monitor.
+
+Without arguments, prints the best CPU and GPU temperature inputs as
+`cpu:<path>` / `gpu:<path>` lines. Scoring every hwmon/thermal input means a
+glob plus dozens of opens, so the chosen paths are cached in
+$XDG_CACHE_HOME/inir/sensors.json together with the hwmon and thermal zone
+device set they were picked from, and only re-resolved when that set changes.
+
+--watch keeps the chosen inputs open and reads them with os.pread every
+--interval seconds, printing one JSON line per tick ({"cpu": 45.0, "gpu": 51.0},
+degrees Celsius; missing or suspended sensors are left out). The device set is
+re-checked every TOPOLOGY_CHECK_INTERVAL seconds or after a failed read; an
+input that keeps failing is re-scored at most once per interval.
+"""
+import argparse
 import glob
+import json
 import os
 import sys
+import time
+
+HWMON_ROOT = "/sys/class/hwmon"
+THERMAL_ROOT = "/sys/class/thermal"
+CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "inir", "sensors.json"
+)
+# Seconds between device set checks in --watch (a listdir and readlinks)
+TOPOLOGY_CHECK_INTERVAL = 30.0
 
 
 def get_content(path):
@@ -79,13 +105,15 @@ def find_best_temp_input(hwmon_path):
     return best_path
 
 
-def detect():
+def resolve_topology():
+    """Score all hwmon and thermal zone inputs; returns {"cpu": path, "gpu": path}
+    with unresolved sensors set to None."""
     cpu_path = None
     gpu_path = None
 
     # 1. Scan HWMON (Preferred)
     # Sort to ensure consistent order, though we check all
-    hwmon_dirs = sorted(glob.glob("/sys/class/hwmon/hwmon*"))
+    hwmon_dirs = sorted(glob.glob(os.path.join(HWMON_ROOT, "hwmon*")))
 
     for hwmon in hwmon_dirs:
         name = get_content(os.path.join(hwmon, "name"))
@@ -154,7 +182,7 @@ def detect():
 
     # 2. Fallback to Thermal Zones (if missing)
     if not cpu_path or not gpu_path:
-        for tz in sorted(glob.glob("/sys/class/thermal/thermal_zone*")):
+        for tz in sorted(glob.glob(os.path.join(THERMAL_ROOT, "thermal_zone*"))):
             tz_type = get_content(os.path.join(tz, "type")).lower()
             temp_path = os.path.join(tz, "temp")
 
@@ -185,13 +213,181 @@ def detect():
             if not gpu_path and any(x in tz_type for x in gpu_tz_patterns):
                 gpu_path = temp_path
 
-    # Output results compatible with QML SplitParser
     # Resolve symlinks for FileView compatibility
-    if cpu_path:
-        print(f"cpu:{os.path.realpath(cpu_path)}")
-    if gpu_path:
-        print(f"gpu:{os.path.realpath(gpu_path)}")
+    return {
+        "cpu": os.path.realpath(cpu_path) if cpu_path else None,
+        "gpu": os.path.realpath(gpu_path) if gpu_path else None,
+    }
+
+
+def topology_signature():
+    """Sensor device set: every hwmon and thermal zone entry with the device
+    path it links to. Changes when drivers load, unload or get renumbered."""
+    signature = []
+    for root, prefix in ((HWMON_ROOT, "hwmon"), (THERMAL_ROOT, "thermal_zone")):
+        try:
+            entries = sorted(e for e in os.listdir(root) if e.startswith(prefix))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                target = os.readlink(os.path.join(root, entry))
+            except OSError:
+                target = ""
+            signature.append([entry, target])
+    return signature
+
+
+def load_topology(use_cache=True):
+    """Return (sensors, signature), reusing the cached sensors when the device
+    set did not change since they were resolved."""
+    signature = topology_signature()
+    cached = None
+    try:
+        with open(CACHE_PATH) as f:
+            cached = json.load(f)
+        if use_cache and cached.get("signature") == signature:
+            sensors = cached["sensors"]
+            if all(p is None or os.path.exists(p) for p in sensors.values()):
+                return sensors, signature
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    sensors = resolve_topology()
+    if cached == {"signature": signature, "sensors": sensors}:
+        return sensors, signature
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp = f"{CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"signature": signature, "sensors": sensors}, f)
+        os.replace(tmp, CACHE_PATH)
+    except OSError:
+        pass
+    return sensors, signature
+
+
+def _runtime_status_path(input_path):
+    # hwmon inputs of runtime-PM devices (hybrid dGPUs); reading the input
+    # itself would wake a suspended device
+    path = os.path.join(os.path.dirname(input_path), "device", "power", "runtime_status")
+    return path if os.path.exists(path) else None
+
+
+def open_sensors(sensors):
+    """Open the chosen inputs; returns {kind: (input_fd, runtime_status_fd or None)}."""
+    fds = {}
+    for kind, path in sensors.items():
+        if not path:
+            continue
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            continue
+        status_fd = None
+        status_path = _runtime_status_path(path)
+        if status_path:
+            try:
+                status_fd = os.open(status_path, os.O_RDONLY | os.O_CLOEXEC)
+            except OSError:
+                pass
+        fds[kind] = (fd, status_fd)
+    return fds
+
+
+def close_sensors(fds):
+    for fd, status_fd in fds.values():
+        for d in (fd, status_fd):
+            if d is not None:
+                try:
+                    os.close(d)
+                except OSError:
+                    pass
+
+
+def read_sensors(fds, kinds=None):
+    """One pread per open input (sysfs regenerates the value at offset 0).
+    Returns (sample, ok) where ok is False if any read failed."""
+    sample = {}
+    ok = True
+    for kind, (fd, status_fd) in fds.items():
+        if kinds is not None and kind not in kinds:
+            continue
+        try:
+            if status_fd is not None and os.pread(status_fd, 32, 0).strip() == b"suspended":
+                continue
+            sample[kind] = round(int(os.pread(fd, 32, 0)) / 1000, 1)
+        except (OSError, ValueError):
+            ok = False
+    return sample, ok
+
+
+class SensorWatcher:
+    """Chosen inputs kept open across reads; re-resolved when the device set
+    changes or a read fails. Also used by resource_sampler.py."""
+
+    def __init__(self, use_cache=True):
+        self.use_cache = use_cache
+        self.sensors, self.signature = load_topology(use_cache)
+        self.fds = open_sensors(self.sensors)
+        self.next_check = time.monotonic() + TOPOLOGY_CHECK_INTERVAL
+        # Earliest time a failed read may re-score the inputs again
+        self.next_rescore = 0.0
+
+    def read(self, kinds=None):
+        sample, ok = read_sensors(self.fds, kinds)
+        now = time.monotonic()
+        rescore = not ok and now >= self.next_rescore
+        if rescore or now >= self.next_check:
+            self.next_check = now + TOPOLOGY_CHECK_INTERVAL
+            current = topology_signature()
+            if rescore or current != self.signature:
+                close_sensors(self.fds)
+                # A failed read on an unchanged device set means the cached
+                # paths went bad; score the inputs again, but only once per
+                # interval for an input that keeps failing
+                if rescore and current == self.signature:
+                    self.next_rescore = now + TOPOLOGY_CHECK_INTERVAL
+                self.sensors, self.signature = load_topology(self.use_cache and current != self.signature)
+                self.fds = open_sensors(self.sensors)
+        return sample
+
+    def close(self):
+        close_sensors(self.fds)
+        self.fds = {}
+
+
+def watch(interval, use_cache=True):
+    watcher = SensorWatcher(use_cache)
+    try:
+        while True:
+            print(json.dumps(watcher.read()), flush=True)
+            time.sleep(interval)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        watcher.close()
+
+
+def detect(use_cache=True):
+    sensors, _ = load_topology(use_cache)
+    # Output results compatible with QML SplitParser
+    for kind in ("cpu", "gpu"):
+        if sensors.get(kind):
+            print(f"{kind}:{sensors[kind]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find CPU/GPU temperature sensors")
+    parser.add_argument("--watch", action="store_true", help="print readings as JSON lines")
+    parser.add_argument("--interval", type=float, default=3.0, help="seconds between --watch readings")
+    parser.add_argument("--no-cache", action="store_true", help="re-resolve the sensors, ignoring " + CACHE_PATH)
+    args = parser.parse_args()
+    if args.watch:
+        watch(max(0.1, args.interval), not args.no_cache)
+    else:
+        detect(not args.no_cache)
 
 
 if __name__ == "__main__":
-    detect()
+    main()
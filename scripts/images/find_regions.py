@@ -3,10 +3,22 @@
 import argparse
 import cv2
 import json
+import math
 import numpy as np
 import sys
 
 DEFAULT_IMAGE_PATH = '/tmp/quickshell/media/screenshot/image'
+# The default segmentation parameters were tuned on a 1080p screen at
+# --resize-factor 0.1, i.e. a working image of about 192x108 pixels
+AUTO_WORKING_PIXELS = 192 * 108
+
+def auto_resize_factor(image_width, image_height, screen_width=None, screen_height=None):
+    # Scale so the target screen maps to the tuned working size; a screenshot
+    # taken at a fractional/HiDPI scale is mapped through the screen's size
+    screen_width = screen_width or image_width
+    screen_height = screen_height or image_height
+    screen_factor = math.sqrt(AUTO_WORKING_PIXELS / float(screen_width * screen_height))
+    return min(1.0, screen_factor * screen_width / float(image_width))
 
 def iou(boxA, boxB):
     # Compute intersection over union for two boxes
@@ -23,23 +35,53 @@ def iou(boxA, boxB):
     return iou
 
 def non_max_suppression(regions, iou_threshold=0.7):
-    # Sort by area (largest first)
-    regions = sorted(regions, key=lambda r: r['width'] * r['height'], reverse=True)
+    # Greedy NMS, largest area first, vectorized over NumPy box arrays.
+    # IoU(A, B) <= area(B) / area(A) when B is smaller, so each kept region is
+    # only compared with the run of remaining (area-sorted) regions whose area
+    # is at least iou_threshold times its own; the rest cannot reach it.
+    if not regions:
+        return []
+    boxes = np.array([[r['x'], r['y'], r['width'], r['height']] for r in regions], dtype=np.int64)
+    areas = boxes[:, 2] * boxes[:, 3]
+    order = np.argsort(-areas, kind='stable')
+    x1 = boxes[order, 0]
+    y1 = boxes[order, 1]
+    x2 = x1 + boxes[order, 2]
+    y2 = y1 + boxes[order, 3]
+    areas = areas[order]
+    neg_areas = -areas
+    alive = np.ones(len(regions), dtype=bool)
     keep = []
-    while regions:
-        current = regions.pop(0)
-        keep.append(current)
-        regions = [r for r in regions if iou(current, r) < iou_threshold]
+    for i in range(len(regions)):
+        if not alive[i]:
+            continue
+        keep.append(regions[order[i]])
+        # One pixel of slack keeps float rounding from rejecting a real match
+        end = np.searchsorted(neg_areas, 1 - iou_threshold * areas[i], side='right')
+        if end <= i + 1:
+            continue
+        rest = slice(i + 1, end)
+        inter_w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        inter_h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = inter_w * inter_h
+        union = areas[i] + areas[rest] - inter
+        overlap = np.zeros(len(union))
+        np.divide(inter, union, out=overlap, where=union > 0)
+        alive[rest] &= overlap < iou_threshold
     return keep
 
-def find_regions(image_path, min_width, min_height, max_width=None, max_height=None, quality=False, k=150, min_size=20, sigma=0.8, resize_factor=1.0):
-    image = cv2.imread(image_path)
-    if image is None:
+def find_regions(image_path, min_width, min_height, max_width=None, max_height=None, quality=False, k=150, min_size=20, sigma=0.8, resize_factor=1.0, screen_size=None):
+    # resize_factor=None picks it from screen_size (width, height; defaults to the image size)
+    original = cv2.imread(image_path)
+    if original is None:
         print(f'Error: Could not load image {image_path}', file=sys.stderr)
         sys.exit(1)
-    orig_h, orig_w = image.shape[:2]
+    orig_h, orig_w = original.shape[:2]
+    if resize_factor is None:
+        resize_factor = auto_resize_factor(orig_w, orig_h, *(screen_size or (None, None)))
+    image = original
     if resize_factor != 1.0:
-        image = cv2.resize(image, (int(orig_w * resize_factor), int(orig_h * resize_factor)), interpolation=cv2.INTER_AREA)
+        image = cv2.resize(original, (int(orig_w * resize_factor), int(orig_h * resize_factor)), interpolation=cv2.INTER_AREA)
     ss = cv2.ximgproc.segmentation.createSelectiveSearchSegmentation()
     ss.setBaseImage(image)
     if quality:
@@ -63,7 +105,7 @@ def find_regions(image_path, min_width, min_height, max_width=None, max_height=N
                 regions.append({'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)})
     # Remove duplicates/overlaps
     regions = non_max_suppression(regions, iou_threshold=0.7)
-    return regions, cv2.imread(image_path)  # Return original image for drawing
+    return regions, original  # Decoded once; resizing made a copy, so it is still full size for drawing
 
 def draw_regions(image, regions, output_path):
     for region in regions:
@@ -91,6 +133,9 @@ def main():
     parser.add_argument('--min-size', type=int, default=50, help='Segmentation parameter min_size (default: 20)')
     parser.add_argument('--sigma', type=float, default=0.6, help='Segmentation parameter sigma (default: 0.8)')
     parser.add_argument('--resize-factor', type=float, default=0.1, help='Resize factor for input image before processing (default: 1.0, e.g. 0.5 for half size)')
+    parser.add_argument('--auto-resize', action='store_true', help='Pick the resize factor from the target screen resolution (overrides --resize-factor)')
+    parser.add_argument('--screen-width', type=int, help='Target screen width for --auto-resize (default: image width)')
+    parser.add_argument('--screen-height', type=int, help='Target screen height for --auto-resize (default: image height)')
     parser.add_argument('--hyprctl', action='store_true', help='Mimics hyprctl\'s window output, like {"at": [x, y], "size": [w, h]}')
     args = parser.parse_args()
 
@@ -104,7 +149,8 @@ def main():
         k=args.k,
         min_size=args.min_size,
         sigma=args.sigma,
-        resize_factor=args.resize_factor
+        resize_factor=None if args.auto_resize else args.resize_factor,
+        screen_size=(args.screen_width, args.screen_height)
     )
     if args.single and regions:
         largest = max(regions, key=lambda r: r['width'] * r['height'])
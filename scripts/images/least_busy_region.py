@@ -7,6 +7,8 @@ import cv2
 import numpy as np
 import argparse
 import json
+import sys
+import time
 
 def center_crop(img, target_w, target_h):
     h, w = img.shape[:2]
@@ -18,11 +20,68 @@ def center_crop(img, target_w, target_h):
     y2 = y1 + target_h
     return img[y1:y2, x1:x2]
 
-def find_least_busy_region(image_path, region_width=300, region_height=200, screen_width=None, screen_height=None, verbose=False, stride=2, screen_mode="fill", horizontal_padding=50, vertical_padding=50, busiest=False):
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise FileNotFoundError(f"Image not found: {image_path}")
-    orig_h, orig_w = img.shape
+def integral_images(arr):
+    """Zero-padded integral images of arr and arr**2 ((h+1) x (w+1))."""
+    integral = cv2.integral(arr, sdepth=cv2.CV_64F)
+    integral_sq = cv2.integral(arr**2, sdepth=cv2.CV_64F)
+    return integral, integral_sq
+
+def _span(positions, offset):
+    """Slice selecting positions + offset; positions is an arithmetic progression."""
+    step = int(positions[1] - positions[0]) if len(positions) > 1 else 1
+    start = int(positions[0]) + offset
+    return slice(start, start + step * (len(positions) - 1) + 1, step)
+
+def window_variance(integral, integral_sq, xs, ys, region_w, region_h):
+    """Variance of every region_w x region_h window at (xs[i], ys[j]).
+
+    xs and ys are evenly spaced window origins. Returns a len(ys) x len(xs)
+    array. Sums are taken with the same operation order as a scalar corner
+    lookup, so every value matches it bit for bit."""
+    x1, x2 = _span(xs, 0), _span(xs, region_w)
+    y1, y2 = _span(ys, 0), _span(ys, region_h)
+    area = region_w * region_h
+    s = integral[y2, x2] - integral[y2, x1] - integral[y1, x2] + integral[y1, x1]
+    s2 = integral_sq[y2, x2] - integral_sq[y2, x1] - integral_sq[y1, x2] + integral_sq[y1, x1]
+    mean = s / area
+    return (s2 / area) - (mean ** 2)
+
+def _window_positions(start, end, stride, region, limit):
+    """Stride grid of window origins whose far edge stays inside limit."""
+    positions = np.arange(start, end + 1, stride, dtype=np.intp)
+    return positions[positions + region - 1 < limit]
+
+def _pick_window(var, busiest):
+    """Row-major first minimum (or maximum) of a variance field."""
+    flat = np.argmax(var) if busiest else np.argmin(var)
+    return np.unravel_index(flat, var.shape)
+
+def _coarse_to_fine(integral, integral_sq, xs, ys, region_w, region_h, busiest, factor, candidates=8):
+    """Search every factor-th stride position, then the full stride grid around
+    the best coarse candidates. Much cheaper for stride 1, but may miss a
+    narrow optimum that falls between coarse samples."""
+    coarse = window_variance(integral, integral_sq, xs[::factor], ys[::factor], region_w, region_h)
+    scores = (-coarse if busiest else coarse).ravel()
+    candidates = min(candidates, scores.size)
+    shortlist = np.argpartition(scores, candidates - 1)[:candidates]
+    order = shortlist[np.lexsort((shortlist, scores[shortlist]))]
+    best = None
+    for flat in order:
+        cy, cx = np.unravel_index(flat, coarse.shape)
+        yi0, xi0 = max(0, cy * factor - factor + 1), max(0, cx * factor - factor + 1)
+        yi1, xi1 = min(len(ys), cy * factor + factor), min(len(xs), cx * factor + factor)
+        var = window_variance(integral, integral_sq, xs[xi0:xi1], ys[yi0:yi1], region_w, region_h)
+        yi, xi = _pick_window(var, busiest)
+        value = var[yi, xi]
+        key = (-value if busiest else value, yi0 + yi, xi0 + xi)
+        if best is None or key < best[0]:
+            best = (key, yi0 + yi, xi0 + xi, value)
+    _, yi, xi, value = best
+    return (int(xs[xi]), int(ys[yi])), float(value)
+
+def scale_to_screen(img, screen_width=None, screen_height=None, screen_mode="fill", verbose=False):
+    """Scale (fill/fit) and center-crop a decoded image to the screen size."""
+    orig_h, orig_w = img.shape[:2]
     scale = 1.0
     if screen_width is not None and screen_height is not None:
         scale_w = screen_width / orig_w
@@ -42,7 +101,25 @@ def find_least_busy_region(image_path, region_width=300, region_height=200, scre
     else:
         if verbose:
             print(f"Using original image size: {orig_w}x{orig_h}")
-    arr = img.astype(np.float64)
+    return img
+
+def load_screen_image(image_path, screen_width=None, screen_height=None, screen_mode="fill", verbose=False):
+    """Grayscale wallpaper scaled and cropped to the screen, as float64."""
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(f"Image not found: {image_path}")
+    return scale_to_screen(img, screen_width, screen_height, screen_mode, verbose).astype(np.float64)
+
+def find_least_busy_region(image_path, region_width=300, region_height=200, screen_width=None, screen_height=None, verbose=False, stride=2, screen_mode="fill", horizontal_padding=50, vertical_padding=50, busiest=False, coarse_factor=1):
+    arr = load_screen_image(image_path, screen_width, screen_height, screen_mode, verbose)
+    return least_busy_in_array(arr, region_width, region_height, verbose, stride, horizontal_padding, vertical_padding, busiest, coarse_factor)
+
+def least_busy_in_array(arr, region_width=300, region_height=200, verbose=False, stride=2, horizontal_padding=50, vertical_padding=50, busiest=False, coarse_factor=1, integrals=None, exclude=None):
+    """find_least_busy_region() on an already loaded image; integrals may be
+    passed in to share one integral_images() result between searches.
+
+    exclude is a list of (x, y, w, h) rectangles the region must not overlap.
+    Returns ((x, y), None) when no window avoids all of them."""
     h, w = arr.shape
     # Validate & adjust stride
     stride = max(1, int(stride) if stride else 1)
@@ -63,24 +140,7 @@ def find_least_busy_region(image_path, region_width=300, region_height=200, scre
         if verbose:
             print(f"Requested region_height {region_height} too large; clamping to {max_region_h}")
         region_height = max_region_h
-    # Use OpenCV's integral for fast computation
-    integral = cv2.integral(arr, sdepth=cv2.CV_64F)[1:,1:]
-    integral_sq = cv2.integral(arr**2, sdepth=cv2.CV_64F)[1:,1:]
-    def region_sum(ii, x1, y1, x2, y2):
-        # Assume bounds have been checked before calling
-        total = ii[y2, x2]
-        if x1 > 0:
-            total -= ii[y2, x1-1]
-        if y1 > 0:
-            total -= ii[y1-1, x2]
-        if x1 > 0 and y1 > 0:
-            total += ii[y1-1, x1-1]
-        return total
-    min_var = None
-    max_var = None
-    min_coords = (horizontal_padding, vertical_padding)
-    max_coords = (horizontal_padding, vertical_padding)
-    area = region_width * region_height
+    integral, integral_sq = integrals if integrals is not None else integral_images(arr)
     x_start = horizontal_padding
     y_start = vertical_padding
     x_end = w - region_width - horizontal_padding + 1
@@ -89,53 +149,32 @@ def find_least_busy_region(image_path, region_width=300, region_height=200, scre
         x_end = x_start
     if y_end < y_start:
         y_end = y_start
-    for y in range(y_start, y_end + 1, stride):
-        for x in range(x_start, x_end + 1, stride):
-            x1, y1 = x, y
-            x2, y2 = x + region_width - 1, y + region_height - 1
-            if x2 >= w or y2 >= h:
-                continue  # Skip out-of-bounds window
-            s = region_sum(integral, x1, y1, x2, y2)
-            s2 = region_sum(integral_sq, x1, y1, x2, y2)
-            mean = s / area
-            var = (s2 / area) - (mean ** 2)
-            if (min_var is None) or (var < min_var):
-                min_var = var
-                min_coords = (x, y)
-            if (max_var is None) or (var > max_var):
-                max_var = var
-                max_coords = (x, y)
-    if busiest:
-        return max_coords, max_var
-    else:
-        return min_coords, min_var
+    xs = _window_positions(x_start, x_end, stride, region_width, w)
+    ys = _window_positions(y_start, y_end, stride, region_height, h)
+    if len(xs) == 0 or len(ys) == 0:
+        return (horizontal_padding, vertical_padding), None
+    coarse_factor = max(1, int(coarse_factor or 1))
+    if coarse_factor > 1 and min(len(xs), len(ys)) > 2 * coarse_factor and not exclude:
+        return _coarse_to_fine(integral, integral_sq, xs, ys, region_width, region_height, busiest, coarse_factor)
+    var = window_variance(integral, integral_sq, xs, ys, region_width, region_height)
+    if exclude:
+        blocked = np.zeros(var.shape, dtype=bool)
+        for ex, ey, ew, eh in exclude:
+            cols = (xs < ex + ew) & (xs + region_width > ex)
+            rows = (ys < ey + eh) & (ys + region_height > ey)
+            blocked |= rows[:, None] & cols[None, :]
+        if blocked.all():
+            return (horizontal_padding, vertical_padding), None
+        var = np.where(blocked, -np.inf if busiest else np.inf, var)
+    yi, xi = _pick_window(var, busiest)
+    return (int(xs[xi]), int(ys[yi])), float(var[yi, xi])
 
 def find_largest_region(image_path, screen_width=None, screen_height=None, verbose=False, stride=2, screen_mode="fill", threshold=100.0, aspect_ratio=1.0, horizontal_padding=50, vertical_padding=50):
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise FileNotFoundError(f"Image not found: {image_path}")
-    orig_h, orig_w = img.shape
-    # ...existing scaling logic...
-    scale = 1.0
-    if screen_width is not None and screen_height is not None:
-        scale_w = screen_width / orig_w
-        scale_h = screen_height / orig_h
-        if screen_mode == "fill":
-            scale = max(scale_w, scale_h)
-        else:
-            scale = min(scale_w, scale_h)
-        new_w = int(orig_w * scale)
-        new_h = int(orig_h * scale)
-        if verbose:
-            print(f"Scaling image from {orig_w}x{orig_h} to {new_w}x{new_h} (scale: {scale:.3f}, mode: {screen_mode})")
-        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4)
-        img = center_crop(img, screen_width, screen_height)
-        if verbose:
-            print(f"Cropped image to {screen_width}x{screen_height}")
-    else:
-        if verbose:
-            print(f"Using original image size: {orig_w}x{orig_h}")
-    arr = img.astype(np.float64)
+    arr = load_screen_image(image_path, screen_width, screen_height, screen_mode, verbose)
+    return largest_in_array(arr, stride, threshold, aspect_ratio, horizontal_padding, vertical_padding)
+
+def largest_in_array(arr, stride=2, threshold=100.0, aspect_ratio=1.0, horizontal_padding=50, vertical_padding=50, integrals=None):
+    """find_largest_region() on an already loaded image."""
     h, w = arr.shape
     stride = max(1, int(stride) if stride else 1)
     threshold = max(0.0, float(threshold))
@@ -143,18 +182,7 @@ def find_largest_region(image_path, screen_width=None, screen_height=None, verbo
     if horizontal_padding * 2 >= w or vertical_padding * 2 >= h:
         horizontal_padding = max(0, min(horizontal_padding, (w - 1) // 2))
         vertical_padding = max(0, min(vertical_padding, (h - 1) // 2))
-    # Use OpenCV's integral for fast computation
-    integral = cv2.integral(arr, sdepth=cv2.CV_64F)[1:,1:]
-    integral_sq = cv2.integral(arr**2, sdepth=cv2.CV_64F)[1:,1:]
-    def region_sum(ii, x1, y1, x2, y2):
-        total = ii[y2, x2]
-        if x1 > 0:
-            total -= ii[y2, x1-1]
-        if y1 > 0:
-            total -= ii[y1-1, x2]
-        if x1 > 0 and y1 > 0:
-            total += ii[y1-1, x1-1]
-        return total
+    integral, integral_sq = integrals if integrals is not None else integral_images(arr)
     min_size = 10
     # Determine maximum feasible size respecting padding
     effective_w = w - 2 * horizontal_padding
@@ -184,27 +212,16 @@ def find_largest_region(image_path, screen_width=None, screen_height=None, verbo
             max_size = mid - 1
             continue
         found = False
-        x_start = horizontal_padding
-        y_start = vertical_padding
-        x_end = w - region_w - horizontal_padding
-        y_end = h - region_h - vertical_padding
-        for y in range(y_start, y_end + 1, stride):
-            for x in range(x_start, x_end + 1, stride):
-                x1, y1 = x, y
-                x2, y2 = x + region_w - 1, y + region_h - 1
-                if x2 >= w or y2 >= h:
-                    continue
-                s = region_sum(integral, x1, y1, x2, y2)
-                s2 = region_sum(integral_sq, x1, y1, x2, y2)
-                area = region_w * region_h
-                mean = s / area
-                var = (s2 / area) - (mean ** 2)
-                if var <= threshold:
-                    found = True
-                    best = (x, y, region_w, region_h, var)
-                    break
-            if found:
-                break
+        xs = _window_positions(horizontal_padding, w - region_w - horizontal_padding, stride, region_w, w)
+        ys = _window_positions(vertical_padding, h - region_h - vertical_padding, stride, region_h, h)
+        if len(xs) and len(ys):
+            var = window_variance(integral, integral_sq, xs, ys, region_w, region_h)
+            # First window under the threshold in row-major scan order
+            under = var <= threshold
+            if under.any():
+                yi, xi = np.unravel_index(np.argmax(under), under.shape)
+                found = True
+                best = (int(xs[xi]), int(ys[yi]), region_w, region_h, float(var[yi, xi]))
         if found:
             min_size = mid + 1
         else:
@@ -264,6 +281,13 @@ def draw_largest_region(image_path, center, size, output_path='output.png', scre
     cv2.imwrite(output_path, img)
     # print removed for quieter operation
 
+def _clip_region(img, x, y, w, h):
+    x = max(0, x)
+    y = max(0, y)
+    w = max(1, min(w, img.shape[1] - x))
+    h = max(1, min(h, img.shape[0] - y))
+    return img[y:y+h, x:x+w]
+
 def get_region_brightness(image_path, x, y, w, h, screen_width=None, screen_height=None, screen_mode="fill"):
     """Get average brightness and brightness std-dev (both 0-255) of a region.
 
@@ -274,18 +298,12 @@ def get_region_brightness(image_path, x, y, w, h, screen_width=None, screen_heig
     img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     if img is None:
         return 128.0, 0.0
-    orig_h, orig_w = img.shape[:2]
-    if screen_width is not None and screen_height is not None:
-        scale_w = screen_width / orig_w
-        scale_h = screen_height / orig_h
-        scale = max(scale_w, scale_h) if screen_mode == "fill" else min(scale_w, scale_h)
-        img = cv2.resize(img, (int(orig_w * scale), int(orig_h * scale)), interpolation=cv2.INTER_LANCZOS4)
-        img = center_crop(img, screen_width, screen_height)
-    x = max(0, x)
-    y = max(0, y)
-    w = max(1, min(w, img.shape[1] - x))
-    h = max(1, min(h, img.shape[0] - y))
-    region = img[y:y+h, x:x+w]
+    img = scale_to_screen(img, screen_width, screen_height, screen_mode)
+    return region_brightness(img, x, y, w, h)
+
+def region_brightness(gray, x, y, w, h):
+    """get_region_brightness() on an already scaled grayscale image."""
+    region = _clip_region(gray, x, y, w, h)
     if region.size == 0:
         return 128.0, 0.0
     return float(np.mean(region)), float(np.std(region))
@@ -294,24 +312,13 @@ def get_dominant_color(image_path, x, y, w, h, screen_width=None, screen_height=
     img = cv2.imread(image_path)
     if img is None:
         raise FileNotFoundError(f"Image not found: {image_path}")
-    orig_h, orig_w = img.shape[:2]
-    if screen_width is not None and screen_height is not None:
-        scale_w = screen_width / orig_w
-        scale_h = screen_height / orig_h
-        if screen_mode == "fill":
-            scale = max(scale_w, scale_h)
-        else:
-            scale = min(scale_w, scale_h)
-        new_w = int(orig_w * scale)
-        new_h = int(orig_h * scale)
-        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4)
-        img = center_crop(img, screen_width, screen_height)
+    img = scale_to_screen(img, screen_width, screen_height, screen_mode)
+    return dominant_color(img, x, y, w, h)
+
+def dominant_color(img, x, y, w, h):
+    """get_dominant_color() on an already scaled BGR image."""
     # Ensure region is within bounds
-    x = max(0, x)
-    y = max(0, y)
-    w = max(1, min(w, img.shape[1] - x))
-    h = max(1, min(h, img.shape[0] - y))
-    region = img[y:y+h, x:x+w]
+    region = _clip_region(img, x, y, w, h)
     if region.size == 0 or region.shape[0] == 0 or region.shape[1] == 0:
         return [0, 0, 0]
     # Keep the full sampled region. Discarding dark pixels biases mixed/dark
@@ -333,6 +340,104 @@ def get_dominant_color(image_path, x, y, w, h, screen_width=None, screen_height=
     # Reverse from BGR to RGB
     return [int(x) for x in reversed(dominant)]
 
+def _region_colors(bgr, gray, x, y, w, h):
+    color = dominant_color(bgr, x, y, w, h)
+    brightness, brightness_std = region_brightness(gray, x, y, w, h)
+    return {
+        "dominant_color": '#{:02x}{:02x}{:02x}'.format(*color),
+        "brightness": round(brightness, 1),
+        "brightness_std": round(brightness_std, 1)
+    }
+
+def place_regions(image_path, requests, screen_width=None, screen_height=None, screen_mode="fill"):
+    """Answer several region requests from one decode and one pair of integral images.
+
+    Each request is a dict with an optional "id" and "mode":
+      "least-busy" (default): width, height, horizontal_padding, vertical_padding,
+          stride, busiest, coarse_to_fine, and "avoid_overlap" (default true) to
+          keep clear of regions placed by earlier requests plus "margin" pixels
+      "largest": stride, threshold, aspect_ratio, paddings (find_largest_region)
+      "color-only": x, y, width, height; only brightness and dominant color
+    Results come back in request order with the same keys as the single-region
+    CLI output, or an "error" key."""
+    bgr = cv2.imread(image_path)
+    if bgr is None:
+        raise FileNotFoundError(f"Image not found: {image_path}")
+    bgr = scale_to_screen(bgr, screen_width, screen_height, screen_mode)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    arr = gray.astype(np.float64)
+    integrals = integral_images(arr)
+    placed = []
+    results = []
+    for request in requests:
+        if not isinstance(request, dict):
+            results.append({"id": None, "mode": None, "error": f"Request is not an object: {request!r}"})
+            continue
+        mode = request.get("mode", "least-busy")
+        result = {"id": request.get("id"), "mode": mode}
+        try:
+            width = int(request.get("width", 300))
+            height = int(request.get("height", 200))
+            paddings = (int(request.get("horizontal_padding", 50)), int(request.get("vertical_padding", 50)))
+            if mode == "color-only":
+                x, y = int(request.get("x", 0)), int(request.get("y", 0))
+                result.update({"center_x": x + width // 2, "center_y": y + height // 2, "width": width, "height": height})
+                result.update(_region_colors(bgr, gray, x, y, width, height))
+            elif mode == "largest":
+                center, size, var = largest_in_array(arr, int(request.get("stride", 10)), float(request.get("threshold", 1000.0)), float(request.get("aspect_ratio", 1.78)), *paddings, integrals=integrals)
+                if center is None:
+                    result["error"] = "No region found under the threshold."
+                else:
+                    x, y = center[0] - size[0] // 2, center[1] - size[1] // 2
+                    result.update({"center_x": center[0], "center_y": center[1], "width": size[0], "height": size[1], "variance": var})
+                    result.update(_region_colors(bgr, gray, x, y, size[0], size[1]))
+                    placed.append((x, y, size[0], size[1]))
+            elif mode == "least-busy":
+                margin = int(request.get("margin", 0))
+                exclude = None
+                if request.get("avoid_overlap", True):
+                    exclude = [(x - margin, y - margin, w + 2 * margin, h + 2 * margin) for x, y, w, h in placed]
+                (x, y), var = least_busy_in_array(arr, width, height, False, int(request.get("stride", 10)), *paddings, bool(request.get("busiest", False)), int(request.get("coarse_to_fine", 1)), integrals, exclude)
+                if var is None and exclude:
+                    result["error"] = "No region found that avoids the other placements."
+                else:
+                    result.update({"center_x": x + width // 2, "center_y": y + height // 2, "width": width, "height": height, "variance": var})
+                    result.update(_region_colors(bgr, gray, x, y, width, height))
+                    placed.append((x, y, width, height))
+            else:
+                result["error"] = f"Unknown mode: {mode}"
+        except (TypeError, ValueError, AttributeError) as e:
+            result["error"] = str(e)
+        results.append(result)
+    return {"screen_width": int(arr.shape[1]), "screen_height": int(arr.shape[0]), "regions": results}
+
+BENCHMARK_SCREENS = [(1366, 768), (1920, 1080), (2560, 1440), (3440, 1440), (3840, 2160)]
+
+def benchmark(args):
+    """Print load, integral and search timings per common screen size."""
+    def timed(fn, repeat=3):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    coarse = args.coarse_to_fine if args.coarse_to_fine > 1 else 4
+    print(f"{args.image_path}: region {args.width}x{args.height}, stride {args.stride}")
+    print(f"{'screen':>10} {'load':>9} {'integral':>9} {'stride ' + str(args.stride):>10} {'stride 1':>9} {'c2f x' + str(coarse):>9} {'largest':>9}")
+    for screen_w, screen_h in BENCHMARK_SCREENS:
+        load_ms, arr = timed(lambda: load_screen_image(args.image_path, screen_w, screen_h, args.screen_mode))
+        integral_ms, integrals = timed(lambda: integral_images(arr))
+        search = dict(region_width=args.width, region_height=args.height, horizontal_padding=args.horizontal_padding, vertical_padding=args.vertical_padding, busiest=args.busiest, integrals=integrals)
+        strided_ms, _ = timed(lambda: least_busy_in_array(arr, stride=args.stride, **search))
+        full_ms, exact = timed(lambda: least_busy_in_array(arr, stride=1, **search))
+        c2f_ms, approx = timed(lambda: least_busy_in_array(arr, stride=1, coarse_factor=coarse, **search))
+        largest_ms, _ = timed(lambda: largest_in_array(arr, args.stride, args.variance_threshold, args.aspect_ratio, args.horizontal_padding, args.vertical_padding, integrals=integrals))
+        note = "" if approx[0] == exact[0] else f"  c2f picked {approx[0]}, exact {exact[0]}"
+        print(f"{screen_w:>5}x{screen_h:<4} {load_ms:>6.1f} ms {integral_ms:>6.1f} ms {strided_ms:>7.1f} ms {full_ms:>6.1f} ms {c2f_ms:>6.1f} ms {largest_ms:>6.1f} ms{note}")
+
 def main():
     parser = argparse.ArgumentParser(description="Find least busy region in an image and output a JSON. Made for determining a suitable position for a wallpaper widget.")
     parser.add_argument("image_path", help="Path to the input image")
@@ -353,8 +458,23 @@ def main():
     parser.add_argument("--color-only", action="store_true", help="Skip region search; analyze color/brightness at a specific position")
     parser.add_argument("--position-x", type=int, default=0, help="Widget X position for --color-only mode")
     parser.add_argument("--position-y", type=int, default=0, help="Widget Y position for --color-only mode")
+    parser.add_argument("--coarse-to-fine", type=int, default=1, metavar="N", help="Search every Nth stride position first, then refine around the best candidates (approximate; 1 = exhaustive)")
+    parser.add_argument("--benchmark", action="store_true", help="Print search timings for common screen sizes and exit")
+    parser.add_argument("--batch", metavar="FILE", help="Answer a JSON list of region requests (or {\"regions\": [...]}) from FILE ('-' for stdin) with one decode; see place_regions()")
     args = parser.parse_args()
 
+    if args.batch:
+        with (sys.stdin if args.batch == "-" else open(args.batch)) as f:
+            requests = json.load(f)
+        if isinstance(requests, dict):
+            requests = requests.get("regions", [])
+        print(json.dumps(place_regions(args.image_path, requests, args.screen_width, args.screen_height, args.screen_mode)))
+        return
+
+    if args.benchmark:
+        benchmark(args)
+        return
+
     # Color-only mode: analyze the region at the widget's actual position
     if args.color_only:
         dominant_color = get_dominant_color(
@@ -432,7 +552,8 @@ def main():
         screen_mode=args.screen_mode,
         horizontal_padding=args.horizontal_padding,
         vertical_padding=args.vertical_padding,
-        busiest=args.busiest
+        busiest=args.busiest,
+        coarse_factor=args.coarse_to_fine
     )
     if args.visual_output:
         draw_region(args.image_path, coords, region_width=args.width, region_height=args.height, screen_width=args.screen_width, screen_height=args.screen_height, screen_mode=args.screen_mode)
@@ -23,13 +23,18 @@ Commands:
   remove-bind KEY      Comment out a keybind in 70-binds.kdl (surgical edit)
 """
 
+from bisect import bisect_right
 from difflib import unified_diff
 import json
+import marshal
+import math
 import os
 import re
 import subprocess
 import sys
+import time
 from pathlib import Path
+from urllib.parse import quote
 
 
 DEFAULT_NIRI_FILES = [
@@ -66,12 +71,11 @@ def _root_includes(relative_path: str) -> bool:
         return False
 
     try:
-        content = config_file.read_text()
-    except Exception:
+        doc = load_kdl(config_file)
+    except (OSError, KdlError):
         return False
 
-    escaped = re.escape(relative_path)
-    return bool(re.search(rf'^\s*include\s+"{escaped}"\s*$', content, re.MULTILINE))
+    return any(node.name == "include" and node.arg() == relative_path for node in doc.root.children)
 
 
 def resolve_niri_section_file(relative_path: str) -> Path:
@@ -97,6 +101,646 @@ def run_niri(*args):
         return str(e), 1
 
 
+# ─── KDL document ─────────────────────────────────────────────────────
+#
+# A lossless parse of one KDL file. Nodes hold offsets into the source text
+# rather than copies of it, so the text is the serialized document: comments,
+# blank lines and formatting survive as they are, and an edit splices the
+# span of the node it changes. Own-line `//` comments are kept per block and
+# parse on demand into the nodes they comment out (`// numlock`,
+# `// Mod+T { ... }`), so those can be found and uncommented.
+#
+# Parsed files are cached in $XDG_CACHE_HOME/inir/niri-kdl/ and reused while
+# their mtime and size match: the settings UI runs every get-* command each
+# time it opens, and they all read the same few files. The cache is marshal
+# of plain tuples, which loads faster than importing pickle.
+
+KDL_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "inir" / "niri-kdl"
+# Bumped whenever the cached layout changes
+_KDL_CACHE_VERSION = 1
+# Files written this recently are not cached: a second write within the
+# filesystem's timestamp granularity could keep both mtime and size
+_KDL_CACHE_SETTLE_NS = 2_000_000_000
+
+_KDL_TRIVIA = re.compile(r"[\s;]+")
+_KDL_SPACE = re.compile(r"[^\S\n]+")
+_KDL_IDENT = re.compile(r'[^\s\\/(){}\[\]<>;=,"]+')
+_KDL_NUMBER = re.compile(
+    r"[+-]?(?:0x[0-9a-fA-F][0-9a-fA-F_]*|0o[0-7][0-7_]*|0b[01][01_]*"
+    r"|[0-9][0-9_]*(?:\.[0-9][0-9_]*)?(?:[eE][+-]?[0-9][0-9_]*)?)"
+    r'(?=[\s\\/(){}\[\]<>;=,"]|$)'
+)
+_KDL_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"', re.DOTALL)
+_KDL_LINE_STRING = re.compile(r'"((?:[^"\\\n]|\\.)*)"')
+_KDL_RAW_OPEN = re.compile(r'r?(#*)"')
+_KDL_BLOCK_COMMENT = re.compile(r"/\*|\*/")
+_KDL_ESCAPE = re.compile(r"\\(u\{[0-9a-fA-F]{1,6}\}|\s+|.)")
+_KDL_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "b": "\b", "f": "\f", "s": " ", "\\": "\\", "/": "/", '"': '"'}
+# KDL v1 keywords and their v2 spellings
+_KDL_KEYWORDS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "#true": True,
+    "#false": False,
+    "#null": None,
+    "#inf": math.inf,
+    "#-inf": -math.inf,
+    "#nan": math.nan,
+}
+
+
+class KdlError(ValueError):
+    """The KDL text does not parse."""
+
+
+class KdlValue:
+    """An argument or property value. `entry_start` is where the entry
+    begins: the property name, or the value itself for arguments."""
+
+    __slots__ = ("value", "start", "end", "entry_start")
+
+    def __init__(self, value, start, end, entry_start):
+        self.value = value
+        self.start = start
+        self.end = end
+        self.entry_start = entry_start
+
+
+class KdlNode:
+    """One node. Offsets point into `src`: `start` is the node name (or its
+    type annotation), `head_end` follows the last entry, `end` follows the
+    closing brace when there are children, and `stmt_end` follows a `;`
+    terminator if there is one. `body_start`/`body_end` surround the
+    children, which is None for nodes without a block. `comments` lists the
+    (start, end) spans of own-line `//` comments directly inside the block."""
+
+    __slots__ = (
+        "name",
+        "src",
+        "start",
+        "head_end",
+        "end",
+        "stmt_end",
+        "line_start",
+        "entries",
+        "children",
+        "body_start",
+        "body_end",
+        "comments",
+        "comment_span",
+        "_commented",
+    )
+
+    def __init__(self, name, src, start):
+        self.name = name
+        self.src = src
+        self.start = start
+        self.head_end = self.end = self.stmt_end = start
+        self.line_start = src.rfind("\n", 0, start) + 1
+        self.entries = []
+        self.children = None
+        self.body_start = self.body_end = None
+        self.comments = []
+        # (start, end) of the comment lines holding a commented-out node
+        self.comment_span = None
+        self._commented = None
+
+    @property
+    def args(self):
+        return [value for key, value in self.entries if key is None]
+
+    def arg(self, index=0, default=None):
+        args = self.args
+        return args[index].value if index < len(args) else default
+
+    def prop(self, key, default=None):
+        for entry_key, value in reversed(self.entries):
+            if entry_key == key:
+                return value.value
+        return default
+
+    def prop_value(self, key):
+        for entry_key, value in reversed(self.entries):
+            if entry_key == key:
+                return value
+        return None
+
+    def indent(self):
+        lead = self.src[self.line_start : self.start]
+        return lead if not lead.strip() else ""
+
+    def child(self, name):
+        for node in self.children or ():
+            if node.name == name:
+                return node
+        return None
+
+    def has(self, name):
+        return self.child(name) is not None
+
+    def flag(self, name):
+        """Whether `name` is set as a bare flag or to true."""
+        node = self.child(name)
+        return node is not None and node.arg(0, True) is True
+
+    def string(self, name):
+        """The string argument of child `name`, or None."""
+        node = self.child(name)
+        value = node.arg() if node is not None else None
+        return value if isinstance(value, str) else None
+
+    def number(self, name):
+        """The numeric argument of child `name`, or None."""
+        node = self.child(name)
+        value = node.arg() if node is not None else None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value
+
+    def walk(self):
+        """Every node below this one, in document order."""
+        for node in self.children or ():
+            yield node
+            yield from node.walk()
+
+    def commented_children(self):
+        """Nodes commented out with `//` directly inside this block, parsed
+        from runs of consecutive own-line comments. Their offsets point into
+        the uncommented text; `comment_span` locates them in this one."""
+        if self._commented is None:
+            self._commented = list(_kdl_commented_nodes(self.src, self.comments))
+        return self._commented
+
+
+class _KdlParser:
+    def __init__(self, text, single_line_strings=False):
+        self.text = text
+        self.string_re = _KDL_LINE_STRING if single_line_strings else _KDL_STRING
+
+    def error(self, message, pos):
+        line = self.text.count("\n", 0, pos) + 1
+        return KdlError(f"line {line}: {message}")
+
+    def document(self):
+        root = KdlNode(None, self.text, 0)
+        root.body_start = 0
+        root.children, root.comments, end = self.nodes(0, closing=False)
+        root.body_end = root.end = root.stmt_end = end
+        return root
+
+    def nodes(self, pos, closing):
+        """Parse nodes up to the closing brace or, with closing=False, the end."""
+        text = self.text
+        nodes = []
+        comments = []
+        while True:
+            pos = self.trivia(pos, comments)
+            if pos >= len(text):
+                if closing:
+                    raise self.error("missing '}'", pos)
+                return nodes, comments, pos
+            if text[pos] == "}":
+                if not closing:
+                    raise self.error("unexpected '}'", pos)
+                return nodes, comments, pos
+            if text.startswith("/-", pos):
+                # Slashdashed nodes are comments too
+                _, pos = self.node(self.trivia(pos + 2, []))
+            else:
+                node, pos = self.node(pos)
+                nodes.append(node)
+
+    def trivia(self, pos, comments):
+        """Skip whitespace, terminators and comments between nodes."""
+        text = self.text
+        while pos < len(text):
+            match = _KDL_TRIVIA.match(text, pos)
+            if match:
+                pos = match.end()
+            elif text.startswith("//", pos):
+                end = text.find("\n", pos)
+                end = len(text) if end < 0 else end
+                if not text[text.rfind("\n", 0, pos) + 1 : pos].strip():
+                    comments.append((pos, end))
+                pos = end
+            elif text.startswith("/*", pos):
+                pos = self.block_comment(pos)
+            else:
+                break
+        return pos
+
+    def space(self, pos):
+        """Skip the whitespace, block comments and line continuations
+        between the entries of a node."""
+        text = self.text
+        while pos < len(text):
+            match = _KDL_SPACE.match(text, pos)
+            if match:
+                pos = match.end()
+            elif text.startswith("/*", pos):
+                pos = self.block_comment(pos)
+            elif text[pos] == "\\":
+                end = self.space(pos + 1)
+                if text.startswith("//", end):
+                    end = text.find("\n", end)
+                    end = len(text) if end < 0 else end
+                if end < len(text) and text[end] != "\n":
+                    raise self.error("expected a newline after '\\'", end)
+                pos = end + 1
+            else:
+                break
+        return pos
+
+    def block_comment(self, pos):
+        depth = 0
+        while True:
+            match = _KDL_BLOCK_COMMENT.search(self.text, pos)
+            if not match:
+                raise self.error("unterminated comment", pos)
+            depth += 1 if match.group() == "/*" else -1
+            pos = match.end()
+            if depth == 0:
+                return pos
+
+    def annotation(self, pos):
+        if self.text.startswith("(", pos):
+            end = self.text.find(")", pos)
+            if end < 0:
+                raise self.error("unterminated type annotation", pos)
+            return end + 1
+        return pos
+
+    def node(self, start):
+        text = self.text
+        pos = self.annotation(start)
+        name, pos = self.value(pos, bare=True)
+        if not isinstance(name, str):
+            raise self.error("expected a node name", start)
+        node = KdlNode(name, text, start)
+        node.head_end = pos
+        while True:
+            pos = self.space(pos)
+            if pos >= len(text) or text[pos] in "\n;}" or text.startswith("//", pos):
+                break
+            if text[pos] == "{":
+                node.body_start = pos + 1
+                node.children, node.comments, pos = self.nodes(pos + 1, closing=True)
+                node.body_end = pos
+                pos += 1
+                break
+            if text.startswith("/-", pos):
+                pos = self.space(pos + 2)
+                if text.startswith("{", pos):
+                    pos = self.nodes(pos + 1, closing=True)[2] + 1
+                else:
+                    pos = self.entry(pos)[1]
+                continue
+            entry, pos = self.entry(pos)
+            node.entries.append(entry)
+            node.head_end = pos
+        node.end = pos if node.children is not None else node.head_end
+        after = self.space(node.end)
+        node.stmt_end = after + 1 if text.startswith(";", after) else node.end
+        return node, pos
+
+    def entry(self, start):
+        """One argument or property: ((key or None, KdlValue), end)."""
+        pos = self.annotation(start)
+        value, end = self.value(pos, bare=True)
+        after = self.space(end)
+        if isinstance(value, str) and self.text.startswith("=", after):
+            value_start = self.annotation(self.space(after + 1))
+            prop_value, prop_end = self.value(value_start, bare=True)
+            return (value, KdlValue(prop_value, value_start, prop_end, start)), prop_end
+        return (None, KdlValue(value, pos, end, start)), end
+
+    def value(self, pos, bare=False):
+        text = self.text
+        if pos >= len(text):
+            raise self.error("unexpected end of file", pos)
+        c = text[pos]
+        if text.startswith('"""', pos):
+            end = text.find('"""', pos + 3)
+            if end < 0:
+                raise self.error("unterminated string", pos)
+            return _kdl_unescape(_kdl_dedent(text[pos + 3 : end])), end + 3
+        if c == '"':
+            match = self.string_re.match(text, pos)
+            if not match:
+                raise self.error("unterminated string", pos)
+            return _kdl_unescape(match.group(1)), match.end()
+        if c in "r#":
+            match = _KDL_RAW_OPEN.match(text, pos)
+            if match and (c == "r" or match.group(1)):
+                close = '"' + match.group(1)
+                end = text.find(close, match.end())
+                if end < 0 or (self.string_re is _KDL_LINE_STRING and "\n" in text[match.end() : end]):
+                    raise self.error("unterminated raw string", pos)
+                return text[match.end() : end], end + len(close)
+        if c in "+-0123456789":
+            match = _KDL_NUMBER.match(text, pos)
+            if match:
+                return _kdl_number(match.group()), match.end()
+        match = _KDL_IDENT.match(text, pos)
+        if not match:
+            raise self.error(f"unexpected {c!r}", pos)
+        word = match.group()
+        if word in _KDL_KEYWORDS:
+            return _KDL_KEYWORDS[word], match.end()
+        if not bare or word.startswith("#"):
+            raise self.error(f"unexpected {word!r}", pos)
+        # Bare identifiers are strings in KDL v2
+        return word, match.end()
+
+
+def _kdl_number(token):
+    digits = token.replace("_", "")
+    sign = -1 if digits.startswith("-") else 1
+    unsigned = digits.lstrip("+-")
+    for prefix, base in (("0x", 16), ("0o", 8), ("0b", 2)):
+        if unsigned.startswith(prefix):
+            return sign * int(unsigned[2:], base)
+    if any(ch in unsigned for ch in ".eE"):
+        return float(digits)
+    return int(digits)
+
+
+def _kdl_unescape(raw):
+    if "\\" not in raw:
+        return raw
+
+    def replace(match):
+        escape = match.group(1)
+        if escape.startswith("u{"):
+            return chr(int(escape[2:-1], 16))
+        if escape[0].isspace():
+            return ""
+        return _KDL_ESCAPES.get(escape, escape)
+
+    return _KDL_ESCAPE.sub(replace, raw)
+
+
+def _kdl_dedent(raw):
+    """Body of a KDL v2 multi-line string: drop the first and last lines and
+    the indentation of the closing quotes."""
+    lines = raw.split("\n")
+    if len(lines) < 2:
+        return raw
+    indent = lines[-1]
+    return "\n".join(line[len(indent) :] if line.startswith(indent) else line.lstrip() for line in lines[1:-1])
+
+
+def _kdl_commented_nodes(src, comments):
+    runs = []
+    for start, end in comments:
+        if runs and src.count("\n", runs[-1][-1][1], start) == 1 and not src[runs[-1][-1][1] : start].strip():
+            runs[-1].append((start, end))
+        else:
+            runs.append([(start, end)])
+
+    for run in runs:
+        fragment = "\n".join(src[start + 2 : end] for start, end in run)
+        line_offsets = [0]
+        for start, end in run[:-1]:
+            line_offsets.append(line_offsets[-1] + end - start - 1)
+        parser = _KdlParser(fragment, single_line_strings=True)
+        pos = 0
+        while True:
+            pos = parser.trivia(pos, [])
+            if pos >= len(fragment):
+                break
+            try:
+                node, end = parser.node(pos)
+            except KdlError:
+                # Prose, or a fragment of something: skip the line
+                newline = fragment.find("\n", pos)
+                if newline < 0:
+                    break
+                pos = newline + 1
+                continue
+            first = run[bisect_right(line_offsets, node.start) - 1]
+            last = run[bisect_right(line_offsets, max(node.start, node.end - 1)) - 1]
+            node.comment_span = (src.rfind("\n", 0, first[0]) + 1, last[1])
+            yield node
+            pos = end
+
+
+class KdlDocument:
+    """A parsed KDL file. `root` is a nameless node holding the top-level
+    nodes as its children."""
+
+    __slots__ = ("text", "root", "_line_starts")
+
+    def __init__(self, text, root=None):
+        self.text = text
+        self.root = root if root is not None else _KdlParser(text).document()
+        self._line_starts = None
+
+    def top(self, name):
+        return self.root.child(name)
+
+    def find(self, name):
+        """The first node called `name` at any depth."""
+        for node in self.root.walk():
+            if node.name == name:
+                return node
+        return None
+
+    def section(self, name, top_level=False):
+        """The first `name { ... }` block, at the top level or anywhere."""
+        nodes = self.root.children if top_level else self.root.walk()
+        for node in nodes:
+            if node.name == name and node.children is not None:
+                return node
+        return None
+
+    def line(self, offset):
+        """1-based line number of `offset`."""
+        if self._line_starts is None:
+            self._line_starts = [0] + [m.end() for m in re.finditer("\n", self.text)]
+        return bisect_right(self._line_starts, offset)
+
+    def splice(self, start, end, replacement):
+        return self.text[:start] + replacement + self.text[end:]
+
+
+def _kdl_pack(node):
+    return (
+        node.name,
+        node.start,
+        node.head_end,
+        node.end,
+        node.stmt_end,
+        node.line_start,
+        tuple((key, value.value, value.start, value.end, value.entry_start) for key, value in node.entries),
+        None if node.children is None else tuple(_kdl_pack(child) for child in node.children),
+        node.body_start,
+        node.body_end,
+        tuple(node.comments),
+        tuple((child.src, child.comment_span, _kdl_pack(child)) for child in node.commented_children()),
+    )
+
+
+def _kdl_unpack(packed, src):
+    node = KdlNode.__new__(KdlNode)
+    (
+        node.name,
+        node.start,
+        node.head_end,
+        node.end,
+        node.stmt_end,
+        node.line_start,
+        entries,
+        children,
+        node.body_start,
+        node.body_end,
+        comments,
+        commented,
+    ) = packed
+    node.src = src
+    node.entries = [(key, KdlValue(*value)) for key, *value in entries]
+    node.children = None if children is None else [_kdl_unpack(child, src) for child in children]
+    node.comments = list(comments)
+    node.comment_span = None
+    node._commented = []
+    for fragment, span, child in commented:
+        child = _kdl_unpack(child, fragment)
+        child.comment_span = span
+        node._commented.append(child)
+    return node
+
+
+_KDL_PARSED = {}
+
+
+def parse_kdl(text):
+    """Parse `text`, reusing the document of an identical recent parse."""
+    doc = _KDL_PARSED.get(text)
+    if doc is None:
+        doc = KdlDocument(text)
+        if len(_KDL_PARSED) >= 8:
+            _KDL_PARSED.pop(next(iter(_KDL_PARSED)))
+        _KDL_PARSED[text] = doc
+    return doc
+
+
+def load_kdl(path):
+    """Parse the KDL file at `path` through the on-disk parse cache."""
+    path = Path(path).resolve()
+    st = path.stat()
+    stamp = (_KDL_CACHE_VERSION, str(path), st.st_mtime_ns, st.st_size)
+    cache_file = KDL_CACHE_DIR / (quote(str(path), safe="") + ".marshal")
+    try:
+        with open(cache_file, "rb") as f:
+            cached_stamp, text, packed = marshal.loads(f.read())
+        if cached_stamp == stamp:
+            doc = _KDL_PARSED.get(text)
+            if doc is None:
+                doc = _KDL_PARSED[text] = KdlDocument(text, _kdl_unpack(packed, text))
+            return doc
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    doc = parse_kdl(path.read_text())
+    if time.time_ns() - st.st_mtime_ns > _KDL_CACHE_SETTLE_NS:
+        tmp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        try:
+            KDL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                marshal.dump((stamp, doc.text, _kdl_pack(doc.root)), f)
+            os.replace(tmp, cache_file)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+    return doc
+
+
+def _kdl_lines(text, start, end):
+    """(line start, line end) around text[start:end] when it has its lines to
+    itself, give or take a trailing comment; otherwise None."""
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", end)
+    line_end = len(text) if line_end < 0 else line_end
+    tail = text[end:line_end].strip().lstrip(";").strip()
+    if text[line_start:start].strip() or (tail and not tail.startswith("//")):
+        return None
+    return line_start, line_end
+
+
+def _kdl_replace(doc, node, replacement):
+    """Replace `node` (name, entries and children) with `replacement`."""
+    return doc.splice(node.start, node.end, replacement)
+
+
+def _kdl_remove(doc, node):
+    """Remove `node`, with its line when it has one to itself."""
+    lines = _kdl_lines(doc.text, node.start, node.stmt_end)
+    if lines is not None:
+        return doc.splice(lines[0], min(lines[1] + 1, len(doc.text)), "")
+    end = _KDL_SPACE.match(doc.text, node.stmt_end)
+    return doc.splice(node.start, end.end() if end else node.stmt_end, "")
+
+
+def _kdl_child_indent(parent):
+    for node in parent.children or ():
+        if node.indent() or "\n" in node.src[parent.body_start : node.start]:
+            return node.indent()
+    return (parent.indent() + "    ") if parent.name is not None else ""
+
+
+def _kdl_insert_child(doc, parent, text, first=False):
+    """Insert `text` (one node, possibly spanning several lines) as the first
+    or last child of `parent`, indented like its siblings."""
+    src = doc.text
+    indent = _kdl_child_indent(parent)
+    text = text.replace("\n", "\n" + indent)
+    body = src[parent.body_start : parent.body_end]
+    if parent.name is None:
+        # Top level: append at the end of the document
+        stripped = src.rstrip()
+        return stripped + ("\n" if stripped else "") + text + "\n"
+    if not body.strip():
+        return doc.splice(parent.body_start, parent.body_end, f"\n{indent}{text}\n{parent.indent()}")
+    if "\n" not in body:
+        # Single-line block like `border { off; }`
+        if first:
+            return doc.splice(parent.body_start, parent.body_start, f" {text};")
+        pos = parent.body_start + len(body.rstrip())
+        separator = " " if src[pos - 1] in ";{" else "; "
+        return doc.splice(pos, pos, f"{separator}{text};")
+    if first:
+        return doc.splice(parent.body_start, parent.body_start, f"\n{indent}{text}")
+    pos = parent.body_start + len(body.rstrip())
+    return doc.splice(pos, pos, f"\n{indent}{text}")
+
+
+def _kdl_set_child(doc, parent, key, value):
+    """Set `key value` (or the bare flag `key`) inside `parent`."""
+    line = f"{key} {value}" if value else key
+    node = parent.child(key)
+    if node is not None:
+        return _kdl_replace(doc, node, line)
+    return _kdl_insert_child(doc, parent, line)
+
+
+def _kdl_set_prop(doc, node, key, value):
+    """Set property key=value on `node`, appending it when missing."""
+    current = node.prop_value(key)
+    if current is not None:
+        return doc.splice(current.start, current.end, value)
+    return doc.splice(node.head_end, node.head_end, f" {key}={value}")
+
+
+def _kdl_uncomment(doc, node):
+    """Uncomment the comment lines holding the commented-out `node`."""
+    start, end = node.comment_span
+    lines = doc.text[start:end].split("\n")
+    return doc.splice(start, end, "\n".join(re.sub(r"^(\s*)// ?", r"\g<1>", line, count=1) for line in lines))
+
+
 # ─── Outputs ──────────────────────────────────────────────────────────
 
 
@@ -123,20 +767,21 @@ def read_vrr_modes():
         return {}
 
     try:
-        content = outputs_file.read_text()
-    except Exception:
+        doc = load_kdl(outputs_file)
+    except (OSError, KdlError):
         return {}
 
     modes = {}
-    for match in re.finditer(r'output\s+"([^"]+)"\s*\{(.*?)\}', content, re.DOTALL):
-        name, block = match.group(1), match.group(2)
-        vrr = re.search(r"^\s*variable-refresh-rate([^\n]*)", block, re.MULTILINE)
-        if not vrr:
-            modes[name] = "off"
-        elif "on-demand=true" in vrr.group(1):
-            modes[name] = "on-demand"
+    for output in doc.root.children:
+        if output.name != "output" or not isinstance(output.arg(), str):
+            continue
+        vrr = output.child("variable-refresh-rate")
+        if vrr is None:
+            modes[output.arg()] = "off"
+        elif vrr.prop("on-demand") is True:
+            modes[output.arg()] = "on-demand"
         else:
-            modes[name] = "on"
+            modes[output.arg()] = "on"
     return modes
 
 
@@ -302,51 +947,33 @@ def cmd_persist_output(args):
     outputs_file = resolve_niri_section_file("config.d/15-outputs.kdl")
     outputs_file.parent.mkdir(parents=True, exist_ok=True)
 
-    existing = outputs_file.read_text() if outputs_file.exists() else ""
-
-    # Find existing output block for this name
-    pattern = rf'(output\s+"{re.escape(output_name)}"\s*\{{)(.*?)(\}})'
-    match = re.search(pattern, existing, re.DOTALL)
-
-    if match:
-        # Surgical edit within existing block
-        block_content = match.group(2)
+    existing = load_kdl(outputs_file).text if outputs_file.exists() else ""
 
+    if _output_node(parse_kdl(existing), output_name) is not None:
+        # Surgical edit within the existing block
+        result = existing
         for key, value in changes.items():
+            doc = parse_kdl(result)
+            block = _output_node(doc, output_name)
             if key == "mode":
-                block_content = _set_in_block(block_content, "mode", f'"{value}"')
+                result = _kdl_set_child(doc, block, "mode", f'"{value}"')
             elif key == "scale":
-                block_content = _set_in_block(block_content, "scale", value)
+                result = _kdl_set_child(doc, block, "scale", value)
             elif key == "transform":
-                block_content = _set_in_block(block_content, "transform", f'"{value}"')
+                result = _kdl_set_child(doc, block, "transform", f'"{value}"')
             elif key == "vrr":
                 if value == "off":
-                    # Remove variable-refresh-rate line
-                    block_content = re.sub(
-                        r"\n?\s*variable-refresh-rate[^\n]*", "", block_content
-                    )
+                    vrr = block.child("variable-refresh-rate")
+                    if vrr is not None:
+                        result = _kdl_remove(doc, vrr)
                 elif value == "on-demand":
-                    block_content = _set_in_block(
-                        block_content, "variable-refresh-rate", "on-demand=true"
-                    )
+                    result = _kdl_set_child(doc, block, "variable-refresh-rate", "on-demand=true")
                 else:
-                    block_content = _set_in_block(
-                        block_content, "variable-refresh-rate", ""
-                    )
+                    result = _kdl_set_child(doc, block, "variable-refresh-rate", "")
             elif key == "position":
                 parts = value.split(",")
                 if len(parts) == 2:
-                    block_content = _set_in_block(
-                        block_content, "position", f"x={parts[0]} y={parts[1]}"
-                    )
-
-        result = (
-            existing[: match.start()]
-            + match.group(1)
-            + block_content
-            + match.group(3)
-            + existing[match.end() :]
-        )
+                    result = _kdl_set_child(doc, block, "position", f"x={parts[0]} y={parts[1]}")
     else:
         # Create new output block
         lines = []
@@ -384,9 +1011,12 @@ def _ensure_vrr_window_rule():
     an unmatched VRR window rule is inert on its own.
     """
     rules_file = resolve_niri_section_file("config.d/30-window-rules.kdl")
-    existing = rules_file.read_text() if rules_file.exists() else ""
+    try:
+        existing = load_kdl(rules_file).text if rules_file.exists() else ""
+    except KdlError:
+        return
 
-    if re.search(r"^\s*variable-refresh-rate\b", existing, re.MULTILINE):
+    if parse_kdl(existing).find("variable-refresh-rate") is not None:
         return
 
     rules_file.parent.mkdir(parents=True, exist_ok=True)
@@ -401,26 +1031,11 @@ def _ensure_vrr_window_rule():
             rules_file.unlink(missing_ok=True)
 
 
-def _set_in_block(block_content, key, value):
-    """Set a key=value inside a KDL block, preserving other content.
-    If key exists, replace the line. If not, append it."""
-    # Escape key for regex (handles hyphens)
-    escaped = re.escape(key)
-    # Try to replace existing line
-    pattern = rf"(\n?\s*){escaped}\b[^\n]*"
-    if re.search(pattern, block_content):
-        if value:
-            return re.sub(pattern, rf"\g<1>{key} {value}", block_content, count=1)
-        else:
-            # Flag-style (no value) like variable-refresh-rate
-            return re.sub(pattern, rf"\g<1>{key}", block_content, count=1)
-    else:
-        # Append
-        indent = "    "
-        if value:
-            return block_content.rstrip() + f"\n{indent}{key} {value}\n"
-        else:
-            return block_content.rstrip() + f"\n{indent}{key}\n"
+def _output_node(doc, name):
+    for node in doc.root.children:
+        if node.name == "output" and node.arg() == name and node.children is not None:
+            return node
+    return None
 
 
 # ─── Input ────────────────────────────────────────────────────────────
@@ -495,249 +1110,97 @@ def cmd_get_input():
         print(json.dumps(result))
         return 0
 
-    content = input_file.read_text()
-
-    # Extract subsections — handle nested braces properly
-    input_block = _extract_block(content, "input", top_level=True)
-    cursor_block = _extract_block(content, "cursor", top_level=True)
-
-    if input_block:
-        kb_block = _extract_block(input_block, "keyboard")
-        tp_block = _extract_block(input_block, "touchpad")
-        mouse_block = _extract_block(input_block, "mouse")
-        trackpoint_block = _extract_block(input_block, "trackpoint")
-
-        # Keyboard
-        if kb_block:
-            xkb_block = _extract_block(kb_block, "xkb")
-            if xkb_block:
-                m = re.search(r'layout\s+"([^"]*)"', xkb_block)
-                if m:
-                    result["keyboard"]["layout"] = m.group(1)
-                m = re.search(r'variant\s+"([^"]*)"', xkb_block)
-                if m:
-                    result["keyboard"]["variant"] = m.group(1)
-                m = re.search(r'options\s+"([^"]*)"', xkb_block)
-                if m:
-                    result["keyboard"]["options"] = m.group(1)
-            m = re.search(r"repeat-delay\s+(\d+)", kb_block)
-            if m:
-                result["keyboard"]["repeat_delay"] = int(m.group(1))
-            m = re.search(r"repeat-rate\s+(\d+)", kb_block)
-            if m:
-                result["keyboard"]["repeat_rate"] = int(m.group(1))
-            m = re.search(r'track-layout\s+"([^"]*)"', kb_block)
-            if m:
-                result["keyboard"]["track_layout"] = m.group(1)
-            # numlock is a standalone flag
-            result["keyboard"]["numlock"] = bool(
-                re.search(r"^\s*numlock\s*$", kb_block, re.MULTILINE)
-            )
-
-        # Touchpad
-        if tp_block:
-            result["touchpad"]["tap"] = bool(
-                re.search(r"^\s*tap\s*$", tp_block, re.MULTILINE)
-            )
-            result["touchpad"]["natural_scroll"] = bool(
-                re.search(r"^\s*natural-scroll\s*$", tp_block, re.MULTILINE)
-            )
-            result["touchpad"]["dwt"] = bool(
-                re.search(r"^\s*dwt\s*$", tp_block, re.MULTILINE)
-            )
-            result["touchpad"]["dwtp"] = bool(
-                re.search(r"^\s*dwtp\s*$", tp_block, re.MULTILINE)
-            )
-            result["touchpad"]["drag_lock"] = bool(
-                re.search(r"^\s*drag-lock\s*$", tp_block, re.MULTILINE)
-            )
-            result["touchpad"]["disabled_on_external_mouse"] = bool(
-                re.search(
-                    r"^\s*disabled-on-external-mouse\s*$",
-                    tp_block,
-                    re.MULTILINE,
-                )
-            )
-            result["touchpad"]["left_handed"] = bool(
-                re.search(r"^\s*left-handed\s*$", tp_block, re.MULTILINE)
-            )
-            result["touchpad"]["middle_emulation"] = bool(
-                re.search(r"^\s*middle-emulation\s*$", tp_block, re.MULTILINE)
-            )
-            m = re.search(r'accel-profile\s+"([^"]*)"', tp_block)
-            if m:
-                result["touchpad"]["accel_profile"] = m.group(1)
-            m = re.search(r"accel-speed\s+([\d.-]+)", tp_block)
-            if m:
-                result["touchpad"]["accel_speed"] = float(m.group(1))
-            m = re.search(r'tap-button-map\s+"([^"]*)"', tp_block)
-            if m:
-                result["touchpad"]["tap_button_map"] = m.group(1)
-            m = re.search(r'click-method\s+"([^"]*)"', tp_block)
-            if m:
-                result["touchpad"]["click_method"] = m.group(1)
-            m = re.search(r'scroll-method\s+"([^"]*)"', tp_block)
-            if m:
-                result["touchpad"]["scroll_method"] = m.group(1)
-            result["touchpad"]["scroll_button_lock"] = bool(
-                re.search(r"^\s*scroll-button-lock\s*$", tp_block, re.MULTILINE)
-            )
-
-        # Mouse
-        if mouse_block:
-            m = re.search(r'accel-profile\s+"([^"]*)"', mouse_block)
-            if m:
-                result["mouse"]["accel_profile"] = m.group(1)
-            result["mouse"]["natural_scroll"] = bool(
-                re.search(r"^\s*natural-scroll\s*$", mouse_block, re.MULTILINE)
-            )
-            m = re.search(r"accel-speed\s+([\d.-]+)", mouse_block)
-            if m:
-                result["mouse"]["accel_speed"] = float(m.group(1))
-            m = re.search(r'scroll-method\s+"([^"]*)"', mouse_block)
-            if m:
-                result["mouse"]["scroll_method"] = m.group(1)
-            result["mouse"]["left_handed"] = bool(
-                re.search(r"^\s*left-handed\s*$", mouse_block, re.MULTILINE)
-            )
-            result["mouse"]["middle_emulation"] = bool(
-                re.search(r"^\s*middle-emulation\s*$", mouse_block, re.MULTILINE)
-            )
-            result["mouse"]["scroll_button_lock"] = bool(
-                re.search(r"^\s*scroll-button-lock\s*$", mouse_block, re.MULTILINE)
-            )
-
-        # Trackpoint
-        if trackpoint_block:
-            m = re.search(r'accel-profile\s+"([^"]*)"', trackpoint_block)
-            if m:
-                result["trackpoint"]["accel_profile"] = m.group(1)
-            result["trackpoint"]["natural_scroll"] = bool(
-                re.search(r"^\s*natural-scroll\s*$", trackpoint_block, re.MULTILINE)
-            )
-            m = re.search(r"accel-speed\s+([\d.-]+)", trackpoint_block)
-            if m:
-                result["trackpoint"]["accel_speed"] = float(m.group(1))
-            m = re.search(r'scroll-method\s+"([^"]*)"', trackpoint_block)
-            if m:
-                result["trackpoint"]["scroll_method"] = m.group(1)
-            result["trackpoint"]["left_handed"] = bool(
-                re.search(r"^\s*left-handed\s*$", trackpoint_block, re.MULTILINE)
-            )
-            result["trackpoint"]["middle_emulation"] = bool(
-                re.search(r"^\s*middle-emulation\s*$", trackpoint_block, re.MULTILINE)
-            )
-            result["trackpoint"]["scroll_button_lock"] = bool(
-                re.search(r"^\s*scroll-button-lock\s*$", trackpoint_block, re.MULTILINE)
-            )
-
-        result["general"]["disable_power_key_handling"] = bool(
-            re.search(r"^\s*disable-power-key-handling\s*$", input_block, re.MULTILINE)
-        )
-        result["general"]["workspace_auto_back_and_forth"] = bool(
-            re.search(
-                r"^\s*workspace-auto-back-and-forth\s*$",
-                input_block,
-                re.MULTILINE,
-            )
-        )
-
-        m = re.search(r'^\s*mod-key\s+"([^"]*)"', input_block, re.MULTILINE)
-        if m:
-            result["general"]["mod_key"] = m.group(1)
-
-        m = re.search(r'^\s*mod-key-nested\s+"([^"]*)"', input_block, re.MULTILINE)
-        if m:
-            result["general"]["mod_key_nested"] = m.group(1)
-
-        m = re.search(
-            r'^\s*warp-mouse-to-focus(?:\s+mode="([^"]*)")?\s*$',
-            input_block,
-            re.MULTILINE,
-        )
-        if m:
+    doc = load_kdl(input_file)
+    input_node = doc.top("input")
+    cursor_node = doc.top("cursor")
+
+    if input_node is not None:
+        kb = input_node.child("keyboard")
+        if kb is not None:
+            xkb = kb.child("xkb")
+            if xkb is not None:
+                for prop in ("layout", "variant", "options"):
+                    value = xkb.string(prop)
+                    if value is not None:
+                        result["keyboard"][prop] = value
+            for prop in ("repeat-delay", "repeat-rate"):
+                value = kb.number(prop)
+                if value is not None:
+                    result["keyboard"][prop.replace("-", "_")] = int(value)
+            value = kb.string("track-layout")
+            if value is not None:
+                result["keyboard"]["track_layout"] = value
+            result["keyboard"]["numlock"] = kb.has("numlock")
+
+        # Touchpad, mouse and trackpoint share most of their settings
+        for device, flags in (
+            (
+                "touchpad",
+                (
+                    "tap",
+                    "natural-scroll",
+                    "dwt",
+                    "dwtp",
+                    "drag-lock",
+                    "disabled-on-external-mouse",
+                    "left-handed",
+                    "middle-emulation",
+                    "scroll-button-lock",
+                ),
+            ),
+            ("mouse", ("natural-scroll", "left-handed", "middle-emulation", "scroll-button-lock")),
+            ("trackpoint", ("natural-scroll", "left-handed", "middle-emulation", "scroll-button-lock")),
+        ):
+            node = input_node.child(device)
+            if node is None:
+                continue
+            for flag in flags:
+                result[device][flag.replace("-", "_")] = node.has(flag)
+            for prop in ("accel-profile", "tap-button-map", "click-method", "scroll-method"):
+                value = node.string(prop)
+                py_key = prop.replace("-", "_")
+                if value is not None and py_key in result[device]:
+                    result[device][py_key] = value
+            value = node.number("accel-speed")
+            if value is not None:
+                result[device]["accel_speed"] = float(value)
+
+        result["general"]["disable_power_key_handling"] = input_node.has("disable-power-key-handling")
+        result["general"]["workspace_auto_back_and_forth"] = input_node.has("workspace-auto-back-and-forth")
+
+        value = input_node.string("mod-key")
+        if value is not None:
+            result["general"]["mod_key"] = value
+        value = input_node.string("mod-key-nested")
+        if value is not None:
+            result["general"]["mod_key_nested"] = value
+
+        warp = input_node.child("warp-mouse-to-focus")
+        if warp is not None:
             result["general"]["warp_mouse_to_focus"] = True
-            result["general"]["warp_mouse_to_focus_mode"] = m.group(1) or "separate"
+            result["general"]["warp_mouse_to_focus_mode"] = warp.prop("mode") or "separate"
 
-        m = re.search(
-            r'^\s*focus-follows-mouse(?:\s+max-scroll-amount="(\d+)%")?\s*$',
-            input_block,
-            re.MULTILINE,
-        )
-        if m:
+        focus = input_node.child("focus-follows-mouse")
+        if focus is not None:
             result["general"]["focus_follows_mouse"] = True
-            if m.group(1):
+            m = re.fullmatch(r"(\d+)%", str(focus.prop("max-scroll-amount", "")))
+            if m:
                 result["general"]["focus_follows_mouse_max_scroll"] = int(m.group(1))
 
     # Cursor (top-level section, not inside input)
-    if cursor_block:
-        m = re.search(r'xcursor-theme\s+"([^"]*)"', cursor_block)
-        if m:
-            result["cursor"]["theme"] = m.group(1)
-        m = re.search(r"xcursor-size\s+(\d+)", cursor_block)
-        if m:
-            result["cursor"]["size"] = int(m.group(1))
-        result["cursor"]["hide_when_typing"] = bool(
-            re.search(r"^\s*hide-when-typing\s*$", cursor_block, re.MULTILINE)
-        )
+    if cursor_node is not None:
+        value = cursor_node.string("xcursor-theme")
+        if value is not None:
+            result["cursor"]["theme"] = value
+        value = cursor_node.number("xcursor-size")
+        if value is not None:
+            result["cursor"]["size"] = int(value)
+        result["cursor"]["hide_when_typing"] = cursor_node.has("hide-when-typing")
 
     print(json.dumps(result))
     return 0
 
 
-def _extract_block(content, section_name, top_level=False):
-    """Extract the content of a top-level block { ... } handling nested braces.
-    Returns the content BETWEEN the outermost braces, or None."""
-    bounds = _find_block_bounds(content, section_name, top_level=top_level)
-    if not bounds:
-        return None
-
-    _, inner_start, inner_end, _ = bounds
-    return content[inner_start:inner_end]
-
-
-def _find_block_bounds(content, section_name, top_level=False):
-    pattern = re.compile(rf"(?:^|\n)\s*{re.escape(section_name)}\s*\{{")
-    for match in pattern.finditer(content):
-        if top_level and _brace_depth_before(content, match.start()) != 0:
-            continue
-
-        inner_start = match.end()
-        depth = 1
-        i = inner_start
-        while i < len(content) and depth > 0:
-            if content[i] == "{":
-                depth += 1
-            elif content[i] == "}":
-                depth -= 1
-            i += 1
-
-        if depth == 0:
-            return match.start(), inner_start, i - 1, i
-
-    return None
-
-
-def _brace_depth_before(content, pos):
-    depth = 0
-    for ch in content[:pos]:
-        if ch == "{":
-            depth += 1
-        elif ch == "}" and depth > 0:
-            depth -= 1
-    return depth
-
-
-def _has_top_level_flag(block_content, flag_name):
-    depth = 0
-    for raw_line in block_content.splitlines():
-        stripped = raw_line.strip()
-        if depth == 0 and stripped == flag_name:
-            return True
-        depth += raw_line.count("{") - raw_line.count("}")
-    return False
-
-
 # ─── Layout ───────────────────────────────────────────────────────────
 
 
@@ -780,48 +1243,35 @@ def cmd_get_layout():
         print(json.dumps(result))
         return 0
 
-    content = layout_file.read_text()
-    layout_block = _extract_block(content, "layout", top_level=True)
+    doc = load_kdl(layout_file)
+    layout = doc.top("layout")
 
-    if layout_block:
-        m = re.search(r"gaps\s+([\d.]+)", layout_block)
-        if m:
-            result["gaps"] = int(float(m.group(1)))
+    if layout is not None:
+        value = layout.number("gaps")
+        if value is not None:
+            result["gaps"] = int(value)
 
-        m = re.search(r'center-focused-column\s+"([^"]*)"', layout_block)
-        if m:
-            result["center_focused"] = m.group(1)
+        value = layout.string("center-focused-column")
+        if value is not None:
+            result["center_focused"] = value
 
-        result["always_center_single_column"] = bool(
-            re.search(
-                r"^\s*always-center-single-column(?:\s+true)?\s*$",
-                layout_block,
-                re.MULTILINE,
-            )
-        )
-        result["empty_workspace_above_first"] = bool(
-            re.search(
-                r"^\s*empty-workspace-above-first(?:\s+true)?\s*$",
-                layout_block,
-                re.MULTILINE,
-            )
-        )
+        result["always_center_single_column"] = layout.flag("always-center-single-column")
+        result["empty_workspace_above_first"] = layout.flag("empty-workspace-above-first")
 
-        m = re.search(r'default-column-display\s+"([^"]*)"', layout_block)
-        if m:
-            result["default_column_display"] = m.group(1)
+        value = layout.string("default-column-display")
+        if value is not None:
+            result["default_column_display"] = value
 
         # Subsections with on/off flags
         for section in ["border", "focus-ring", "shadow"]:
-            block = _extract_block(layout_block, section)
+            block = layout.child(section)
             if block is not None:
                 py_key = section.replace("-", "_")
-                # "off" on its own line means disabled
-                has_off = bool(re.search(r"^\s*off\s*$", block, re.MULTILINE))
-                result[py_key]["enabled"] = not has_off
-                m = re.search(r"width\s+(\d+)", block)
-                if m and "width" in result[py_key]:
-                    result[py_key]["width"] = int(m.group(1))
+                # "off" means disabled
+                result[py_key]["enabled"] = not block.has("off")
+                value = block.number("width")
+                if value is not None and "width" in result[py_key]:
+                    result[py_key]["width"] = int(value)
                 # Parse color properties (border, focus-ring, shadow)
                 for color_key in [
                     "active-color",
@@ -829,35 +1279,36 @@ def cmd_get_layout():
                     "urgent-color",
                     "color",
                 ]:
-                    m = re.search(rf'{re.escape(color_key)}\s+"([^"]*)"', block)
-                    if m:
-                        py_color_key = color_key.replace("-", "_")
-                        if py_color_key in result[py_key]:
-                            result[py_key][py_color_key] = m.group(1)
+                    value = block.string(color_key)
+                    py_color_key = color_key.replace("-", "_")
+                    if value is not None and py_color_key in result[py_key]:
+                        result[py_key][py_color_key] = value
 
                 if py_key == "shadow":
                     for setting in ["softness", "spread"]:
-                        m = re.search(rf"{setting}\s+([\d.-]+)", block)
-                        if m:
-                            result[py_key][setting] = int(float(m.group(1)))
-                    m = re.search(r"offset\s+x=([\d.-]+)\s+y=([\d.-]+)", block)
-                    if m:
-                        result[py_key]["offset_x"] = int(float(m.group(1)))
-                        result[py_key]["offset_y"] = int(float(m.group(2)))
+                        value = block.number(setting)
+                        if value is not None:
+                            result[py_key][setting] = int(value)
+                    offset = block.child("offset")
+                    if offset is not None:
+                        x, y = offset.prop("x"), offset.prop("y")
+                        if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+                            result[py_key]["offset_x"] = int(x)
+                            result[py_key]["offset_y"] = int(y)
 
         # Struts
-        struts_block = _extract_block(layout_block, "struts")
-        if struts_block:
+        struts = layout.child("struts")
+        if struts is not None:
             for edge in ["left", "right", "top", "bottom"]:
-                m = re.search(rf"{edge}\s+(\d+)", struts_block)
-                if m:
-                    result["struts"][edge] = int(m.group(1))
+                value = struts.number(edge)
+                if value is not None:
+                    result["struts"][edge] = int(value)
 
-    overview_block = _extract_block(content, "overview", top_level=True)
-    if overview_block:
-        m = re.search(r"zoom\s+([\d.]+)", overview_block)
-        if m:
-            result["overview_zoom"] = float(m.group(1))
+    overview = doc.top("overview")
+    if overview is not None:
+        value = overview.number("zoom")
+        if value is not None:
+            result["overview_zoom"] = float(value)
 
     print(json.dumps(result))
     return 0
@@ -961,50 +1412,46 @@ def cmd_get_animations():
         print(json.dumps(result))
         return 0
 
-    content = anim_file.read_text()
-    anim_block = _extract_block(content, "animations", top_level=True)
+    anim = load_kdl(anim_file).top("animations")
 
-    if anim_block:
-        result["enabled"] = not _has_top_level_flag(anim_block, "off")
-        m = re.search(r"slowdown\s+([\d.]+)", anim_block)
-        if m:
-            result["slowdown"] = float(m.group(1))
+    if anim is not None:
+        result["enabled"] = not anim.has("off")
+        value = anim.number("slowdown")
+        if value is not None:
+            result["slowdown"] = float(value)
 
         for anim_type in ANIMATION_TYPES:
             anim_settings = dict(ANIMATION_DEFAULTS[anim_type])
-            type_block = _extract_block(anim_block, anim_type)
-            if type_block:
-                spring_match = re.search(r"spring\s+(.*)", type_block)
-                if spring_match:
+            type_block = anim.child(anim_type)
+            if type_block is not None and type_block.children:
+                spring = type_block.child("spring")
+                if spring is not None:
                     anim_settings["mode"] = "spring"
-                    params = spring_match.group(1)
                     for param, py_key in [
                         ("damping-ratio", "damping_ratio"),
                         ("stiffness", "stiffness"),
                         ("epsilon", "epsilon"),
                     ]:
-                        m = re.search(rf"{param}=([\d.]+)", params)
-                        if m:
-                            anim_settings[py_key] = float(m.group(1))
+                        value = spring.prop(param)
+                        if isinstance(value, (int, float)) and not isinstance(value, bool):
+                            anim_settings[py_key] = float(value)
                 else:
-                    duration_match = re.search(r"duration-ms\s+(\d+)", type_block)
-                    curve_match = re.search(r'curve\s+"([^"]*)"(.*)', type_block)
-                    if duration_match or curve_match:
+                    duration = type_block.number("duration-ms")
+                    curve = type_block.child("curve")
+                    if curve is not None and not isinstance(curve.arg(), str):
+                        curve = None
+                    if duration is not None or curve is not None:
                         anim_settings = {
                             "mode": "easing",
-                            "duration_ms": int(duration_match.group(1))
-                            if duration_match
-                            else 150,
-                            "curve": curve_match.group(1)
-                            if curve_match
-                            else "ease-out-expo",
-                            "curve_args": curve_match.group(2).strip()
-                            if curve_match
+                            "duration_ms": int(duration) if duration is not None else 150,
+                            "curve": curve.arg() if curve is not None else "ease-out-expo",
+                            # Everything after the curve name, e.g. cubic-bezier points
+                            "curve_args": curve.src[curve.args[0].end : curve.head_end].strip()
+                            if curve is not None
                             else "",
                         }
 
-                has_off = bool(re.search(r"^\s*off\s*$", type_block, re.MULTILINE))
-                if has_off:
+                if type_block.has("off"):
                     anim_settings["off"] = True
             result["types"][anim_type] = anim_settings
     else:
@@ -1031,44 +1478,32 @@ def cmd_get_window_rules():
         print(json.dumps(result))
         return 0
 
-    content = rules_file.read_text()
-
-    # Find all window-rule blocks
-    pos = 0
-    while True:
-        match = re.search(r"window-rule\s*\{", content[pos:])
-        if not match:
-            break
-        block_start = pos + match.end()
-        depth = 1
-        i = block_start
-        while i < len(content) and depth > 0:
-            if content[i] == "{":
-                depth += 1
-            elif content[i] == "}":
-                depth -= 1
-            i += 1
-        block = content[block_start : i - 1] if depth == 0 else ""
-        pos = i
+    for rule in load_kdl(rules_file).root.children:
+        if rule.name != "window-rule" or rule.children is None:
+            continue
 
         # Check if this is the inactive-opacity rule (has match is-active=false)
-        if re.search(r"match\s+is-active\s*=\s*false", block):
-            m = re.search(r"opacity\s+([\d.]+)", block)
-            if m:
-                result["inactive_opacity"] = float(m.group(1))
+        if _is_inactive_rule(rule):
+            value = rule.number("opacity")
+            if value is not None:
+                result["inactive_opacity"] = float(value)
         else:
             # General rule — corner radius / clip
-            m = re.search(r"geometry-corner-radius\s+(\d+)", block)
-            if m:
-                result["corner_radius"] = int(m.group(1))
-            m = re.search(r"clip-to-geometry\s+(true|false)", block)
-            if m:
-                result["clip_to_geometry"] = m.group(1) == "true"
+            value = rule.number("geometry-corner-radius")
+            if value is not None:
+                result["corner_radius"] = int(value)
+            clip = rule.child("clip-to-geometry")
+            if clip is not None and isinstance(clip.arg(), bool):
+                result["clip_to_geometry"] = clip.arg()
 
     print(json.dumps(result))
     return 0
 
 
+def _is_inactive_rule(rule):
+    return any(node.name == "match" and node.prop("is-active") is False for node in rule.children)
+
+
 # ─── Cursor Themes ────────────────────────────────────────────────────
 
 
@@ -1481,16 +1916,12 @@ def cmd_sync_cursor():
     theme = None
     size = None
     try:
-        content = Path(input_file).read_text()
-        cursor_block = _extract_block(content, "cursor", top_level=True)
-        if cursor_block:
-            m = re.search(r'xcursor-theme\s+"([^"]*)"', cursor_block)
-            if m:
-                theme = m.group(1)
-            m = re.search(r"xcursor-size\s+(\d+)", cursor_block)
-            if m:
-                size = int(m.group(1))
-    except OSError:
+        cursor = load_kdl(input_file).top("cursor")
+        if cursor is not None:
+            theme = cursor.string("xcursor-theme")
+            size = cursor.number("xcursor-size")
+            size = int(size) if size is not None else None
+    except (OSError, KdlError):
         pass
 
     if theme is None and size is None:
@@ -1509,7 +1940,7 @@ def _set_input(config_dir, key, value):
         print(json.dumps({"error": "input config file not found"}))
         return 1
 
-    content = input_file.read_text()
+    content = load_kdl(input_file).text
     parts = key.split(".", 1)
 
     if len(parts) == 1:
@@ -1663,7 +2094,7 @@ def _set_layout(config_dir, key, value):
         print(json.dumps({"error": "layout config file not found"}))
         return 1
 
-    content = layout_file.read_text()
+    content = load_kdl(layout_file).text
 
     if key == "gaps":
         content = _set_value_in_block(
@@ -1726,42 +2157,27 @@ def _set_animations(config_dir, key, value):
         print(json.dumps({"error": "animations config file not found"}))
         return 1
 
-    content = anim_file.read_text()
-
-    if key == "enabled":
-        anim_block = _extract_block(content, "animations", top_level=True)
-        if anim_block is None:
-            print(json.dumps({"error": "animations block not found"}))
-            return 1
+    content = load_kdl(anim_file).text
 
-        has_off = _has_top_level_flag(anim_block, "off")
+    doc = parse_kdl(content)
+    anim = doc.top("animations")
+    if anim is None or anim.children is None:
+        print(json.dumps({"error": "animations block not found"}))
+        return 1
 
-        if value == "on" and has_off:
-            content = re.sub(
-                r"(animations\s*\{)\s*\n\s*off\s*\n",
-                r"\g<1>\n",
-                content,
-                count=1,
-            )
-        elif value == "off" and not has_off:
-            content = re.sub(
-                r"(animations\s*\{)\s*\n",
-                r"\g<1>\n    off\n",
-                content,
-                count=1,
-            )
+    if key == "enabled":
+        off = anim.child("off")
+        if value == "on" and off is not None:
+            content = _kdl_remove(doc, off)
+        elif value == "off" and off is None:
+            content = _kdl_insert_child(doc, anim, "off", first=True)
 
     elif key == "slowdown":
-        anim_block = _extract_block(content, "animations", top_level=True)
-        if anim_block and "slowdown" in anim_block:
-            content = re.sub(r"(slowdown\s+)[\d.]+", rf"\g<1>{value}", content, count=1)
+        slowdown = anim.child("slowdown")
+        if slowdown is not None:
+            content = _kdl_replace(doc, slowdown, f"slowdown {value}")
         else:
-            content = re.sub(
-                r"(animations\s*\{)\s*\n",
-                rf"\g<1>\n    slowdown {value}\n",
-                content,
-                count=1,
-            )
+            content = _kdl_insert_child(doc, anim, f"slowdown {value}", first=True)
 
     elif "." in key:
         # Per-type spring param: e.g. "window-open.damping-ratio" "0.98"
@@ -1773,55 +2189,28 @@ def _set_animations(config_dir, key, value):
             print(json.dumps({"error": f"Unknown spring param: {param}"}))
             return 1
 
-        anim_block = _extract_block(content, "animations", top_level=True)
-        if anim_block is None:
-            print(json.dumps({"error": "animations block not found"}))
-            return 1
-
-        type_block = _extract_block(anim_block, anim_type)
+        type_block = anim.child(anim_type)
+        if type_block is not None and type_block.children is None:
+            type_block = None
 
         if param == "enabled":
-            if type_block:
-                content = _toggle_flag(content, anim_type, "off", value != "on")
+            if type_block is not None:
+                content = _kdl_toggle_flag(doc, type_block, "off", value != "on")
             elif value != "on":
-                content = re.sub(
-                    r"(animations\s*\{)\s*\n",
-                    rf"\g<1>\n    {anim_type} {{\n        off\n    }}\n",
-                    content,
-                    count=1,
-                )
+                content = _kdl_insert_child(doc, anim, f"{anim_type} {{\n    off\n}}", first=True)
             return _write_validated(anim_file, content)
 
-        if type_block:
-            spring_match = re.search(r"spring\s+(.*)", type_block)
-            if spring_match:
-                old_spring_line = spring_match.group(0)
-                # Replace the specific param in the spring line
-                if re.search(rf"{re.escape(param)}=[\d.]+", old_spring_line):
-                    new_spring_line = re.sub(
-                        rf"{re.escape(param)}=[\d.]+",
-                        f"{param}={value}",
-                        old_spring_line,
-                    )
-                else:
-                    new_spring_line = old_spring_line + f" {param}={value}"
-                content = content.replace(old_spring_line, new_spring_line, 1)
+        if type_block is not None:
+            spring = type_block.child("spring")
+            if spring is not None:
+                content = _kdl_set_prop(doc, spring, param, value)
             else:
                 # No spring line yet — add one
-                type_pattern = rf"({re.escape(anim_type)}\s*\{{)"
-                content = re.sub(
-                    type_pattern,
-                    rf"\g<1>\n        spring {param}={value}",
-                    content,
-                    count=1,
-                )
+                content = _kdl_insert_child(doc, type_block, f"spring {param}={value}", first=True)
         else:
             # Animation type block doesn't exist — create it
-            content = re.sub(
-                r"(animations\s*\{)\s*\n",
-                rf"\g<1>\n    {anim_type} {{\n        spring {param}={value}\n    }}\n",
-                content,
-                count=1,
+            content = _kdl_insert_child(
+                doc, anim, f"{anim_type} {{\n    spring {param}={value}\n}}", first=True
             )
 
     else:
@@ -1837,35 +2226,25 @@ def _set_window_rules(config_dir, key, value):
         print(json.dumps({"error": "window rules config file not found"}))
         return 1
 
-    content = rules_file.read_text()
+    content = load_kdl(rules_file).text
 
-    if key == "corner-radius":
-        if re.search(r"geometry-corner-radius\s+\d+", content):
-            content = re.sub(
-                r"(geometry-corner-radius\s+)\d+",
-                rf"\g<1>{value}",
-                content,
-                count=1,
-            )
-        else:
+    doc = parse_kdl(content)
+    rules = [node for node in doc.root.children if node.name == "window-rule" and node.children is not None]
+
+    if key in ("corner-radius", "clip-to-geometry"):
+        prop = "geometry-corner-radius" if key == "corner-radius" else key
+        existing = doc.find(prop)
+        if existing is not None:
+            content = _kdl_replace(doc, existing, f"{prop} {value}")
+        elif rules:
             # Insert in first window-rule block
-            content = re.sub(
-                r"(window-rule\s*\{)\s*\n",
-                rf"\g<1>\n    geometry-corner-radius {value}\n",
-                content,
-                count=1,
-            )
+            content = _kdl_insert_child(doc, rules[0], f"{prop} {value}", first=True)
 
     elif key == "inactive-opacity":
         # Find the inactive rule block (has match is-active=false)
-        inactive_pattern = r"(window-rule\s*\{[^}]*match\s+is-active\s*=\s*false[^}]*)(opacity\s+[\d.]+)"
-        if re.search(inactive_pattern, content, re.DOTALL):
-            content = re.sub(
-                r"(match\s+is-active\s*=\s*false\s*\n\s*)(opacity\s+)[\d.]+",
-                rf"\g<1>\g<2>{value}",
-                content,
-                count=1,
-            )
+        inactive = next((rule for rule in rules if _is_inactive_rule(rule)), None)
+        if inactive is not None:
+            content = _kdl_set_child(doc, inactive, "opacity", value)
         else:
             # No inactive rule exists — append one
             content = (
@@ -1873,22 +2252,6 @@ def _set_window_rules(config_dir, key, value):
                 + f"\n\nwindow-rule {{\n    match is-active=false\n    opacity {value}\n}}\n"
             )
 
-    elif key == "clip-to-geometry":
-        if re.search(r"clip-to-geometry\s+(true|false)", content):
-            content = re.sub(
-                r"(clip-to-geometry\s+)(true|false)",
-                rf"\g<1>{value}",
-                content,
-                count=1,
-            )
-        else:
-            content = re.sub(
-                r"(window-rule\s*\{)\s*\n",
-                rf"\g<1>\n    clip-to-geometry {value}\n",
-                content,
-                count=1,
-            )
-
     else:
         print(json.dumps({"error": f"Unknown window-rules key: {key}"}))
         return 1
@@ -1920,51 +2283,24 @@ def _write_validated(filepath, content):
 def _toggle_flag(content, parent_section, flag_name, enable, top_level=False):
     """Toggle a standalone flag (like `tap`, `natural-scroll`, `numlock`)
     inside a KDL subsection. Enable=True adds/uncomments, Enable=False
-    removes/comments the flag line."""
-    escaped_flag = re.escape(flag_name)
-
-    bounds = _find_block_bounds(content, parent_section, top_level=top_level)
-    if bounds is None:
+    removes the flag line."""
+    doc = parse_kdl(content)
+    parent = doc.section(parent_section, top_level=top_level)
+    if parent is None:
         return content
+    return _kdl_toggle_flag(doc, parent, flag_name, enable)
 
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-
-    # Check if flag exists (uncommented)
-    has_flag = bool(re.search(rf"^\s*{escaped_flag}\s*$", block_content, re.MULTILINE))
-    # Check if flag exists commented out
-    has_commented = bool(
-        re.search(rf"^\s*//\s*{escaped_flag}\s*$", block_content, re.MULTILINE)
-    )
-
-    if enable and has_flag:
-        return content  # Already enabled
-    elif enable and has_commented:
-        # Uncomment
-        new_block = re.sub(
-            rf"^(\s*)//\s*{escaped_flag}\s*$",
-            rf"\g<1>{flag_name}",
-            block_content,
-            flags=re.MULTILINE,
-            count=1,
-        )
-    elif enable:
-        # Add flag — find good insertion point (before closing brace)
-        new_block = block_content.rstrip() + f"\n        {flag_name}\n    "
-    elif not enable and has_flag:
-        new_block = re.sub(
-            rf"^[ \t]*{escaped_flag}[ \t]*\n",
-            "",
-            block_content,
-            flags=re.MULTILINE,
-            count=1,
-        )
-    elif not enable and has_commented:
-        return content  # Already disabled
-    else:
-        return content  # Flag doesn't exist and we want it off — nothing to do
 
-    return content[:inner_start] + new_block + content[inner_end:]
+def _kdl_toggle_flag(doc, parent, flag_name, enable):
+    flag = parent.child(flag_name)
+    if not enable:
+        return _kdl_remove(doc, flag) if flag is not None else doc.text
+    if flag is not None:
+        return doc.text  # Already enabled
+    for node in parent.commented_children():
+        if node.name == flag_name and not node.entries and node.children is None:
+            return _kdl_uncomment(doc, node)
+    return _kdl_insert_child(doc, parent, flag_name)
 
 
 def _set_value_in_subsection(content, section, prop, value):
@@ -1973,109 +2309,61 @@ def _set_value_in_subsection(content, section, prop, value):
 
 
 def _remove_key_from_section(content, section, prop, top_level=False):
-    bounds = _find_block_bounds(content, section, top_level=top_level)
-    if not bounds:
+    doc = parse_kdl(content)
+    block = doc.section(section, top_level=top_level)
+    node = block.child(prop) if block is not None else None
+    if node is None:
         return content
-
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-    new_block = _remove_key_from_block_content(block_content, prop)
-    return content[:inner_start] + new_block + content[inner_end:]
+    return _kdl_remove(doc, node)
 
 
 def _ensure_subsection(content, parent_section, subsection):
-    parent_bounds = _find_block_bounds(content, parent_section, top_level=True)
-    if not parent_bounds:
-        return content
-
-    if _find_block_bounds(content, subsection):
+    doc = parse_kdl(content)
+    parent = doc.section(parent_section, top_level=True)
+    if parent is None or doc.section(subsection) is not None:
         return content
-
-    _, inner_start, inner_end, _ = parent_bounds
-    parent_content = content[inner_start:inner_end]
-    new_parent_content = parent_content.rstrip() + f"\n    {subsection} {{\n    }}\n"
-    return content[:inner_start] + new_parent_content + content[inner_end:]
+    return _kdl_insert_child(doc, parent, f"{subsection} {{\n}}")
 
 
 def _set_value_in_block(content, section, prop, value, top_level=False):
-    bounds = _find_block_bounds(content, section, top_level=top_level)
-    if not bounds:
+    doc = parse_kdl(content)
+    block = doc.section(section, top_level=top_level)
+    if block is None:
         return content
-
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-    new_block = _set_in_block(block_content, prop, value)
-    return content[:inner_start] + new_block + content[inner_end:]
+    return _kdl_set_child(doc, block, prop, value)
 
 
 def _toggle_subsection_enabled(content, section, enable):
     """Toggle the `off` flag inside a subsection block (border, focus-ring, shadow)."""
-    bounds = _find_block_bounds(content, section)
-    if not bounds:
+    doc = parse_kdl(content)
+    block = doc.section(section)
+    if block is None:
         return content
 
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-    has_off = bool(re.search(r"^\s*off\s*$", block_content, re.MULTILINE))
-
-    if enable and has_off:
-        new_block = re.sub(
-            r"^[ \t]*off\s*\n", "", block_content, flags=re.MULTILINE, count=1
-        )
-    elif not enable and not has_off:
-        new_block = "\n        off\n" + block_content.lstrip("\n")
-    else:
-        return content  # Already in desired state
-
-    return content[:inner_start] + new_block + content[inner_end:]
-
-
-def _remove_key_from_block_content(block_content, key):
-    return re.sub(
-        rf"\n?\s*{re.escape(key)}\b[^\n]*",
-        "",
-        block_content,
-        count=1,
-    )
+    off = block.child("off")
+    if enable and off is not None:
+        return _kdl_remove(doc, off)
+    if not enable and off is None:
+        return _kdl_insert_child(doc, block, "off", first=True)
+    return content  # Already in desired state
 
 
 def _set_xkb_value(content, prop, value):
-    kb_bounds = _find_block_bounds(content, "keyboard")
-    if not kb_bounds:
+    doc = parse_kdl(content)
+    keyboard = doc.section("keyboard")
+    if keyboard is None:
         return content
 
-    kb_start, kb_inner_start, kb_inner_end, kb_end = kb_bounds
-    kb_content = content[kb_inner_start:kb_inner_end]
-    xkb_bounds = _find_block_bounds(kb_content, "xkb")
-    if not xkb_bounds:
+    xkb = keyboard.child("xkb")
+    if xkb is None or xkb.children is None:
         if not value:
             return content
-        opening_line = content[kb_start:kb_inner_start].splitlines()[-1]
-        keyboard_indent = re.match(r"\s*", opening_line).group(0)
-        xkb_indent = keyboard_indent + "    "
-        prop_indent = xkb_indent + "    "
-        trailing = kb_content[len(kb_content.rstrip()) :]
-        if not trailing:
-            trailing = "\n" + keyboard_indent
-        new_xkb_block = (
-            f'{xkb_indent}xkb {{\n'
-            f'{prop_indent}{prop} "{value}"\n'
-            f"{xkb_indent}}}"
-        )
-        new_kb_content = kb_content.rstrip() + "\n" + new_xkb_block + trailing
-        return content[:kb_inner_start] + new_kb_content + content[kb_inner_end:]
+        return _kdl_insert_child(doc, keyboard, f'xkb {{\n    {prop} "{value}"\n}}')
 
-    _, xkb_inner_start, xkb_inner_end, _ = xkb_bounds
-    xkb_content = kb_content[xkb_inner_start:xkb_inner_end]
     if value:
-        new_xkb_content = _set_in_block(xkb_content, prop, f'"{value}"')
-    else:
-        new_xkb_content = _remove_key_from_block_content(xkb_content, prop)
-
-    new_kb_content = (
-        kb_content[:xkb_inner_start] + new_xkb_content + kb_content[xkb_inner_end:]
-    )
-    return content[:kb_inner_start] + new_kb_content + content[kb_inner_end:]
+        return _kdl_set_child(doc, xkb, prop, f'"{value}"')
+    node = xkb.child(prop)
+    return _kdl_remove(doc, node) if node is not None else content
 
 
 def _set_shadow_offset(content, value):
@@ -2405,45 +2693,46 @@ def _kb_categorize(description: str, action: str) -> str:
     return "Other"
 
 
-def _kb_find_in_block(block_lines: list, key_combo: str, check_commented: bool = False):
-    """Locate a keybind in block_lines.
+# Key names as the binds block uses them: XF86AudioMute, Mod+Shift+Slash...
+_KB_KEY_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9+_]*")
 
-    Returns (start_idx, end_idx_exclusive) covering all lines of the bind
-    (including any multi-line body), or None if not found.
-    """
-    escaped = re.escape(key_combo)
-    for i, raw_line in enumerate(block_lines):
-        stripped = raw_line.strip()
-        if check_commented:
-            if not stripped.startswith("//"):
-                continue
-            candidate = stripped[2:].lstrip()
-        else:
-            if stripped.startswith("//"):
-                continue
-            candidate = stripped
 
-        if not re.match(rf"^{escaped}(?:\s|$|\{{)", candidate):
-            continue
+def _kb_is_bind(node):
+    return node.children is not None and _KB_KEY_RE.fullmatch(node.name) is not None
 
-        # Single-line: { action; } on the same line
-        if re.search(r"\{[^}]*\}", candidate):
-            return (i, i + 1)
-        # Multi-line block: opening { without matching } on same line
-        if "{" in candidate:
-            depth = candidate.count("{") - candidate.count("}")
-            j = i + 1
-            while j < len(block_lines) and depth > 0:
-                inner = block_lines[j].strip()
-                depth += inner.count("{") - inner.count("}")
-                j += 1
-            return (i, j)
-        # Line with no brace at all — treat as single line
-        return (i, i + 1)
 
+def _kb_find(binds, key_combo, commented=False):
+    """The bind for key_combo in the binds block, or with commented=True the
+    bind commented out there."""
+    nodes = binds.commented_children() if commented else binds.children
+    for node in nodes:
+        if node.name == key_combo and node.children is not None:
+            return node
     return None
 
 
+def _kb_bind_lines(doc, node):
+    """(start, end) of the lines holding the bind, without the final newline."""
+    if node.comment_span is not None:
+        return node.comment_span
+    lines = _kdl_lines(doc.text, node.start, node.stmt_end)
+    return lines if lines is not None else (node.start, node.stmt_end)
+
+
+def _kb_load_binds(binds_file):
+    """The parsed binds file and its top-level binds block, or None after
+    printing the error."""
+    if not binds_file.exists():
+        print(json.dumps({"error": f"Binds file not found: {binds_file}"}))
+        return None
+    doc = load_kdl(binds_file)
+    binds = doc.section("binds", top_level=True)
+    if binds is None:
+        print(json.dumps({"error": "No binds { } block found in file"}))
+        return None
+    return doc, binds
+
+
 # ─── Keybind commands ──────────────────────────────────────────────────
 
 
@@ -2455,96 +2744,42 @@ def cmd_get_binds():
     category, description, line_number (1-based, in the file), commented.
     """
     binds_file = resolve_niri_section_file("config.d/70-binds.kdl")
-    if not binds_file.exists():
-        print(json.dumps({"error": f"Binds file not found: {binds_file}"}))
-        return 1
-
-    content = binds_file.read_text()
-    bounds = _find_block_bounds(content, "binds", top_level=True)
-    if not bounds:
-        print(json.dumps({"error": "No binds { } block found in file"}))
+    loaded = _kb_load_binds(binds_file)
+    if loaded is None:
         return 1
+    doc, binds = loaded
 
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-
-    # Line number of the first character inside the block (1-based in the full file)
-    base_line = content[:inner_start].count("\n") + 1
+    nodes = [node for node in binds.children if _kb_is_bind(node)]
+    nodes += [node for node in binds.commented_children() if _kb_is_bind(node)]
+    nodes.sort(key=lambda node: node.comment_span[0] if node.comment_span else node.start)
 
     all_binds = []
-    block_lines = block_content.split("\n")
-    i = 0
-    while i < len(block_lines):
-        raw_line = block_lines[i]
-        stripped = raw_line.strip()
-
-        # Determine whether this is a commented-out bind
-        commented = False
-        candidate = stripped
-        if stripped.startswith("//"):
-            inner = stripped[2:].lstrip()
-            # Only promote to "commented bind" if it matches the keybind pattern
-            if re.match(r"^[A-Za-z0-9_][A-Za-z0-9+_]*\s*(?:[^{]*?)\{", inner):
-                commented = True
-                candidate = inner
-
-        if not candidate or (stripped.startswith("//") and not commented):
-            i += 1
-            continue
-
-        match = re.match(r"^([A-Za-z0-9_][A-Za-z0-9+_]*)\s*(.*?)(\{.*)$", candidate)
-        if not match:
-            i += 1
-            continue
-
-        key_combo = match.group(1)
-        # Strip hotkey-overlay-title from the options string — it's KDL metadata, not a bind option
-        options_raw = match.group(2).strip()
-        options_clean = re.sub(
-            r'\s*hotkey-overlay-title="[^"]*"', "", options_raw
-        ).strip()
-        rest = match.group(3)
-
-        line_number = base_line + i
-
-        action_raw = ""
-        action = ""
-        if re.search(r"\{[^}]*\}", rest):
-            # Single-line: extract the content between { and }
-            m = re.search(r"\{\s*(.*?)\s*\}", rest)
-            if m:
-                action_raw = m.group(1).strip()
-                action = action_raw.rstrip(";")
-        elif "{" in rest:
-            # Multi-line: collect lines until the closing }
-            action_lines = []
-            i += 1
-            while i < len(block_lines):
-                inner_line = block_lines[i].strip()
-                if inner_line == "}":
-                    break
-                if inner_line and not inner_line.startswith("//"):
-                    action_lines.append(inner_line)
-                i += 1
-            action_raw = " ".join(action_lines)
-            action = " ".join(ln.rstrip(";") for ln in action_lines)
+    for node in nodes:
+        commented = node.comment_span is not None
+        # hotkey-overlay-title is KDL metadata, not a bind option
+        options = " ".join(
+            node.src[value.entry_start : value.end]
+            for key, value in node.entries
+            if key != "hotkey-overlay-title"
+        )
+        action_raw = " ".join(node.src[child.start : child.stmt_end] for child in node.children)
+        action = " ".join(node.src[child.start : child.end] for child in node.children)
 
         description = _kb_generate_comment(action)
         category = _kb_categorize(description, action)
 
         all_binds.append(
             {
-                "key_combo": key_combo,
-                "options": options_clean,
+                "key_combo": node.name,
+                "options": options,
                 "action": action,
                 "action_raw": action_raw,
                 "category": category,
                 "description": description,
-                "line_number": line_number,
+                "line_number": doc.line(node.comment_span[0] if commented else node.start),
                 "commented": commented,
             }
         )
-        i += 1
 
     _KB_CATEGORY_ORDER = [
         "System",
@@ -2620,51 +2855,25 @@ def cmd_set_bind(args):
 
     binds_file = resolve_niri_section_file("config.d/70-binds.kdl")
     binds_file.parent.mkdir(parents=True, exist_ok=True)
-    if not binds_file.exists():
-        print(json.dumps({"error": f"Binds file not found: {binds_file}"}))
-        return 1
-
-    content = binds_file.read_text()
-    bounds = _find_block_bounds(content, "binds", top_level=True)
-    if not bounds:
-        print(json.dumps({"error": "No binds { } block found in file"}))
+    loaded = _kb_load_binds(binds_file)
+    if loaded is None:
         return 1
+    doc, binds = loaded
 
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-    block_lines = block_content.split("\n")
+    if options:
+        entry = f"{key_combo} {options} {{ {action}; }}"
+    else:
+        entry = f"{key_combo} {{ {action}; }}"
 
     # Prefer active bind match; fall back to commented
-    span = _kb_find_in_block(block_lines, key_combo, check_commented=False)
-    if span is None:
-        span = _kb_find_in_block(block_lines, key_combo, check_commented=True)
-
-    if span is not None:
-        start_idx, end_idx = span
+    node = _kb_find(binds, key_combo) or _kb_find(binds, key_combo, commented=True)
+    if node is not None:
+        start, end = _kb_bind_lines(doc, node)
         # Preserve the indentation of the original first line
-        original_indent = re.match(r"^([ \t]*)", block_lines[start_idx]).group(1)
-        if options:
-            replacement = f"{original_indent}{key_combo} {options} {{ {action}; }}"
-        else:
-            replacement = f"{original_indent}{key_combo} {{ {action}; }}"
-        new_block_lines = (
-            block_lines[:start_idx] + [replacement] + block_lines[end_idx:]
-        )
+        indent = re.match(r"[ \t]*", doc.text[start:end]).group()
+        new_content = doc.splice(start, end, indent + entry)
     else:
-        # Append before trailing blank lines (which sit just before the closing })
-        if options:
-            new_entry = f"    {key_combo} {options} {{ {action}; }}"
-        else:
-            new_entry = f"    {key_combo} {{ {action}; }}"
-        insert_at = len(block_lines)
-        while insert_at > 0 and not block_lines[insert_at - 1].strip():
-            insert_at -= 1
-        new_block_lines = (
-            block_lines[:insert_at] + [new_entry, ""] + block_lines[insert_at:]
-        )
-
-    new_block_content = "\n".join(new_block_lines)
-    new_content = content[:inner_start] + new_block_content + content[inner_end:]
+        new_content = _kdl_insert_child(doc, binds, entry)
     return _write_validated(binds_file, new_content)
 
 
@@ -2683,74 +2892,38 @@ def cmd_remove_bind(args):
     key_combo = args[0]
 
     binds_file = resolve_niri_section_file("config.d/70-binds.kdl")
-    if not binds_file.exists():
-        print(json.dumps({"error": f"Binds file not found: {binds_file}"}))
-        return 1
-
-    content = binds_file.read_text()
-    bounds = _find_block_bounds(content, "binds", top_level=True)
-    if not bounds:
-        print(json.dumps({"error": "No binds { } block found in file"}))
+    loaded = _kb_load_binds(binds_file)
+    if loaded is None:
         return 1
+    doc, binds = loaded
 
-    _, inner_start, inner_end, _ = bounds
-    block_content = content[inner_start:inner_end]
-    block_lines = block_content.split("\n")
-
-    span = _kb_find_in_block(block_lines, key_combo, check_commented=False)
-    if span is None:
+    node = _kb_find(binds, key_combo)
+    if node is None:
         print(json.dumps({"error": f"Active bind not found: {key_combo}"}))
         return 1
 
-    start_idx, end_idx = span
+    start, end = _kb_bind_lines(doc, node)
+    start = doc.text.rfind("\n", 0, start) + 1
+
+    # If the immediately preceding non-empty line is a plain description comment
+    # (not a section-header divider containing ═), comment it out too so the whole
+    # block looks like a commented-out entry.
+    before = doc.text[binds.body_start : start].rstrip()
+    prev_start = max(before.rfind("\n") + 1, 0)
+    prev_stripped = before[prev_start:].strip()
+    if prev_stripped.startswith("//") and "═" not in prev_stripped:
+        start = binds.body_start + prev_start
 
-    # Comment out every line in the bind span
+    # Comment out every line, preserving indentation
     commented_lines = []
-    for line in block_lines[start_idx:end_idx]:
+    for line in doc.text[start:end].split("\n"):
         if line.strip():
-            lead = re.match(r"^([ \t]*)", line).group(1)
+            lead = re.match(r"[ \t]*", line).group()
             commented_lines.append(f"{lead}// {line[len(lead) :]}")
         else:
             commented_lines.append(line)
 
-    # If the immediately preceding non-empty line is a plain description comment
-    # (not a section-header divider containing ═), comment it out too so the whole
-    # block looks like a commented-out entry.
-    prev_idx = start_idx - 1
-    while prev_idx >= 0 and not block_lines[prev_idx].strip():
-        prev_idx -= 1
-
-    extra_prefix = []
-    if prev_idx >= 0:
-        prev_stripped = block_lines[prev_idx].strip()
-        is_desc_comment = (
-            prev_stripped.startswith("//")
-            and "\u2550" not in prev_stripped  # ═ character used in section headers
-            and "═" not in prev_stripped
-        )
-        if is_desc_comment:
-            prev_line = block_lines[prev_idx]
-            lead = re.match(r"^([ \t]*)", prev_line).group(1)
-            extra_prefix = [f"{lead}// {prev_line[len(lead) :]}"]
-            # Replace the original description line with the double-commented version
-            new_block_lines = (
-                block_lines[:prev_idx]
-                + extra_prefix
-                + commented_lines
-                + block_lines[end_idx:]
-            )
-        else:
-            new_block_lines = (
-                block_lines[:start_idx] + commented_lines + block_lines[end_idx:]
-            )
-    else:
-        new_block_lines = (
-            block_lines[:start_idx] + commented_lines + block_lines[end_idx:]
-        )
-
-    new_block_content = "\n".join(new_block_lines)
-    new_content = content[:inner_start] + new_block_content + content[inner_end:]
-    return _write_validated(binds_file, new_content)
+    return _write_validated(binds_file, doc.splice(start, end, "\n".join(commented_lines)))
 
 
 # ─── Main ─────────────────────────────────────────────────────────────
@@ -2793,7 +2966,11 @@ def main():
         print(json.dumps({"error": f"Unknown command: {cmd}"}))
         return 1
 
-    return fn()
+    try:
+        return fn()
+    except KdlError as e:
+        print(json.dumps({"error": f"Cannot parse the Niri config: {e}"}))
+        return 1
 
 
 if __name__ == "__main__":
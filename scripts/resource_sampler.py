@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+System metrics sampler for services/ResourceUsage.qml.
+
+Keeps /proc/stat, /proc/meminfo, /proc/diskstats and the temperature inputs
+picked by detect_sensors.py open, reads them with os.pread when each metric is
+due and prints one compact JSON line per tick holding only the metrics sampled
+in it:
+
+  {"cpu": 0.1234,
+   "memory": {"total": kB, "available": kB, "swapTotal": kB, "swapFree": kB},
+   "temperature": {"cpu": 45.0, "gpu": 51.0},
+   "disk": {"total": B, "used": B, "read": B/s, "write": B/s},
+   "gpu": 0.31, "gpuSuspended": false}
+
+CPU usage and disk throughput are deltas against the previous sample of the
+same metric. Disk usage is statvfs("/"), as reported by `df`.
+
+Settings arrive on stdin as JSON objects, one per line, merged into the
+current ones:
+
+  {"intervals": {"cpu": ms, "memory": ms, "temperature": ms, "disk": ms, "gpu": ms},
+   "slowdown": N,          # interval multiplier applied while "slow" is true
+   "slow": bool,
+   "gpuBusyPath": path,    # DRM gpu_busy_percent ("" = no sysfs GPU usage)
+   "dgpuStatusPath": path, # hybrid dGPU power/runtime_status ("" = none)
+   "gpuTemperature": bool,
+   "sample": true}         # sample everything now
+
+The sampler exits when stdin closes.
+"""
+
+import json
+import os
+import selectors
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from detect_sensors import SensorWatcher  # noqa: E402
+
+METRICS = ("cpu", "memory", "temperature", "disk", "gpu")
+DEFAULT_SETTINGS = {
+    "intervals": {"cpu": 3000, "memory": 3000, "temperature": 3000, "disk": 30000, "gpu": 3000},
+    "slowdown": 4,
+    "slow": False,
+    "gpuBusyPath": "",
+    "dgpuStatusPath": "",
+    "gpuTemperature": True,
+}
+# CPU usage needs two samples; take the second one early instead of showing
+# nothing for a whole interval after startup
+FIRST_CPU_DELAY = 0.5
+_MEMINFO_KEYS = {
+    b"MemTotal:": "total",
+    b"MemAvailable:": "available",
+    b"SwapTotal:": "swapTotal",
+    b"SwapFree:": "swapFree",
+}
+# /proc/diskstats counts 512-byte sectors regardless of the device block size
+_SECTOR_SIZE = 512
+
+
+def _open(path):
+    try:
+        return os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        return None
+
+
+def _pread_all(fd, chunk=65536):
+    data = b""
+    while True:
+        part = os.pread(fd, chunk, len(data))
+        data += part
+        if len(part) < chunk:
+            return data
+
+
+def _physical_disks():
+    # Block devices without a backing `device` link (loop, dm, md, zram) stack
+    # on top of physical disks and would count their I/O twice
+    try:
+        return {name for name in os.listdir("/sys/block") if os.path.exists(f"/sys/block/{name}/device")}
+    except OSError:
+        return set()
+
+
+class Sampler:
+    def __init__(self):
+        self.stat_fd = _open("/proc/stat")
+        self.meminfo_fd = _open("/proc/meminfo")
+        self.diskstats_fd = _open("/proc/diskstats")
+        self.sensors = SensorWatcher()
+        self.disks = _physical_disks()
+        self.gpu_busy_fd = None
+        self.dgpu_status_fd = None
+        self._gpu_paths = ("", "")
+        self._prev_cpu = self._read_cpu_times()
+        self._prev_disk = None
+
+    def set_gpu_paths(self, busy_path, status_path):
+        if (busy_path, status_path) == self._gpu_paths:
+            return
+        for fd in (self.gpu_busy_fd, self.dgpu_status_fd):
+            if fd is not None:
+                os.close(fd)
+        self.gpu_busy_fd = _open(busy_path) if busy_path else None
+        self.dgpu_status_fd = _open(status_path) if status_path else None
+        self._gpu_paths = (busy_path, status_path)
+
+    def _read_cpu_times(self):
+        if self.stat_fd is None:
+            return None
+        # The aggregate "cpu" line comes first; no need for per-CPU and irq lines
+        line = os.pread(self.stat_fd, 256, 0).split(b"\n", 1)[0].split()
+        if not line or line[0] != b"cpu":
+            return None
+        stats = [int(v) for v in line[1:8]]
+        # idle + iowait = not working
+        return sum(stats), stats[3] + stats[4]
+
+    def _read_disk_sectors(self):
+        if self.diskstats_fd is None:
+            return None
+        read = written = 0
+        for line in _pread_all(self.diskstats_fd).splitlines():
+            fields = line.split()
+            if len(fields) >= 10 and fields[2].decode() in self.disks:
+                read += int(fields[5])
+                written += int(fields[9])
+        return time.monotonic(), read, written
+
+    def cpu(self):
+        current = self._read_cpu_times()
+        previous, self._prev_cpu = self._prev_cpu, current
+        if current is None or previous is None:
+            return None
+        total = current[0] - previous[0]
+        idle = current[1] - previous[1]
+        return round(1 - idle / total, 4) if total > 0 else 0.0
+
+    def memory(self):
+        if self.meminfo_fd is None:
+            return None
+        values = {}
+        for line in os.pread(self.meminfo_fd, 8192, 0).splitlines():
+            key = _MEMINFO_KEYS.get(line.split(b" ", 1)[0])
+            if key:
+                values[key] = int(line.split()[1])
+        return values
+
+    def temperature(self, gpu=True):
+        return self.sensors.read(None if gpu else ("cpu",))
+
+    def disk(self):
+        result = {}
+        try:
+            st = os.statvfs("/")
+            result["total"] = st.f_blocks * st.f_frsize
+            result["used"] = (st.f_blocks - st.f_bfree) * st.f_frsize
+        except OSError:
+            pass
+        disks = _physical_disks()
+        if disks != self.disks:
+            # A disk came or went: restart the throughput baseline
+            self.disks = disks
+            self._prev_disk = None
+        current = self._read_disk_sectors()
+        previous, self._prev_disk = self._prev_disk, current
+        if current is not None and previous is not None and current[0] > previous[0]:
+            elapsed = current[0] - previous[0]
+            result["read"] = round(max(0, current[1] - previous[1]) * _SECTOR_SIZE / elapsed)
+            result["write"] = round(max(0, current[2] - previous[2]) * _SECTOR_SIZE / elapsed)
+        return result
+
+    def gpu_suspended(self):
+        # runtime_status is answered by the kernel without waking the device;
+        # None when there is no hybrid dGPU to watch
+        if self.dgpu_status_fd is None:
+            return None
+        try:
+            return os.pread(self.dgpu_status_fd, 32, 0).strip() == b"suspended"
+        except OSError:
+            return False
+
+    def gpu(self):
+        if self.gpu_busy_fd is None:
+            return None
+        try:
+            return max(0.0, min(1.0, int(os.pread(self.gpu_busy_fd, 32, 0)) / 100))
+        except (OSError, ValueError):
+            return None
+
+
+def _merge_settings(settings, line):
+    try:
+        update = json.loads(line)
+    except ValueError:
+        print(f"[resource_sampler] bad settings line: {line.strip()}", file=sys.stderr)
+        return False
+    if not isinstance(update, dict):
+        return False
+    sample_now = bool(update.pop("sample", False))
+    intervals = update.pop("intervals", None)
+    if isinstance(intervals, dict):
+        for metric, ms in intervals.items():
+            if metric in settings["intervals"] and isinstance(ms, (int, float)) and ms > 0:
+                settings["intervals"][metric] = ms
+    for key, value in update.items():
+        if key in settings:
+            settings[key] = value
+    return sample_now
+
+
+def collect(sampler, settings, metrics):
+    """Sample `metrics` and return the JSON-ready tick."""
+    tick = {}
+    suspended = None
+    if "gpu" in metrics or ("temperature" in metrics and settings["gpuTemperature"]):
+        suspended = sampler.gpu_suspended()
+    for metric in metrics:
+        if metric == "temperature":
+            value = sampler.temperature(settings["gpuTemperature"] and not suspended)
+        elif metric == "gpu":
+            if suspended:
+                tick["gpuSuspended"] = True
+                continue
+            value = sampler.gpu()
+        else:
+            value = getattr(sampler, metric)()
+        if value is not None:
+            tick[metric] = value
+    if suspended is False:
+        tick["gpuSuspended"] = False
+    return tick
+
+
+def run():
+    settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+    sampler = Sampler()
+    selector = selectors.DefaultSelector()
+    stdin = sys.stdin.fileno()
+    selector.register(stdin, selectors.EVENT_READ)
+    pending = b""
+
+    now = time.monotonic()
+    due = {metric: now for metric in METRICS}
+    due["cpu"] = now + FIRST_CPU_DELAY
+
+    def interval(metric):
+        scale = max(1, settings["slowdown"]) if settings["slow"] else 1
+        return settings["intervals"][metric] * scale / 1000
+
+    while True:
+        now = time.monotonic()
+        ready = [metric for metric in METRICS if due[metric] <= now]
+        if ready:
+            for metric in ready:
+                due[metric] = now + interval(metric)
+            tick = collect(sampler, settings, ready)
+            if tick:
+                print(json.dumps(tick, separators=(",", ":")), flush=True)
+            continue
+
+        if not selector.select(max(0.0, min(due.values()) - now)):
+            continue
+        data = os.read(stdin, 65536)
+        if not data:
+            return
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            was_slow = settings["slow"]
+            sample_now = _merge_settings(settings, line.decode(errors="replace"))
+            sampler.set_gpu_paths(settings["gpuBusyPath"] or "", settings["dgpuStatusPath"] or "")
+            now = time.monotonic()
+            if sample_now or was_slow != settings["slow"]:
+                # Leaving slow mode should not wait out a stretched interval
+                due = {metric: min(due[metric], now) for metric in METRICS}
+            else:
+                due = {metric: min(due[metric], now + interval(metric)) for metric in METRICS}
+
+
+def main():
+    try:
+        run()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
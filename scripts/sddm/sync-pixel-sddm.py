@@ -15,6 +15,26 @@ import shutil
 import subprocess
 import sys
 
+# Shared video frame extractor: next to this file in the repo, or in the
+# installed shell when this script runs from ~/.local/bin
+for _colors_dir in (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "colors"),
+    os.path.join(
+        os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config")),
+        "quickshell",
+        "inir",
+        "scripts",
+        "colors",
+    ),
+):
+    if os.path.isfile(os.path.join(_colors_dir, "video_frames.py")):
+        sys.path.insert(0, _colors_dir)
+        break
+try:
+    from video_frames import save_frame
+except ImportError:
+    save_frame = None
+
 THEME_NAME = "ii-pixel"
 THEME_DIR = f"/usr/share/sddm/themes/{THEME_NAME}"
 THEME_CONF = os.path.join(THEME_DIR, "theme.conf")
@@ -248,39 +268,31 @@ VIDEO_EXTENSIONS = {".mp4", ".mkv", ".webm", ".avi", ".mov", ".gif", ".webp"}
 
 
 def extract_video_frame(video_path, dest_png):
-    """Use ffmpeg to extract the first frame of a video as PNG. Returns tmp path on success, None on failure."""
+    """Extract a representative frame of a video as PNG (see colors/video_frames.py). Returns tmp path on success, None on failure."""
     if not shutil.which("ffmpeg"):
         print("[sddm-pixel] ffmpeg not found — cannot extract video frame")
         return None
     tmp = os.path.join("/tmp", "sddm-pixel-frame.tmp.png")
-    try:
-        proc = subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                video_path,
-                "-vframes",
-                "1",
-                "-update",
-                "1",
-                "-f",
-                "image2",
-                tmp,
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=15,
-        )
+    if save_frame is not None:
+        if save_frame(video_path, tmp, timeout=15) and os.path.isfile(tmp):
+            return tmp
+    else:
+        try:
+            proc = subprocess.run(
+                ["ffmpeg", "-y", "-i", video_path, "-vframes", "1", "-update", "1", "-f", "image2", tmp],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=15,
+            )
+        except Exception as e:
+            print(f"[sddm-pixel] ffmpeg error: {e}")
+            return None
         if proc.returncode == 0 and os.path.isfile(tmp):
             return tmp
-        print(
-            f"[sddm-pixel] ffmpeg frame extraction failed for {os.path.basename(video_path)}"
-        )
-        return None
-    except Exception as e:
-        print(f"[sddm-pixel] ffmpeg error: {e}")
-        return None
+    print(
+        f"[sddm-pixel] ffmpeg frame extraction failed for {os.path.basename(video_path)}"
+    )
+    return None
 
 
 def update_background(wallpaper_path):
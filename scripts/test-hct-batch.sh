@@ -0,0 +1,47 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+repo_root="$(cd -- "$(dirname -- "${BASH_SOURCE[0]}")/.." && pwd)"
+
+# Color generation runs from the shell's venv; fall back to the system python.
+python="${INIR_TEST_PYTHON:-python3}"
+if ! "$python" -c 'import numpy, materialyoucolor' 2>/dev/null; then
+  printf 'SKIP: %s lacks numpy/materialyoucolor\n' "$python"
+  exit 0
+fi
+
+# hct_batch must reproduce the scalar materialyoucolor helpers it replaced bit
+# for bit. test-hct-batch.json holds seed/fg/bg colors and the outputs of the
+# scalar harmonize, boost_chroma_tone, ensure_min_chroma, scale_chroma,
+# find_tone_for_contrast and ensure_contrast (Hct.from_int/Hct.from_hct) for
+# them; every case is replayed through the batch functions in one call.
+"$python" - "$repo_root/scripts/colors" "$repo_root/scripts/test-hct-batch.json" <<'PY'
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import hct_batch
+
+with open(sys.argv[2], encoding="utf-8") as handle:
+    golden = json.load(handle)
+
+failures = 0
+for case in golden["cases"]:
+    function = case["function"]
+    result = getattr(hct_batch, function)(*case["arrays"].values(), **case["kwargs"])
+    if function == "find_tone_for_contrast":
+        result = [[int(c), float(t), bool(m), float(r)] for c, t, m, r in zip(*result)]
+    else:
+        result = [int(value) for value in result]
+    for index, (got, want) in enumerate(zip(result, case["expected"])):
+        if got != want:
+            failures += 1
+            print("FAIL: {}({}) #{}: got {}, want {}".format(
+                function, case["kwargs"], index, got, want), file=sys.stderr)
+    if len(result) != len(case["expected"]):
+        failures += 1
+        print("FAIL: {}({}) returned {} values".format(
+            function, case["kwargs"], len(result)), file=sys.stderr)
+if failures:
+    sys.exit(1)
+PY
+
+printf 'hct batch: ok\n'
@@ -168,6 +168,12 @@ fi
 step "mascot pack install and repair"
 bash "$runtime_root/scripts/test-mascot-pack-flow.sh"
 
+step "thumbnail pipeline"
+bash "$runtime_root/scripts/test-thumbnail-pipeline.sh"
+
+step "hct batch golden values"
+bash "$runtime_root/scripts/test-hct-batch.sh"
+
 if [[ -f "$runtime_root/Makefile" ]]; then
     step "make install dry run"
     make -n install PREFIX=/tmp/inir-stage-test -C "$runtime_root" >/dev/null
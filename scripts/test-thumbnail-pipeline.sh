@@ -0,0 +1,72 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+repo_root="$(cd -- "$(dirname -- "${BASH_SOURCE[0]}")/.." && pwd)"
+tmp="$(mktemp -d)"
+trap 'rm -rf "$tmp"' EXIT
+
+export HOME="$tmp/home"
+export XDG_CACHE_HOME="$tmp/cache"
+mkdir -p "$HOME" "$XDG_CACHE_HOME" "$tmp/walls"
+
+# The thumbnailer runs from the shell's venv; fall back to the system python.
+python="${INIR_TEST_PYTHON:-python3}"
+if ! "$python" -c 'import PIL, click, loguru, tqdm' 2>/dev/null; then
+  printf 'SKIP: %s lacks Pillow/click/loguru/tqdm\n' "$python"
+  exit 0
+fi
+
+"$python" - "$tmp/walls" <<'PY'
+import sys
+from PIL import Image
+Image.new("RGB", (640, 400), (200, 80, 40)).save(sys.argv[1] + "/wall.jpg", quality=90)
+PY
+
+# load_downscaled() must shrink large JPEG and JPEG 2000 sources while decoding
+"$python" - "$repo_root/scripts/colors" "$tmp" <<'PY'
+import sys
+sys.path.insert(0, sys.argv[1])
+from PIL import Image, features
+from image_loading import load_downscaled
+tmp = sys.argv[2]
+cases = [("big.jpg", {"quality": 85})]
+if features.check("jpg_2000"):
+    cases.append(("big.jp2", {}))
+for name, options in cases:
+    Image.new("RGB", (6000, 4000), (30, 120, 200)).save(tmp + "/" + name, **options)
+    image, stats = load_downscaled(tmp + "/" + name, (8, 8))
+    if image.size != (8, 8) or stats["decoded"] >= (6000, 4000):
+        sys.exit("FAIL: load_downscaled({}) -> {} {}".format(name, image.size, stats))
+PY
+
+# ADDs through --queue must come back as DONE and IDLE while stdin is still
+# open (as it is for Wallpapers.qml), and the server must exit on EOF. Workers
+# forked while the request reader holds the stdin lock never run a task.
+"$python" - "$python" "$repo_root/scripts/thumbnails/thumbgen.py" "$tmp/walls/wall.jpg" <<'PY'
+import select, subprocess, sys, time
+python, thumbgen, wall = sys.argv[1:]
+proc = subprocess.Popen([python, thumbgen, "--queue", "-w", "2"], stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+# The second ADD arrives while the first is still in flight and asks for sizes
+# it does not cover: it must wait for the first result, not race it.
+proc.stdin.write("ADD 0 normal {0}\nADD 0 large,x-large {0}\n".format(wall))
+proc.stdin.flush()
+seen, deadline = [], time.monotonic() + 60
+while "IDLE" not in seen and time.monotonic() < deadline:
+    if select.select([proc.stdout], [], [], 1)[0]:
+        line = proc.stdout.readline()
+        if not line:
+            break
+        seen.append(line.rstrip("\n"))
+proc.stdin.close()
+try:
+    proc.wait(timeout=30)
+except subprocess.TimeoutExpired:
+    proc.kill()
+    sys.exit("FAIL: thumbgen --queue did not exit on EOF\n" + "\n".join(seen))
+done = [line for line in seen if line.startswith("DONE ")]
+if done != ["DONE generated normal " + wall, "DONE generated x-large,large " + wall] or seen[-1] != "IDLE":
+    sys.exit("FAIL: thumbgen --queue did not report DONE/IDLE\n" + "\n".join(seen))
+PY
+
+printf 'thumbnail pipeline: ok\n'
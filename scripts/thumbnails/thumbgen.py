@@ -7,12 +7,21 @@
 import os
 import sys
 import hashlib
+import heapq
+import io
+import itertools
+import queue
 import signal
+import sqlite3
+import struct
 import subprocess
+import threading
+import time
 import urllib.parse
+import zlib
 from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import click
 from loguru import logger
@@ -36,6 +45,29 @@ try:
 except (ImportError, ValueError):
     pass
 
+# In-process backend: Pillow (JPEG draft decoding through colors/image_loading.py)
+# writes the PNGs; pyvips, when installed, does the decoding and shrinking.
+# Videos go through colors/video_frames.py: one ffmpeg run for a single,
+# already scaled keyframe.
+NATIVE_BACKEND = None
+pyvips = None
+try:
+    from PIL import Image, PngImagePlugin
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "colors"))
+    from image_loading import load_downscaled
+    from video_frames import extract_frame, is_video
+
+    NATIVE_BACKEND = "pillow"
+    try:
+        import pyvips
+
+        NATIVE_BACKEND = "pyvips"
+    except (ImportError, OSError):
+        pyvips = None
+except ImportError:
+    pass
+
 # Pixel sizes for thumbnail directories (freedesktop spec)
 thumbnail_pixel_sizes = {
     "normal": 128,
@@ -44,8 +76,9 @@ thumbnail_pixel_sizes = {
     "xx-large": 1024,
 }
 
-factory = None
-current_size = "large"
+# GnomeDesktop factories and the sizes being generated, largest first
+factories = {}
+current_sizes = ["large"]
 active_pool = None
 logger.remove()
 logger.add(sys.stdout, level="INFO")
@@ -77,72 +110,405 @@ signal.signal(signal.SIGTERM, _terminate_pool)
 signal.signal(signal.SIGINT, _terminate_pool)
 
 
-def get_thumbnail_path(fpath: str, size_name: str) -> str:
-    """Calculate thumbnail path using the same method as QML ThumbnailImage."""
+def get_thumbnail_uri(fpath: str) -> str:
+    """file:// URI whose MD5 names the thumbnail (also stored as Thumb::URI)."""
     # Encode each path component (like QML's encodeURIComponent)
     parts = fpath.split("/")
     encoded = "/".join(urllib.parse.quote(p, safe="") for p in parts)
-    url = f"file://{encoded}"
-    md5 = hashlib.md5(url.encode()).hexdigest()
+    return f"file://{encoded}"
+
+
+def get_thumbnail_path(fpath: str, size_name: str) -> str:
+    """Calculate thumbnail path using the same method as QML ThumbnailImage."""
+    md5 = hashlib.md5(get_thumbnail_uri(fpath).encode()).hexdigest()
     cache_dir = os.path.expanduser(f"~/.cache/thumbnails/{size_name}")
     return f"{cache_dir}/{md5}.png"
 
 
-def make_thumbnail_imagemagick(fpath: str, size_name: str) -> bool:
-    """Generate thumbnail using ImageMagick (fallback method)."""
-    thumb_path = get_thumbnail_path(fpath, size_name)
+# Freshness index: path -> (mtime, size, thumbnail path, status) per thumbnail
+# size, so unchanged files are skipped before any worker is started.
+INDEX_PATH = _log_dir / "thumbgen-index.sqlite"
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    path TEXT NOT NULL,
+    size_name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    thumb_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (path, size_name)
+)
+"""
+
+
+class ThumbnailIndex:
+    """Persistent record of what has been thumbnailed, per thumbnail size.
 
-    if os.path.exists(thumb_path):
-        logger.debug("FRESH       {}".format(fpath))
+    status is "ok" (thumbnail exists) or "failed" (no backend could handle the
+    file). Both are skipped until the file's mtime or size changes; "ok" rows
+    are also redone when their thumbnail was removed from the cache."""
+
+    def __init__(self, path: Path = INDEX_PATH) -> None:
+        self.conn = sqlite3.connect(str(path), timeout=10.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(_INDEX_SCHEMA)
+        self.pending_writes = 0
+
+    def entries(self, size_name: str, prefix: Optional[str] = None) -> Dict[str, Tuple[int, int, str, str]]:
+        query = "SELECT path, mtime_ns, size, thumb_path, status FROM thumbnails WHERE size_name = ?"
+        params: Tuple = (size_name,)
+        if prefix is not None:
+            query += " AND substr(path, 1, ?) = ?"
+            params += (len(prefix), prefix)
+        return {row[0]: tuple(row[1:]) for row in self.conn.execute(query, params)}
+
+    def entry(self, fpath: str, size_name: str) -> Optional[Tuple[int, int, str, str]]:
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, thumb_path, status FROM thumbnails WHERE path = ? AND size_name = ?",
+            (fpath, size_name),
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def record(self, fpath: str, size_name: str, stamp: Tuple[int, int], thumb_path: str, status: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?)",
+            (fpath, size_name, stamp[0], stamp[1], thumb_path, status),
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= 64:
+            self.commit()
+
+    def forget(self, paths: Iterable[str], size_name: str) -> None:
+        self.conn.executemany(
+            "DELETE FROM thumbnails WHERE path = ? AND size_name = ?",
+            ((p, size_name) for p in paths),
+        )
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self.pending_writes = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
+
+
+def _file_stamp(fpath: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _stale_size(entry, stamp: Tuple[int, int], thumb_exists) -> Optional[bool]:
+    """None when the index entry says this thumbnail is up to date, otherwise
+    the job's force flag (True when the file changed since it was made)."""
+    if entry is None:
         return False
+    mtime_ns, size, thumb_path, status = entry
+    if (mtime_ns, size) != stamp:
+        return True
+    if status == "ok" and not thumb_exists(thumb_path):
+        return False
+    return None
 
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
 
-    size = thumbnail_pixel_sizes[size_name]
+def find_stale(
+    paths: List[str], index: ThumbnailIndex, size_names: List[str]
+) -> Tuple[List[Tuple[str, Dict[str, bool]]], Dict[str, Tuple[int, int]]]:
+    """Split paths into work for the pool and up-to-date files.
+
+    Returns (jobs, stamps): jobs are (path, {size_name: force}) pairs listing
+    the sizes that need work, force meaning the file changed since that
+    thumbnail was made, and stamps the (mtime_ns, size) of every path that
+    still exists."""
+    existing = {}
+    known = {}
+    for size_name in size_names:
+        cache_dir = os.path.expanduser(f"~/.cache/thumbnails/{size_name}")
+        try:
+            # One directory listing instead of a stat per thumbnail
+            existing[size_name] = set(os.listdir(cache_dir))
+        except OSError:
+            existing[size_name] = set()
+        known[size_name] = index.entries(size_name)
+    jobs = []
+    stamps = {}
+    for fpath in paths:
+        stamp = _file_stamp(fpath)
+        if stamp is None:
+            continue
+        stamps[fpath] = stamp
+        sizes = {}
+        for size_name in size_names:
+            force = _stale_size(
+                known[size_name].get(fpath),
+                stamp,
+                lambda thumb_path: os.path.basename(thumb_path) in existing[size_name],
+            )
+            if force is not None:
+                sizes[size_name] = force
+        if sizes:
+            jobs.append((fpath, sizes))
+    return jobs, stamps
+
+
+def make_thumbnails_imagemagick(fpath: str, sizes: Dict[str, bool]) -> Dict[str, str]:
+    """Generate thumbnails using ImageMagick (fallback method).
+
+    All sizes come from one magick run, each resized from the previous one."""
+    statuses = {}
+    needed = []
+    for size_name, force in sizes.items():
+        if not force and os.path.exists(get_thumbnail_path(fpath, size_name)):
+            logger.debug("FRESH       {}".format(fpath))
+            statuses[size_name] = "fresh"
+        else:
+            needed.append(size_name)
+    if not needed:
+        return statuses
+    needed.sort(key=thumbnail_pixel_sizes.get, reverse=True)
+
     # Use [0] suffix to get first frame (works for images and animated gifs)
-    cmd = ["magick", f"{fpath}[0]", "-resize", f"{size}x{size}", thumb_path]
+    cmd = ["magick", f"{fpath}[0]"]
+    for i, size_name in enumerate(needed):
+        thumb_path = get_thumbnail_path(fpath, size_name)
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        size = thumbnail_pixel_sizes[size_name]
+        cmd += ["-resize", f"{size}x{size}"]
+        cmd += [thumb_path] if i == len(needed) - 1 else ["-write", thumb_path]
 
     try:
         result = subprocess.run(cmd, capture_output=True, timeout=30)
         if result.returncode == 0:
             logger.debug("OK_MAGICK   {}".format(fpath))
-            return True
+            status = "generated"
         else:
             logger.debug("ERROR_MAGICK {}".format(fpath))
-            return False
-    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+            status = "failed"
+    except subprocess.TimeoutExpired as e:
+        logger.debug("ERROR_MAGICK {} - {}".format(fpath, str(e)))
+        status = "failed"
+    except FileNotFoundError as e:
+        # No magick binary: not the file's fault, so do not remember it as failed
         logger.debug("ERROR_MAGICK {} - {}".format(fpath, str(e)))
+        status = "unavailable"
+    statuses.update((size_name, status) for size_name in needed)
+    return statuses
+
+
+def _thumbnail_mode(image) -> str:
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        return "RGBA"
+    return "RGB"
+
+
+def _fit_size(size: Tuple[int, int], pixels: int) -> Tuple[int, int]:
+    """size scaled to fit pixels x pixels, never enlarged."""
+    scale = min(pixels / size[0], pixels / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _native_decode(fpath: str, pixels: int):
+    """Decode fpath scaled to fit pixels x pixels (never enlarged).
+
+    Returns (image, backend, original size), or (None, None, None) when
+    neither pyvips nor Pillow (nor ffmpeg, for videos) can read the file."""
+    if is_video(fpath):
+        data = extract_frame(fpath, max_size=pixels)
+        if data is None:
+            return None, None, None
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except (OSError, SyntaxError):
+            return None, None, None
+        # The frame arrives scaled; smaller sizes are computed from it
+        return image.convert("RGB"), "ffmpeg", image.size
+
+    if pyvips is not None:
+        try:
+            original = pyvips.Image.new_from_file(fpath, access="sequential")
+            thumb = pyvips.Image.thumbnail(fpath, pixels, height=pixels, size="down", no_rotate=True)
+            if thumb.interpretation not in ("srgb", "b-w"):
+                thumb = thumb.colourspace("srgb")
+            if thumb.format != "uchar":
+                thumb = thumb.cast("uchar")
+            mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}.get(thumb.bands)
+            if mode is not None:
+                image = Image.frombytes(mode, (thumb.width, thumb.height), thumb.write_to_memory())
+                return image, "pyvips", (original.width, original.height)
+        except pyvips.Error:
+            pass
+
+    try:
+        image, stats = load_downscaled(
+            fpath, lambda size: _fit_size(size, pixels), Image.Resampling.LANCZOS, mode=_thumbnail_mode
+        )
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        return None, None, None
+    return image, "pillow", stats["original"]
+
+
+def _thumbnail_is_fresh(thumb_path: str, mtime: int) -> bool:
+    try:
+        with Image.open(thumb_path) as thumb:
+            stored = thumb.info.get("Thumb::MTime")
+    except OSError:
         return False
+    # Thumbnails without the key (older magick runs) only had to exist
+    return stored is None or stored == str(mtime)
+
+
+def _save_thumbnail(image, fpath: str, size_name: str, st: os.stat_result) -> str:
+    thumb_path = get_thumbnail_path(fpath, size_name)
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Thumb::URI", get_thumbnail_uri(fpath))
+    info.add_text("Thumb::MTime", str(int(st.st_mtime)))
+    info.add_text("Thumb::Size", str(st.st_size))
+    info.add_text("Software", "iNiR thumbgen")
+
+    # Write privately and rename, so readers never see a half-written PNG
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+    tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+    try:
+        image.save(tmp_path, "PNG", pnginfo=info)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, thumb_path)
+    except OSError as e:
+        logger.debug("ERROR_NATIVE {} - {}".format(fpath, str(e)))
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return "failed"
+    return "generated"
+
+
+def make_thumbnails_native(fpath: str, sizes: Dict[str, bool]) -> Tuple[Optional[Dict[str, str]], str]:
+    """Generate freedesktop thumbnails in-process. Returns (statuses, backend);
+    statuses is None when the file needs another backend.
+
+    The file is decoded once, at the largest size that needs work; smaller
+    sizes are downsampled from the previous one (xx-large > x-large > large >
+    normal)."""
+    st = os.stat(fpath)
+    mtime = int(st.st_mtime)
+    statuses = {}
+    needed = []
+    for size_name, force in sizes.items():
+        if not force and _thumbnail_is_fresh(get_thumbnail_path(fpath, size_name), mtime):
+            logger.debug("FRESH       {}".format(fpath))
+            statuses[size_name] = "fresh"
+        else:
+            needed.append(size_name)
+    if not needed:
+        return statuses, ""
+    needed.sort(key=thumbnail_pixel_sizes.get, reverse=True)
+
+    image, backend, original = _native_decode(fpath, thumbnail_pixel_sizes[needed[0]])
+    if image is None:
+        return None, ""
+    for size_name in needed:
+        # Target sizes come from the original so every size matches a
+        # single-size run; only the pixels are taken from the larger thumbnail
+        target = _fit_size(original, thumbnail_pixel_sizes[size_name])
+        if image.size != target:
+            image = image.resize(target, Image.Resampling.LANCZOS)
+        statuses[size_name] = _save_thumbnail(image, fpath, size_name, st)
+    logger.debug("OK_{:<9}{}".format(backend.upper(), fpath))
+    return statuses, backend
+
 
+def make_thumbnail(job: Tuple[str, Dict[str, bool]]) -> Tuple[str, Dict[str, str], str, float]:
+    """Thumbnail one file at every requested size. Returns (path, statuses,
+    backend, seconds): statuses maps size name to "generated", "fresh",
+    "failed" or "unavailable" (no backend installed), backend is the one that
+    did the work."""
+    fpath, sizes = job
+    start = time.perf_counter()
+    statuses, backend = _make_thumbnail(fpath, sizes)
+    return fpath, statuses, backend, time.perf_counter() - start
 
-def make_thumbnail(fpath: str) -> bool:
-    global current_size
+
+def _make_thumbnail(fpath: str, sizes: Dict[str, bool]) -> Tuple[Dict[str, str], str]:
+    statuses = {}
+    backend = ""
+    remaining = dict(sizes)
 
     # Try GnomeDesktop first if available
-    if GNOME_DESKTOP_AVAILABLE and factory is not None:
+    if GNOME_DESKTOP_AVAILABLE and factories:
         mtime = os.path.getmtime(fpath)
         f = Gio.file_new_for_path(str(fpath))
         uri = f.get_uri()
         info = f.query_info("standard::content-type", Gio.FileQueryInfoFlags.NONE, None)
         mime_type = info.get_content_type()
 
-        if factory.lookup(uri, mtime) is not None:
-            logger.debug("FRESH       {}".format(uri))
-            return False
+        for size_name in list(remaining):
+            factory = factories[size_name]
+            if factory.lookup(uri, mtime) is not None:
+                logger.debug("FRESH       {}".format(uri))
+                statuses[size_name] = "fresh"
+                del remaining[size_name]
+                continue
+
+            if factory.can_thumbnail(uri, mime_type, mtime):
+                thumbnail = factory.generate_thumbnail(uri, mime_type)
+                if thumbnail is not None:
+                    logger.debug("OK          {}".format(uri))
+                    factory.save_thumbnail(thumbnail, uri, mtime)
+                    statuses[size_name] = "generated"
+                    backend = "gnome"
+                    del remaining[size_name]
+                    continue
 
-        if factory.can_thumbnail(uri, mime_type, mtime):
-            thumbnail = factory.generate_thumbnail(uri, mime_type)
-            if thumbnail is not None:
-                logger.debug("OK          {}".format(uri))
-                factory.save_thumbnail(thumbnail, uri, mtime)
-                return True
+            # GnomeDesktop failed, fall through to the native backend
+            logger.debug("FALLBACK    {} (GnomeDesktop unsupported)".format(uri))
 
-        # GnomeDesktop failed, fall through to ImageMagick
-        logger.debug("FALLBACK    {} (GnomeDesktop unsupported)".format(uri))
+    if remaining and NATIVE_BACKEND is not None:
+        native, native_backend = make_thumbnails_native(fpath, remaining)
+        if native is not None:
+            statuses.update(native)
+            return statuses, native_backend or backend
+        logger.debug("FALLBACK    {} (native backend unsupported)".format(fpath))
 
-    # Fallback to ImageMagick
-    return make_thumbnail_imagemagick(fpath, current_size)
+    # ImageMagick only for what the native backend cannot decode
+    if remaining:
+        magick = make_thumbnails_imagemagick(fpath, remaining)
+        statuses.update(magick)
+        if any(status != "fresh" for status in magick.values()):
+            backend = "magick"
+    return statuses, backend
+
+
+def forget_missing(
+    index: ThumbnailIndex, dir_path: Path, scanned_files: List[str], size_names: List[str], recursive: bool
+) -> None:
+    """Forget files that disappeared from this folder since the last run."""
+    root = os.path.abspath(dir_path)
+    scanned = set(scanned_files)
+    for size_name in size_names:
+        gone = [
+            fpath
+            for fpath in index.entries(size_name, prefix=root + "/")
+            if fpath not in scanned and (recursive or os.path.dirname(fpath) == root)
+        ]
+        index.forget(gone, size_name)
+
+
+def record_statuses(index: ThumbnailIndex, fpath: str, stamp: Tuple[int, int], statuses: Dict[str, str]) -> None:
+    for size_name, status in statuses.items():
+        if status == "unavailable":
+            continue
+        index.record(
+            fpath,
+            size_name,
+            stamp,
+            get_thumbnail_path(fpath, size_name),
+            "failed" if status == "failed" else "ok",
+        )
 
 
 @logger.catch()
@@ -154,30 +520,498 @@ def thumbnail_folder(
     recursive: bool,
     machine_progress: bool = False,
 ) -> None:
-    global active_pool
     all_files = get_all_files(dir_path=dir_path, recursive=recursive)
     if only_images:
         all_files = get_all_images(all_files=all_files)
-    all_files = [str(fpath) for fpath in all_files]
-    if machine_progress:
-        completed = 0
-        total = len(all_files)
-        with Pool(processes=workers, initializer=_worker_init) as p:
-            active_pool = p
-            try:
-                for result in p.imap(make_thumbnail, all_files):
-                    completed += 1
-                    print(f"PROGRESS {completed}/{total} FILE {all_files[completed - 1]}")
+    all_files = [os.path.abspath(fpath) for fpath in all_files]
+
+    index = ThumbnailIndex()
+    try:
+        forget_missing(index, dir_path, all_files, current_sizes, recursive)
+        thumbnail_paths(all_files, index=index, workers=workers, machine_progress=machine_progress)
+    finally:
+        index.close()
+
+
+def thumbnail_paths(
+    paths: List[str],
+    *,
+    index: ThumbnailIndex,
+    workers: int,
+    machine_progress: bool = False,
+) -> None:
+    """Thumbnail every path the index does not already know to be up to date."""
+    global active_pool
+    jobs, stamps = find_stale(paths, index, current_sizes)
+    print("{} up to date, {} to thumbnail".format(len(stamps) - len(jobs), len(jobs)))
+    sys.stdout.flush()
+    if not jobs:
+        return
+
+    # backend -> [files, failures, seconds spent in workers]
+    backend_stats: Dict[str, List] = {}
+
+    def account(backend: str, statuses: Dict[str, str], seconds: float) -> None:
+        if not backend:
+            return
+        stats = backend_stats.setdefault(backend, [0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += "failed" in statuses.values()
+        stats[2] += seconds
+
+    # A pool costs more than it saves for a handful of changed files
+    processes = max(1, min(workers, len(jobs)))
+    started = time.perf_counter()
+    with Pool(processes=processes, initializer=_worker_init) as p:
+        active_pool = p
+        try:
+            results = p.imap(make_thumbnail, jobs)
+            if not machine_progress:
+                results = tqdm(results, total=len(jobs))
+            total = len(jobs)
+            for completed, (fpath, statuses, backend, seconds) in enumerate(results, start=1):
+                record_statuses(index, fpath, stamps[fpath], statuses)
+                account(backend, statuses, seconds)
+                if machine_progress:
+                    print(f"PROGRESS {completed}/{total} FILE {fpath}")
                     sys.stdout.flush()
-            finally:
-                active_pool = None
-    else:
-        with Pool(processes=workers, initializer=_worker_init) as p:
-            active_pool = p
+        finally:
+            active_pool = None
+
+    elapsed = time.perf_counter() - started
+    logger.info("{} file(s) in {:.2f}s with {} worker(s)".format(len(jobs), elapsed, processes))
+    for backend, (files, failures, seconds) in sorted(backend_stats.items()):
+        logger.info(
+            "  {:<7} {:>5} file(s), {} failed, {:.1f} ms/file, {:.1f} files/s per worker".format(
+                backend, files, failures, seconds * 1000 / files, files / seconds if seconds else 0.0
+            )
+        )
+
+
+# Queue mode (--queue): the shell keeps one thumbgen running and streams
+# requests on stdin, one per line:
+#   ADD <priority> <sizes> <path>   thumbnail one file, sizes like "large,x-large"
+#   SCAN <priority> <sizes> <dir>   queue every stale file of a folder
+#   PRIO <priority> <path>          move a queued file
+#   CANCEL [<path>]                 drop a queued file, or everything queued
+#   QUIT                            finish the queue and exit (same as EOF)
+# Lower priorities run first: the shell sends 0 for thumbnails on screen, 1
+# for ones near the scroll position and 2 for folder scans. Every file is
+# answered with "DONE <status> <sizes> <path>" (after "PROGRESS i/n FILE
+# <path>" when a worker made it), and "IDLE" follows once nothing is queued.
+# Files already handed to a worker can no longer be moved or cancelled.
+PRIORITY_VISIBLE = 0
+PRIORITY_NEAR = 1
+PRIORITY_BACKGROUND = 2
+
+
+class ThumbnailQueue:
+    """Files waiting for a worker, ordered by (priority, arrival).
+
+    A file is queued at most once: adding it again merges the sizes and keeps
+    the more urgent priority. Moved and cancelled entries stay in the heap
+    marked dead and are skipped by pop()."""
+
+    def __init__(self) -> None:
+        self.heap: List[list] = []
+        self.entries: Dict[str, list] = {}
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _insert(self, fpath: str, priority: int, sizes: Dict[str, bool]) -> None:
+        entry = [priority, next(self.counter), fpath, sizes]
+        self.entries[fpath] = entry
+        heapq.heappush(self.heap, entry)
+
+    def _remove(self, fpath: str) -> Optional[list]:
+        entry = self.entries.pop(fpath, None)
+        if entry is not None:
+            entry[2] = None
+        return entry
+
+    def push(self, fpath: str, priority: int, sizes: Dict[str, bool]) -> None:
+        entry = self._remove(fpath)
+        if entry is not None:
+            merged = dict(entry[3])
+            for size_name, force in sizes.items():
+                merged[size_name] = merged.get(size_name, False) or force
+            sizes = merged
+            priority = min(priority, entry[0])
+        self._insert(fpath, priority, sizes)
+
+    def reprioritize(self, fpath: str, priority: int) -> bool:
+        entry = self._remove(fpath)
+        if entry is None:
+            return False
+        self._insert(fpath, priority, entry[3])
+        return True
+
+    def cancel(self, fpath: Optional[str] = None) -> List[Tuple[str, Dict[str, bool]]]:
+        """Drop fpath (or every queued file); returns what was dropped."""
+        if fpath is None:
+            dropped = [(entry[2], entry[3]) for entry in self.entries.values()]
+            self.heap = []
+            self.entries = {}
+            return dropped
+        entry = self._remove(fpath)
+        return [(fpath, entry[3])] if entry is not None else []
+
+    def pop(self) -> Optional[Tuple[str, Dict[str, bool]]]:
+        while self.heap:
+            _priority, _seq, fpath, sizes = heapq.heappop(self.heap)
+            if fpath is not None:
+                del self.entries[fpath]
+                return fpath, sizes
+        return None
+
+
+def _overall_status(statuses: Dict[str, str]) -> str:
+    for status in ("failed", "unavailable", "generated"):
+        if status in statuses.values():
+            return status
+    return "fresh"
+
+
+def serve_queue(*, workers: int, only_images: bool) -> None:
+    """Thumbnail files in the order requested on stdin until EOF or QUIT."""
+    global active_pool
+    events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+
+    def read_requests() -> None:
+        # os.read on fd 0, not sys.stdin: a thread blocked inside the buffered
+        # reader holds its lock, and every worker the pool forks (including the
+        # replacements for dead ones) then hangs in multiprocessing's
+        # util._close_stdin() before running a single task.
+        buffered = b""
+        while True:
+            chunk = os.read(0, 65536)
+            if not chunk:
+                break
+            *lines, buffered = (buffered + chunk).split(b"\n")
+            for line in lines:
+                events.put(("request", line.decode("utf-8", "surrogateescape")))
+        if buffered:
+            events.put(("request", buffered.decode("utf-8", "surrogateescape")))
+        events.put(("request", "QUIT"))
+
+    index = ThumbnailIndex()
+    pending = ThumbnailQueue()
+    # path -> (stamp when handed to a worker, sizes)
+    in_flight: Dict[str, Tuple[Tuple[int, int], Dict[str, bool]]] = {}
+    # path -> (priority, sizes) requested while the path was in flight; re-added
+    # once its result is back so no path is ever on two workers at once
+    deferred: Dict[str, Tuple[int, List[str]]] = {}
+    completed = 0
+    busy = False
+    quitting = False
+
+    def emit(line: str) -> None:
+        print(line)
+        sys.stdout.flush()
+
+    def done(fpath: str, status: str, sizes: Iterable[str]) -> None:
+        emit("DONE {} {} {}".format(status, ",".join(sizes), fpath))
+
+    def finish(fpath: str, statuses: Dict[str, str]) -> None:
+        nonlocal completed
+        completed += 1
+        total = completed + len(pending) + len(in_flight)
+        emit(f"PROGRESS {completed}/{total} FILE {fpath}")
+        done(fpath, _overall_status(statuses), statuses)
+
+    def add(fpath: str, priority: int, size_names: List[str]) -> None:
+        fpath = os.path.abspath(fpath)
+        if fpath in in_flight:
+            if not set(size_names) <= set(in_flight[fpath][1]):
+                old_priority, old_sizes = deferred.get(fpath, (priority, []))
+                merged = old_sizes + [s for s in size_names if s not in old_sizes]
+                deferred[fpath] = (min(priority, old_priority), merged)
+            return
+        stamp = _file_stamp(fpath)
+        if stamp is None:
+            done(fpath, "missing", size_names)
+            return
+        sizes = {}
+        for size_name in size_names:
+            force = _stale_size(index.entry(fpath, size_name), stamp, os.path.exists)
+            if force is not None:
+                sizes[size_name] = force
+        if sizes:
+            pending.push(fpath, priority, sizes)
+        else:
+            done(fpath, "fresh", size_names)
+
+    def scan(dir_path: str, priority: int, size_names: List[str]) -> None:
+        try:
+            all_files = get_all_files(dir_path=Path(dir_path), recursive=False)
+        except ValueError as e:
+            logger.warning(str(e))
+            emit("SCANNED 0 {}".format(dir_path))
+            return
+        if only_images:
+            all_files = get_all_images(all_files=all_files)
+        all_files = [os.path.abspath(fpath) for fpath in all_files]
+        forget_missing(index, Path(dir_path), all_files, size_names, False)
+        jobs, _stamps = find_stale(all_files, index, size_names)
+        for fpath, sizes in jobs:
+            if fpath in in_flight:
+                add(fpath, priority, list(sizes))
+            else:
+                pending.push(fpath, priority, sizes)
+        emit("SCANNED {} {}".format(len(jobs), dir_path))
+
+    def parse_sizes(value: str) -> List[str]:
+        size_names = [s for s in value.split(",") if s]
+        unknown = [s for s in size_names if s not in thumbnail_pixel_sizes]
+        if not size_names or unknown:
+            raise ValueError("unknown size(s): {}".format(value))
+        return size_names
+
+    def handle(line: str) -> None:
+        nonlocal busy, quitting
+        command, _, rest = line.strip().partition(" ")
+        command = command.upper()
+        if command in ("ADD", "SCAN"):
+            priority, size_list, target = rest.split(" ", 2)
+            (add if command == "ADD" else scan)(target, int(priority), parse_sizes(size_list))
+            busy = True
+        elif command == "PRIO":
+            priority, target = rest.split(" ", 1)
+            target = os.path.abspath(target)
+            pending.reprioritize(target, int(priority))
+            if target in deferred:
+                deferred[target] = (int(priority), deferred[target][1])
+        elif command == "CANCEL":
+            target = os.path.abspath(rest) if rest else None
+            for fpath, sizes in pending.cancel(target):
+                done(fpath, "cancelled", sizes)
+            for fpath in list(deferred) if target is None else [target]:
+                if fpath in deferred:
+                    done(fpath, "cancelled", deferred.pop(fpath)[1])
+        elif command == "QUIT":
+            quitting = True
+        elif command:
+            raise ValueError("unknown command")
+
+    logger.info("Queue mode: {} worker(s), reading requests from stdin".format(workers))
+    with Pool(processes=workers, initializer=_worker_init) as p:
+        active_pool = p
+        threading.Thread(target=read_requests, daemon=True).start()
+        try:
+            while True:
+                while pending and len(in_flight) < workers:
+                    fpath, sizes = pending.pop()
+                    stamp = _file_stamp(fpath)
+                    if stamp is None:
+                        done(fpath, "missing", sizes)
+                        continue
+                    in_flight[fpath] = (stamp, sizes)
+                    p.apply_async(
+                        make_thumbnail,
+                        ((fpath, sizes),),
+                        callback=lambda result: events.put(("result", result)),
+                        error_callback=lambda error, fpath=fpath: events.put(("error", (fpath, error))),
+                    )
+                if not pending and not in_flight:
+                    if busy:
+                        index.commit()
+                        emit("IDLE")
+                        busy = False
+                        completed = 0
+                    if quitting:
+                        break
+
+                kind, payload = events.get()
+                if kind == "request":
+                    try:
+                        handle(payload)
+                    except ValueError as e:
+                        logger.warning("Bad request {!r}: {}".format(payload, e))
+                        emit("ERROR {}".format(payload))
+                elif kind == "result":
+                    fpath, statuses, _backend, _seconds = payload
+                    stamp, _sizes = in_flight.pop(fpath)
+                    record_statuses(index, fpath, stamp, statuses)
+                    finish(fpath, statuses)
+                else:
+                    fpath, error = payload
+                    _stamp, sizes = in_flight.pop(fpath)
+                    logger.error("Thumbnailing {} failed: {}".format(fpath, error))
+                    finish(fpath, {size_name: "failed" for size_name in sizes})
+                if kind != "request" and fpath in deferred:
+                    priority, size_names = deferred.pop(fpath)
+                    add(fpath, priority, size_names)
+        finally:
+            active_pool = None
+            index.close()
+
+
+# Cache garbage collection (`thumbgen.py gc`): nothing else ever removes
+# thumbnails, so the cache keeps every wallpaper that was deleted, moved or
+# edited since. gc drops thumbnails whose source is gone or changed since
+# (Thumb::URI / Thumb::MTime, read from the PNG text chunks without decoding
+# the image) and temp files left by killed writers, then removes the least
+# recently used (atime) thumbnails of each size until it fits its budget.
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_TMP_MAX_AGE = 3600
+_BYTE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def read_thumbnail_info(thumb_path: str) -> Dict[str, str]:
+    """tEXt/zTXt/iTXt chunks stored ahead of a PNG's image data."""
+    info = {}
+    with open(thumb_path, "rb") as f:
+        if f.read(8) != _PNG_SIGNATURE:
+            return info
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, kind = struct.unpack(">I4s", header)
+            if kind in (b"IDAT", b"IEND"):
+                break
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)  # CRC
             try:
-                list(tqdm(p.imap(make_thumbnail, all_files), total=len(all_files)))
-            finally:
-                active_pool = None
+                if kind == b"tEXt":
+                    key, _, value = data.partition(b"\0")
+                    info[key.decode("latin-1")] = value.decode("latin-1")
+                elif kind == b"zTXt":
+                    key, _, value = data.partition(b"\0")
+                    info[key.decode("latin-1")] = zlib.decompress(value[1:]).decode("latin-1")
+                elif kind == b"iTXt":
+                    key, _, value = data.partition(b"\0")
+                    compressed, value = value[0], value[2:]
+                    _language, _, value = value.partition(b"\0")
+                    _translated, _, value = value.partition(b"\0")
+                    if compressed:
+                        value = zlib.decompress(value)
+                    info[key.decode("latin-1")] = value.decode("utf-8", errors="replace")
+            except (IndexError, zlib.error):
+                continue
+    return info
+
+
+def _thumbnail_source(uri: Optional[str]) -> Optional[str]:
+    if not uri:
+        return None
+    parts = urllib.parse.urlsplit(uri)
+    if parts.scheme != "file" or parts.netloc not in ("", "localhost"):
+        return None
+    return urllib.parse.unquote(parts.path)
+
+
+def _parse_bytes(value: str) -> int:
+    value = value.strip().upper().rstrip("IB").rstrip("B")
+    unit = value[-1:] if value[-1:] in _BYTE_UNITS else ""
+    return int(float(value[: len(value) - len(unit)]) * _BYTE_UNITS[unit])
+
+
+def parse_budgets(value: str, size_names: List[str]) -> Dict[str, int]:
+    """"512M" applies to every size, "large=256M,x-large=1G" per size; 0 = no budget."""
+    budgets = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        size_name, sep, amount = item.partition("=")
+        if not sep:
+            budgets.update((s, _parse_bytes(item)) for s in size_names)
+        elif size_name.strip() in thumbnail_pixel_sizes:
+            budgets[size_name.strip()] = _parse_bytes(amount)
+        else:
+            raise ValueError("unknown size: {}".format(size_name))
+    return budgets
+
+
+def collect_garbage(size_names: List[str], budgets: Dict[str, int], dry_run: bool = False) -> Dict[str, Dict[str, List[int]]]:
+    """Prune the cache of every size. Returns, per size, [files, bytes] for
+    each reason ("gone", "stale", "budget", "temp") and what was "kept"."""
+    now = time.time()
+    report = {}
+    index = ThumbnailIndex()
+    try:
+        for size_name in size_names:
+            counts = {reason: [0, 0] for reason in ("gone", "stale", "budget", "temp", "kept")}
+            report[size_name] = counts
+            cache_dir = os.path.expanduser(f"~/.cache/thumbnails/{size_name}")
+            try:
+                entries = list(os.scandir(cache_dir))
+            except OSError:
+                continue
+
+            def remove(path: str, nbytes: int, reason: str) -> None:
+                if not dry_run:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        return
+                counts[reason][0] += 1
+                counts[reason][1] += nbytes
+
+            kept = []
+            forgotten = []
+            for entry in entries:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    if now - st.st_mtime > _TMP_MAX_AGE:
+                        remove(entry.path, st.st_size, "temp")
+                    continue
+                if not entry.name.endswith(".png"):
+                    continue
+                try:
+                    info = read_thumbnail_info(entry.path)
+                except OSError:
+                    continue
+                source = _thumbnail_source(info.get("Thumb::URI"))
+                reason = None
+                if source is not None:
+                    try:
+                        source_mtime = int(os.stat(source).st_mtime)
+                    except FileNotFoundError:
+                        reason = "gone"
+                    except OSError:
+                        pass
+                    else:
+                        try:
+                            stored = int(float(info.get("Thumb::MTime", source_mtime)))
+                        except ValueError:
+                            stored = source_mtime
+                        if stored != source_mtime:
+                            reason = "stale"
+                if reason is not None:
+                    remove(entry.path, st.st_size, reason)
+                    forgotten.append(source)
+                else:
+                    kept.append((st.st_atime, st.st_size, entry.path))
+
+            total = sum(nbytes for _atime, nbytes, _path in kept)
+            budget = budgets.get(size_name, 0)
+            evicted = 0
+            if budget and total > budget:
+                kept.sort()
+                for _atime, nbytes, path in kept:
+                    if total <= budget:
+                        break
+                    remove(path, nbytes, "budget")
+                    total -= nbytes
+                    evicted += 1
+            counts["kept"] = [len(kept) - evicted, total]
+            if not dry_run:
+                index.forget(forgotten, size_name)
+    finally:
+        index.close()
+    return report
+
+
+def _mib(nbytes: int) -> str:
+    return "{:.1f} MiB".format(nbytes / (1 << 20))
 
 
 def get_all_images(*, all_files: List[Path]) -> List[Path]:
@@ -217,7 +1051,7 @@ def get_all_files(*, dir_path: Path, recursive: bool) -> List[Path]:
 @click.option(
     "-d",
     "--img_dirs",
-    required=True,
+    default="",
     help='directories to generate thumbnails seperated by space, eg: "dir1/dir2 dir3"',
 )
 @click.option(
@@ -227,6 +1061,11 @@ def get_all_files(*, dir_path: Path, recursive: bool) -> List[Path]:
     type=click.Choice(["normal", "large", "x-large", "xx-large"]),
     help="Thumbnail size: normal, large, x-large, xx-large",
 )
+@click.option(
+    "--sizes",
+    default="",
+    help='Comma-separated sizes to generate from one decode per image, eg: "large,x-large" (overrides --size)',
+)
 @click.option("-w", "--workers", default=1, help="no of cpus to use for processing")
 @click.option(
     "-i",
@@ -248,23 +1087,69 @@ def get_all_files(*, dir_path: Path, recursive: bool) -> List[Path]:
     default=False,
     help="Print machine-readable progress lines instead of a progress bar",
 )
+@click.option(
+    "--changed-only",
+    is_flag=True,
+    default=False,
+    help="Only thumbnail the given PATHS (or paths read from stdin, one per line) instead of scanning directories",
+)
+@click.option(
+    "--queue",
+    "queue_mode",
+    is_flag=True,
+    default=False,
+    help="Keep running and thumbnail files in the priority order requested on stdin (ADD/SCAN/PRIO/CANCEL lines)",
+)
+@click.argument("paths", nargs=-1, type=click.Path())
 def main(
     img_dirs: str,
     size: str,
+    sizes: str,
     workers: str,
     only_images: bool,
     recursive: bool,
     machine_progress: bool,
+    changed_only: bool,
+    queue_mode: bool,
+    paths: Tuple[str, ...],
 ) -> None:
     img_dirs = [Path(img_dir) for img_dir in img_dirs.split()]
-    global factory, current_size
-    current_size = size
+    if not changed_only and not queue_mode and not img_dirs:
+        raise click.UsageError("either -d/--img_dirs, --changed-only or --queue is required")
+    global factories, current_sizes
+    current_sizes = [s.strip() for s in sizes.split(",") if s.strip()] or [size]
+    unknown = [s for s in current_sizes if s not in thumbnail_pixel_sizes]
+    if unknown:
+        raise click.BadParameter("unknown size(s): {}".format(", ".join(unknown)), param_hint="--sizes")
+    current_sizes = sorted(set(current_sizes), key=thumbnail_pixel_sizes.get, reverse=True)
+
+    if queue_mode:
+        # Every request names its own sizes
+        current_sizes = sorted(thumbnail_pixel_sizes, key=thumbnail_pixel_sizes.get, reverse=True)
 
     if GNOME_DESKTOP_AVAILABLE:
-        factory = GnomeDesktop.DesktopThumbnailFactory.new(thumbnail_size_map[size])
+        factories = {s: GnomeDesktop.DesktopThumbnailFactory.new(thumbnail_size_map[s]) for s in current_sizes}
     else:
-        logger.info("GnomeDesktop not available, using ImageMagick fallback")
-        factory = None
+        factories = {}
+    backends = (["gnome"] if factories else []) + ([NATIVE_BACKEND] if NATIVE_BACKEND else []) + ["magick"]
+    logger.info("Thumbnail backends: {}; sizes: {}".format(" > ".join(backends), ", ".join(current_sizes)))
+
+    if queue_mode:
+        serve_queue(workers=workers, only_images=only_images)
+        return
+
+    if changed_only:
+        changed = list(paths) or [line.strip() for line in sys.stdin if line.strip()]
+        changed = [os.path.abspath(p) for p in changed if os.path.isfile(p)]
+        if only_images:
+            changed = [str(p) for p in get_all_images(all_files=[Path(p) for p in changed])]
+        index = ThumbnailIndex()
+        try:
+            thumbnail_paths(changed, index=index, workers=workers, machine_progress=machine_progress)
+        finally:
+            index.close()
+        print("Thumbnail Generation Completed!")
+        return
 
     for img_dir in img_dirs:
         thumbnail_folder(
@@ -277,5 +1162,60 @@ def main(
     print("Thumbnail Generation Completed!")
 
 
+@click.command(name="gc")
+@click.option(
+    "--sizes",
+    default=",".join(thumbnail_pixel_sizes),
+    help="Comma-separated thumbnail sizes to prune (default: all)",
+)
+@click.option(
+    "--budget",
+    default="0",
+    help='Byte budget per size, eg: "512M" for each size or "large=256M,x-large=1G"; 0 keeps every fresh thumbnail',
+)
+@click.option("--dry-run", is_flag=True, default=False, help="Only report what would be removed")
+def gc(sizes: str, budget: str, dry_run: bool) -> None:
+    """Remove orphaned and stale thumbnails and enforce the cache budget."""
+    size_names = [s.strip() for s in sizes.split(",") if s.strip()]
+    unknown = [s for s in size_names if s not in thumbnail_pixel_sizes]
+    if unknown:
+        raise click.BadParameter("unknown size(s): {}".format(", ".join(unknown)), param_hint="--sizes")
+    try:
+        budgets = parse_budgets(budget, size_names)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--budget")
+
+    started = time.perf_counter()
+    report = collect_garbage(size_names, budgets, dry_run=dry_run)
+    files = reclaimed = 0
+    for size_name, counts in report.items():
+        removed = [counts[reason] for reason in ("gone", "stale", "budget", "temp")]
+        size_files = sum(count for count, _nbytes in removed)
+        size_bytes = sum(nbytes for _count, nbytes in removed)
+        files += size_files
+        reclaimed += size_bytes
+        print(
+            "{}: removed {} file(s), {} ({} gone, {} stale, {} over budget, {} temp); kept {} file(s), {}".format(
+                size_name,
+                size_files,
+                _mib(size_bytes),
+                counts["gone"][0],
+                counts["stale"][0],
+                counts["budget"][0],
+                counts["temp"][0],
+                counts["kept"][0],
+                _mib(counts["kept"][1]),
+            )
+        )
+    print(
+        "{} {} file(s), {} in {:.2f}s".format(
+            "Would reclaim" if dry_run else "Reclaimed", files, _mib(reclaimed), time.perf_counter() - started
+        )
+    )
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["gc"]:
+        gc(sys.argv[2:], prog_name="thumbgen.py gc")
+    else:
+        main()
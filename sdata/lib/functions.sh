@@ -183,7 +183,8 @@ RUNTIME_EXCLUDES=(
   --exclude='/agents/' --exclude='/tools/' --exclude='/l10n/'
   --exclude='/release.sh' --exclude='/wiki-sync.sh' --exclude='/verify-docs.sh'
   --exclude='/qml-check.fish' --exclude='/test-local-distribution.sh'
-  --exclude='/test-mascot-pack-flow.sh'
+  --exclude='/test-mascot-pack-flow.sh' --exclude='/test-thumbnail-pipeline.sh'
+  --exclude='/test-hct-batch.sh' --exclude='/test-hct-batch.json'
   # Local art work files — the manifest always ships, the art does not
   --exclude='graphify-out/'
   --exclude='images/mascot/*.png' --exclude='images/mascot/*.gif'
@@ -21,8 +21,9 @@ _text_watcher='spawn-at-startup "bash" "-c" "wl-paste --type text --watch ~/.con
 migration_check() {
     [[ -f "$_cliphist_startup_file" ]] || return 1
 
-    # Any text watcher at all means 032 owns this file, not us.
-    if grep -q 'wl-paste --type text' "$_cliphist_startup_file" 2>/dev/null; then
+    # Any text watcher at all means 032 owns this file, not us. The resident
+    # `clipboard-store.py --watch` runs its own wl-paste text watcher.
+    if grep -qE 'wl-paste --type text|clipboard-store\.py --watch' "$_cliphist_startup_file" 2>/dev/null; then
         return 1
     fi
 
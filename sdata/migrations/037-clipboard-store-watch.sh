@@ -0,0 +1,38 @@
+#!/usr/bin/env bash
+# Migration 037: Keep the clipboard store filter resident
+#
+# `wl-paste --type text --watch clipboard-store.py` starts a new Python process
+# for every copy, which then forks `cliphist store`. `clipboard-store.py --watch`
+# runs that same wl-paste watcher itself and stays resident: wl-paste only
+# appends a separator to each copy and the filter reads them from one pipe.
+
+MIGRATION_ID="037-clipboard-store-watch"
+MIGRATION_TITLE="Keep the clipboard store filter resident"
+MIGRATION_DESCRIPTION="Runs clipboard-store.py once with --watch instead of once per copy. Same history and markup stripping, without a Python startup on every clipboard change."
+MIGRATION_TARGET_FILE="~/.config/niri/config.d/50-startup.kdl"
+MIGRATION_REQUIRED=false
+
+_cliphist_startup_file="${HOME}/.config/niri/config.d/50-startup.kdl"
+_per_copy_watcher='wl-paste --type text --watch ~/.config/quickshell/inir/scripts/clipboard-store.py'
+
+migration_check() {
+    [[ -f "$_cliphist_startup_file" ]] || return 1
+    grep -qF "$_per_copy_watcher" "$_cliphist_startup_file" 2>/dev/null
+}
+
+migration_preview() {
+    echo -e "${STY_RED}- wl-paste --type text --watch ~/.config/quickshell/inir/scripts/clipboard-store.py${STY_RST}"
+    echo -e "${STY_GREEN}+ ~/.config/quickshell/inir/scripts/clipboard-store.py --watch${STY_RST}"
+    echo ""
+    echo "The filter starts once per session instead of once per copy."
+    echo "Takes effect at the next login."
+}
+
+migration_apply() {
+    [[ -f "$_cliphist_startup_file" ]] || return 1
+
+    sed -i "s|wl-paste --type text --watch ~/.config/quickshell/inir/scripts/clipboard-store.py|~/.config/quickshell/inir/scripts/clipboard-store.py --watch|" \
+        "$_cliphist_startup_file"
+
+    grep -q 'clipboard-store.py --watch' "$_cliphist_startup_file"
+}
@@ -119,6 +119,9 @@ function setup_super_daemon(){
   local daemon_src="${REPO_ROOT}/scripts/daemon/inir_super_overview_daemon.py"
   local service_src="${REPO_ROOT}/scripts/systemd/inir-super-overview.service"
   local daemon_dst="${HOME}/.local/bin/inir_super_overview_daemon.py"
+  # Imported by the daemon from its own directory
+  local watch_src="${REPO_ROOT}/scripts/daemon/inir_input_watch.py"
+  local watch_dst="${HOME}/.local/bin/inir_input_watch.py"
   local service_dst="${XDG_CONFIG_HOME}/systemd/user/inir-super-overview.service"
   
   if [[ ! -f "$daemon_src" ]]; then
@@ -130,6 +133,7 @@ function setup_super_daemon(){
   x mkdir -p "$(dirname "$daemon_dst")"
   x cp "$daemon_src" "$daemon_dst"
   x chmod +x "$daemon_dst"
+  x cp "$watch_src" "$watch_dst"
   
   # Install systemd service
   x mkdir -p "$(dirname "$service_dst")"
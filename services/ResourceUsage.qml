@@ -1,13 +1,17 @@
 pragma Singleton
 pragma ComponentBehavior: Bound
 
+import qs
 import qs.modules.common
 import QtQuick
 import Quickshell
 import Quickshell.Io
 
 /**
- * Simple polled resource usage service with RAM, Swap, CPU usage, and temperatures.
+ * Resource usage service with RAM, Swap, CPU usage, disk and temperatures.
+ * Values stream from scripts/resource_sampler.py, one process that keeps the
+ * /proc and hwmon files open; the FileView/df polling below is the fallback
+ * when the sampler cannot run.
  */
 Singleton {
     id: root
@@ -20,7 +24,7 @@ Singleton {
     // This prevents the service from running forever after briefly opening a panel.
     // Persistent consumers (bar, vertical bar) prevent auto-stop entirely.
     readonly property int _autoStopDelayMs: Config.options?.resources?.autoStopDelay ?? 15000
-    readonly property int _diskUpdateIntervalMs: 30000
+    readonly property int _diskUpdateIntervalMs: Config.options?.resources?.diskInterval ?? 30000
     // 0 + zero-guard avoids fake "100%" before first poll.
     property real memoryTotal: 0
     property real memoryFree: 0
@@ -45,6 +49,9 @@ Singleton {
     property real diskTotal: 1
     property real diskUsed: 0
     property real diskUsedPercentage: diskTotal > 0 ? diskUsed / diskTotal : 0
+    // Physical disk throughput in bytes/s (sampler only)
+    property real diskReadSpeed: 0
+    property real diskWriteSpeed: 0
 
     property string maxAvailableMemoryString: kbToGbString(ResourceUsage.memoryTotal)
     property string maxAvailableSwapString: kbToGbString(ResourceUsage.swapTotal)
@@ -211,23 +218,29 @@ Singleton {
 
     function ensureRunning(): void {
         root._runningRequested = true;
+        root._recentlyRequested = true;
+        recentRequestTimer.restart();
         if (!root._initRequested) {
             root._initRequested = true;
-            detectTempSensors.running = true;
+            if (root._samplerFailed)
+                detectTempSensors.running = true;
             detectGpuUsageSource.running = true;
             detectHybridGpu.running = true;
             findCpuMaxFreqProc.running = true;
         }
         if (root._persistentConsumers === 0)
             autoStopTimer.restart();
-        pollTimer.restart();
         // Prime values now instead of waiting one updateInterval — but only once.
         // Multiple consumers calling ensureRunning() in their Component.onCompleted
         // would race their reload() ops and drop in-flight reads (FileView warnings).
         if (!root._primed) {
             root._primed = true;
-            root._pollSensors();
-            root._pollDisk();
+            if (root._samplerFailed) {
+                root._pollSensors();
+                root._pollDisk();
+            }
+        } else if (samplerProc.running) {
+            samplerProc.write(JSON.stringify({ sample: true }) + "\n");
         }
     }
 
@@ -250,11 +263,22 @@ Singleton {
     function stop(): void {
         root._runningRequested = false;
         root._primed = false;
-        pollTimer.stop();
-        diskPollTimer.stop();
+        // The sampler and the polling timers follow _runningRequested
         autoStopTimer.stop();
     }
 
+    // Panels call ensureRunning() when they open; keep full-rate sampling for
+    // them even while the bar is hidden
+    property bool _recentlyRequested: false
+    readonly property bool _samplerSlow: !root._recentlyRequested && (!GlobalStates.barOpen || GlobalStates.screenLocked)
+
+    Timer {
+        id: recentRequestTimer
+        interval: root._autoStopDelayMs
+        repeat: false
+        onTriggered: root._recentlyRequested = false
+    }
+
     Timer {
         id: autoStopTimer
         interval: root._autoStopDelayMs
@@ -349,6 +373,117 @@ Singleton {
 
     }
 
+    // ── Sampler daemon ────────────────────────────────────────────────────
+    property string samplerScriptPath: Quickshell.shellPath("scripts/resource_sampler.py")
+    property bool _samplerFailed: false
+    property bool _dGpuSuspended: false
+
+    function _samplerSettings(): var {
+        const interval = Config.options?.resources?.updateInterval ?? 3000;
+        const monitorGpu = Config.options?.resources?.monitorGpu ?? true;
+        const tempInterval = Config.options?.resources?.temperatureInterval ?? 0;
+        return {
+            intervals: {
+                cpu: interval,
+                memory: interval,
+                gpu: interval,
+                temperature: tempInterval > 0 ? tempInterval : interval,
+                disk: root._diskUpdateIntervalMs
+            },
+            slowdown: Config.options?.resources?.hiddenSlowdown ?? 4,
+            slow: root._samplerSlow,
+            gpuBusyPath: monitorGpu && root._gpuUsageSource === "sysfs" ? root._gpuUsagePath : "",
+            dgpuStatusPath: root._dGpuRuntimeStatusPath,
+            // nvidia-smi reports the GPU temperature alongside utilization
+            gpuTemperature: monitorGpu && root._gpuUsageSource !== "nvidia-smi"
+        };
+    }
+    readonly property string _samplerSettingsLine: JSON.stringify(root._samplerSettings())
+    on_SamplerSettingsLineChanged: {
+        if (samplerProc.running)
+            samplerProc.write(root._samplerSettingsLine + "\n");
+    }
+
+    function _handleSample(line: string): void {
+        let sample;
+        try {
+            sample = JSON.parse(line);
+        } catch (e) {
+            return;
+        }
+
+        if (sample.gpuSuspended !== undefined)
+            root._dGpuSuspended = sample.gpuSuspended;
+
+        const memory = sample.memory;
+        if (memory) {
+            memoryTotal = memory.total ?? 0;
+            memoryFree = memory.available ?? 0;
+            swapTotal = memory.swapTotal ?? 0;
+            swapFree = memory.swapFree ?? 0;
+        }
+
+        const temps = sample.temperature;
+        if (temps) {
+            if (temps.cpu !== undefined)
+                cpuTemp = Math.round(temps.cpu);
+            if (temps.gpu !== undefined && root._gpuUsageSource !== "nvidia-smi")
+                gpuTemp = Math.round(temps.gpu);
+        }
+
+        const disk = sample.disk;
+        if (disk) {
+            if (disk.total !== undefined) {
+                diskTotal = disk.total || 1;
+                diskUsed = disk.used ?? 0;
+            }
+            diskReadSpeed = disk.read ?? 0;
+            diskWriteSpeed = disk.write ?? 0;
+        }
+
+        if (sample.gpu !== undefined && root._gpuUsageSource === "sysfs")
+            gpuUsage = sample.gpu;
+
+        // CPU ticks at updateInterval: drive the external GPU tools and histories from it
+        if (sample.cpu !== undefined) {
+            autoStopTimer.restart();
+            cpuUsage = sample.cpu;
+
+            const skipGpu = !(Config.options?.resources?.monitorGpu ?? true) || root._dGpuSuspended;
+            if (skipGpu || root._gpuUsageSource === "none")
+                gpuUsage = 0;
+            else if (root._gpuUsageSource === "nvidia-smi" && !nvidiaGpuProc.running)
+                nvidiaGpuProc.running = true;
+            else if (root._gpuUsageSource === "intel" && !intelGpuProc.running)
+                intelGpuProc.running = true;
+
+            root.updateHistories();
+        }
+    }
+
+    Process {
+        id: samplerProc
+        running: root._runningRequested && !root._samplerFailed
+        command: ["/usr/bin/python3", "-u", root.samplerScriptPath]
+        stdinEnabled: true
+        stdout: SplitParser {
+            onRead: line => root._handleSample(line)
+        }
+        onStarted: samplerProc.write(root._samplerSettingsLine + "\n")
+        onExited: (exitCode, exitStatus) => {
+            // stop() ends the sampler by design; anything else falls back to polling
+            if (!root._runningRequested)
+                return;
+            console.warn("[ResourceUsage] sampler exited", exitCode, exitStatus, "- falling back to polling");
+            root._samplerFailed = true;
+            if (!root._cpuTempPath && !detectTempSensors.running)
+                detectTempSensors.running = true;
+            root._pollSensors();
+            root._pollDisk();
+        }
+    }
+
+    // ── Polling fallback ──────────────────────────────────────────────────
     function _pollDisk(): void {
         if (!diskProc.running)
             diskProc.running = true;
@@ -357,7 +492,7 @@ Singleton {
     Timer {
         id: pollTimer
         interval: Config.options?.resources?.updateInterval ?? 3000
-        running: root._runningRequested
+        running: root._runningRequested && root._samplerFailed
         repeat: true
         onTriggered: root._pollSensors()
     }
@@ -365,7 +500,7 @@ Singleton {
     Timer {
         id: diskPollTimer
         interval: root._diskUpdateIntervalMs
-        running: root._runningRequested
+        running: root._runningRequested && root._samplerFailed
         repeat: true
         onTriggered: root._pollDisk()
     }
@@ -252,16 +252,11 @@ Singleton {
             } else {
                 _ffGenProc._videoPath = _ffCheckProc._videoPath
                 _ffGenProc._outputPath = _ffCheckProc._outputPath
-                _ffGenProc.command = ["bash", "-c",
-                    // Wallpaper loops usually fade in from black, so frame 0 gives
-                    // this file a nearly black palette — and this frame is what the
-                    // theming pipeline quantizes. Pick a representative frame.
-                    "mkdir -p " + JSON.stringify(root._videoThumbDir) +
-                    " && ffmpeg -y -i " + JSON.stringify(_ffCheckProc._videoPath) +
-                    " -vf " + JSON.stringify("thumbnail=n=100") +
-                    " -frames:v 1 -update 1 -q:v 2 " + JSON.stringify(_ffCheckProc._outputPath) +
-                    " || ffmpeg -y -i " + JSON.stringify(_ffCheckProc._videoPath) +
-                    " -vframes 1 -update 1 -q:v 2 " + JSON.stringify(_ffCheckProc._outputPath)]
+                // Wallpaper loops usually fade in from black, so frame 0 gives
+                // this file a nearly black palette — and this frame is what the
+                // theming pipeline quantizes. video_frames.py picks a
+                // representative keyframe (the one switchwall.sh would pick).
+                _ffGenProc.command = [root.videoFramesScriptPath, _ffCheckProc._videoPath, _ffCheckProc._outputPath]
                 _ffGenProc.running = true
             }
         }
@@ -281,6 +276,7 @@ Singleton {
     // ── End video first-frame system ──────────────────────────────────────
 
     property string thumbgenScriptPath: `${FileUtils.trimFileProtocol(Directories.scriptPath)}/thumbnails/thumbgen-venv.sh`
+    property string videoFramesScriptPath: `${FileUtils.trimFileProtocol(Directories.scriptPath)}/colors/video_frames.py`
     property string generateThumbnailsMagickScriptPath: `${FileUtils.trimFileProtocol(Directories.scriptPath)}/thumbnails/generate-thumbnails-magick.sh`
     
     // Calculate standard Freedesktop thumbnail path
@@ -320,7 +316,7 @@ Singleton {
     readonly property list<string> extensions: ["jpg", "jpeg", "png", "webp", "avif", "bmp", "svg", "gif", "mp4", "webm", "mkv", "avi", "mov"]
     property list<string> wallpapers: []
     property int _wallpaperCacheIndex: 0
-    readonly property bool thumbnailGenerationRunning: thumbgenProc.running
+    readonly property bool thumbnailGenerationRunning: Object.keys(root._thumbgenScans).length > 0
     property real thumbnailGenerationProgress: 0
     property var _knownThumbnailOutputs: ({})
 
@@ -879,6 +875,7 @@ Singleton {
         sortReversed: false
         onCountChanged: root.rebuildWallpapersCache()
         onFolderChanged: {
+            root._cancelFolderThumbnails(root.effectiveDirectory)
             root.folderChanged()
             root._scheduleFolderModelTransitionEnd()
         }
@@ -907,14 +904,18 @@ Singleton {
         onTriggered: root.appendWallpapersCacheBatch()
     }
 
-    property string _pendingThumbnailSize: ""
+    // Sizes requested within one debounce window go to thumbgen as one request
+    // (SCAN/ADD with a size list), which decodes each image once for all of them
+    property var _pendingThumbnailSizes: ({})
     property string _pendingThumbnailDir: ""
     property var _singleThumbPending: ({})
     property var _singleThumbQueue: []
     
     function generateThumbnail(size: string) {
         if (!["normal", "large", "x-large", "xx-large"].includes(size)) throw new Error("Invalid thumbnail size")
-        root._pendingThumbnailSize = size
+        const sizes = Object.assign({}, root._pendingThumbnailSizes)
+        sizes[size] = true
+        root._pendingThumbnailSizes = sizes
         root._pendingThumbnailDir = FileUtils.trimFileProtocol(root.directory)
         thumbgenDebounce.restart()
     }
@@ -923,7 +924,7 @@ Singleton {
     // Both write to ~/.cache/thumbnails/<size>/<md5>.png, and the desktop's own
     // video thumbnailer decorates its output with a film-strip border — whoever
     // wrote first won, so a surface that wants a clean frame could not rely on
-    // that path. The generator here is the same ffmpeg call, private location.
+    // that path. The generator here is the shared video_frames.py extractor, private location.
     function videoStillPath(filePath: string): string {
         const clean = FileUtils.trimFileProtocol(String(filePath ?? ""))
         if (!clean) return ""
@@ -946,24 +947,14 @@ Singleton {
             _processNextSingleThumb()
     }
 
-    function ensureThumbnailForPath(filePath: string, size = "large") {
+    // priority: thumbnailPriorityVisible for thumbnails on screen,
+    // thumbnailPriorityNear for ones about to scroll in
+    function ensureThumbnailForPath(filePath: string, size = "large", priority = root.thumbnailPriorityVisible) {
         const normalizedPath = FileUtils.trimFileProtocol(String(filePath ?? ""))
         if (!normalizedPath || normalizedPath.length === 0) return
         if (!["normal", "large", "x-large", "xx-large"].includes(size)) return
 
-        const outputPath = root.getExpectedThumbnailPath(normalizedPath, size)
-        if (!outputPath || outputPath.length === 0) return
-
-        const key = `${size}:${normalizedPath}`
-        if (root._singleThumbPending[key]) return
-
-        const pending = Object.assign({}, root._singleThumbPending)
-        pending[key] = true
-        root._singleThumbPending = pending
-        root._singleThumbQueue.push({ key: key, filePath: normalizedPath, size: size, outputPath: outputPath })
-
-        if (!_singleThumbProc.running)
-            _processNextSingleThumb()
+        root._sendThumbgenRequest(`ADD ${priority} ${size} ${normalizedPath}`)
     }
 
     function _processNextSingleThumb() {
@@ -971,16 +962,9 @@ Singleton {
 
         const item = root._singleThumbQueue.shift()
         const maxSize = Images.thumbnailSizes[item.size] ?? 256
-        const outputDir = FileUtils.parentDirectory(item.outputPath)
-        const commandBody = root.isVideoFile(item.filePath)
-            ? "mkdir -p " + JSON.stringify(outputDir)
-                + " && [ -f " + JSON.stringify(item.outputPath) + " ] && exit 0 || { ffmpeg -y -i " + JSON.stringify(item.filePath)
-                + " -vf " + JSON.stringify(`thumbnail=n=100,scale='min(${maxSize},iw)':'min(${maxSize},ih)':force_original_aspect_ratio=decrease`)
-                + " -frames:v 1 -update 1 "
-                + " " + JSON.stringify(item.outputPath) + " >/dev/null 2>&1 && exit 1; }"
-            : "mkdir -p " + JSON.stringify(outputDir)
-                + " && [ -f " + JSON.stringify(item.outputPath) + " ] && exit 0 || { magick " + JSON.stringify(item.filePath + "[0]")
-                + " -resize " + `${maxSize}x${maxSize}` + " " + JSON.stringify(item.outputPath) + " >/dev/null 2>&1 && exit 1; }"
+        const commandBody = "[ -f " + JSON.stringify(item.outputPath) + " ] && exit 0 || { "
+            + JSON.stringify(root.videoFramesScriptPath) + " " + JSON.stringify(item.filePath)
+            + " " + JSON.stringify(item.outputPath) + ` --max-size ${maxSize} >/dev/null 2>&1 && exit 1; }`
 
         _singleThumbProc._key = item.key
         _singleThumbProc._filePath = item.filePath
@@ -995,48 +979,234 @@ Singleton {
         root._singleThumbPending = pending
     }
     
+    // One long-running `thumbgen.py --queue` takes every image thumbnail
+    // request. Folder scans go in at background priority and thumbnails on
+    // screen at visible priority, so those appear first even while a large
+    // folder is being processed.
+    readonly property int thumbnailPriorityVisible: 0
+    readonly property int thumbnailPriorityNear: 1
+    readonly property int thumbnailPriorityBackground: 2
+    // Requests made while thumbgen is starting (or quitting)
+    property var _thumbgenBacklog: []
+    // Folders scanned since the queue last went idle: dir -> { sizes, paths }
+    property var _thumbgenScans: ({})
+
+    // Folder of the last finished thumbgen scans and, per size, the files they
+    // covered. Re-scans of the same folder only queue the files that appeared
+    // since; thumbgen's own index skips unchanged files either way.
+    property string _thumbgenDoneDir: ""
+    property var _thumbgenDonePaths: ({})
+
+    function _sendThumbgenRequest(line: string): void {
+        if (line.includes("\n")) return
+        thumbgenIdleTimer.stop()
+        if (thumbgenProc.running && thumbgenProc._started && !thumbgenProc._quitting) {
+            thumbgenProc.write(line + "\n")
+            return
+        }
+        root._thumbgenBacklog.push(line)
+        if (!thumbgenProc.running)
+            thumbgenProc.running = true
+    }
+
+    // Move a queued thumbnail, e.g. to background priority once it scrolled away
+    function prioritizeThumbnail(filePath: string, priority: int): void {
+        const normalizedPath = FileUtils.trimFileProtocol(String(filePath ?? ""))
+        if (!normalizedPath || !thumbgenProc.running) return
+        root._sendThumbgenRequest(`PRIO ${priority} ${normalizedPath}`)
+    }
+
+    function cancelThumbnail(filePath: string): void {
+        const normalizedPath = FileUtils.trimFileProtocol(String(filePath ?? ""))
+        if (!normalizedPath || !thumbgenProc.running) return
+        root._sendThumbgenRequest(`CANCEL ${normalizedPath}`)
+    }
+
+    // Drop the queued work of folders scanned for thumbnails other than
+    // keepDir, once the picker has moved away from them. Their scans are
+    // forgotten too, so the cancelled files are not counted as done.
+    function _cancelFolderThumbnails(keepDir: string): void {
+        const scans = Object.assign({}, root._thumbgenScans)
+        let changed = false
+        for (const dir in scans) {
+            if (dir === keepDir) continue
+            for (const path of scans[dir].paths)
+                root.cancelThumbnail(path)
+            delete scans[dir]
+            changed = true
+        }
+        if (changed)
+            root._thumbgenScans = scans
+    }
+
+    function _handleThumbgenLine(data: string): void {
+        let match = data.match(/^PROGRESS (\d+)\/(\d+)/)
+        if (match) {
+            root.thumbnailGenerationProgress = parseInt(match[1]) / parseInt(match[2])
+            return
+        }
+        match = data.match(/^DONE (\S+) (\S+) (.+)$/)
+        if (match) {
+            if (match[1] === "generated" || match[1] === "fresh") {
+                for (const size of match[2].split(","))
+                    root.rememberThumbnail(root.getExpectedThumbnailPath(match[3], size))
+                root.thumbnailGeneratedFile(match[3])
+            }
+            return
+        }
+        if (data === "IDLE") {
+            root._finishThumbgenScans()
+            thumbgenIdleTimer.restart()
+        }
+    }
+
+    function _finishThumbgenScans(): void {
+        const scans = root._thumbgenScans
+        root._thumbgenScans = ({})
+        for (const dir in scans) {
+            const done = dir === root._thumbgenDoneDir ? Object.assign({}, root._thumbgenDonePaths) : {}
+            for (const size of scans[dir].sizes) {
+                const paths = Object.assign({}, done[size] ?? {})
+                for (const path of scans[dir].paths)
+                    paths[path] = true
+                done[size] = paths
+            }
+            root._thumbgenDoneDir = dir
+            root._thumbgenDonePaths = done
+            root.thumbnailGenerated(dir)
+        }
+    }
+
     Timer {
         id: thumbgenDebounce
         interval: 300
         onTriggered: {
-            if (thumbgenProc.running) return
-            thumbgenProc.directory = root._pendingThumbnailDir
-            thumbgenProc._size = root._pendingThumbnailSize
-            thumbgenProc.command = [thumbgenScriptPath, "--size", root._pendingThumbnailSize, "--workers", "4", "--machine_progress", "-d", root._pendingThumbnailDir]
+            const dir = root._pendingThumbnailDir
+            const sizes = Object.keys(root._pendingThumbnailSizes)
+            if (sizes.length === 0) return
+            root._pendingThumbnailSizes = ({})
+            const snapshot = root.wallpapers.slice()
+            const done = dir === root._thumbgenDoneDir ? root._thumbgenDonePaths : {}
+            const priority = root.thumbnailPriorityBackground
+            if (sizes.every(size => done[size])) {
+                const added = snapshot.filter(path => sizes.some(size => !done[size][path]))
+                if (added.length === 0) return
+                for (const path of added)
+                    root._sendThumbgenRequest(`ADD ${priority} ${sizes.join(",")} ${path}`)
+            } else {
+                root._sendThumbgenRequest(`SCAN ${priority} ${sizes.join(",")} ${dir}`)
+            }
+            const scans = Object.assign({}, root._thumbgenScans)
+            const scannedSizes = new Set([...(scans[dir]?.sizes ?? []), ...sizes])
+            scans[dir] = { sizes: Array.from(scannedSizes), paths: snapshot }
+            root._thumbgenScans = scans
             root.thumbnailGenerationProgress = 0
-            thumbgenProc.running = true
+        }
+    }
+
+    // Let thumbgen and its workers exit once nothing was requested for a while
+    Timer {
+        id: thumbgenIdleTimer
+        interval: 60000
+        onTriggered: {
+            if (!thumbgenProc.running || !thumbgenProc._started) return
+            thumbgenProc._quitting = true
+            thumbgenProc.write("QUIT\n")
         }
     }
 
     Process {
         id: thumbgenProc
-        property string directory
-        property string _size: ""
+        property bool _started: false
+        property bool _quitting: false
+        command: [root.thumbgenScriptPath, "--queue", "--workers", "4"]
+        stdinEnabled: true
         environment: ({
             "INIR_VENV": Quickshell.env("INIR_VENV") || Quickshell.env("HOME") + "/.local/state/quickshell/.venv",
             "ILLOGICAL_IMPULSE_VIRTUAL_ENV": Quickshell.env("INIR_VENV") || Quickshell.env("HOME") + "/.local/state/quickshell/.venv"
         })
+        onStarted: {
+            thumbgenProc._started = true
+            const backlog = root._thumbgenBacklog
+            root._thumbgenBacklog = []
+            for (const line of backlog)
+                thumbgenProc.write(line + "\n")
+        }
         stdout: SplitParser {
-            onRead: data => {
-                let match = data.match(/PROGRESS (\d+)\/(\d+)/)
-                if (match) root.thumbnailGenerationProgress = parseInt(match[1]) / parseInt(match[2])
-                match = data.match(/FILE (.+)/)
-                if (match) root.thumbnailGeneratedFile(match[1])
-            }
+            onRead: data => root._handleThumbgenLine(data)
         }
         onExited: (exitCode, exitStatus) => {
+            const quitting = thumbgenProc._quitting
+            thumbgenProc._started = false
+            thumbgenProc._quitting = false
             if (exitCode !== 0) {
-                thumbgenFallbackProc.command = [generateThumbnailsMagickScriptPath, "--size", thumbgenProc._size, "-d", FileUtils.trimFileProtocol(thumbgenProc.directory)]
-                thumbgenFallbackProc.running = true
+                // Unfinished folder scans fall back to the ImageMagick script
+                const dirs = Object.keys(root._thumbgenScans)
+                root._thumbgenBacklog = []
+                if (dirs.length > 0) {
+                    const scan = root._thumbgenScans[dirs[0]]
+                    thumbgenFallbackProc.directory = dirs[0]
+                    thumbgenFallbackProc.command = [generateThumbnailsMagickScriptPath, "--size", scan.sizes[0], "-d", dirs[0]]
+                    thumbgenFallbackProc.running = true
+                }
+                root._thumbgenScans = ({})
                 return
             }
-            root.thumbnailGenerated(thumbgenProc.directory)
+            // Requests that arrived after QUIT was sent
+            if (quitting && root._thumbgenBacklog.length > 0)
+                thumbgenProc.running = true
+        }
+    }
+
+    // Thumbnail cache GC: drops thumbnails of deleted/changed files and, when
+    // a budget is set, trims each size to it (least recently used first). The
+    // cache is the shared freedesktop one, so the budget is opt-in.
+    // First run a few minutes after startup, then every six hours.
+    readonly property int thumbnailCacheBudgetMB: Config.options?.wallpaperSelector?.thumbnailCacheBudgetMB ?? 0
+    Timer {
+        id: thumbnailGcTimer
+        interval: 5 * 60 * 1000
+        running: Config.ready
+        repeat: true
+        onTriggered: {
+            interval = 6 * 60 * 60 * 1000
+            if (thumbnailGcProc.running || root.thumbnailGenerationRunning) return
+            thumbnailGcProc.command = [root.thumbgenScriptPath, "gc", "--budget", `${Math.max(0, root.thumbnailCacheBudgetMB)}M`]
+            thumbnailGcProc.running = true
         }
     }
 
+    Process {
+        id: thumbnailGcProc
+        environment: ({
+            "INIR_VENV": Quickshell.env("INIR_VENV") || Quickshell.env("HOME") + "/.local/state/quickshell/.venv",
+            "ILLOGICAL_IMPULSE_VIRTUAL_ENV": Quickshell.env("INIR_VENV") || Quickshell.env("HOME") + "/.local/state/quickshell/.venv"
+        })
+    }
+
     Process {
         id: thumbgenFallbackProc
-        onExited: root.thumbnailGenerated(thumbgenProc.directory)
+        property string directory
+        onExited: root.thumbnailGenerated(thumbgenFallbackProc.directory)
+    }
+
+    // Once a folder's thumbnails exist, pre-compute its color features (seed
+    // colors, auto scheme, least busy region) so switching to one of these
+    // wallpapers later skips decoding it. Incremental: unchanged files are skipped.
+    property string wallpaperIndexScriptPath: `${FileUtils.trimFileProtocol(Directories.scriptPath)}/colors/wallpaper_index.py`
+    onThumbnailGenerated: directory => {
+        const dir = FileUtils.trimFileProtocol(String(directory ?? ""))
+        if (!dir || wallpaperIndexProc.running) return
+        wallpaperIndexProc.command = [root.wallpaperIndexScriptPath, "index", "--workers", "2", dir]
+        wallpaperIndexProc.running = true
+    }
+
+    Process {
+        id: wallpaperIndexProc
+        environment: ({
+            "INIR_VENV": Quickshell.env("INIR_VENV") || Quickshell.env("HOME") + "/.local/state/quickshell/.venv",
+            "ILLOGICAL_IMPULSE_VIRTUAL_ENV": Quickshell.env("INIR_VENV") || Quickshell.env("HOME") + "/.local/state/quickshell/.venv"
+        })
     }
 
     Process {
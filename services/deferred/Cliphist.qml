@@ -11,7 +11,10 @@ import qs.services
 Singleton {
     id: root
     // property string cliphistBinary: FileUtils.trimFileProtocol(`${Directories.home}/.cargo/bin/stash`)
-    property string cliphistBinary: "cliphist"
+    // clipboard.backend "native" swaps cliphist for scripts/clipboard_history.py,
+    // which takes the same commands and prints the same list lines
+    readonly property bool nativeHistory: (Config.options?.clipboard?.backend ?? "cliphist") === "native"
+    property string cliphistBinary: nativeHistory ? `${Directories.scriptsPath}/clipboard_history.py` : "cliphist"
     // Limit how many entries we keep/read to avoid huge models and heavy fuzzy search
     property int maxEntries: 400
     property real pasteDelay: 0.05
@@ -290,7 +293,10 @@ Singleton {
         id: readProc
         property list<string> buffer: []
 
-        command: [root.cliphistBinary, "list"]
+        // The native store can stop at maxEntries instead of listing everything
+        command: root.nativeHistory
+            ? [root.cliphistBinary, "list", "--limit", String(root.maxEntries)]
+            : [root.cliphistBinary, "list"]
 
         stdout: SplitParser {
             onRead: (line) => {
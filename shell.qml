@@ -573,6 +573,7 @@ ShellRoot {
     }
 
     IpcHandler {
+        id: overviewIpc
         target: "overview"
         function _isWaffle(): bool { return (Config.options?.panelFamily ?? "ii") === "waffle" }
         function toggle(): void {
@@ -616,6 +617,40 @@ ShellRoot {
         }
     }
 
+    // Line-based twin of the "overview" target for inir_super_overview_daemon.py:
+    // a Super tap writes "toggle" to a connection it keeps open instead of
+    // spawning `inir overview toggle` and a Quickshell IPC client per keypress.
+    SocketServer {
+        id: overviewSocketServer
+        active: false
+        handler: Socket {
+            parser: SplitParser {
+                onRead: line => {
+                    const command = line.trim()
+                    if (command === "toggle") overviewIpc.toggle()
+                    else if (command === "open") overviewIpc.open()
+                    else if (command === "close") overviewIpc.close()
+                }
+            }
+        }
+    }
+
+    // Resolves the socket path the way the daemon's overview_socket_path() does
+    // (XDG_RUNTIME_DIR, else /run/user/<uid>; never the shared /tmp). A crashed
+    // previous instance leaves its socket file behind, which would make listening fail.
+    Process {
+        running: true
+        command: ["/usr/bin/bash", "-c",
+            'sock="${XDG_RUNTIME_DIR:-/run/user/$(id -u)}/inir/overview.sock"; mkdir -p "${sock%/*}" && rm -f "$sock" && printf "%s" "$sock"']
+        stdout: StdioCollector {
+            onStreamFinished: {
+                if (text.length === 0) return
+                overviewSocketServer.path = text
+                overviewSocketServer.active = true
+            }
+        }
+    }
+
     LazyLoader {
         loading: Config.ready && (Config.options?.panelFamily ?? "ii") !== "waffle"
         activeAsync: Config.ready && (Config.options?.panelFamily ?? "ii") !== "waffle"